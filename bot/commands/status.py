@@ -81,8 +81,38 @@ class StatusCommand(BotCommand):
         status["notify_telegram"] = bool(config.telegram_bot_token and config.telegram_chat_id)
         status["notify_email"] = bool(config.email_sender and config.email_password)
         
+        # 数据源健康记分板
+        from data_provider.source_stats import get_health_report
+        status["data_sources"] = get_health_report()["sources"]
+        
         return status
     
+    def _format_data_sources(self, data_sources: dict) -> List[str]:
+        """格式化数据源健康记分板（成功率、p50/p95 延迟、最近错误）"""
+        if not data_sources:
+            return ["• 暂无数据源调用记录"]
+        
+        operation_names = {
+            "daily": "日线",
+            "realtime": "实时行情",
+            "chip": "筹码分布",
+            "indices": "指数行情",
+        }
+        lines = []
+        for operation, sources in data_sources.items():
+            lines.append(f"• {operation_names.get(operation, operation)}:")
+            for source, stats in sources.items():
+                icon = "✅" if stats["healthy"] else "❌"
+                rate = stats["success_rate"]
+                rate_text = f"{rate:.0%}" if rate is not None else "-"
+                p50 = f"{stats['p50']}s" if stats["p50"] is not None else "-"
+                p95 = f"{stats['p95']}s" if stats["p95"] is not None else "-"
+                lines.append(f"  {icon} {source}: 成功率 {rate_text}, p50 {p50}, p95 {p95}")
+                if not stats["healthy"] and stats["recent_errors"]:
+                    last_error = stats["recent_errors"][-1]
+                    lines.append(f"    最近错误({last_error['time']}): {last_error['error'][:60]}")
+        return lines
+    
     def _format_status(self, status: dict, platform: str) -> str:
         """格式化状态信息"""
         # 状态图标
@@ -126,6 +156,9 @@ class StatusCommand(BotCommand):
             f"• 邮件: {icon(status['notify_email'])}",
         ])
         
+        lines.extend(["", "**🩺 数据源健康**"])
+        lines.extend(self._format_data_sources(status['data_sources']))
+        
         # AI 服务总体状态
         ai_available = status['ai_gemini'] or status['ai_openai']
         if ai_available:
@@ -16,8 +16,11 @@
 
 import logging
 import random
+import sqlite3
+import threading
 import time
 from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, Future, wait
 from datetime import datetime
 from typing import Optional, List, Tuple, Dict, Any
 
@@ -30,6 +33,9 @@ from tenacity import (
     retry_if_exception_type,
 )
 
+from .local_cache import get_local_cache, load_with_local_cache
+from .source_stats import get_scoreboard
+
 # 配置日志
 logger = logging.getLogger(__name__)
 
@@ -37,6 +43,21 @@ logger = logging.getLogger(__name__)
 # === 标准化列名定义 ===
 STANDARD_COLUMNS = ['date', 'open', 'high', 'low', 'close', 'volume', 'amount', 'pct_chg']
 
+# === 日线对冲请求参数 ===
+HEDGE_MIN_SAMPLES = 5      # 数据源成功样本数达到该值后才使用自适应延迟
+HEDGE_MIN_DELAY = 0.5      # 自适应对冲延迟下限（秒）
+HEDGE_MAX_DELAY = 30.0     # 自适应对冲延迟上限（秒）
+
+# === 实时行情数据源 → (Fetcher 名称, get_realtime_quote 额外参数) ===
+REALTIME_SOURCE_FETCHERS: Dict[str, Tuple[str, Dict[str, str]]] = {
+    'efinance': ('EfinanceFetcher', {}),
+    'akshare_em': ('AkshareFetcher', {'source': 'em'}),       # 东财
+    'akshare_sina': ('AkshareFetcher', {'source': 'sina'}),   # 新浪
+    'tencent': ('AkshareFetcher', {'source': 'tencent'}),     # 腾讯
+    'akshare_qq': ('AkshareFetcher', {'source': 'tencent'}),
+    'tushare': ('TushareFetcher', {}),                        # 需要 Tushare Pro 积分
+}
+
 
 class DataFetchError(Exception):
     """数据获取异常基类"""
@@ -331,10 +352,14 @@ class DataFetcherManager:
         from .pytdx_fetcher import PytdxFetcher
         from .baostock_fetcher import BaostockFetcher
         from .yfinance_fetcher import YfinanceFetcher
+        from .realtime_types import configure_realtime_caches
         from src.config import get_config
 
         config = get_config()
 
+        # 按配置调整全量行情缓存的 TTL / stale 窗口
+        configure_realtime_caches(config.realtime_cache_ttls, config.realtime_cache_stale_ttl)
+
         # 创建所有数据源实例（优先级在各 Fetcher 的 __init__ 中确定）
         efinance = EfinanceFetcher()
         akshare = AkshareFetcher()
@@ -393,21 +418,45 @@ class DataFetcherManager:
         Raises:
             DataFetchError: 所有数据源都失败时抛出
         """
+        if get_local_cache() is None:
+            return self._get_daily_data_failover(stock_code, start_date, end_date, days)
+
+        # 本地持久化缓存：同一台机器上的多个进程共享一次上游拉取
+        # end_date 为空时按当天区分，避免跨日复用
+        from src.config import get_config
+        cache_key = (
+            f"daily:{stock_code}:{start_date or ''}:"
+            f"{end_date or datetime.now().strftime('%Y-%m-%d')}:{days}"
+        )
+        return load_with_local_cache(
+            cache_key, get_config().local_cache_daily_ttl,
+            lambda: self._get_daily_data_failover(stock_code, start_date, end_date, days),
+        )
+
+    def _get_daily_data_failover(
+        self,
+        stock_code: str,
+        start_date: Optional[str],
+        end_date: Optional[str],
+        days: int,
+    ) -> Tuple[pd.DataFrame, str]:
+        """按优先级依次尝试各数据源（get_daily_data 的实际拉取逻辑）"""
+        from src.config import get_config
+
+        if get_config().daily_hedge_enabled and len(self._fetchers) > 1:
+            return self._get_daily_data_hedged(stock_code, start_date, end_date, days)
+
         errors = []
         
-        for fetcher in self._fetchers:
+        for fetcher in self._ordered_fetchers('daily'):
             try:
                 logger.info(f"尝试使用 [{fetcher.name}] 获取 {stock_code}...")
-                df = fetcher.get_daily_data(
-                    stock_code=stock_code,
-                    start_date=start_date,
-                    end_date=end_date,
-                    days=days
-                )
+                df = self._timed_get_daily_data(fetcher, stock_code, start_date, end_date, days)
                 
                 if df is not None and not df.empty:
                     logger.info(f"[{fetcher.name}] 成功获取 {stock_code}")
                     return df, fetcher.name
+                errors.append(f"[{fetcher.name}] 返回空数据")
                     
             except Exception as e:
                 error_msg = f"[{fetcher.name}] 失败: {str(e)}"
@@ -420,6 +469,142 @@ class DataFetcherManager:
         error_summary = f"所有数据源获取 {stock_code} 失败:\n" + "\n".join(errors)
         logger.error(error_summary)
         raise DataFetchError(error_summary)
+
+    def _ordered_fetchers(self, operation: str) -> List[BaseFetcher]:
+        """
+        按健康记分板动态调整数据源顺序（ADAPTIVE_SOURCE_ORDER=false 时保持静态优先级）
+        """
+        from src.config import get_config
+
+        if not get_config().adaptive_source_order:
+            return list(self._fetchers)
+        by_name = {f.name: f for f in self._fetchers}
+        return [by_name[name] for name in get_scoreboard().rank(operation, list(by_name))]
+
+    @staticmethod
+    def _timed_get_daily_data(
+        fetcher: BaseFetcher,
+        stock_code: str,
+        start_date: Optional[str],
+        end_date: Optional[str],
+        days: int,
+    ) -> Optional[pd.DataFrame]:
+        """调用数据源获取日线，并将耗时与结果记录到健康记分板"""
+        scoreboard = get_scoreboard()
+        start = time.time()
+        try:
+            df = fetcher.get_daily_data(
+                stock_code=stock_code,
+                start_date=start_date,
+                end_date=end_date,
+                days=days
+            )
+        except Exception as e:
+            scoreboard.record('daily', fetcher.name, time.time() - start, False, str(e))
+            raise
+        scoreboard.record('daily', fetcher.name, time.time() - start, df is not None and not df.empty)
+        return df
+
+    def _hedge_delay(self, fetcher: BaseFetcher) -> float:
+        """
+        对冲延迟：等待该数据源多久后并行启动下一个数据源
+
+        样本足够时取该数据源成功耗时的分位数（自适应），否则使用配置的默认延迟
+        """
+        from src.config import get_config
+
+        config = get_config()
+        histogram = get_scoreboard().histogram('daily', fetcher.name)
+        if histogram.count < HEDGE_MIN_SAMPLES:
+            return config.daily_hedge_delay
+        delay = histogram.quantile(config.daily_hedge_quantile) or config.daily_hedge_delay
+        return min(max(delay, HEDGE_MIN_DELAY), HEDGE_MAX_DELAY)
+
+    def _get_daily_data_hedged(
+        self,
+        stock_code: str,
+        start_date: Optional[str],
+        end_date: Optional[str],
+        days: int,
+    ) -> Tuple[pd.DataFrame, str]:
+        """
+        对冲请求模式获取日线
+
+        策略：
+        1. 先请求最高优先级数据源
+        2. 超过其对冲延迟仍未返回时，并行请求下一优先级数据源
+        3. 某个数据源失败时立即启动下一个（与顺序故障切换一致）
+        4. 取最先返回的有效 DataFrame；落后的请求在后台自然结束，结果丢弃
+
+        每个请求使用独立的后台线程而不是共享的定长线程池：流水线多只股票并发时，
+        挂起的慢请求会一直占住线程，对冲请求若排在它们后面就失去了意义
+        """
+        fetchers = self._ordered_fetchers('daily')
+        errors = []
+        pending: Dict[Future, BaseFetcher] = {}
+        next_index = 0
+
+        def launch() -> None:
+            nonlocal next_index
+            fetcher = fetchers[next_index]
+            next_index += 1
+            logger.info(f"尝试使用 [{fetcher.name}] 获取 {stock_code}...")
+            future = self._start_hedge_call(
+                f"daily-hedge-{fetcher.name}-{stock_code}",
+                self._timed_get_daily_data, fetcher, stock_code, start_date, end_date, days,
+            )
+            pending[future] = fetcher
+
+        launch()
+        while pending:
+            timeout = None
+            if next_index < len(fetchers):
+                # 以最近启动的数据源的对冲延迟作为等待上限
+                timeout = self._hedge_delay(fetchers[next_index - 1])
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                logger.info(f"[对冲] {stock_code} 等待超过 {timeout:.1f}s，并行启动 "
+                            f"[{fetchers[next_index].name}]")
+                launch()
+                continue
+
+            for future in done:
+                fetcher = pending.pop(future)
+                try:
+                    df = future.result()
+                except Exception as e:
+                    error_msg = f"[{fetcher.name}] 失败: {str(e)}"
+                    logger.warning(error_msg)
+                    errors.append(error_msg)
+                    continue
+                if df is not None and not df.empty:
+                    logger.info(f"[{fetcher.name}] 成功获取 {stock_code}")
+                    return df, fetcher.name
+                errors.append(f"[{fetcher.name}] 返回空数据")
+
+            # 本轮全部失败且没有在途请求：立即切换到下一个数据源
+            if not pending and next_index < len(fetchers):
+                launch()
+
+        error_summary = f"所有数据源获取 {stock_code} 失败:\n" + "\n".join(errors)
+        logger.error(error_summary)
+        raise DataFetchError(error_summary)
+
+    @staticmethod
+    def _start_hedge_call(name: str, fn, *args) -> Future:
+        """在独立的后台线程中执行 fn(*args)，立即返回 Future（不排队）"""
+        future: Future = Future()
+        future.set_running_or_notify_cancel()
+
+        def run() -> None:
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name=name, daemon=True).start()
+        return future
     
     @property
     def available_fetchers(self) -> List[str]:
@@ -433,7 +618,7 @@ class DataFetcherManager:
         策略：
         1. 检查优先级中是否包含全量拉取数据源（efinance/akshare_em）
         2. 如果不包含，跳过预取（新浪/腾讯是单股票查询，无需预取）
-        3. 如果自选股数量 >= 5 且使用全量数据源，则预取填充缓存
+        3. 如果自选股数量 >= 5 且使用全量数据源，则直接拉取全市场快照填充缓存
         
         这样做的好处：
         - 使用新浪/腾讯时：每只股票独立查询，无全量拉取问题
@@ -481,23 +666,55 @@ class DataFetcherManager:
         
         logger.info(f"[预取] 开始批量预取实时行情，共 {len(stock_codes)} 只股票...")
         
-        # 尝试通过 efinance 或 akshare 预取
-        # 只需要调用一次 get_realtime_quote，缓存机制会自动拉取全市场数据
-        try:
-            # 用第一只股票触发全量拉取
-            first_code = stock_codes[0]
-            quote = self.get_realtime_quote(first_code)
+        # 按优先级直接填充第一个可用的全量快照（单飞缓存，并发分析线程不会重复拉取）
+        snapshot = self.get_market_snapshot(priority_list)
+        if snapshot is not None:
+            logger.info(f"[预取] 批量预取完成: {snapshot.source.value} 快照 {len(snapshot)} 只股票")
+            return len(stock_codes)
+
+        logger.warning(f"[预取] 批量预取失败，将使用逐个查询模式")
+        return 0
+    
+    def get_market_snapshot(self, priority: Optional[List[str]] = None):
+        """
+        获取全市场实时行情快照（efinance / 东财，按优先级取第一个非空快照）
+        
+        Args:
+            priority: 数据源名称顺序（默认使用 REALTIME_SOURCE_PRIORITY，
+                      其中未列出的全量数据源排在最后）
             
-            if quote:
-                logger.info(f"[预取] 批量预取完成，缓存已填充")
-                return len(stock_codes)
-            else:
-                logger.warning(f"[预取] 批量预取失败，将使用逐个查询模式")
-                return 0
-                
-        except Exception as e:
-            logger.error(f"[预取] 批量预取异常: {e}")
-            return 0
+        Returns:
+            RealtimeSnapshot，全部失败返回 None
+        """
+        from .realtime_types import get_realtime_circuit_breaker
+        
+        snapshot_fetchers = {
+            'efinance': 'EfinanceFetcher',
+            'akshare_em': 'AkshareFetcher',
+        }
+        if priority is None:
+            from src.config import get_config
+            priority = [s.strip() for s in get_config().realtime_source_priority.lower().split(',')]
+            priority += [s for s in snapshot_fetchers if s not in priority]
+        
+        circuit_breaker = get_realtime_circuit_breaker()
+        fetchers_by_name = {f.name: f for f in self._fetchers}
+        for source in priority:
+            fetcher = fetchers_by_name.get(snapshot_fetchers.get(source, ''))
+            if fetcher is None or not hasattr(fetcher, 'get_realtime_snapshot'):
+                continue
+            if not circuit_breaker.is_available(source):
+                logger.info(f"[全量快照] {source} 处于熔断状态，跳过")
+                continue
+            try:
+                snapshot = fetcher.get_realtime_snapshot()
+            except Exception as e:
+                logger.warning(f"[全量快照] {source} 拉取异常: {e}")
+                continue
+            if snapshot is not None and not snapshot.is_empty:
+                return snapshot
+            logger.warning(f"[全量快照] {source} 快照为空，尝试下一个数据源")
+        return None
     
     def get_realtime_quote(self, stock_code: str):
         """
@@ -544,62 +761,33 @@ class DataFetcherManager:
             logger.warning(f"[实时行情] 美股 {stock_code} 无可用数据源")
             return None
         
-        # 获取配置的数据源优先级
-        source_priority = config.realtime_source_priority.split(',')
+        # 获取配置的数据源优先级（开启自适应排序时按健康记分板调整）
+        source_priority = [s.strip().lower() for s in config.realtime_source_priority.split(',') if s.strip()]
+        if config.adaptive_source_order:
+            source_priority = get_scoreboard().rank('realtime', source_priority)
         
+        fetchers_by_name = {f.name: f for f in self._fetchers}
         errors = []
         
         for source in source_priority:
-            source = source.strip().lower()
+            # 数据源名称 → (Fetcher 名称, get_realtime_quote 额外参数)
+            target = REALTIME_SOURCE_FETCHERS.get(source)
+            fetcher = fetchers_by_name.get(target[0]) if target else None
+            if fetcher is None or not hasattr(fetcher, 'get_realtime_quote'):
+                continue
             
+            start = time.time()
             try:
-                quote = None
-                
-                if source == "efinance":
-                    # 尝试 EfinanceFetcher
-                    for fetcher in self._fetchers:
-                        if fetcher.name == "EfinanceFetcher":
-                            if hasattr(fetcher, 'get_realtime_quote'):
-                                quote = fetcher.get_realtime_quote(stock_code)
-                            break
-                
-                elif source == "akshare_em":
-                    # 尝试 AkshareFetcher 东财数据源
-                    for fetcher in self._fetchers:
-                        if fetcher.name == "AkshareFetcher":
-                            if hasattr(fetcher, 'get_realtime_quote'):
-                                quote = fetcher.get_realtime_quote(stock_code, source="em")
-                            break
+                quote = fetcher.get_realtime_quote(stock_code, **target[1])
+                ok = quote is not None and quote.has_basic_data()
+                get_scoreboard().record('realtime', source, time.time() - start, ok)
                 
-                elif source == "akshare_sina":
-                    # 尝试 AkshareFetcher 新浪数据源
-                    for fetcher in self._fetchers:
-                        if fetcher.name == "AkshareFetcher":
-                            if hasattr(fetcher, 'get_realtime_quote'):
-                                quote = fetcher.get_realtime_quote(stock_code, source="sina")
-                            break
-                
-                elif source in ("tencent", "akshare_qq"):
-                    # 尝试 AkshareFetcher 腾讯数据源
-                    for fetcher in self._fetchers:
-                        if fetcher.name == "AkshareFetcher":
-                            if hasattr(fetcher, 'get_realtime_quote'):
-                                quote = fetcher.get_realtime_quote(stock_code, source="tencent")
-                            break
-                
-                elif source == "tushare":
-                    # 尝试 TushareFetcher（需要 Tushare Pro 积分）
-                    for fetcher in self._fetchers:
-                        if fetcher.name == "TushareFetcher":
-                            if hasattr(fetcher, 'get_realtime_quote'):
-                                quote = fetcher.get_realtime_quote(stock_code)
-                            break
-                
-                if quote is not None and quote.has_basic_data():
+                if ok:
                     logger.info(f"[实时行情] {stock_code} 成功获取 (来源: {source})")
                     return quote
                     
             except Exception as e:
+                get_scoreboard().record('realtime', source, time.time() - start, False, str(e))
                 error_msg = f"[{source}] 失败: {str(e)}"
                 logger.warning(error_msg)
                 errors.append(error_msg)
@@ -648,23 +836,30 @@ class DataFetcherManager:
             ("EfinanceFetcher", "efinance_chip"),
         ]
 
+        if config.adaptive_source_order:
+            ranked = get_scoreboard().rank('chip', [name for name, _ in chip_sources])
+            chip_sources = sorted(chip_sources, key=lambda item: ranked.index(item[0]))
+
         for fetcher_name, source_key in chip_sources:
             # 检查熔断器状态
             if not circuit_breaker.is_available(source_key):
                 logger.debug(f"[熔断] {fetcher_name} 筹码接口处于熔断状态，尝试下一个")
                 continue
 
+            start = time.time()
             try:
                 for fetcher in self._fetchers:
                     if fetcher.name == fetcher_name:
                         if hasattr(fetcher, 'get_chip_distribution'):
                             chip = fetcher.get_chip_distribution(stock_code)
+                            get_scoreboard().record('chip', fetcher_name, time.time() - start, chip is not None)
                             if chip is not None:
                                 circuit_breaker.record_success(source_key)
                                 logger.info(f"[筹码分布] {stock_code} 成功获取 (来源: {fetcher_name})")
                                 return chip
                         break
             except Exception as e:
+                get_scoreboard().record('chip', fetcher_name, time.time() - start, False, str(e))
                 logger.warning(f"[筹码分布] {fetcher_name} 获取 {stock_code} 失败: {e}")
                 circuit_breaker.record_failure(source_key, str(e))
                 continue
@@ -695,11 +890,18 @@ class DataFetcherManager:
         if not hasattr(self, '_stock_name_cache'):
             self._stock_name_cache = {}
         
+        # 1.1 本地持久化缓存（其他进程已获取过的名称）
+        name = self._get_persisted_stock_names([stock_code]).get(stock_code)
+        if name:
+            self._stock_name_cache[stock_code] = name
+            return name
+        
         # 2. 尝试从实时行情中获取（最快）
         quote = self.get_realtime_quote(stock_code)
         if quote and hasattr(quote, 'name') and quote.name:
             name = quote.name
             self._stock_name_cache[stock_code] = name
+            self._persist_stock_names({stock_code: name})
             logger.info(f"[股票名称] 从实时行情获取: {stock_code} -> {name}")
             return name
         
@@ -710,6 +912,7 @@ class DataFetcherManager:
                     name = fetcher.get_stock_name(stock_code)
                     if name:
                         self._stock_name_cache[stock_code] = name
+                        self._persist_stock_names({stock_code: name})
                         logger.info(f"[股票名称] 从 {fetcher.name} 获取: {stock_code} -> {name}")
                         return name
                 except Exception as e:
@@ -745,6 +948,15 @@ class DataFetcherManager:
                 result[code] = self._stock_name_cache[code]
                 missing_codes.discard(code)
         
+        if not missing_codes:
+            return result
+        
+        # 1.1 本地持久化缓存（其他进程已获取过的名称）
+        persisted = self._get_persisted_stock_names(missing_codes)
+        self._stock_name_cache.update(persisted)
+        result.update(persisted)
+        missing_codes.difference_update(persisted)
+        
         if not missing_codes:
             return result
         
@@ -754,14 +966,17 @@ class DataFetcherManager:
                 try:
                     stock_list = fetcher.get_stock_list()
                     if stock_list is not None and not stock_list.empty:
+                        fetched = {}
                         for _, row in stock_list.iterrows():
                             code = row.get('code')
                             name = row.get('name')
                             if code and name:
-                                self._stock_name_cache[code] = name
+                                fetched[code] = name
                                 if code in missing_codes:
                                     result[code] = name
                                     missing_codes.discard(code)
+                        self._stock_name_cache.update(fetched)
+                        self._persist_stock_names(fetched)
                         
                         if not missing_codes:
                             break
@@ -781,15 +996,40 @@ class DataFetcherManager:
         logger.info(f"[股票名称] 批量获取完成，成功 {len(result)}/{len(stock_codes)}")
         return result
 
+    def _get_persisted_stock_names(self, stock_codes) -> Dict[str, str]:
+        """从本地持久化缓存读取股票名称（未开启时返回空字典）"""
+        cache = get_local_cache()
+        if cache is None:
+            return {}
+        from src.config import get_config
+        try:
+            return cache.get_stock_names(stock_codes, max_age=get_config().local_cache_names_ttl)
+        except sqlite3.Error as e:
+            logger.debug(f"[股票名称] 读取本地缓存失败: {e}")
+            return {}
+
+    def _persist_stock_names(self, names: Dict[str, str]) -> None:
+        """写入本地持久化缓存，供其他进程复用"""
+        cache = get_local_cache()
+        if cache is None or not names:
+            return
+        try:
+            cache.save_stock_names(names)
+        except sqlite3.Error as e:
+            logger.debug(f"[股票名称] 写入本地缓存失败: {e}")
+
     def get_main_indices(self) -> List[Dict[str, Any]]:
         """获取主要指数实时行情（自动切换数据源）"""
-        for fetcher in self._fetchers:
+        for fetcher in self._ordered_fetchers('indices'):
+            start = time.time()
             try:
                 data = fetcher.get_main_indices()
+                get_scoreboard().record('indices', fetcher.name, time.time() - start, bool(data))
                 if data:
                     logger.info(f"[{fetcher.name}] 获取指数行情成功")
                     return data
             except Exception as e:
+                get_scoreboard().record('indices', fetcher.name, time.time() - start, False, str(e))
                 logger.warning(f"[{fetcher.name}] 获取指数行情失败: {e}")
                 continue
         return []
@@ -40,10 +40,10 @@ from tenacity import (
 )
 
 from .base import BaseFetcher, DataFetchError, RateLimitError, STANDARD_COLUMNS
+from .local_cache import load_with_local_cache
 from .realtime_types import (
-    UnifiedRealtimeQuote, RealtimeSource,
-    get_realtime_circuit_breaker,
-    safe_float, safe_int  # 使用统一的类型转换函数
+    RealtimeSource, RealtimeSnapshot, EFINANCE_COLUMNS,
+    get_realtime_circuit_breaker, get_realtime_cache,
 )
 
 
@@ -105,11 +105,9 @@ USER_AGENTS = [
 
 # 缓存实时行情数据（避免重复请求）
 # TTL 设为 10 分钟 (600秒)：批量分析场景下避免重复拉取
-_realtime_cache: Dict[str, Any] = {
-    'data': None,
-    'timestamp': 0,
-    'ttl': 600  # 10分钟缓存有效期
-}
+# 缓存值为 RealtimeSnapshot（按代码 O(1) 查询）；单飞刷新，多线程冷启动只拉取一次
+# TTL 可通过 REALTIME_CACHE_TTLS 按数据源覆盖
+_realtime_cache = get_realtime_cache('efinance', ttl=600)
 
 
 def _is_etf_code(stock_code: str) -> bool:
@@ -441,6 +439,60 @@ class EfinanceFetcher(BaseFetcher):
         
         return df
     
+    def _load_realtime_snapshot(self) -> Optional[RealtimeSnapshot]:
+        """
+        全量拉取实时行情并构建快照
+
+        由 _realtime_cache 单飞调用：同一时刻只有一个线程执行该函数。
+        失败返回 None（不覆盖旧缓存）。
+        """
+        import efinance as ef
+        circuit_breaker = get_realtime_circuit_breaker()
+        source_key = "efinance"
+
+        try:
+            logger.info(f"[缓存未命中] 触发全量刷新 实时行情(efinance)")
+            # 防封禁策略
+            self._set_random_user_agent()
+            self._enforce_rate_limit()
+
+            logger.info(f"[API调用] ef.stock.get_realtime_quotes() 获取实时行情...")
+            api_start = time.time()
+
+            # efinance 的实时行情 API
+            df = ef.stock.get_realtime_quotes()
+
+            api_elapsed = time.time() - api_start
+            logger.info(f"[API返回] ef.stock.get_realtime_quotes 成功: 返回 {len(df)} 只股票, 耗时 {api_elapsed:.2f}s")
+            circuit_breaker.record_success(source_key)
+        except Exception as e:
+            logger.error(f"[API错误] ef.stock.get_realtime_quotes 获取失败: {e}")
+            circuit_breaker.record_failure(source_key, str(e))
+            return None
+
+        # 构建快照（代码 → 行号索引 + 数值列），后续查询 O(1)
+        snapshot = RealtimeSnapshot.from_dataframe(df, EFINANCE_COLUMNS, RealtimeSource.EFINANCE)
+        logger.info(f"[缓存更新] 实时行情(efinance) 缓存已刷新，TTL={_realtime_cache.ttl}s")
+        return snapshot
+
+    def get_realtime_snapshot(self, force_refresh: bool = False) -> Optional[RealtimeSnapshot]:
+        """
+        获取全市场实时行情快照
+
+        Args:
+            force_refresh: 是否强制刷新（批量预取时使用）；并发调用只会触发一次全量拉取
+        """
+        if force_refresh:
+            return _realtime_cache.refresh(self._load_realtime_snapshot_shared)
+        return _realtime_cache.get(self._load_realtime_snapshot_shared)
+
+    def _load_realtime_snapshot_shared(self) -> Optional[RealtimeSnapshot]:
+        """经本地持久化缓存加载（开启 LOCAL_CACHE_ENABLED 时跨进程共享一次拉取）"""
+        return load_with_local_cache(
+            'realtime:efinance', _realtime_cache.ttl, self._load_realtime_snapshot,
+            should_store=lambda snapshot: not snapshot.is_empty,
+        )
+
     def get_realtime_quote(self, stock_code: str) -> Optional[EfinanceRealtimeQuote]:
         """
         获取实时行情数据
@@ -453,7 +505,6 @@ class EfinanceFetcher(BaseFetcher):
         Returns:
             UnifiedRealtimeQuote 对象，获取失败返回 None
         """
-        import efinance as ef
         circuit_breaker = get_realtime_circuit_breaker()
         source_key = "efinance"
         
@@ -463,84 +514,17 @@ class EfinanceFetcher(BaseFetcher):
             return None
         
         try:
-            # 检查缓存
-            current_time = time.time()
-            if (_realtime_cache['data'] is not None and 
-                current_time - _realtime_cache['timestamp'] < _realtime_cache['ttl']):
-                df = _realtime_cache['data']
-                cache_age = int(current_time - _realtime_cache['timestamp'])
-                logger.debug(f"[缓存命中] 实时行情(efinance) - 缓存年龄 {cache_age}s/{_realtime_cache['ttl']}s")
-            else:
-                # 触发全量刷新
-                logger.info(f"[缓存未命中] 触发全量刷新 实时行情(efinance)")
-                # 防封禁策略
-                self._set_random_user_agent()
-                self._enforce_rate_limit()
-                
-                logger.info(f"[API调用] ef.stock.get_realtime_quotes() 获取实时行情...")
-                import time as _time
-                api_start = _time.time()
-                
-                # efinance 的实时行情 API
-                df = ef.stock.get_realtime_quotes()
-                
-                api_elapsed = _time.time() - api_start
-                logger.info(f"[API返回] ef.stock.get_realtime_quotes 成功: 返回 {len(df)} 只股票, 耗时 {api_elapsed:.2f}s")
-                circuit_breaker.record_success(source_key)
-                
-                # 更新缓存
-                _realtime_cache['data'] = df
-                _realtime_cache['timestamp'] = current_time
-                logger.info(f"[缓存更新] 实时行情(efinance) 缓存已刷新，TTL={_realtime_cache['ttl']}s")
-            
-            # 查找指定股票
-            # efinance 返回的列名可能是 '股票代码' 或 'code'
-            code_col = '股票代码' if '股票代码' in df.columns else 'code'
-            row = df[df[code_col] == stock_code]
-            if row.empty:
-                logger.warning(f"[API返回] 未找到股票 {stock_code} 的实时行情")
+            # 单飞缓存：冷缓存时多个线程只触发一次全量拉取
+            snapshot = self.get_realtime_snapshot()
+            if snapshot is None:
                 return None
+            logger.debug(f"[缓存] 实时行情(efinance) - 缓存年龄 {int(snapshot.age)}s/{_realtime_cache.ttl}s")
             
-            row = row.iloc[0]
-            
-            # 使用 realtime_types.py 中的统一转换函数
-            # 获取列名（可能是中文或英文）
-            name_col = '股票名称' if '股票名称' in df.columns else 'name'
-            price_col = '最新价' if '最新价' in df.columns else 'price'
-            pct_col = '涨跌幅' if '涨跌幅' in df.columns else 'pct_chg'
-            chg_col = '涨跌额' if '涨跌额' in df.columns else 'change'
-            vol_col = '成交量' if '成交量' in df.columns else 'volume'
-            amt_col = '成交额' if '成交额' in df.columns else 'amount'
-            turn_col = '换手率' if '换手率' in df.columns else 'turnover_rate'
-            amp_col = '振幅' if '振幅' in df.columns else 'amplitude'
-            high_col = '最高' if '最高' in df.columns else 'high'
-            low_col = '最低' if '最低' in df.columns else 'low'
-            open_col = '开盘' if '开盘' in df.columns else 'open'
-            # efinance 也返回量比、市盈率、市值等字段
-            vol_ratio_col = '量比' if '量比' in df.columns else 'volume_ratio'
-            pe_col = '市盈率' if '市盈率' in df.columns else 'pe_ratio'
-            total_mv_col = '总市值' if '总市值' in df.columns else 'total_mv'
-            circ_mv_col = '流通市值' if '流通市值' in df.columns else 'circ_mv'
-            
-            quote = UnifiedRealtimeQuote(
-                code=stock_code,
-                name=str(row.get(name_col, '')),
-                source=RealtimeSource.EFINANCE,
-                price=safe_float(row.get(price_col)),
-                change_pct=safe_float(row.get(pct_col)),
-                change_amount=safe_float(row.get(chg_col)),
-                volume=safe_int(row.get(vol_col)),
-                amount=safe_float(row.get(amt_col)),
-                turnover_rate=safe_float(row.get(turn_col)),
-                amplitude=safe_float(row.get(amp_col)),
-                high=safe_float(row.get(high_col)),
-                low=safe_float(row.get(low_col)),
-                open_price=safe_float(row.get(open_col)),
-                volume_ratio=safe_float(row.get(vol_ratio_col)),  # 量比
-                pe_ratio=safe_float(row.get(pe_col)),  # 市盈率
-                total_mv=safe_float(row.get(total_mv_col)),  # 总市值
-                circ_mv=safe_float(row.get(circ_mv_col)),  # 流通市值
-            )
+            # 查找指定股票（快照哈希索引，O(1)）
+            quote = snapshot.get_quote(stock_code)
+            if quote is None:
+                logger.warning(f"[API返回] 未找到股票 {stock_code} 的实时行情")
+                return None
             
             logger.info(f"[实时行情-efinance] {stock_code} {quote.name}: 价格={quote.price}, 涨跌={quote.change_pct}%, "
                        f"量比={quote.volume_ratio}, 换手率={quote.turnover_rate}%")
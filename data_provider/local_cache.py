@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+本地持久化缓存（跨进程共享）
+===================================
+
+设计目标：
+main.py 定时任务、webui.py 服务、机器人 Stream 客户端各自启动时内存缓存都是空的，
+同一台机器上的多个进程会分别请求东财/新浪等上游接口。
+LocalCache 使用本地 SQLite 文件（WAL 模式）保存：
+1. 全市场实时行情快照（RealtimeSnapshot）
+2. 股票名称表
+3. 近期日线数据
+
+并通过租约（lease）实现跨进程单飞：同一 key 同一时刻只有一个进程拉取上游，
+其余进程等待结果写入后直接读取。
+
+值以 JSON 保存（DataFrame 用 pandas 的 table 格式，行情快照用 RealtimeSnapshot.to_dict），
+不使用 pickle：缓存文件被多个进程共享，读取时不会执行文件中的任意代码。
+过期条目在打开缓存时以及每写入 PURGE_EVERY_SETS 次后清理，文件不会随每日新键无限增长。
+
+使用方式：
+- 配置 LOCAL_CACHE_ENABLED=true 开启（默认关闭）
+- get_local_cache() 未开启时返回 None，调用方直接走原有逻辑
+"""
+
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+# 等待其他进程刷新时的轮询间隔（秒）
+LEASE_POLL_INTERVAL = 0.2
+# 每写入该次数后清理一次过期条目
+PURGE_EVERY_SETS = 200
+
+_TYPE_TAG = '__type__'
+
+
+def _to_json(value: Any) -> Any:
+    """把缓存值转换为可 JSON 序列化的结构（DataFrame / 行情快照 / 元组带类型标记）"""
+    from .realtime_types import RealtimeSnapshot
+
+    if isinstance(value, pd.DataFrame):
+        return {_TYPE_TAG: 'dataframe', 'data': value.to_json(orient='table', index=False)}
+    if isinstance(value, RealtimeSnapshot):
+        return {_TYPE_TAG: 'snapshot', 'data': value.to_dict()}
+    if isinstance(value, tuple):
+        return {_TYPE_TAG: 'tuple', 'data': [_to_json(item) for item in value]}
+    if isinstance(value, list):
+        return [_to_json(item) for item in value]
+    if isinstance(value, dict):
+        return {str(k): _to_json(v) for k, v in value.items()}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise TypeError(f"不支持缓存的类型: {type(value).__name__}")
+
+
+def _from_json(data: Any) -> Any:
+    """_to_json 的逆操作"""
+    from .realtime_types import RealtimeSnapshot
+
+    if isinstance(data, list):
+        return [_from_json(item) for item in data]
+    if not isinstance(data, dict):
+        return data
+    tag = data.get(_TYPE_TAG)
+    if tag == 'dataframe':
+        return pd.read_json(io.StringIO(data['data']), orient='table')
+    if tag == 'snapshot':
+        return RealtimeSnapshot.from_dict(data['data'])
+    if tag == 'tuple':
+        return tuple(_from_json(item) for item in data['data'])
+    return {k: _from_json(v) for k, v in data.items()}
+
+
+class LocalCache:
+    """
+    基于 SQLite 的跨进程 KV 缓存
+
+    - kv: 通用 KV（JSON 序列化），带过期时间
+    - stock_names: 股票名称表（code → name），便于按需增量合并
+    - leases: 刷新租约，实现跨进程单飞
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            -- 旧版本以 pickle 保存值的表，数据可丢弃
+            DROP TABLE IF EXISTS entries;
+            CREATE TABLE IF NOT EXISTS kv (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS stock_names (
+                code TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS leases (
+                key TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+        """)
+        self._owner = f"{os.getpid()}"
+        self._sets_since_purge = 0
+        self.purge_expired()
+
+    # === 通用 KV ===
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取未过期的缓存值，不存在或已过期返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM kv WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        try:
+            return _from_json(json.loads(row[0]))
+        except Exception as e:
+            logger.warning(f"[本地缓存] 反序列化失败，忽略 {key}: {e}")
+            return None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """写入缓存值（每 PURGE_EVERY_SETS 次顺带清理过期条目）"""
+        now = time.time()
+        text = json.dumps(_to_json(value), ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, text, now, now + ttl),
+            )
+            self._sets_since_purge += 1
+            purge = self._sets_since_purge >= PURGE_EVERY_SETS
+        if purge:
+            self.purge_expired()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def purge_expired(self) -> int:
+        """清理过期条目，返回删除数量"""
+        now = time.time()
+        with self._lock:
+            self._sets_since_purge = 0
+            cur = self._conn.execute("DELETE FROM kv WHERE expires_at <= ?", (now,))
+            self._conn.execute("DELETE FROM leases WHERE expires_at <= ?", (now,))
+            return cur.rowcount
+
+    # === 跨进程单飞 ===
+
+    def _acquire_lease(self, key: str, lease_seconds: float) -> bool:
+        owner = f"{self._owner}-{threading.get_ident()}"
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.execute(
+                    "DELETE FROM leases WHERE key = ? AND expires_at <= ?", (key, now)
+                )
+                cur = self._conn.execute(
+                    "INSERT OR IGNORE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)",
+                    (key, owner, now + lease_seconds),
+                )
+                self._conn.execute("COMMIT")
+                return cur.rowcount == 1
+            except sqlite3.Error:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+
+    def _release_lease(self, key: str) -> None:
+        owner = f"{self._owner}-{threading.get_ident()}"
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def get_or_load(
+        self,
+        key: str,
+        ttl: float,
+        loader: Callable[[], Any],
+        lease_seconds: float = 60.0,
+        should_store: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """
+        读取缓存，未命中时调用 loader 并写入；多个进程同时未命中只有一个会调用 loader
+
+        Args:
+            key: 缓存键
+            ttl: 有效期（秒）
+            loader: 上游拉取函数
+            lease_seconds: 租约时长，持有进程崩溃时租约到期后由其他进程接手
+            should_store: 判断结果是否写入缓存（如空快照不写入，避免其他进程跳过拉取）
+        """
+        value = self.get(key)
+        if value is not None:
+            logger.debug(f"[本地缓存] 命中 {key}")
+            return value
+
+        deadline = time.time() + lease_seconds
+        while True:
+            if self._acquire_lease(key, lease_seconds):
+                try:
+                    # 拿到租约后再检查一次：等待期间其他进程可能已写入
+                    value = self.get(key)
+                    if value is not None:
+                        return value
+                    value = loader()
+                    if value is not None and (should_store is None or should_store(value)):
+                        try:
+                            self.set(key, value, ttl)
+                        except (sqlite3.Error, TypeError, ValueError) as e:
+                            logger.warning(f"[本地缓存] 写入 {key} 失败: {e}")
+                    return value
+                finally:
+                    self._release_lease(key)
+
+            # 其他进程正在刷新：等待其写入结果
+            time.sleep(LEASE_POLL_INTERVAL)
+            value = self.get(key)
+            if value is not None:
+                logger.debug(f"[本地缓存] 复用其他进程的刷新结果 {key}")
+                return value
+            if time.time() >= deadline:
+                logger.warning(f"[本地缓存] 等待 {key} 刷新超时，直接拉取")
+                return loader()
+
+    # === 股票名称表 ===
+
+    def get_stock_names(self, codes: Optional[Iterable[str]] = None, max_age: float = 86400) -> Dict[str, str]:
+        """
+        读取股票名称
+
+        Args:
+            codes: 指定代码（None 表示全部）
+            max_age: 名称有效期（秒）
+        """
+        min_updated = time.time() - max_age
+        with self._lock:
+            if codes is None:
+                rows = self._conn.execute(
+                    "SELECT code, name FROM stock_names WHERE updated_at >= ?", (min_updated,)
+                ).fetchall()
+            else:
+                codes = list(codes)
+                rows = []
+                # SQLite 默认变量上限 999，分批查询
+                for i in range(0, len(codes), 500):
+                    chunk = codes[i:i + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows.extend(self._conn.execute(
+                        f"SELECT code, name FROM stock_names WHERE updated_at >= ? AND code IN ({placeholders})",
+                        (min_updated, *chunk),
+                    ).fetchall())
+        return {code: name for code, name in rows}
+
+    def save_stock_names(self, names: Dict[str, str]) -> None:
+        """合并写入股票名称"""
+        if not names:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO stock_names (code, name, updated_at) VALUES (?, ?, ?)",
+                [(code, name, now) for code, name in names.items() if code and name],
+            )
+
+
+_local_cache: Optional[LocalCache] = None
+_local_cache_lock = threading.Lock()
+
+
+def get_local_cache() -> Optional[LocalCache]:
+    """
+    获取本地持久化缓存（LOCAL_CACHE_ENABLED=false 时返回 None）
+    """
+    global _local_cache
+    from src.config import get_config
+
+    config = get_config()
+    if not config.local_cache_enabled:
+        return None
+    if _local_cache is None:
+        with _local_cache_lock:
+            if _local_cache is None:
+                try:
+                    _local_cache = LocalCache(config.local_cache_path)
+                    logger.info(f"[本地缓存] 已启用: {config.local_cache_path}")
+                except Exception as e:
+                    logger.warning(f"[本地缓存] 初始化失败，回退到仅内存缓存: {e}")
+                    return None
+    return _local_cache
+
+
+def load_with_local_cache(
+    key: str,
+    ttl: float,
+    loader: Callable[[], Any],
+    should_store: Optional[Callable[[Any], bool]] = None,
+) -> Any:
+    """
+    通过本地缓存加载（未启用时直接调用 loader）
+
+    本地缓存异常不影响主流程：出错时退化为直接调用 loader
+    """
+    cache = get_local_cache()
+    if cache is None:
+        return loader()
+    try:
+        return cache.get_or_load(key, ttl, loader, should_store=should_store)
+    except sqlite3.Error as e:
+        logger.warning(f"[本地缓存] 读写失败，直接拉取 {key}: {e}")
+        return loader()
@@ -30,6 +30,7 @@ from tenacity import (
 )
 
 from .base import BaseFetcher, DataFetchError, STANDARD_COLUMNS
+from .local_cache import load_with_local_cache
 import os
 
 logger = logging.getLogger(__name__)
@@ -302,15 +303,23 @@ class PytdxFetcher(BaseFetcher):
             market, code = self._get_market_code(stock_code)
             
             with self._pytdx_session() as api:
-                # 获取股票列表（缓存）
+                # 获取股票列表（缓存；开启本地持久化缓存时跨进程共享）
                 if self._stock_list_cache is None:
-                    # 获取深圳和上海股票列表
-                    sz_stocks = api.get_security_list(0, 0)  # 深圳
-                    sh_stocks = api.get_security_list(1, 0)  # 上海
-                    
-                    self._stock_list_cache = {}
-                    for stock in (sz_stocks or []) + (sh_stocks or []):
-                        self._stock_list_cache[stock['code']] = stock['name']
+                    from src.config import get_config
+
+                    def load_security_list() -> dict:
+                        # 获取深圳和上海股票列表
+                        sz_stocks = api.get_security_list(0, 0)  # 深圳
+                        sh_stocks = api.get_security_list(1, 0)  # 上海
+                        return {
+                            stock['code']: stock['name']
+                            for stock in (sz_stocks or []) + (sh_stocks or [])
+                        }
+
+                    self._stock_list_cache = load_with_local_cache(
+                        'pytdx:security_list', get_config().local_cache_names_ttl,
+                        load_security_list, should_store=bool,
+                    )
                 
                 # 查找股票名称
                 name = self._stock_list_cache.get(code)
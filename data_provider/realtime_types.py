@@ -11,15 +11,21 @@
 
 使用方式：
 - 所有 Fetcher 的 get_realtime_quote() 统一返回 UnifiedRealtimeQuote
+- 全量行情接口（efinance / akshare_em / tushare）缓存 RealtimeSnapshot，按代码 O(1) 查询
+- SingleFlightCache 保证多线程下同一数据源同一时刻只有一次全量刷新
 - CircuitBreaker 管理各数据源的熔断状态
 """
 
 import logging
+import threading
 import time
 from dataclasses import dataclass, field
-from typing import Optional, Dict, Any, Union
+from typing import Optional, Dict, Any, Union, List, Tuple, Callable
 from enum import Enum
 
+import numpy as np
+import pandas as pd
+
 logger = logging.getLogger(__name__)
 
 
@@ -175,6 +181,416 @@ class UnifiedRealtimeQuote:
         return self.volume_ratio is not None or self.turnover_rate is not None
 
 
+# ============================================
+# 全市场实时行情快照
+# ============================================
+# 设计说明：
+# 东财/efinance 等全量接口一次返回 5000+ 只股票，原先缓存原始 DataFrame，
+# 每次查询都执行 df[df['代码'] == code] 全表扫描并逐字段 safe_float 转换。
+# RealtimeSnapshot 在每次刷新时只构建一次：代码 → 行号哈希 + 按字段的 NumPy 数值列，
+# 查询为 O(1)，并缓存已构建的 UnifiedRealtimeQuote。
+
+# UnifiedRealtimeQuote 中的数值字段（volume 为整数，其余为浮点数）
+QUOTE_NUMERIC_FIELDS = (
+    'price', 'change_pct', 'change_amount', 'volume', 'amount',
+    'volume_ratio', 'turnover_rate', 'amplitude',
+    'open_price', 'high', 'low', 'pre_close',
+    'pe_ratio', 'pb_ratio', 'total_mv', 'circ_mv',
+    'change_60d', 'high_52w', 'low_52w',
+)
+
+# 各全量数据源的列名映射：字段名 → 候选列名（按顺序取第一个存在的列）
+# 东方财富（akshare ak.stock_zh_a_spot_em / ak.fund_etf_spot_em）
+AKSHARE_EM_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    'code': ('代码',),
+    'name': ('名称',),
+    'price': ('最新价',),
+    'change_pct': ('涨跌幅',),
+    'change_amount': ('涨跌额',),
+    'volume': ('成交量',),
+    'amount': ('成交额',),
+    'volume_ratio': ('量比',),
+    'turnover_rate': ('换手率',),
+    'amplitude': ('振幅',),
+    'open_price': ('今开',),
+    'high': ('最高',),
+    'low': ('最低',),
+    'pre_close': ('昨收',),
+    'pe_ratio': ('市盈率-动态',),
+    'pb_ratio': ('市净率',),
+    'total_mv': ('总市值',),
+    'circ_mv': ('流通市值',),
+    'change_60d': ('60日涨跌幅',),
+    'high_52w': ('52周最高',),
+    'low_52w': ('52周最低',),
+}
+
+# efinance（ef.stock.get_realtime_quotes），列名可能是中文或英文
+EFINANCE_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    'code': ('股票代码', 'code'),
+    'name': ('股票名称', 'name'),
+    'price': ('最新价', 'price'),
+    'change_pct': ('涨跌幅', 'pct_chg'),
+    'change_amount': ('涨跌额', 'change'),
+    'volume': ('成交量', 'volume'),
+    'amount': ('成交额', 'amount'),
+    'volume_ratio': ('量比', 'volume_ratio'),
+    'turnover_rate': ('换手率', 'turnover_rate'),
+    'amplitude': ('振幅', 'amplitude'),
+    'open_price': ('开盘', 'open'),
+    'high': ('最高', 'high'),
+    'low': ('最低', 'low'),
+    'pre_close': ('昨日收盘', 'pre_close'),
+    'pe_ratio': ('市盈率', 'pe_ratio'),
+    'total_mv': ('总市值', 'total_mv'),
+    'circ_mv': ('流通市值', 'circ_mv'),
+}
+
+# Tushare Pro（quotation 接口）
+TUSHARE_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    'code': ('ts_code', 'TS_CODE', 'code'),
+    'name': ('name',),
+    'price': ('price',),
+    'change_pct': ('pct_chg',),
+    'change_amount': ('change',),
+    'volume': ('vol',),
+    'amount': ('amount',),
+    'open_price': ('open',),
+    'high': ('high',),
+    'low': ('low',),
+    'pre_close': ('pre_close',),
+    'turnover_rate': ('turnover_ratio',),
+    'pe_ratio': ('pe',),
+    'pb_ratio': ('pb',),
+    'total_mv': ('total_mv',),
+}
+
+
+class RealtimeSnapshot:
+    """
+    全市场实时行情快照（每次刷新构建一次）
+
+    - index: 代码 → 行号哈希，查询 O(1)
+    - columns: 字段 → float64 NumPy 列（缺失值为 NaN）
+    - get_quote() 每次返回新构建的 UnifiedRealtimeQuote，调用方修改不会影响其他线程/股票
+
+    使用方式：
+        snapshot = RealtimeSnapshot.from_dataframe(df, AKSHARE_EM_COLUMNS, RealtimeSource.AKSHARE_EM)
+        quote = snapshot.get_quote('600519')
+    """
+
+    def __init__(
+        self,
+        source: RealtimeSource,
+        codes: List[str],
+        names: List[str],
+        columns: Dict[str, np.ndarray],
+        timestamp: Optional[float] = None,
+    ):
+        self.source = source
+        self.codes = codes
+        self.names = names
+        self.columns = columns
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        # 重复代码保留首行，与原先 df[df['代码'] == code].iloc[0] 行为一致
+        self.index: Dict[str, int] = {}
+        for i, code in enumerate(codes):
+            self.index.setdefault(code, i)
+
+    @classmethod
+    def empty(cls, source: RealtimeSource) -> 'RealtimeSnapshot':
+        """空快照（接口失败时缓存，避免同一轮任务反复请求）"""
+        return cls(source, [], [], {})
+
+    @classmethod
+    def from_dataframe(
+        cls,
+        df: Optional[pd.DataFrame],
+        column_map: Dict[str, Tuple[str, ...]],
+        source: RealtimeSource,
+        code_normalizer: Optional[Callable[[str], str]] = None,
+    ) -> 'RealtimeSnapshot':
+        """
+        从全量行情 DataFrame 构建快照
+
+        Args:
+            df: 数据源返回的全量行情
+            column_map: 字段名 → 候选列名，见 AKSHARE_EM_COLUMNS / EFINANCE_COLUMNS / TUSHARE_COLUMNS
+            source: 数据源标记
+            code_normalizer: 代码规范化函数（如 Tushare 的 600519.SH → 600519）
+        """
+        if df is None or df.empty:
+            return cls.empty(source)
+
+        def pick(field_name: str) -> Optional[str]:
+            for col in column_map.get(field_name, ()):
+                if col in df.columns:
+                    return col
+            return None
+
+        code_col = pick('code')
+        if code_col is None:
+            logger.warning(f"[实时快照] {source.value} 行情缺少代码列，无法构建快照")
+            return cls.empty(source)
+
+        codes = [str(c).strip() for c in df[code_col].tolist()]
+        if code_normalizer is not None:
+            codes = [code_normalizer(c) for c in codes]
+
+        name_col = pick('name')
+        names = [str(n) for n in df[name_col].tolist()] if name_col else [''] * len(codes)
+
+        columns: Dict[str, np.ndarray] = {}
+        for field_name in QUOTE_NUMERIC_FIELDS:
+            col = pick(field_name)
+            if col is None:
+                continue
+            # '-' / '' 等非数值统一转为 NaN，与 safe_float 的处理一致
+            columns[field_name] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)
+
+        return cls(source, codes, names, columns)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """可 JSON 序列化的字典（本地缓存持久化用，不含已构建的 quote 对象）"""
+        return {
+            'source': self.source.value,
+            'codes': self.codes,
+            'names': self.names,
+            'columns': {name: column.tolist() for name, column in self.columns.items()},
+            'timestamp': self.timestamp,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'RealtimeSnapshot':
+        """由 to_dict() 的结果恢复快照"""
+        return cls(
+            RealtimeSource(data['source']),
+            list(data['codes']),
+            list(data['names']),
+            {name: np.asarray(values, dtype=np.float64) for name, values in data['columns'].items()},
+            timestamp=data['timestamp'],
+        )
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.index
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.codes
+
+    @property
+    def age(self) -> float:
+        """快照年龄（秒）"""
+        return time.time() - self.timestamp
+
+    def get_quote(self, code: str) -> Optional[UnifiedRealtimeQuote]:
+        """
+        O(1) 获取指定代码的实时行情
+
+        Returns:
+            新构建的 UnifiedRealtimeQuote 对象，快照中不存在返回 None
+        """
+        i = self.index.get(code)
+        if i is None:
+            return None
+
+        values: Dict[str, Any] = {}
+        for field_name, column in self.columns.items():
+            value = column[i]
+            if np.isnan(value):
+                continue
+            values[field_name] = int(value) if field_name == 'volume' else float(value)
+
+        return UnifiedRealtimeQuote(
+            code=code,
+            name=self.names[i],
+            source=self.source,
+            **values,
+        )
+
+
+# ============================================
+# 单飞（single-flight）实时行情缓存
+# ============================================
+# 设计说明：
+# 全量行情接口一次拉取 5000+ 只股票，耗时数秒。多线程分析时冷缓存会导致
+# 每个 worker 各自触发一次全量拉取。SingleFlightCache 保证同一时刻只有一个刷新在执行，
+# 其他调用方等待该刷新完成后直接复用结果；过期但仍在 stale 窗口内的数据先返回旧值，
+# 同时在后台刷新（stale-while-revalidate）。
+
+class SingleFlightCache:
+    """
+    线程安全的单飞缓存
+
+    状态：
+    - 新鲜（age < ttl）：直接返回
+    - 陈旧（ttl <= age < ttl + stale_ttl）：返回旧值，并在后台触发一次刷新
+    - 过期/为空：同步刷新，同一时刻只有一个线程调用 loader，其余线程等待结果
+    """
+
+    def __init__(self, name: str, ttl: float, stale_ttl: float = 0.0):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._value: Any = None
+        self._timestamp: float = 0.0
+        self._refreshing = False
+        self._generation = 0
+        self._cond = threading.Condition()
+
+    @property
+    def age(self) -> float:
+        """缓存年龄（秒），无数据时为 inf"""
+        if self._value is None:
+            return float('inf')
+        return time.time() - self._timestamp
+
+    def peek(self) -> Any:
+        """返回当前缓存值（不触发刷新，可能已过期）"""
+        return self._value
+
+    def invalidate(self) -> None:
+        """清空缓存，下次 get 时同步刷新"""
+        with self._cond:
+            self._value = None
+            self._timestamp = 0.0
+
+    def get(self, loader: Callable[[], Any]) -> Any:
+        """
+        获取缓存值，必要时调用 loader 刷新
+
+        Args:
+            loader: 刷新函数（全量拉取），返回新值；返回 None 表示失败，
+                    抛出异常时由发起刷新的线程向上抛出
+
+        Returns:
+            缓存值；刷新失败时返回旧值（可能为 None）
+        """
+        with self._cond:
+            age = self.age
+            if age < self.ttl:
+                return self._value
+            if age < self.ttl + self.stale_ttl:
+                if not self._refreshing:
+                    self._refreshing = True
+                    logger.debug(f"[缓存] {self.name} 数据已陈旧({int(age)}s)，后台刷新")
+                    threading.Thread(
+                        target=self._refresh_in_background, args=(loader,),
+                        name=f"refresh-{self.name}", daemon=True,
+                    ).start()
+                return self._value
+            if self._refreshing:
+                # 已有刷新在执行：等待其完成后复用结果
+                generation = self._generation
+                logger.debug(f"[缓存] {self.name} 等待进行中的刷新")
+                while self._refreshing and self._generation == generation:
+                    self._cond.wait()
+                return self._value
+            self._refreshing = True
+
+        return self._load(loader)
+
+    def refresh(self, loader: Callable[[], Any]) -> Any:
+        """
+        强制刷新（如批量预取）；已有刷新在执行时等待其结果，不重复拉取
+        """
+        with self._cond:
+            if self._refreshing:
+                generation = self._generation
+                while self._refreshing and self._generation == generation:
+                    self._cond.wait()
+                return self._value
+            self._refreshing = True
+        return self._load(loader)
+
+    def _load(self, loader: Callable[[], Any]) -> Any:
+        """
+        调用 loader 并发布结果（调用前需已置 _refreshing = True）
+
+        loader 返回 None 视为刷新失败：保留旧值，并返回旧值（可能为 None）
+        """
+        value = None
+        try:
+            value = loader()
+        finally:
+            with self._cond:
+                if value is not None:
+                    self._value = value
+                    # 值自带时间戳（如从本地缓存读取的快照）时按其实际生成时间计算年龄
+                    value_ts = getattr(value, 'timestamp', None)
+                    self._timestamp = value_ts if isinstance(value_ts, float) else time.time()
+                self._refreshing = False
+                self._generation += 1
+                self._cond.notify_all()
+        return value if value is not None else self._value
+
+    def _refresh_in_background(self, loader: Callable[[], Any]) -> None:
+        try:
+            self._load(loader)
+        except Exception as e:
+            logger.warning(f"[缓存] {self.name} 后台刷新失败，继续使用旧数据: {e}")
+
+
+# 全局实时行情缓存注册表（按数据源名称）及配置覆盖项
+_realtime_caches: Dict[str, SingleFlightCache] = {}
+_realtime_cache_ttl_overrides: Dict[str, float] = {}
+_realtime_cache_stale_ttl: Optional[float] = None
+_realtime_caches_lock = threading.Lock()
+
+
+def _apply_cache_config(cache: SingleFlightCache) -> None:
+    if cache.name in _realtime_cache_ttl_overrides:
+        cache.ttl = _realtime_cache_ttl_overrides[cache.name]
+    if _realtime_cache_stale_ttl is not None:
+        cache.stale_ttl = _realtime_cache_stale_ttl
+
+
+def get_realtime_cache(name: str, ttl: float, stale_ttl: float = 0.0) -> SingleFlightCache:
+    """
+    获取（或创建）指定数据源的实时行情缓存
+
+    ttl/stale_ttl 为默认值，可由 configure_realtime_caches 按配置覆盖
+    """
+    with _realtime_caches_lock:
+        cache = _realtime_caches.get(name)
+        if cache is None:
+            cache = SingleFlightCache(name, ttl, stale_ttl)
+            _apply_cache_config(cache)
+            _realtime_caches[name] = cache
+        return cache
+
+
+def configure_realtime_caches(ttls: str = "", stale_ttl: Optional[float] = None) -> None:
+    """
+    按配置调整各数据源缓存的 TTL
+
+    Args:
+        ttls: 分数据源 TTL，格式 "efinance:600,akshare_em:1200"，未列出的保持默认
+        stale_ttl: 陈旧数据可继续使用的时长（秒），None 表示不修改
+    """
+    global _realtime_cache_stale_ttl
+
+    overrides: Dict[str, float] = {}
+    for item in (ttls or "").split(','):
+        name, sep, value = item.partition(':')
+        if not sep:
+            continue
+        try:
+            overrides[name.strip().lower()] = float(value)
+        except ValueError:
+            logger.warning(f"[缓存] 无效的 TTL 配置项: {item}")
+
+    with _realtime_caches_lock:
+        _realtime_cache_ttl_overrides.update(overrides)
+        if stale_ttl is not None:
+            _realtime_cache_stale_ttl = stale_ttl
+        for cache in _realtime_caches.values():
+            _apply_cache_config(cache)
+
+
 @dataclass
 class ChipDistribution:
     """
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+数据源延迟统计与健康记分板
+===================================
+
+为每个数据源记录请求耗时直方图，用于：
+1. DataFetcherManager 对冲请求（hedged request）的自适应延迟
+2. 数据源健康记分板（动态调整数据源顺序）
+
+直方图使用固定的对数分桶，记录/查询均为 O(桶数)，线程安全。
+HealthScoreboard 按 操作 × 数据源 汇总成功率、p50/p95 延迟和最近错误，
+供 DataFetcherManager 动态调整数据源顺序，并通过 /api/health 与机器人 status 命令展示。
+健康/慢速判定只看最近窗口内的请求（累计直方图只用于展示和对冲延迟），
+被降级的数据源每隔 PROBE_INTERVAL_SECONDS 按原优先级试探一次，恢复后重新排到前面。
+"""
+
+import bisect
+import logging
+import statistics
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# 分桶上界（秒）：覆盖 50ms ~ 2min，最后一桶为溢出桶
+LATENCY_BUCKETS = (
+    0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 7.5,
+    10.0, 15.0, 20.0, 30.0, 45.0, 60.0, 120.0,
+)
+
+# 健康判定参数
+HEALTH_WINDOW = 20              # 近期成功率统计窗口（请求次数）
+HEALTH_WINDOW_SECONDS = 600     # 只统计最近 10 分钟内的请求，降级的数据源过期后自动恢复参与排序
+HEALTH_MIN_SAMPLES = 5          # 样本数不足时不判定为不健康
+UNHEALTHY_SUCCESS_RATE = 0.5    # 近期成功率低于该值视为不健康
+RECENT_ERRORS = 5               # 保留的最近错误条数
+SLOW_P50_SECONDS = 10.0         # 近期 p50 延迟超过该值视为慢数据源（排在健康且不慢的数据源之后）
+PROBE_INTERVAL_SECONDS = 120    # 降级的数据源每隔该时长按原优先级试探一次，取得新样本以便恢复
+
+
+class LatencyHistogram:
+    """
+    单个数据源的耗时直方图
+
+    - 成功请求计入分桶，用于分位数估计
+    - 失败请求只计数，不影响分位数
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._counts: List[int] = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._success = 0
+        self._failure = 0
+        self._total_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, success: bool = True) -> None:
+        """记录一次请求耗时"""
+        with self._lock:
+            if not success:
+                self._failure += 1
+                return
+            self._counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self._success += 1
+            self._total_seconds += seconds
+
+    @property
+    def count(self) -> int:
+        """成功请求数"""
+        return self._success
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        估计耗时分位数（取所在分桶上界，偏保守）
+
+        Returns:
+            分位数（秒），无样本返回 None
+        """
+        with self._lock:
+            if self._success == 0:
+                return None
+            target = q * self._success
+            cumulative = 0
+            for i, n in enumerate(self._counts):
+                cumulative += n
+                if cumulative >= target and n > 0:
+                    return LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else LATENCY_BUCKETS[-1]
+            return LATENCY_BUCKETS[-1]
+
+    def to_dict(self) -> Dict[str, Optional[float]]:
+        """统计摘要"""
+        with self._lock:
+            success, failure, total = self._success, self._failure, self._total_seconds
+        return {
+            'success': success,
+            'failure': failure,
+            'avg': round(total / success, 3) if success else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+        }
+
+
+class SourceHealth:
+    """
+    单个数据源在某类操作上的健康状况
+
+    - 延迟直方图（成功请求，累计）
+    - 最近 HEALTH_WINDOW 次（且在 HEALTH_WINDOW_SECONDS 内）请求的成败与耗时，用于计算近期成功率与近期 p50
+    - 最近 RECENT_ERRORS 条错误信息
+    """
+
+    def __init__(self, source: str, operation: str):
+        self.source = source
+        self.operation = operation
+        self.histogram = LatencyHistogram(f"{operation}:{source}")
+        self._outcomes: Deque[Tuple[float, bool, float]] = deque(maxlen=HEALTH_WINDOW)
+        self._errors: Deque[Tuple[float, str]] = deque(maxlen=RECENT_ERRORS)
+        self._last_success_at: Optional[float] = None
+        # 降级期间下一次允许试探的时间（None 表示未处于降级）
+        self._next_probe_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, success: bool, error: Optional[str] = None) -> None:
+        self.histogram.record(seconds, success)
+        with self._lock:
+            now = time.time()
+            self._outcomes.append((now, success, seconds))
+            if success:
+                self._last_success_at = now
+            else:
+                self._errors.append((now, (error or "无有效数据")[:200]))
+
+    def _recent_outcomes(self) -> List[bool]:
+        cutoff = time.time() - HEALTH_WINDOW_SECONDS
+        with self._lock:
+            return [ok for ts, ok, _ in self._outcomes if ts >= cutoff]
+
+    def _recent_latencies(self) -> List[float]:
+        """近期窗口内成功请求的耗时"""
+        cutoff = time.time() - HEALTH_WINDOW_SECONDS
+        with self._lock:
+            return [seconds for ts, ok, seconds in self._outcomes if ok and ts >= cutoff]
+
+    @property
+    def recent_p50(self) -> Optional[float]:
+        """近期窗口内成功请求的 p50 耗时，无样本返回 None"""
+        latencies = self._recent_latencies()
+        return statistics.median(latencies) if latencies else None
+
+    @property
+    def samples(self) -> int:
+        """近期窗口内的请求数"""
+        return len(self._recent_outcomes())
+
+    @property
+    def success_rate(self) -> Optional[float]:
+        """近期成功率，无样本返回 None"""
+        outcomes = self._recent_outcomes()
+        if not outcomes:
+            return None
+        return sum(outcomes) / len(outcomes)
+
+    @property
+    def is_slow(self) -> bool:
+        """近期样本足够且近期 p50 延迟超过 SLOW_P50_SECONDS（慢的样本过期后自动恢复）"""
+        latencies = self._recent_latencies()
+        if len(latencies) < HEALTH_MIN_SAMPLES:
+            return False
+        return statistics.median(latencies) > SLOW_P50_SECONDS
+
+    @property
+    def is_healthy(self) -> bool:
+        """样本不足时视为健康；近期成功率低于阈值视为不健康"""
+        outcomes = self._recent_outcomes()
+        if len(outcomes) < HEALTH_MIN_SAMPLES:
+            return True
+        return sum(outcomes) / len(outcomes) >= UNHEALTHY_SUCCESS_RATE
+
+    def claim_probe(self, demoted: bool) -> bool:
+        """
+        降级期间是否轮到一次试探（按原优先级尝试，取得新样本）
+
+        首次降级时开始计时，每 PROBE_INTERVAL_SECONDS 返回一次 True；恢复后清除计时
+        """
+        with self._lock:
+            if not demoted:
+                self._next_probe_at = None
+                return False
+            now = time.time()
+            if self._next_probe_at is None:
+                self._next_probe_at = now + PROBE_INTERVAL_SECONDS
+                return False
+            if now < self._next_probe_at:
+                return False
+            self._next_probe_at = now + PROBE_INTERVAL_SECONDS
+            return True
+
+    def to_dict(self) -> Dict[str, Any]:
+        stats = self.histogram.to_dict()
+        recent_p50 = self.recent_p50
+        rate = self.success_rate
+        with self._lock:
+            errors = [
+                {'time': datetime.fromtimestamp(ts).strftime('%H:%M:%S'), 'error': msg}
+                for ts, msg in self._errors
+            ]
+            last_success = self._last_success_at
+        return {
+            'healthy': self.is_healthy,
+            'slow': self.is_slow,
+            'success_rate': round(rate, 3) if rate is not None else None,
+            'samples': self.samples,
+            'success': stats['success'],
+            'failure': stats['failure'],
+            'avg': stats['avg'],
+            'p50': stats['p50'],
+            'p95': stats['p95'],
+            'recent_p50': round(recent_p50, 3) if recent_p50 is not None else None,
+            'last_success': (datetime.fromtimestamp(last_success).isoformat(timespec='seconds')
+                             if last_success else None),
+            'recent_errors': errors,
+        }
+
+
+class HealthScoreboard:
+    """
+    数据源健康记分板（按 操作 × 数据源 统计）
+
+    操作类型：daily（日线）、realtime（实时行情）、chip（筹码分布）、indices（指数行情）
+
+    DataFetcherManager 每次调用数据源后记录结果，并通过 rank() 动态调整尝试顺序：
+    慢数据源后移、不健康的数据源排到最后，同一档内保持原有优先级。
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str], SourceHealth] = {}
+        self._lock = threading.Lock()
+
+    def get(self, operation: str, source: str) -> SourceHealth:
+        """获取（或创建）指定操作/数据源的健康记录"""
+        key = (operation, source)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = SourceHealth(source, operation)
+                self._entries[key] = entry
+            return entry
+
+    def record(
+        self,
+        operation: str,
+        source: str,
+        seconds: float,
+        success: bool,
+        error: Optional[str] = None,
+    ) -> None:
+        """记录一次数据源调用结果"""
+        self.get(operation, source).record(seconds, success, error)
+
+    def histogram(self, operation: str, source: str) -> LatencyHistogram:
+        return self.get(operation, source).histogram
+
+    def rank(self, operation: str, sources: Sequence[str]) -> List[str]:
+        """
+        按健康状况调整数据源顺序（稳定排序）
+
+        Args:
+            operation: 操作类型
+            sources: 按静态优先级排好的数据源名称
+
+        Returns:
+            顺序：健康 → 健康但慢 → 不健康；同一档内保持原有优先级。
+            降级的数据源到了试探时间时本次按原优先级排列
+        """
+        def tier(name: str) -> int:
+            entry = self.get(operation, name)
+            level = 2 if not entry.is_healthy else (1 if entry.is_slow else 0)
+            if entry.claim_probe(level > 0):
+                logger.info(f"[数据源健康] {operation}:{name} 已降级，本次按原优先级试探")
+                return 0
+            return level
+
+        return sorted(sources, key=tier)
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """所有记录的健康摘要 {operation: {source: {...}}}"""
+        with self._lock:
+            entries = list(self._entries.values())
+        result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for entry in entries:
+            result.setdefault(entry.operation, {})[entry.source] = entry.to_dict()
+        return result
+
+
+_scoreboard = HealthScoreboard()
+
+
+def get_scoreboard() -> HealthScoreboard:
+    """获取全局数据源健康记分板"""
+    return _scoreboard
+
+
+def get_health_report() -> Dict[str, Any]:
+    """
+    数据源健康报告（供 /api/health 与机器人 status 命令使用）
+
+    Returns:
+        {
+            "sources": {operation: {source: {...}}},
+            "circuit_breakers": {"realtime": {source: state}, "chip": {source: state}}
+        }
+    """
+    from .realtime_types import get_realtime_circuit_breaker, get_chip_circuit_breaker
+
+    return {
+        'sources': _scoreboard.snapshot(),
+        'circuit_breakers': {
+            'realtime': get_realtime_circuit_breaker().get_status(),
+            'chip': get_chip_circuit_breaker().get_status(),
+        },
+    }
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+交易日历与交易时段
+===================================
+
+回补日线缺口、判断数据是否已是最新时若按工作日判断，春节、国庆等工作日休市每年约 10 段，
+每次同步都会把它们当作缺口重复请求数据源。
+
+A 股使用新浪交易日历（ak.tool_trade_date_hist_sina）：
+- 进程内缓存 CALENDAR_TTL 秒，开启 LOCAL_CACHE_ENABLED 时跨进程共享一次拉取
+- 日历未覆盖的日期（日历发布前的未来年份）按工作日补齐
+- 获取失败时 get_trade_dates 返回 None，调用方回退到按工作日判断
+
+港股、美股无可用日历，按工作日判断（休市日由同步水位的确认时间兜底）；
+交易时段按各交易所当地时间（MARKET_SESSIONS）计算
+"""
+
+import bisect
+import logging
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+from .local_cache import load_with_local_cache
+
+logger = logging.getLogger(__name__)
+
+
+# 交易日历缓存时长（秒）
+CALENDAR_TTL = 86400
+# 获取失败后的重试间隔（秒），期间直接按工作日判断
+CALENDAR_RETRY_INTERVAL = 600
+
+# 市场
+MARKET_CN = 'cn'
+MARKET_HK = 'hk'
+MARKET_US = 'us'
+# 各市场交易时段：(交易所时区, 开盘(时, 分), 收盘(时, 分))；A 股/港股午间休市沿用上午收盘数据，不单独处理
+MARKET_SESSIONS = {
+    MARKET_CN: ('Asia/Shanghai', (9, 30), (15, 0)),
+    MARKET_HK: ('Asia/Hong_Kong', (9, 30), (16, 0)),
+    MARKET_US: ('America/New_York', (9, 30), (16, 0)),
+}
+
+_calendar: Optional[Tuple[float, Optional[List[date]]]] = None
+_calendar_lock = threading.Lock()
+
+
+def _load_calendar() -> List[str]:
+    import akshare as ak
+
+    df = ak.tool_trade_date_hist_sina()
+    return [d.isoformat() for d in pd.to_datetime(df['trade_date']).dt.date]
+
+
+def _get_calendar() -> Optional[List[date]]:
+    global _calendar
+    with _calendar_lock:
+        if _calendar is not None:
+            ttl = CALENDAR_TTL if _calendar[1] is not None else CALENDAR_RETRY_INTERVAL
+            if time.time() - _calendar[0] < ttl:
+                return _calendar[1]
+        try:
+            days = load_with_local_cache('calendar:sina', CALENDAR_TTL, _load_calendar, should_store=bool)
+        except Exception as e:
+            logger.warning(f"[交易日历] 获取失败，按工作日判断: {e}")
+            days = None
+        if not days:
+            _calendar = (time.time(), None)
+            return None
+        _calendar = (time.time(), sorted(date.fromisoformat(d) for d in days))
+        return _calendar[1]
+
+
+def get_trade_dates(start_date: date, end_date: date) -> Optional[List[date]]:
+    """
+    区间内（含首尾）的交易日
+
+    Returns:
+        交易日列表（升序）；日历不可用时返回 None
+    """
+    calendar = _get_calendar()
+    if calendar is None:
+        return None
+    days = [d for d in calendar if start_date <= d <= end_date]
+    if end_date > calendar[-1]:
+        tail_start = max(start_date, calendar[-1] + timedelta(days=1))
+        days.extend(pd.bdate_range(tail_start, end_date).date)
+    return days
+
+
+def get_market(stock_code: str) -> str:
+    """
+    按代码判断所属市场（规则同各数据源的 _is_hk_code / _is_us_code）
+
+    Returns:
+        MARKET_HK / MARKET_US / MARKET_CN
+    """
+    code = stock_code.strip()
+    lower = code.lower()
+    if lower.startswith('hk'):
+        if lower[2:].isdigit() and 1 <= len(lower) - 2 <= 5:
+            return MARKET_HK
+    elif code.isdigit() and len(code) == 5:
+        return MARKET_HK
+    if re.match(r'^[A-Z]{1,5}(\.[A-Z])?$', code.upper()):
+        return MARKET_US
+    return MARKET_CN
+
+
+def is_trade_date(day: date, market: str = MARKET_CN) -> bool:
+    """
+    是否为交易日（A 股按交易日历，日历不可用或未覆盖时按工作日；港股/美股按工作日）
+    """
+    if day.weekday() >= 5:
+        return False
+    if market != MARKET_CN:
+        return True
+    calendar = _get_calendar()
+    if calendar is None or day > calendar[-1] or day < calendar[0]:
+        return True
+    i = bisect.bisect_left(calendar, day)
+    return i < len(calendar) and calendar[i] == day
+
+
+def previous_trade_date(day: date, market: str = MARKET_CN) -> date:
+    """不晚于 day 的最近交易日"""
+    while not is_trade_date(day, market):
+        day -= timedelta(days=1)
+    return day
+
+
+def market_now(market: str = MARKET_CN, now: Optional[datetime] = None) -> datetime:
+    """
+    交易所当地时间（不带时区）
+
+    Args:
+        now: 本机时间（不带时区时按本机时区解释），默认当前时间
+    """
+    tz = ZoneInfo(MARKET_SESSIONS[market][0])
+    return (now or datetime.now()).astimezone(tz).replace(tzinfo=None)
+
+
+def market_close_time(day: date, market: str = MARKET_CN) -> datetime:
+    """指定交易日的收盘时间（换算为本机时间，不带时区，可与 datetime.now() 直接比较）"""
+    tz_name, _, (hour, minute) = MARKET_SESSIONS[market]
+    close = datetime.combine(day, datetime.min.time()).replace(hour=hour, minute=minute, tzinfo=ZoneInfo(tz_name))
+    return close.astimezone().replace(tzinfo=None)
+
+
+def is_trading_session(market: str = MARKET_CN, now: Optional[datetime] = None) -> bool:
+    """是否处于交易时段（交易日的开盘至收盘之间，按交易所当地时间）"""
+    local = market_now(market, now)
+    if not is_trade_date(local.date(), market):
+        return False
+    _, (open_hour, open_minute), (close_hour, close_minute) = MARKET_SESSIONS[market]
+    opening = local.replace(hour=open_hour, minute=open_minute, second=0, microsecond=0)
+    return opening <= local < local.replace(hour=close_hour, minute=close_minute, second=0, microsecond=0)
+
+
+def expected_latest_trade_date(market: str = MARKET_CN, now: Optional[datetime] = None) -> date:
+    """
+    数据源应已提供的最近交易日：交易所当地收盘前取上一个交易日，收盘后取当天（若为交易日）
+    """
+    local = market_now(market, now)
+    day = local.date()
+    _, _, (close_hour, close_minute) = MARKET_SESSIONS[market]
+    if local < local.replace(hour=close_hour, minute=close_minute, second=0, microsecond=0):
+        day -= timedelta(days=1)
+    return previous_trade_date(day, market)
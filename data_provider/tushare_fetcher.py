@@ -426,7 +426,7 @@ class TushareFetcher(BaseFetcher):
             return None
 
         from .realtime_types import (
-            UnifiedRealtimeQuote, RealtimeSource,
+            UnifiedRealtimeQuote, RealtimeSource, RealtimeSnapshot, TUSHARE_COLUMNS,
             safe_float, safe_int
         )
 
@@ -439,28 +439,15 @@ class TushareFetcher(BaseFetcher):
             # 尝试调用 Pro 实时接口 (需要积分)
             df = self._api.quotation(ts_code=ts_code)
 
-            if df is not None and not df.empty:
-                row = df.iloc[0]
+            # 与全量数据源共用 RealtimeSnapshot 的列映射与类型转换
+            snapshot = RealtimeSnapshot.from_dataframe(
+                df, TUSHARE_COLUMNS, RealtimeSource.TUSHARE,
+                code_normalizer=lambda c: c.split('.')[0],
+            )
+            quote = snapshot.get_quote(stock_code.split('.')[0])
+            if quote is not None:
                 logger.debug(f"Tushare Pro 实时行情获取成功: {stock_code}")
-
-                return UnifiedRealtimeQuote(
-                    code=stock_code,
-                    name=str(row.get('name', '')),
-                    source=RealtimeSource.TUSHARE,
-                    price=safe_float(row.get('price')),
-                    change_pct=safe_float(row.get('pct_chg')),  # Pro 接口通常直接返回涨跌幅
-                    change_amount=safe_float(row.get('change')),
-                    volume=safe_int(row.get('vol')),
-                    amount=safe_float(row.get('amount')),
-                    high=safe_float(row.get('high')),
-                    low=safe_float(row.get('low')),
-                    open_price=safe_float(row.get('open')),
-                    pre_close=safe_float(row.get('pre_close')),
-                    turnover_rate=safe_float(row.get('turnover_ratio')), # Pro 接口可能有换手率
-                    pe_ratio=safe_float(row.get('pe')),
-                    pb_ratio=safe_float(row.get('pb')),
-                    total_mv=safe_float(row.get('total_mv')),
-                )
+                return quote
         except Exception as e:
             # 仅记录调试日志，不报错，继续尝试降级
             logger.debug(f"Tushare Pro 实时行情不可用 (可能是积分不足): {e}")
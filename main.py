@@ -14,6 +14,8 @@ A股自选股智能分析系统 - 主调度程序
     python main.py              # 正常运行
     python main.py --debug      # 调试模式
     python main.py --dry-run    # 仅获取数据不分析
+    python main.py --backfill   # 回补日线数据缺口
+    python main.py --backtest   # 用已入库日线回测趋势信号
 
 交易理念（已融入分析）：
 - 严进策略：不追高，乖离率 > 5% 不买入
@@ -137,6 +139,10 @@ def parse_arguments() -> argparse.Namespace:
   python main.py --single-notify    # 启用单股推送模式（每分析完一只立即推送）
   python main.py --schedule         # 启用定时任务模式
   python main.py --market-review    # 仅运行大盘复盘
+  python main.py --backfill         # 回补自选股最近一年的日线缺口
+  python main.py --async            # 使用 asyncio 异步流水线（大批量股票）
+  python main.py --screen           # 全市场技术面筛选，仅对排名前 N 的股票进行 AI 分析
+  python main.py --backtest --backtest-bias 3,5,8   # 回测趋势信号并扫描乖离率阈值
         '''
     )
     
@@ -177,6 +183,26 @@ def parse_arguments() -> argparse.Namespace:
         help='并发线程数（默认使用配置值）'
     )
     
+    parser.add_argument(
+        '--async',
+        dest='async_pipeline',
+        action='store_true',
+        help='使用 asyncio 异步流水线（各阶段并发上限见 ASYNC_*_CONCURRENCY）'
+    )
+    
+    parser.add_argument(
+        '--screen',
+        action='store_true',
+        help='全市场技术面筛选：快照初筛 + 趋势规则批量评分，仅对排名靠前的股票进行 AI 分析'
+    )
+    
+    parser.add_argument(
+        '--screen-top',
+        type=int,
+        default=None,
+        help='筛选后进入 AI 分析的股票数（默认 SCREEN_TOP_N）'
+    )
+    
     parser.add_argument(
         '--schedule',
         action='store_true',
@@ -195,6 +221,46 @@ def parse_arguments() -> argparse.Namespace:
         help='跳过大盘复盘分析'
     )
     
+    parser.add_argument(
+        '--backfill',
+        action='store_true',
+        help='仅回补日线数据缺口（不进行分析）'
+    )
+    
+    parser.add_argument(
+        '--backfill-days',
+        type=int,
+        default=365,
+        help='回补的自然日范围（默认 365）'
+    )
+    
+    parser.add_argument(
+        '--backtest',
+        action='store_true',
+        help='仅用已入库日线回测趋势信号（不进行分析）'
+    )
+    
+    parser.add_argument(
+        '--backtest-days',
+        type=int,
+        default=750,
+        help='回测使用的交易日数（默认 750，约三年）'
+    )
+    
+    parser.add_argument(
+        '--backtest-bias',
+        type=str,
+        default=None,
+        help='扫描的乖离率阈值，逗号分隔（默认 5）'
+    )
+    
+    parser.add_argument(
+        '--backtest-ma',
+        type=str,
+        default=None,
+        help='扫描的均线周期组合，分号分隔，如 5,10,20;10,20,60（默认 5,10,20）'
+    )
+    
     parser.add_argument(
         '--webui',
         action='store_true',
@@ -225,18 +291,34 @@ def run_full_analysis(
         if getattr(args, 'single_notify', False):
             config.single_stock_notify = True
         
-        # 创建调度器
-        pipeline = StockAnalysisPipeline(
+        # 创建调度器（--async 或 ASYNC_PIPELINE_ENABLED=true 使用异步流水线）
+        if getattr(args, 'async_pipeline', False) or config.async_pipeline_enabled:
+            from src.core.async_pipeline import AsyncStockAnalysisPipeline
+            pipeline_cls = AsyncStockAnalysisPipeline
+        else:
+            pipeline_cls = StockAnalysisPipeline
+        pipeline = pipeline_cls(
             config=config,
             max_workers=args.workers
         )
         
+        # --screen: 全市场筛选替代自选股列表，只把排名靠前的股票交给 AI 分析
+        run_stocks = True
+        if getattr(args, 'screen', False):
+            candidates = pipeline.screen_market(top_n=args.screen_top)
+            stock_codes = [c.code for c in candidates]
+            if not stock_codes:
+                logger.warning("全市场筛选无入选股票，跳过个股分析")
+                run_stocks = False
+        
         # 1. 运行个股分析
-        results = pipeline.run(
-            stock_codes=stock_codes,
-            dry_run=args.dry_run,
-            send_notification=not args.no_notify
-        )
+        results = []
+        if run_stocks:
+            results = pipeline.run(
+                stock_codes=stock_codes,
+                dry_run=args.dry_run,
+                send_notification=not args.no_notify
+            )
 
         # Issue #128: 分析间隔 - 在个股分析和大盘分析之间添加延迟
         analysis_delay = getattr(config, 'analysis_delay', 0)
@@ -412,7 +494,10 @@ def main() -> int:
                 search_service = SearchService(
                     bocha_keys=config.bocha_api_keys,
                     tavily_keys=config.tavily_api_keys,
-                    serpapi_keys=config.serpapi_keys
+                    serpapi_keys=config.serpapi_keys,
+                    provider_concurrency=config.search_provider_concurrency,
+                    key_rate_per_minute=config.search_key_rate_per_minute,
+                    key_burst=config.search_key_burst,
                 )
             
             if config.gemini_api_key or config.openai_api_key:
@@ -431,7 +516,33 @@ def main() -> int:
             )
             return 0
         
-        # 模式2: 定时任务模式
+        # 模式2: 回补日线缺口
+        if args.backfill:
+            logger.info(f"模式: 回补日线缺口（最近 {args.backfill_days} 天）")
+            pipeline = StockAnalysisPipeline(config=config, max_workers=args.workers)
+            pipeline.backfill(stock_codes=stock_codes, days=args.backfill_days)
+            return 0
+        
+        # 模式2.1: 趋势信号回测
+        if args.backtest:
+            from src.backtest import Backtester, load_backtest_panel
+            
+            codes = stock_codes or config.stock_list
+            logger.info(f"模式: 趋势信号回测（{len(codes)} 只股票，最近 {args.backtest_days} 个交易日）")
+            bias_thresholds = [float(x) for x in (args.backtest_bias or '5').split(',') if x.strip()]
+            ma_periods = [
+                tuple(int(x) for x in group.split(','))
+                for group in (args.backtest_ma or '5,10,20').split(';') if group.strip()
+            ]
+            panel = load_backtest_panel(codes, days=args.backtest_days)
+            if len(panel) == 0:
+                logger.warning("数据库中没有可用的日线数据，请先运行分析或 --backfill")
+                return 0
+            reports = Backtester().run_grid(panel, bias_thresholds=bias_thresholds, ma_periods=ma_periods)
+            logger.info(f"最优参数: {reports[0].summary()}")
+            return 0
+        
+        # 模式3: 定时任务模式
         if args.schedule or config.schedule_enabled:
             logger.info("模式: 定时任务")
             logger.info(f"每日执行时间: {config.schedule_time}")
@@ -448,7 +559,7 @@ def main() -> int:
             )
             return 0
         
-        # 模式3: 正常单次运行
+        # 模式4: 正常单次运行
         run_full_analysis(config, args, stock_codes)
         
         logger.info("\n程序执行完成")
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+日线写入性能基准：批量 UPSERT vs 逐行 ORM
+===================================
+
+在临时 SQLite 数据库上对比 DatabaseManager.save_daily_data（批量 UPSERT）
+与 _save_daily_data_rowwise（逐行 SELECT + 更新/插入）的写入速度（rows/sec）。
+每个规模分别测试首次写入（全部插入）与重复写入（全部更新）。
+
+使用方法：
+    python scripts/benchmark_save_daily_data.py                  # 默认 1000,100000 行
+    python scripts/benchmark_save_daily_data.py --sizes 1000,10000
+    python scripts/benchmark_save_daily_data.py --skip-rowwise-above 10000
+"""
+
+import argparse
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.storage import DatabaseManager  # noqa: E402
+
+ROWS_PER_CODE = 1000
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    """生成多股票日线 DataFrame（每只股票 ROWS_PER_CODE 个交易日）"""
+    codes = max(1, rows // ROWS_PER_CODE)
+    per_code = rows // codes
+    dates = pd.bdate_range('2015-01-01', periods=per_code)
+    rng = np.random.default_rng(0)
+    n = codes * per_code
+    close = rng.uniform(5, 100, n)
+    return pd.DataFrame({
+        'code': np.repeat([f"{600000 + i:06d}" for i in range(codes)], per_code),
+        'date': np.tile(dates, codes),
+        'open': close * 0.99,
+        'high': close * 1.02,
+        'low': close * 0.98,
+        'close': close,
+        'volume': rng.uniform(1e5, 1e7, n),
+        'amount': rng.uniform(1e6, 1e9, n),
+        'pct_chg': rng.normal(0, 2, n),
+        'ma5': close,
+        'ma10': close,
+        'ma20': close,
+        'volume_ratio': rng.uniform(0.5, 2, n),
+    })
+
+
+def fresh_db(workdir: Path, name: str) -> DatabaseManager:
+    """创建一个独立的临时 SQLite 数据库"""
+    DatabaseManager.reset_instance()
+    return DatabaseManager(db_url=f"sqlite:///{workdir / name}.db")
+
+
+def run_bulk(db: DatabaseManager, df: pd.DataFrame) -> float:
+    start = time.perf_counter()
+    db.save_daily_data(df, data_source='Benchmark')
+    return time.perf_counter() - start
+
+
+def run_rowwise(db: DatabaseManager, df: pd.DataFrame) -> float:
+    start = time.perf_counter()
+    for code, group in df.groupby('code'):
+        db._save_daily_data_rowwise(group, code, 'Benchmark')
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='save_daily_data 写入性能基准')
+    parser.add_argument('--sizes', type=str, default='1000,100000', help='测试行数，逗号分隔')
+    parser.add_argument('--skip-rowwise-above', type=int, default=0,
+                        help='行数超过该值时跳过逐行路径（0 表示不跳过）')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger('src.storage').setLevel(logging.WARNING)
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    print(f"{'rows':>8} | {'path':<8} | {'insert rows/s':>14} | {'update rows/s':>14}")
+    print("-" * 54)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        for rows in sizes:
+            df = make_frame(rows)
+            n = len(df)
+
+            paths = [('bulk', run_bulk)]
+            if not args.skip_rowwise_above or n <= args.skip_rowwise_above:
+                paths.append(('rowwise', run_rowwise))
+
+            for name, runner in paths:
+                db = fresh_db(workdir, f"{name}_{n}")
+                insert_elapsed = runner(db, df)
+                update_elapsed = runner(db, df)
+                print(f"{n:>8} | {name:<8} | {n / insert_elapsed:>14,.0f} | {n / update_elapsed:>14,.0f}")
+
+    DatabaseManager.reset_instance()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -36,6 +36,50 @@ CREATE TABLE `stock_daily` (
     INDEX `ix_date` (`date`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='股票日线数据';
 
+-- ============================================================
+-- 1.1 日线同步水位表 (增量同步)
+-- ============================================================
+DROP TABLE IF EXISTS `stock_sync_state`;
+CREATE TABLE `stock_sync_state` (
+    `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT COMMENT '主键ID',
+    `code` VARCHAR(10) NOT NULL COMMENT '股票代码',
+    `last_date` DATE DEFAULT NULL COMMENT '已入库的最新交易日',
+    `last_synced_at` DATETIME DEFAULT NULL COMMENT '最近一次同步时间',
+    `data_source` VARCHAR(50) DEFAULT NULL COMMENT '最近一次同步数据来源',
+    `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `uix_code` (`code`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='日线同步水位';
+
+-- ============================================================
+-- 1.2 增量指标状态表 (盘中重新评分)
+-- ============================================================
+DROP TABLE IF EXISTS `stock_indicator_state`;
+CREATE TABLE `stock_indicator_state` (
+    `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT COMMENT '主键ID',
+    `code` VARCHAR(10) NOT NULL COMMENT '股票代码',
+    `last_date` DATE DEFAULT NULL COMMENT '状态对应的最新交易日',
+    `last_close` DOUBLE DEFAULT NULL COMMENT '状态对应交易日的收盘价',
+    `state` TEXT NOT NULL COMMENT '指标状态JSON',
+    `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `uix_code` (`code`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='增量指标状态';
+
+-- ============================================================
+-- 1.3 已确认无日线的交易日 (缺口回补)
+-- ============================================================
+DROP TABLE IF EXISTS `stock_daily_empty`;
+CREATE TABLE `stock_daily_empty` (
+    `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT COMMENT '主键ID',
+    `code` VARCHAR(10) NOT NULL COMMENT '股票代码',
+    `date` DATE NOT NULL COMMENT '已确认无数据的交易日',
+    `confirmed_at` DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '确认时间',
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `uix_empty_code_date` (`code`, `date`),
+    KEY `ix_stock_daily_empty_code` (`code`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='已确认无日线的交易日';
+
 -- ============================================================
 -- 2. 用户表
 -- ============================================================
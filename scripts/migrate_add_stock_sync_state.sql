@@ -0,0 +1,53 @@
+-- ============================================================
+-- 日线增量同步 / 缺口回补 / 增量指标状态 - 数据库迁移脚本
+-- 适用于: MySQL 5.7+ / MariaDB 10.3+
+-- 执行前请备份数据库
+-- ============================================================
+
+SET NAMES utf8mb4;
+
+-- ============================================================
+-- 1. 日线同步水位表：记录每只股票已入库的最新交易日
+-- ============================================================
+CREATE TABLE IF NOT EXISTS `stock_sync_state` (
+    `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT COMMENT '主键ID',
+    `code` VARCHAR(10) NOT NULL COMMENT '股票代码',
+    `last_date` DATE DEFAULT NULL COMMENT '已入库的最新交易日',
+    `last_synced_at` DATETIME DEFAULT NULL COMMENT '最近一次同步时间',
+    `data_source` VARCHAR(50) DEFAULT NULL COMMENT '最近一次同步数据来源',
+    `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `uix_code` (`code`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='日线同步水位';
+
+-- 用已有日线数据初始化水位
+INSERT INTO `stock_sync_state` (`code`, `last_date`, `last_synced_at`)
+SELECT `code`, MAX(`date`), NOW() FROM `stock_daily` GROUP BY `code`
+ON DUPLICATE KEY UPDATE `last_date` = VALUES(`last_date`);
+
+-- ============================================================
+-- 2. 已确认无日线的交易日：回补时不再把停牌/休市日当作缺口
+-- ============================================================
+CREATE TABLE IF NOT EXISTS `stock_daily_empty` (
+    `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT COMMENT '主键ID',
+    `code` VARCHAR(10) NOT NULL COMMENT '股票代码',
+    `date` DATE NOT NULL COMMENT '已确认无数据的交易日',
+    `confirmed_at` DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '确认时间',
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `uix_empty_code_date` (`code`, `date`),
+    KEY `ix_stock_daily_empty_code` (`code`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='已确认无日线的交易日';
+
+-- ============================================================
+-- 3. 增量指标状态表：盘中重新评分
+-- ============================================================
+CREATE TABLE IF NOT EXISTS `stock_indicator_state` (
+    `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT COMMENT '主键ID',
+    `code` VARCHAR(10) NOT NULL COMMENT '股票代码',
+    `last_date` DATE DEFAULT NULL COMMENT '状态对应的最新交易日',
+    `last_close` DOUBLE DEFAULT NULL COMMENT '状态对应交易日的收盘价',
+    `state` TEXT NOT NULL COMMENT '指标状态JSON',
+    `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    PRIMARY KEY (`id`),
+    UNIQUE KEY `uix_code` (`code`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='增量指标状态';
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+回测校验：面板评分与撮合规则
+===================================
+
+在随机日线面板（含停牌缺失日、一字涨跌停开盘、20% 涨跌幅板块，末尾为连续下跌段
+以便回测结束前全部平仓）上核对：
+1. StockTrendAnalyzer.score_panel 每个交易日的评分/信号/趋势/乖离率
+   与对同一历史前缀调用 analyze() 的结果一致
+2. Backtester.run 的每笔成交满足撮合规则：
+   - 信号次日开盘成交，T+1，100 股整数倍
+   - 涨停开盘不买入，跌停开盘不卖出
+   - 盈亏按佣金（含最低佣金）与印花税重算一致，同时持仓数不超过上限
+   - 回测结束无持仓时，期末净值 = 初始资金 + 各笔盈亏之和
+3. run_grid 的单组参数结果与 run 相同（指标缓存与交易日对齐复用不影响结果）
+
+不一致时打印差异并以非 0 退出码结束。
+
+使用方法：
+    python scripts/verify_backtest.py
+    python scripts/verify_backtest.py --codes 8 --bars 400 --seed 3
+"""
+
+import argparse
+import logging
+import math
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.backtest import BacktestConfig, Backtester, _price_limit  # noqa: E402
+from src.indicators import IndicatorPanel  # noqa: E402
+from src.stock_analyzer import BUY_SIGNAL_ORDER, TREND_STATUS_ORDER, StockTrendAnalyzer  # noqa: E402
+
+
+# 序列末尾连续下跌的交易日数：下跌初期均线仍可能多头并触发买入，
+# 取 max_hold_days 的两倍以上，保证到期卖出后期末无持仓
+FLAT_TAIL_BARS = 25
+
+
+def make_frames(codes: List[str], bars: int, rng: np.random.Generator) -> Dict[str, pd.DataFrame]:
+    """
+    随机游走日线：约 3% 交易日停牌（整行缺失），约 3% 交易日一字涨停或跌停开盘，
+    最后 FLAT_TAIL_BARS 个交易日连续下跌
+    """
+    dates = pd.bdate_range('2021-01-04', periods=bars)
+    frames = {}
+    for code in codes:
+        limit = _price_limit(code)
+        close = np.empty(bars)
+        open_ = np.empty(bars)
+        price = rng.uniform(5, 50)
+        for t in range(bars):
+            prev = price
+            move = rng.random()
+            if t >= bars - FLAT_TAIL_BARS:
+                # 末尾连续阴跌：不再出现买入信号，持仓在回测结束前全部卖出
+                open_[t] = round(prev * 0.995, 2)
+                price = round(prev * 0.98, 2)
+            elif move < 0.015:
+                price = round(prev * (1 + limit), 2)
+                open_[t] = price
+            elif move < 0.03:
+                price = round(prev * (1 - limit), 2)
+                open_[t] = price
+            else:
+                open_[t] = round(prev * (1 + rng.normal(0, 0.01)), 2)
+                price = round(prev * (1 + np.clip(rng.normal(0.001, 0.025), -limit, limit)), 2)
+            close[t] = price
+        df = pd.DataFrame({
+            'date': dates,
+            'open': open_,
+            'high': np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, bars)),
+            'low': np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, bars)),
+            'close': close,
+            'volume': rng.uniform(1e5, 1e7, bars),
+        })
+        # 首日与末尾下跌段之外随机停牌
+        suspended = rng.random(bars) < 0.03
+        suspended[0] = False
+        suspended[-FLAT_TAIL_BARS:] = False
+        frames[code] = df[~suspended].reset_index(drop=True)
+    return frames
+
+
+def verify_scores(frames: Dict[str, pd.DataFrame], panel: IndicatorPanel, analyzer: StockTrendAnalyzer) -> int:
+    """score_panel 与逐前缀 analyze() 对比，返回不一致的 bar 数"""
+    signals = analyzer.score_panel(panel)
+    width = panel.close.shape[1]
+    failures = 0
+    checked = 0
+    for i, code in enumerate(panel.codes):
+        df = frames[code]
+        offset = width - int(panel.n_bars[i])
+        for k in range(19, len(df)):
+            col = offset + k
+            result = analyzer.analyze(df.iloc[:k + 1], code)
+            expected = {
+                'signal_score': result.signal_score,
+                'buy_signal': result.buy_signal,
+                'trend_status': result.trend_status,
+            }
+            actual = {
+                'signal_score': int(signals.score[i, col]),
+                'buy_signal': BUY_SIGNAL_ORDER[signals.buy_signal[i, col]],
+                'trend_status': TREND_STATUS_ORDER[signals.trend_status[i, col]],
+            }
+            diffs = [f"{name}: analyze={expected[name]} panel={actual[name]}"
+                     for name in expected if expected[name] != actual[name]]
+            if not math.isclose(result.bias_ma5, signals.bias_ma5[i, col], rel_tol=1e-9, abs_tol=1e-9):
+                diffs.append(f"bias_ma5: analyze={result.bias_ma5!r} panel={signals.bias_ma5[i, col]!r}")
+            if not signals.valid[i, col]:
+                diffs.append("valid=False")
+            checked += 1
+            if diffs:
+                failures += 1
+                print(f"[评分] {code} 第 {k + 1} 根 K 线不一致: {'; '.join(diffs)}")
+    print(f"评分: 核对 {checked} 个 bar，{'通过' if not failures else f'{failures} 个不一致'}")
+    return failures
+
+
+def verify_trades(panel: IndicatorPanel, backtester: Backtester) -> int:
+    """逐笔核对撮合规则与资金核算，返回不一致项数"""
+    cfg = backtester.config
+    grid = backtester.align(panel)
+    signals = backtester.trend_analyzer.score_panel(panel)
+    entry_mask = grid.scatter(signals.signal_mask(*cfg.entry_signals), False)
+    report = backtester.run(panel, grid=grid)
+    code_index = {code: i for i, code in enumerate(grid.codes)}
+    failures = []
+
+    holding = np.zeros(len(grid.dates), dtype=np.int64)
+    for trade in report.trades:
+        i = code_index[trade.code]
+        entry_col = int(np.searchsorted(grid.dates, trade.entry_date))
+        exit_col = int(np.searchsorted(grid.dates, trade.exit_date))
+        holding[entry_col:exit_col] += 1
+        label = f"{trade.code} {trade.entry_date}→{trade.exit_date}"
+
+        if trade.shares <= 0 or trade.shares % cfg.lot_size:
+            failures.append(f"{label}: 股数 {trade.shares} 不是 {cfg.lot_size} 的整数倍")
+        if exit_col <= entry_col:
+            failures.append(f"{label}: 违反 T+1")
+        if entry_col == 0 or not entry_mask[i, entry_col - 1]:
+            failures.append(f"{label}: 买入前一交易日没有买入信号")
+        if trade.entry_price != grid.open[i, entry_col] or trade.exit_price != grid.open[i, exit_col]:
+            failures.append(f"{label}: 成交价不是当日开盘价")
+        if grid.limit_up[i, entry_col]:
+            failures.append(f"{label}: 涨停开盘买入")
+        if grid.limit_down[i, exit_col]:
+            failures.append(f"{label}: 跌停开盘卖出")
+
+        buy_value = trade.shares * trade.entry_price
+        sell_value = trade.shares * trade.exit_price
+        cost = buy_value + max(buy_value * cfg.commission_rate, cfg.min_commission)
+        proceeds = (sell_value - max(sell_value * cfg.commission_rate, cfg.min_commission)
+                    - sell_value * cfg.stamp_tax_rate)
+        if not math.isclose(trade.pnl, proceeds - cost, rel_tol=1e-9, abs_tol=1e-6):
+            failures.append(f"{label}: 盈亏 {trade.pnl:.4f}，按费用重算为 {proceeds - cost:.4f}")
+        if not math.isclose(trade.return_pct, (proceeds - cost) / cost * 100, rel_tol=1e-9, abs_tol=1e-9):
+            failures.append(f"{label}: 收益率与盈亏不符")
+
+    if holding.max(initial=0) > cfg.max_positions:
+        failures.append(f"同时持仓 {holding.max()} 只，超过上限 {cfg.max_positions}")
+
+    if report.open_positions == 0:
+        expected = cfg.initial_cash + sum(trade.pnl for trade in report.trades)
+        if not math.isclose(report.equity[-1], expected, rel_tol=1e-9):
+            failures.append(f"期末净值 {report.equity[-1]:.2f} ≠ 初始资金 + 盈亏之和 {expected:.2f}")
+        ledger = "已核对"
+    else:
+        ledger = f"期末仍有 {report.open_positions} 只持仓，跳过"
+
+    for failure in failures:
+        print(f"[撮合] {failure}")
+    print(f"撮合: {report.trade_count} 笔交易，涨停/停牌未买入 {report.blocked_buys} 次，"
+          f"跌停/停牌顺延卖出 {report.blocked_sells} 次，期末资金核算{ledger}，"
+          f"{'通过' if not failures else f'{len(failures)} 项不一致'}")
+    return len(failures)
+
+
+def verify_grid(panel: IndicatorPanel, backtester: Backtester) -> int:
+    """run_grid 单组参数与 run 结果对比"""
+    bias = backtester.trend_analyzer.BIAS_THRESHOLD
+    single = backtester.run(panel)
+    grid_report = backtester.run_grid(panel, bias_thresholds=[bias], ma_periods=[(5, 10, 20)])[0]
+    same = (
+        single.to_dict() == grid_report.to_dict()
+        and np.array_equal(single.equity, grid_report.equity)
+        and single.trades == grid_report.trades
+    )
+    print(f"参数扫描: run_grid 与 run {'一致' if same else '不一致'}")
+    return 0 if same else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='score_panel 与回测撮合规则校验')
+    parser.add_argument('--codes', type=int, default=6, help='股票数量')
+    parser.add_argument('--bars', type=int, default=250, help='每只股票的交易日数')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    rng = np.random.default_rng(args.seed)
+    # 一半为 20% 涨跌幅的创业板代码
+    codes = [f"{(300000 if i % 2 else 600000) + i:06d}" for i in range(args.codes)]
+    frames = make_frames(codes, args.bars, rng)
+    panel = IndicatorPanel.from_frames(frames)
+    backtester = Backtester(BacktestConfig(max_positions=3, max_hold_days=10))
+
+    failures = verify_scores(frames, panel, backtester.trend_analyzer)
+    failures += verify_trades(panel, backtester)
+    failures += verify_grid(panel, backtester)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
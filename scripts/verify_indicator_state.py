@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+增量指标状态校验：IndicatorState vs compute_indicators
+===================================
+
+在随机日线序列上逐根追加 K 线，核对 IndicatorState 与面板批量计算的一致性：
+1. update() 之后的 snapshot() 与同一历史前缀上 compute_indicators 的最新快照一致
+2. preview() 试算的快照与把该报价作为当日 K 线批量计算的结果一致，且不修改状态
+3. to_dict() → JSON → from_dict() 恢复的状态与原状态快照相同，继续追加 K 线后仍保持相同
+
+序列长度默认超过 STATE_RESYNC_BARS，覆盖滑动和的定期精确重算。
+任一字段超出容差即打印差异并以非 0 退出码结束。
+
+使用方法：
+    python scripts/verify_indicator_state.py                   # 默认 3 条序列，每条 600 根 K 线
+    python scripts/verify_indicator_state.py --bars 1000 --series 5 --seed 42
+"""
+
+import argparse
+import json
+import math
+import sys
+from dataclasses import asdict, replace
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.indicators import (  # noqa: E402
+    STATE_RESYNC_BARS,
+    IndicatorPanel,
+    IndicatorSnapshot,
+    IndicatorState,
+    compute_indicators,
+)
+from src.stock_analyzer import StockTrendAnalyzer  # noqa: E402
+
+# 均线/RSI 滑动和与 pandas 批量结果之间允许的浮点误差
+REL_TOL = 1e-9
+ABS_TOL = 1e-9
+
+
+def make_series(bars: int, rng: np.random.Generator) -> pd.DataFrame:
+    """生成随机游走日线，少量成交量缺失、最高价缺失"""
+    close = 20 * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+    high = close * (1 + rng.uniform(0, 0.03, bars))
+    volume = rng.uniform(1e5, 1e7, bars)
+    volume[rng.random(bars) < 0.02] = np.nan
+    high[rng.random(bars) < 0.02] = np.nan
+    return pd.DataFrame({
+        'date': pd.bdate_range('2018-01-01', periods=bars),
+        'close': close,
+        'high': high,
+        'low': close * 0.98,
+        'volume': volume,
+    })
+
+
+def batch_snapshots(df: pd.DataFrame) -> List[IndicatorSnapshot]:
+    """每个历史前缀 df[:k]（k = 1..n）的最新快照：每个前缀作为面板的一行，一次批量计算"""
+    frames = {str(k): df.iloc[:k] for k in range(1, len(df) + 1)}
+    panel = IndicatorPanel.from_frames(frames)
+    return StockTrendAnalyzer._latest_snapshots(panel, compute_indicators(panel))
+
+
+def diff_snapshots(expected: IndicatorSnapshot, actual: IndicatorSnapshot) -> List[str]:
+    """返回超出容差的字段描述（两边均为 NaN 视为一致）"""
+    diffs = []
+    for name, want in asdict(expected).items():
+        got = getattr(actual, name)
+        want, got = float(want), float(got)
+        if math.isnan(want) and math.isnan(got):
+            continue
+        if not math.isclose(want, got, rel_tol=REL_TOL, abs_tol=ABS_TOL):
+            diffs.append(f"{name}: batch={want!r} state={got!r}")
+    return diffs
+
+
+def verify_series(df: pd.DataFrame, label: str) -> int:
+    """校验一条序列，返回失败项数"""
+    failures = 0
+    expected = batch_snapshots(df)
+    state = IndicatorState(label)
+    rows = list(df.itertuples(index=False))
+
+    for k, row in enumerate(rows):
+        if k > 0:
+            # preview：以第 k 根 K 线作为盘中报价试算，结果应等于含该 K 线的批量计算
+            # （报价缺最高价时 preview 按最新价计入近 20 日最高价）
+            want = expected[k]
+            if math.isnan(row.high):
+                want = replace(want, recent_high=float(np.nanmax([want.recent_high, row.close])))
+            before = state.to_dict()
+            diffs = diff_snapshots(want, state.preview(row.close, row.high, row.volume))
+            if state.to_dict() != before:
+                diffs.append("preview() 修改了状态")
+            if diffs:
+                failures += 1
+                print(f"[{label}] preview 第 {k + 1} 根 K 线不一致: {'; '.join(diffs)}")
+
+        state.update(row.date.date(), row.close, row.high, row.volume)
+        diffs = diff_snapshots(expected[k], state.snapshot())
+        if diffs:
+            failures += 1
+            print(f"[{label}] update 第 {k + 1} 根 K 线不一致: {'; '.join(diffs)}")
+
+    from_history = IndicatorState.from_history(label, df)
+    if from_history.to_dict() != state.to_dict():
+        failures += 1
+        print(f"[{label}] from_history 与逐根 update 的状态不同")
+
+    # 序列化往返：在中途和末尾各恢复一次，恢复后继续追加 K 线应与原状态完全一致
+    for cut in (len(rows) // 2, len(rows)):
+        original = IndicatorState.from_history(label, df.iloc[:cut])
+        restored = IndicatorState.from_dict(json.loads(json.dumps(original.to_dict())))
+        if restored.to_dict() != original.to_dict():
+            failures += 1
+            print(f"[{label}] 第 {cut} 根 K 线处 to_dict/from_dict 往返后序列化结果不同")
+        for row in rows[cut:]:
+            original.update(row.date.date(), row.close, row.high, row.volume)
+            restored.update(row.date.date(), row.close, row.high, row.volume)
+        diffs = diff_snapshots(original.snapshot(), restored.snapshot())
+        if restored.to_dict() != original.to_dict() and not diffs:
+            diffs.append("状态存在浮点差异")
+        if diffs:
+            failures += 1
+            print(f"[{label}] 第 {cut} 根 K 线处恢复的状态继续追加后不一致: {'; '.join(diffs)}")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='IndicatorState 与 compute_indicators 一致性校验')
+    parser.add_argument('--bars', type=int, default=2 * STATE_RESYNC_BARS + 100, help='每条序列的 K 线数')
+    parser.add_argument('--series', type=int, default=3, help='随机序列条数')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    failures = 0
+    for i in range(args.series):
+        label = f"series{i}"
+        failed = verify_series(make_series(args.bars, rng), label)
+        print(f"{label}: {args.bars} 根 K 线，{'通过' if not failed else f'{failed} 项不一致'}")
+        failures += failed
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+日线写入校验：批量 UPSERT vs 逐行 ORM
+===================================
+
+在两个临时 SQLite 数据库上分别用 DatabaseManager.save_daily_data（批量 UPSERT）
+与 _save_daily_data_rowwise（逐行 SELECT + 更新/插入）执行同一组写入，核对：
+1. 每次写入返回的新增条数相同
+2. 写入后 stock_daily 表内容相同（不比较 id、created_at、updated_at）
+
+写入序列覆盖：首次写入、与已有日期部分重叠的写入（旧日期数值被修正 + 新日期追加）、
+数值为 NaN、缺少部分列、日期为字符串。不一致时打印差异并以非 0 退出码结束。
+
+使用方法：
+    python scripts/verify_save_daily_data.py
+    python scripts/verify_save_daily_data.py --codes 20 --days 300 --seed 1
+"""
+
+import argparse
+import logging
+import sys
+import tempfile
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.storage import DAILY_UPSERT_COLUMNS, DatabaseManager, StockDaily  # noqa: E402
+
+
+def make_frame(codes: List[str], dates: pd.DatetimeIndex, rng: np.random.Generator) -> pd.DataFrame:
+    """生成多股票日线 DataFrame，约 5% 的数值为 NaN"""
+    n = len(codes) * len(dates)
+    close = rng.uniform(5, 100, n)
+    df = pd.DataFrame({
+        'code': np.repeat(codes, len(dates)),
+        'date': np.tile(dates, len(codes)),
+        'open': close * 0.99,
+        'high': close * 1.02,
+        'low': close * 0.98,
+        'close': close,
+        'volume': rng.uniform(1e5, 1e7, n),
+        'amount': rng.uniform(1e6, 1e9, n),
+        'pct_chg': rng.normal(0, 2, n),
+        'ma5': close,
+        'ma10': close,
+        'ma20': close,
+        'volume_ratio': rng.uniform(0.5, 2, n),
+    })
+    for col in ('volume', 'pct_chg', 'ma20'):
+        df.loc[rng.random(n) < 0.05, col] = np.nan
+    return df
+
+
+def write_steps(codes: List[str], days: int, rng: np.random.Generator) -> List[pd.DataFrame]:
+    """依次执行的写入：首次写入 → 部分重叠（修正 + 追加） → 字符串日期且缺少 volume_ratio 列"""
+    dates = pd.bdate_range('2023-01-02', periods=days + days // 2)
+    first = make_frame(codes, dates[:days], rng)
+    overlap = make_frame(codes, dates[days // 2: days + days // 4], rng)
+    tail = make_frame(codes[: max(1, len(codes) // 2)], dates[days - 5:], rng)
+    tail['date'] = tail['date'].dt.strftime('%Y-%m-%d')
+    tail = tail.drop(columns=['volume_ratio'])
+    return [first, overlap, tail]
+
+
+def save_bulk(db: DatabaseManager, df: pd.DataFrame) -> int:
+    return db.save_daily_data(df, data_source='Verify')
+
+
+def save_rowwise(db: DatabaseManager, df: pd.DataFrame) -> int:
+    return sum(
+        db._save_daily_data_rowwise(group.drop(columns=['code']), code, 'Verify')
+        for code, group in df.groupby('code')
+    )
+
+
+def read_table(db: DatabaseManager) -> pd.DataFrame:
+    columns = [StockDaily.code, StockDaily.date] + [getattr(StockDaily, col) for col in DAILY_UPSERT_COLUMNS]
+    with db._engine.connect() as conn:
+        df = pd.read_sql(select(*columns), conn)
+    return df.sort_values(['code', 'date']).reset_index(drop=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='save_daily_data 批量与逐行写入结果一致性校验')
+    parser.add_argument('--codes', type=int, default=5, help='股票数量')
+    parser.add_argument('--days', type=int, default=120, help='首次写入的交易日数')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger('src.storage').setLevel(logging.WARNING)
+
+    codes = [f"{600000 + i:06d}" for i in range(args.codes)]
+    steps = write_steps(codes, args.days, np.random.default_rng(args.seed))
+    failures = 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tables = {}
+        counts = {}
+        for name, saver in (('bulk', save_bulk), ('rowwise', save_rowwise)):
+            DatabaseManager.reset_instance()
+            db = DatabaseManager(db_url=f"sqlite:///{Path(tmp) / name}.db")
+            counts[name] = [saver(db, df) for df in steps]
+            tables[name] = read_table(db)
+        DatabaseManager.reset_instance()
+
+    for step, (bulk, rowwise) in enumerate(zip(counts['bulk'], counts['rowwise']), 1):
+        status = '一致' if bulk == rowwise else '不一致'
+        print(f"写入 {step}: {len(steps[step - 1])} 行，新增 bulk={bulk} rowwise={rowwise}（{status}）")
+        failures += bulk != rowwise
+
+    try:
+        pd.testing.assert_frame_equal(tables['bulk'], tables['rowwise'], check_dtype=False)
+        print(f"stock_daily 表内容一致，共 {len(tables['bulk'])} 行")
+    except AssertionError as e:
+        failures += 1
+        print(f"stock_daily 表内容不一致:\n{e}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
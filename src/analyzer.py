@@ -10,12 +10,15 @@ A股自选股智能分析系统 - AI分析层
 3. 结合技术面和消息面生成分析报告
 """
 
+import asyncio
 import json
 import logging
+import threading
 import time
 from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from contextvars import ContextVar
 from dataclasses import dataclass
-from typing import Optional, Dict, Any, List, Callable, TypeVar
+from typing import Optional, Dict, Any, List, Callable, Tuple, TypeVar, Union, TYPE_CHECKING
 
 from tenacity import (
     retry,
@@ -26,19 +29,109 @@ from tenacity import (
 )
 
 from src.config import get_config
+from src.llm_cache import LLMResponseCache, get_llm_cache
+from src.llm_stream import DashboardStreamParser, StreamAbort
+from src.prompt_budget import NewsDigest, estimate_tokens, fit_prompt
+
+if TYPE_CHECKING:
+    from src.core.context import AnalysisContext
 
 logger = logging.getLogger(__name__)
 
 T = TypeVar("T")
 
+# 单只股票请求的输出 token 上限；合并请求按股票数倍增，但不超过模型的输出上限
+SINGLE_OUTPUT_TOKENS = 8192
+
+# 常见模型的输出 token 上限（按模型名前缀匹配，越具体的前缀越靠前）；未列出的模型按单只请求上限处理
+MODEL_MAX_OUTPUT_TOKENS: Tuple[Tuple[str, int], ...] = (
+    ('gpt-4o-mini', 16384),
+    ('gpt-4o', 16384),
+    ('gpt-4.1', 32768),
+    ('gpt-4-turbo', 4096),
+    ('gpt-3.5-turbo', 4096),
+    ('deepseek-chat', 8192),
+    ('deepseek-reasoner', 65536),
+    ('gemini-1.5', 8192),
+    ('gemini-2.0', 8192),
+    ('gemini-', 65536),
+)
+
+
+def model_max_output_tokens(model: Optional[str]) -> int:
+    """模型的输出 token 上限（未知模型返回 SINGLE_OUTPUT_TOKENS）"""
+    name = (model or '').lower().rsplit('/', 1)[-1]
+    for prefix, limit in MODEL_MAX_OUTPUT_TOKENS:
+        if name.startswith(prefix):
+            return limit
+    return SINGLE_OUTPUT_TOKENS
+
+
+# 当前分析（线程/协程内）的 token 用量，analyze() 开始时重置，API 返回后累加
+_llm_usage: ContextVar[Optional[Dict[str, int]]] = ContextVar('llm_usage', default=None)
+
+
+def _record_usage(response: Any = None, cached: bool = False) -> None:
+    """累加接口返回的 token 用量（OpenAI usage / Gemini usage_metadata）"""
+    usage = _llm_usage.get()
+    if usage is None:
+        return
+    if cached:
+        usage['cached'] += 1
+        return
+    try:
+        if getattr(response, 'usage', None) is not None:
+            prompt_tokens = response.usage.prompt_tokens
+            completion_tokens = response.usage.completion_tokens
+        elif getattr(response, 'usage_metadata', None) is not None:
+            prompt_tokens = response.usage_metadata.prompt_token_count
+            completion_tokens = response.usage_metadata.candidates_token_count
+        else:
+            return
+        usage['prompt_tokens'] += int(prompt_tokens or 0)
+        usage['completion_tokens'] += int(completion_tokens or 0)
+        usage['calls'] += 1
+    except (AttributeError, TypeError, ValueError):
+        pass
+
+
+def _empty_response_info(response: Any) -> Tuple[Any, Any]:
+    """
+    空响应排查信息 (finish_reason, 用量)，只记录这两项，不记录响应对象本身
 
-def _run_with_timeout(func: Callable[[], T], timeout_seconds: int, label: str = "LLM") -> T:
-    """在单独线程中执行 func，超时则抛出异常，避免 SDK 无响应导致主流程卡死。超时后不等待 worker 以免主线程再次卡住。"""
+    OpenAI 取 choices[0].finish_reason / usage，Gemini 取 candidates[0].finish_reason / usage_metadata；
+    流式响应（response 为 None）时均为 None
+    """
+    if response is None:
+        return None, None
+    try:
+        if getattr(response, 'choices', None):
+            return response.choices[0].finish_reason, getattr(response, 'usage', None)
+        candidates = getattr(response, 'candidates', None)
+        finish_reason = candidates[0].finish_reason if candidates else None
+        return finish_reason, getattr(response, 'usage_metadata', None)
+    except (AttributeError, IndexError, TypeError):
+        return None, None
+
+
+def _run_with_timeout(
+    func: Callable[[], T],
+    timeout_seconds: int,
+    label: str = "LLM",
+    cancel: Optional[threading.Event] = None,
+) -> T:
+    """
+    在单独线程中执行 func，超时则抛出异常，避免 SDK 无响应导致主流程卡死。超时后不等待 worker 以免主线程再次卡住。
+
+    cancel: 超时时置位，通知 worker（如流式读取）停止工作，避免与重试并行消耗 token、推送过期的部分结果
+    """
     ex = ThreadPoolExecutor(max_workers=1)
     future = ex.submit(func)
     try:
         return future.result(timeout=timeout_seconds)
     except FuturesTimeoutError:
+        if cancel is not None:
+            cancel.set()
         ex.shutdown(wait=False)  # 不等待卡住的 worker，否则主线程会再卡到 worker 结束
         raise TimeoutError(f"{label} 请求超时（{timeout_seconds}s），请检查网络或 API 状态") from None
     else:
@@ -216,6 +309,8 @@ class AnalysisResult:
     data_sources: str = ""  # 数据来源说明
     success: bool = True
     error_message: Optional[str] = None
+    prompt_tokens: int = 0  # 输入 token 数（接口统计，不可用时为估算值）
+    completion_tokens: int = 0  # 输出 token 数
     
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
@@ -248,6 +343,8 @@ class AnalysisResult:
             'search_performed': self.search_performed,
             'success': self.success,
             'error_message': self.error_message,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
         }
     
     def get_core_conclusion(self) -> str:
@@ -516,6 +613,8 @@ class GeminiAnalyzer:
         self._using_fallback = False  # 是否正在使用备选模型
         self._use_openai = False  # 是否使用 OpenAI 兼容 API
         self._openai_client = None  # OpenAI 客户端
+        self._openai_client_kwargs: Dict[str, Any] = {}  # OpenAI 客户端参数（供异步客户端复用）
+        self._async_openai_client = None  # AsyncOpenAI 客户端（异步流水线按需创建）
         
         # 检查 Gemini API Key 是否有效（过滤占位符）
         gemini_key_valid = self._api_key and not self._api_key.startswith('your_') and len(self._api_key) > 10
@@ -573,6 +672,7 @@ class GeminiAnalyzer:
                 client_kwargs["base_url"] = config.openai_base_url
 
             self._openai_client = OpenAI(**client_kwargs)
+            self._openai_client_kwargs = client_kwargs
             self._current_model_name = config.openai_model
             self._use_openai = True
             logger.info(f"OpenAI 兼容 API 初始化成功 (base_url: {config.openai_base_url}, model: {config.openai_model})")
@@ -664,13 +764,123 @@ class GeminiAnalyzer:
         """检查分析器是否可用"""
         return self._model is not None or self._openai_client is not None
     
-    def _call_openai_api(self, prompt: str, generation_config: dict) -> str:
+    def _stream_openai(
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> str:
+        """
+        流式调用 OpenAI 兼容 API（LLM_STREAMING_ENABLED）
+        
+        边接收边解析，回显/非 JSON 时抛出 StreamAbort 并立即断开连接；
+        cancel 置位（调用方已超时放弃）后停止读取并断开连接
+        """
+        parser = DashboardStreamParser(self._is_response_likely_echo, on_partial=self._guard_partial(on_partial, cancel))
+        stream = self._openai_client.chat.completions.create(
+            model=self._current_model_name,
+            messages=[
+                {"role": "system", "content": self.SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+        try:
+            for chunk in stream:
+                if cancel is not None and cancel.is_set():
+                    logger.info("[LLM流式/OpenAI] 调用方已超时放弃，停止读取")
+                    break
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parser.feed(chunk.choices[0].delta.content)
+        finally:
+            # 提前终止时关闭连接，不再继续生成
+            stream.close()
+        return parser.text
+    
+    def _stream_gemini(
+        self,
+        prompt: str,
+        generation_config: dict,
+        request_timeout: int,
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> str:
+        """
+        流式调用 Gemini（LLM_STREAMING_ENABLED）
+        
+        边接收边解析，回显/非 JSON 时抛出 StreamAbort 并断开连接；
+        cancel 置位（调用方已超时放弃）后停止读取并断开连接
+        """
+        parser = DashboardStreamParser(self._is_response_likely_echo, on_partial=self._guard_partial(on_partial, cancel))
+        response = self._model.generate_content(
+            prompt,
+            generation_config=generation_config,
+            request_options={"timeout": request_timeout},
+            stream=True,
+        )
+        try:
+            for chunk in response:
+                if cancel is not None and cancel.is_set():
+                    logger.info("[LLM流式/Gemini] 调用方已超时放弃，停止读取")
+                    break
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # 无文本部分的块（如仅含安全评级）
+                    continue
+                parser.feed(text)
+        finally:
+            self._close_gemini_stream(response)
+        return parser.text
+    
+    @staticmethod
+    def _close_gemini_stream(response: Any) -> None:
+        """
+        断开 Gemini 流式响应（提前终止、超时放弃或读取完毕时调用）
+        
+        SDK 未提供公开的关闭方法：底层迭代器为 gRPC 流（cancel）或 REST 生成器（close）
+        """
+        iterator = getattr(response, '_iterator', None)
+        for name in ('cancel', 'close'):
+            method = getattr(iterator, name, None)
+            if callable(method):
+                try:
+                    method()
+                except Exception as e:
+                    logger.debug(f"[LLM流式/Gemini] 关闭流失败: {e}")
+                return
+    
+    @staticmethod
+    def _guard_partial(
+        on_partial: Optional[Callable[[Dict[str, Any]], None]],
+        cancel: Optional[threading.Event],
+    ) -> Optional[Callable[[Dict[str, Any]], None]]:
+        """调用方超时放弃后不再推送部分结果，避免覆盖重试请求的任务状态"""
+        if on_partial is None or cancel is None:
+            return on_partial
+
+        def guarded(partial: Dict[str, Any]) -> None:
+            if not cancel.is_set():
+                on_partial(partial)
+        return guarded
+    
+    def _call_openai_api(
+        self,
+        prompt: str,
+        generation_config: dict,
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> str:
         """
         调用 OpenAI 兼容 API
         
         Args:
             prompt: 提示词
             generation_config: 生成配置
+            on_partial: 流式模式下的部分结果回调（可选）
             
         Returns:
             响应文本
@@ -679,7 +889,7 @@ class GeminiAnalyzer:
         max_retries = config.gemini_max_retries
         base_delay = config.gemini_retry_delay
         temperature = generation_config.get('temperature', config.openai_temperature)
-        max_tokens = generation_config.get('max_output_tokens', 8192)
+        max_tokens = generation_config.get('max_output_tokens', SINGLE_OUTPUT_TOKENS)
 
         # 模型调用详情日志：输入与参数
         _prompt_preview = prompt[:800] + "..." if len(prompt) > 800 else prompt
@@ -693,6 +903,7 @@ class GeminiAnalyzer:
         logger.info("[LLM调用/OpenAI] user prompt 预览: %s", _prompt_preview)
         logger.debug("[LLM调用/OpenAI] 完整 user prompt: %s", prompt)
         logger.info("[LLM调用/OpenAI] 正在等待 API 响应（最长 %d 秒），超时将自动重试或跳过…", request_timeout)
+        stream_aborted = False
         for attempt in range(max_retries):
             try:
                 if attempt > 0:
@@ -714,11 +925,20 @@ class GeminiAnalyzer:
                         temperature=temperature,
                         max_tokens=max_tokens,
                     )
-                response = _run_with_timeout(_openai_call, request_timeout, "OpenAI")
+                response = None
+                if config.llm_streaming_enabled:
+                    cancel = threading.Event()
+                    out_text = _run_with_timeout(
+                        lambda: self._stream_openai(prompt, temperature, max_tokens, on_partial, cancel),
+                        request_timeout, "OpenAI", cancel,
+                    )
+                else:
+                    response = _run_with_timeout(_openai_call, request_timeout, "OpenAI")
+                    _record_usage(response)
+                    out_text = response.choices[0].message.content if response and response.choices else None
                 _elapsed = time.time() - _start
                 
-                if response and response.choices and response.choices[0].message.content:
-                    out_text = response.choices[0].message.content
+                if out_text:
                     _out_preview = out_text[:800] + "..." if len(out_text) > 800 else out_text
                     logger.info(
                         "[LLM调用/OpenAI] 响应: 耗时=%.2fs, 长度=%d, 预览: %s",
@@ -727,9 +947,18 @@ class GeminiAnalyzer:
                     logger.debug("[LLM调用/OpenAI] 完整响应: %s", out_text)
                     return out_text
                 else:
-                    logger.warning("[LLM调用/OpenAI] API 返回空响应 body=%s", response)
+                    logger.warning(
+                        "[LLM调用/OpenAI] API 返回空响应: finish_reason=%s, usage=%s",
+                        *_empty_response_info(response),
+                    )
                     raise ValueError("OpenAI API 返回空响应")
                     
+            except StreamAbort as e:
+                # 回显/非 JSON：最多再试一次
+                logger.warning(f"[OpenAI] 流式响应提前终止，第 {attempt + 1}/{max_retries} 次尝试: {e}")
+                if stream_aborted or attempt == max_retries - 1:
+                    raise
+                stream_aborted = True
             except (TimeoutError, FuturesTimeoutError) as e:
                 logger.warning(f"[OpenAI] 请求超时，第 {attempt + 1}/{max_retries} 次尝试: {e}")
                 if attempt == max_retries - 1:
@@ -748,7 +977,129 @@ class GeminiAnalyzer:
         
         raise Exception("OpenAI API 调用失败，已达最大重试次数")
     
-    def _call_api_with_retry(self, prompt: str, generation_config: dict) -> str:
+    def _response_cache_key(self, prompt: str, generation_config: dict) -> Tuple[str, str]:
+        """
+        响应缓存键（提供方/模型/温度/输出上限/系统提示词/用户提示词的指纹）
+        
+        Returns:
+            (key, model)
+        """
+        provider = "openai" if self._use_openai else "gemini"
+        model = f"{provider}:{self._current_model_name}"
+        default_temperature = get_config().openai_temperature if self._use_openai else None
+        key = LLMResponseCache.make_key(
+            prompt,
+            model=model,
+            temperature=generation_config.get('temperature', default_temperature),
+            system_prompt=self.SYSTEM_PROMPT,
+            max_tokens=generation_config.get('max_output_tokens'),
+        )
+        return key, model
+    
+    def _get_cached_response(
+        self,
+        prompt: str,
+        generation_config: dict,
+        json_array: bool = False,
+    ) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """
+        查询响应缓存（LLM_CACHE_ENABLED=false 或缓存异常时视为未命中；
+        缓存文本不是完整 JSON 时同样视为未命中）
+        
+        Returns:
+            (缓存的响应文本, key, model)
+        """
+        cache = get_llm_cache()
+        if cache is None:
+            return None, None, None
+        key, model = self._response_cache_key(prompt, generation_config)
+        try:
+            cached = cache.get(key)
+        except Exception as e:
+            logger.warning(f"[LLM缓存] 读取失败，直接请求: {e}")
+            return None, key, model
+        if cached is not None and not self._is_complete_json_response(cached, json_array):
+            return None, key, model
+        if cached is not None:
+            logger.info(f"[LLM缓存] 命中 {model}（key={key[:12]}），跳过 API 调用")
+        return cached, key, model
+    
+    def _is_complete_json_response(self, response_text: str, json_array: bool = False) -> bool:
+        """
+        响应中是否包含可完整解析的 JSON 对象（json_array=True 时为数组）
+        
+        与 _parse_response / _split_batch_response 的提取方式一致；
+        截断、空白或无法解析的响应返回 False
+        """
+        opener, closer, expected = ('[', ']', list) if json_array else ('{', '}', dict)
+        cleaned_text = response_text.replace('```json', '').replace('```', '')
+        json_start = cleaned_text.find(opener)
+        json_end = cleaned_text.rfind(closer) + 1
+        if json_start < 0 or json_end <= json_start:
+            return False
+        try:
+            data = json.loads(self._fix_json_string(cleaned_text[json_start:json_end]))
+        except json.JSONDecodeError:
+            return False
+        return isinstance(data, expected) and bool(data)
+    
+    def _store_cached_response(
+        self,
+        key: Optional[str],
+        model: Optional[str],
+        response_text: str,
+        json_array: bool = False,
+    ) -> None:
+        """
+        写入响应缓存
+        
+        只缓存可完整解析的 JSON 响应：回显题目、截断、空白或无法解析的响应不写入，
+        避免在 TTL 内反复重放同一个坏响应
+        """
+        cache = get_llm_cache()
+        if cache is None or key is None:
+            return
+        if self._is_response_likely_echo(response_text) or not self._is_complete_json_response(response_text, json_array):
+            logger.info(f"[LLM缓存] 响应不是完整的 JSON，不写入缓存（key={key[:12]}）")
+            return
+        try:
+            cache.set(key, model, response_text)
+        except Exception as e:
+            logger.warning(f"[LLM缓存] 写入失败: {e}")
+    
+    def _call_api_with_retry(
+        self,
+        prompt: str,
+        generation_config: dict,
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None,
+        json_array: bool = False,
+    ) -> str:
+        """
+        调用 AI API（先查响应缓存，未命中时请求并写入）
+        
+        Args:
+            prompt: 提示词
+            generation_config: 生成配置
+            on_partial: 流式模式下的部分结果回调（可选）
+            json_array: 期望的响应为 JSON 数组（批量请求），用于判断响应能否写入缓存
+            
+        Returns:
+            响应文本
+        """
+        cached, key, model = self._get_cached_response(prompt, generation_config, json_array)
+        if cached is not None:
+            _record_usage(cached=True)
+            return cached
+        response_text = self._request_with_retry(prompt, generation_config, on_partial)
+        self._store_cached_response(key, model, response_text, json_array)
+        return response_text
+    
+    def _request_with_retry(
+        self,
+        prompt: str,
+        generation_config: dict,
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> str:
         """
         调用 AI API，带有重试和模型切换机制
         
@@ -759,16 +1110,19 @@ class GeminiAnalyzer:
         2. 多次失败后切换到备选模型
         3. Gemini 完全失败后尝试 OpenAI
         
+        LLM_STREAMING_ENABLED=true 时以流式接收并增量解析，回显/非 JSON 响应提前终止
+        
         Args:
             prompt: 提示词
             generation_config: 生成配置
+            on_partial: 流式模式下的部分结果回调（可选）
             
         Returns:
             响应文本
         """
         # 如果已经在使用 OpenAI 模式，直接调用 OpenAI
         if self._use_openai:
-            return self._call_openai_api(prompt, generation_config)
+            return self._call_openai_api(prompt, generation_config, on_partial)
         
         config = get_config()
         max_retries = config.gemini_max_retries
@@ -776,6 +1130,7 @@ class GeminiAnalyzer:
         
         last_error = None
         tried_fallback = getattr(self, '_using_fallback', False)
+        stream_aborted = False
         
         for attempt in range(max_retries):
             try:
@@ -804,11 +1159,20 @@ class GeminiAnalyzer:
                         generation_config=generation_config,
                         request_options={"timeout": request_timeout}
                     )
-                response = _run_with_timeout(_gemini_call, request_timeout, "Gemini")
+                response = None
+                if config.llm_streaming_enabled:
+                    cancel = threading.Event()
+                    out_text = _run_with_timeout(
+                        lambda: self._stream_gemini(prompt, generation_config, request_timeout, on_partial, cancel),
+                        request_timeout, "Gemini", cancel,
+                    )
+                else:
+                    response = _run_with_timeout(_gemini_call, request_timeout, "Gemini")
+                    _record_usage(response)
+                    out_text = response.text if response else None
                 _elapsed = time.time() - _start
                 
-                if response and response.text:
-                    out_text = response.text
+                if out_text:
                     _out_preview = out_text[:800] + "..." if len(out_text) > 800 else out_text
                     logger.info(
                         "[LLM调用/Gemini] 响应: 耗时=%.2fs, 长度=%d, 预览: %s",
@@ -817,9 +1181,19 @@ class GeminiAnalyzer:
                     logger.debug("[LLM调用/Gemini] 完整响应: %s", out_text)
                     return out_text
                 else:
-                    logger.warning("[LLM调用/Gemini] 返回空响应 response=%s", response)
+                    logger.warning(
+                        "[LLM调用/Gemini] 返回空响应: finish_reason=%s, usage=%s",
+                        *_empty_response_info(response),
+                    )
                     raise ValueError("Gemini 返回空响应")
                     
+            except StreamAbort as e:
+                # 回显/非 JSON：最多再试一次，仍失败则交给 OpenAI 兼容 API
+                last_error = e
+                logger.warning(f"[Gemini] 流式响应提前终止，第 {attempt + 1}/{max_retries} 次尝试: {e}")
+                if stream_aborted:
+                    break
+                stream_aborted = True
             except (TimeoutError, FuturesTimeoutError) as e:
                 last_error = e
                 logger.warning(f"[Gemini] 请求超时，第 {attempt + 1}/{max_retries} 次尝试: {e}")
@@ -848,7 +1222,7 @@ class GeminiAnalyzer:
         if self._openai_client:
             logger.warning("[Gemini] 所有重试失败，切换到 OpenAI 兼容 API")
             try:
-                return self._call_openai_api(prompt, generation_config)
+                return self._call_openai_api(prompt, generation_config, on_partial)
             except Exception as openai_error:
                 logger.error(f"[OpenAI] 备选 API 也失败: {openai_error}")
                 raise last_error or openai_error
@@ -858,7 +1232,7 @@ class GeminiAnalyzer:
             self._init_openai_fallback()
             if self._openai_client:
                 try:
-                    return self._call_openai_api(prompt, generation_config)
+                    return self._call_openai_api(prompt, generation_config, on_partial)
                 except Exception as openai_error:
                     logger.error(f"[OpenAI] 备选 API 也失败: {openai_error}")
                     raise last_error or openai_error
@@ -866,10 +1240,177 @@ class GeminiAnalyzer:
         # 所有方式都失败
         raise last_error or Exception("所有 AI API 调用失败，已达最大重试次数")
     
+    def _get_async_openai_client(self):
+        """按需创建 AsyncOpenAI 客户端（与同步客户端使用相同的 key/base_url/超时）"""
+        if self._async_openai_client is None and self._openai_client is not None:
+            from openai import AsyncOpenAI
+            self._async_openai_client = AsyncOpenAI(**self._openai_client_kwargs)
+        return self._async_openai_client
+    
+    async def _call_openai_api_async(self, prompt: str, generation_config: dict) -> str:
+        """
+        调用 OpenAI 兼容 API（asyncio 版本）
+        
+        超时通过 asyncio.wait_for 取消进行中的请求，而不是丢弃卡住的线程
+        """
+        config = get_config()
+        max_retries = config.gemini_max_retries
+        base_delay = config.gemini_retry_delay
+        temperature = generation_config.get('temperature', config.openai_temperature)
+        max_tokens = generation_config.get('max_output_tokens', SINGLE_OUTPUT_TOKENS)
+        request_timeout = getattr(config, 'llm_request_timeout', 120)
+        client = self._get_async_openai_client()
+
+        logger.info(
+            "[LLM调用/OpenAI-async] 请求参数: model=%s, temperature=%s, max_tokens=%s, prompt_len=%d",
+            self._current_model_name, temperature, max_tokens, len(prompt),
+        )
+        for attempt in range(max_retries):
+            try:
+                if attempt > 0:
+                    delay = min(base_delay * (2 ** (attempt - 1)), 60)
+                    logger.info(f"[OpenAI] 第 {attempt + 1} 次重试，等待 {delay:.1f} 秒...")
+                    await asyncio.sleep(delay)
+                
+                _start = time.time()
+                response = await asyncio.wait_for(
+                    client.chat.completions.create(
+                        model=self._current_model_name,
+                        messages=[
+                            {"role": "system", "content": self.SYSTEM_PROMPT},
+                            {"role": "user", "content": prompt}
+                        ],
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                    ),
+                    timeout=request_timeout,
+                )
+                _elapsed = time.time() - _start
+                _record_usage(response)
+                
+                if response and response.choices and response.choices[0].message.content:
+                    out_text = response.choices[0].message.content
+                    logger.info("[LLM调用/OpenAI-async] 响应: 耗时=%.2fs, 长度=%d", _elapsed, len(out_text))
+                    logger.debug("[LLM调用/OpenAI-async] 完整响应: %s", out_text)
+                    return out_text
+                logger.warning(
+                    "[LLM调用/OpenAI-async] API 返回空响应: finish_reason=%s, usage=%s",
+                    *_empty_response_info(response),
+                )
+                raise ValueError("OpenAI API 返回空响应")
+                
+            except asyncio.TimeoutError:
+                logger.warning(f"[OpenAI] 请求超时（{request_timeout}s，已取消），第 {attempt + 1}/{max_retries} 次尝试")
+                if attempt == max_retries - 1:
+                    raise TimeoutError(f"OpenAI 请求超时（{request_timeout}s），请检查网络或 API 状态") from None
+            except Exception as e:
+                error_str = str(e)
+                is_rate_limit = '429' in error_str or 'rate' in error_str.lower() or 'quota' in error_str.lower()
+                if is_rate_limit:
+                    logger.warning(f"[OpenAI] API 限流，第 {attempt + 1}/{max_retries} 次尝试: {error_str[:100]}")
+                else:
+                    logger.warning(f"[OpenAI] API 调用失败，第 {attempt + 1}/{max_retries} 次尝试: {error_str[:100]}")
+                if attempt == max_retries - 1:
+                    raise
+        
+        raise Exception("OpenAI API 调用失败，已达最大重试次数")
+    
+    async def _call_api_with_retry_async(self, prompt: str, generation_config: dict) -> str:
+        """调用 AI API（asyncio 版本），先查响应缓存，未命中时请求并写入"""
+        cached, key, model = self._get_cached_response(prompt, generation_config)
+        if cached is not None:
+            _record_usage(cached=True)
+            return cached
+        response_text = await self._request_with_retry_async(prompt, generation_config)
+        self._store_cached_response(key, model, response_text)
+        return response_text
+    
+    async def _request_with_retry_async(self, prompt: str, generation_config: dict) -> str:
+        """
+        调用 AI API（asyncio 版本），重试与模型切换策略同 _request_with_retry
+        
+        优先级：Gemini > Gemini 备选模型 > OpenAI 兼容 API
+        """
+        if self._use_openai:
+            return await self._call_openai_api_async(prompt, generation_config)
+        
+        config = get_config()
+        max_retries = config.gemini_max_retries
+        base_delay = config.gemini_retry_delay
+        request_timeout = getattr(config, 'llm_request_timeout', 120)
+        
+        last_error = None
+        tried_fallback = getattr(self, '_using_fallback', False)
+        
+        for attempt in range(max_retries):
+            try:
+                if attempt > 0:
+                    delay = min(base_delay * (2 ** (attempt - 1)), 60)
+                    logger.info(f"[Gemini] 第 {attempt + 1} 次重试，等待 {delay:.1f} 秒...")
+                    await asyncio.sleep(delay)
+                
+                logger.info(
+                    "[LLM调用/Gemini-async] 请求参数: model=%s, generation_config=%s, prompt_len=%d",
+                    getattr(self, '_current_model_name', 'unknown'), generation_config, len(prompt),
+                )
+                _start = time.time()
+                response = await asyncio.wait_for(
+                    self._model.generate_content_async(
+                        prompt,
+                        generation_config=generation_config,
+                        request_options={"timeout": request_timeout}
+                    ),
+                    timeout=request_timeout,
+                )
+                _elapsed = time.time() - _start
+                _record_usage(response)
+                
+                if response and response.text:
+                    logger.info("[LLM调用/Gemini-async] 响应: 耗时=%.2fs, 长度=%d", _elapsed, len(response.text))
+                    logger.debug("[LLM调用/Gemini-async] 完整响应: %s", response.text)
+                    return response.text
+                logger.warning(
+                    "[LLM调用/Gemini-async] 返回空响应: finish_reason=%s, usage=%s",
+                    *_empty_response_info(response),
+                )
+                raise ValueError("Gemini 返回空响应")
+                
+            except asyncio.TimeoutError:
+                last_error = TimeoutError(f"Gemini 请求超时（{request_timeout}s），请检查网络或 API 状态")
+                logger.warning(f"[Gemini] 请求超时（已取消），第 {attempt + 1}/{max_retries} 次尝试")
+            except Exception as e:
+                last_error = e
+                error_str = str(e)
+                is_rate_limit = '429' in error_str or 'quota' in error_str.lower() or 'rate' in error_str.lower()
+                
+                if is_rate_limit:
+                    logger.warning(f"[Gemini] API 限流 (429)，第 {attempt + 1}/{max_retries} 次尝试: {error_str[:100]}")
+                    if attempt >= max_retries // 2 and not tried_fallback:
+                        if self._switch_to_fallback_model():
+                            tried_fallback = True
+                            logger.info("[Gemini] 已切换到备选模型，继续重试")
+                else:
+                    logger.warning(f"[Gemini] API 调用失败，第 {attempt + 1}/{max_retries} 次尝试: {error_str[:100]}")
+        
+        # Gemini 所有重试都失败，尝试 OpenAI 兼容 API
+        if not self._openai_client and config.openai_api_key and config.openai_base_url:
+            logger.warning("[Gemini] 所有重试失败，尝试初始化 OpenAI 兼容 API")
+            self._init_openai_fallback()
+        if self._openai_client:
+            logger.warning("[Gemini] 所有重试失败，切换到 OpenAI 兼容 API")
+            try:
+                return await self._call_openai_api_async(prompt, generation_config)
+            except Exception as openai_error:
+                logger.error(f"[OpenAI] 备选 API 也失败: {openai_error}")
+                raise last_error or openai_error
+        
+        raise last_error or Exception("所有 AI API 调用失败，已达最大重试次数")
+    
     def analyze(
         self, 
-        context: Dict[str, Any],
-        news_context: Optional[str] = None
+        context: Union[Dict[str, Any], 'AnalysisContext'],
+        news_context: Optional[Union[str, NewsDigest]] = None,
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None
     ) -> AnalysisResult:
         """
         分析单只股票
@@ -881,12 +1422,17 @@ class GeminiAnalyzer:
         4. 返回结构化结果
         
         Args:
-            context: 从 storage.get_analysis_context() 获取的上下文数据
-            news_context: 预先搜索的新闻内容（可选）
+            context: 从 storage.get_analysis_context() 获取的上下文数据，
+                     或流水线构建的 AnalysisContext（直接转换，不再查询数据库）
+            news_context: 预先搜索的新闻内容（NewsDigest 或文本，可选）
+            on_partial: 流式模式（LLM_STREAMING_ENABLED）下的部分结果回调，
+                        参数为已解析出的 评分/操作建议/一句话结论 等字段（可选）
             
         Returns:
             AnalysisResult 对象
         """
+        if hasattr(context, 'to_prompt_context'):
+            context = context.to_prompt_context()
         code = context.get('code', 'Unknown')
         config = get_config()
         
@@ -896,113 +1442,231 @@ class GeminiAnalyzer:
             logger.debug(f"[LLM] 请求前等待 {request_delay:.1f} 秒...")
             time.sleep(request_delay)
         
-        # 优先从上下文获取股票名称（由 main.py 传入）
-        name = context.get('stock_name')
-        if not name or name.startswith('股票'):
-            # 备选：从 realtime 中获取
-            if 'realtime' in context and context['realtime'].get('name'):
-                name = context['realtime']['name']
-            else:
-                # 最后从映射表获取
-                name = STOCK_NAME_MAP.get(code, f'股票{code}')
+        name = self._resolve_stock_name(context, code)
         
         # 如果模型不可用，返回默认结果
         if not self.is_available():
-            return AnalysisResult(
-                code=code,
-                name=name,
-                sentiment_score=50,
-                trend_prediction='震荡',
-                operation_advice='持有',
-                confidence_level='低',
-                analysis_summary='AI 分析功能未启用（未配置 API Key）',
-                risk_warning='请配置 Gemini API Key 后重试',
-                success=False,
-                error_message='Gemini API Key 未配置',
-            )
+            return self._unavailable_result(code, name)
         
         try:
-            # 格式化输入（包含技术面数据和新闻）
-            prompt = self._format_prompt(context, name, news_context)
-            
-            # 获取模型名称
-            model_name = getattr(self, '_current_model_name', None)
-            if not model_name:
-                model_name = getattr(self._model, '_model_name', 'unknown')
-                if hasattr(self._model, 'model_name'):
-                    model_name = self._model.model_name
-            
-            logger.info(f"========== AI 分析 {name}({code}) ==========")
-            logger.info(f"[LLM配置] 模型: {model_name}")
-            logger.info(f"[LLM配置] Prompt 长度: {len(prompt)} 字符")
-            logger.info(f"[LLM配置] 是否包含新闻: {'是' if news_context else '否'}")
-            
-            # 记录完整 prompt 到日志（INFO级别记录摘要，DEBUG记录完整）
-            prompt_preview = prompt[:500] + "..." if len(prompt) > 500 else prompt
-            logger.info(f"[LLM Prompt 预览]\n{prompt_preview}")
-            logger.debug(f"=== 完整 Prompt ({len(prompt)}字符) ===\n{prompt}\n=== End Prompt ===")
-
-            # 设置生成配置（从配置文件读取温度参数）
-            config = get_config()
-            generation_config = {
-                "temperature": config.gemini_temperature,
-                "max_output_tokens": 8192,
-            }
-
-            # 根据实际使用的 API 显示日志
-            api_provider = "OpenAI" if self._use_openai else "Gemini"
-            logger.info(f"[LLM调用] 开始调用 {api_provider} API...")
-            logger.info("[LLM调用] 正在生成决策仪表盘，预计需 1–2 分钟，请勿关闭...")
+            prompt, generation_config = self._prepare_request(context, code, name, news_context)
+            _llm_usage.set(self._new_usage())
             
             # 使用带重试的 API 调用
             start_time = time.time()
-            response_text = self._call_api_with_retry(prompt, generation_config)
+            response_text = self._call_api_with_retry(prompt, generation_config, on_partial)
             elapsed = time.time() - start_time
 
             # 检测模型回显（返回了题目而非 JSON），避免把 prompt 当结果展示
             if self._is_response_likely_echo(response_text):
                 logger.warning("[LLM返回] 检测到模型回显题目，重试一次...")
-                response_text = self._call_api_with_retry(prompt, generation_config)
+                response_text = self._call_api_with_retry(prompt, generation_config, on_partial)
                 if self._is_response_likely_echo(response_text):
                     raise ValueError("模型返回了题目内容而非 JSON，请稍后重试")
 
-            # 记录响应信息
-            logger.info(f"[LLM返回] {api_provider} API 响应成功, 耗时 {elapsed:.2f}s, 响应长度 {len(response_text)} 字符")
-            
-            # 记录响应预览（INFO级别）和完整响应（DEBUG级别）
-            response_preview = response_text[:300] + "..." if len(response_text) > 300 else response_text
-            logger.info(f"[LLM返回 预览]\n{response_preview}")
-            logger.debug(f"=== {api_provider} 完整响应 ({len(response_text)}字符) ===\n{response_text}\n=== End Response ===")
-            
-            # 解析响应
-            result = self._parse_response(response_text, code, name)
-            result.raw_response = response_text
-            result.search_performed = bool(news_context)
+            result = self._build_result(response_text, code, name, news_context, elapsed)
+            self._attach_usage(result, prompt, response_text)
+            return result
             
-            logger.info(f"[LLM解析] {name}({code}) 分析完成: {result.trend_prediction}, 评分 {result.sentiment_score}")
+        except Exception as e:
+            return self._error_result(code, name, e)
+    
+    async def analyze_async(
+        self,
+        context: Union[Dict[str, Any], 'AnalysisContext'],
+        news_context: Optional[Union[str, NewsDigest]] = None
+    ) -> AnalysisResult:
+        """
+        分析单只股票（asyncio 版本，供异步流水线使用）
+        
+        与 analyze 流程一致，但 API 调用使用 AsyncOpenAI / generate_content_async，
+        不占用线程；调用方 asyncio.wait_for 超时会真正取消进行中的 HTTP 请求。
+        """
+        if hasattr(context, 'to_prompt_context'):
+            context = context.to_prompt_context()
+        code = context.get('code', 'Unknown')
+        config = get_config()
+        
+        request_delay = config.gemini_request_delay
+        if request_delay > 0:
+            logger.debug(f"[LLM] 请求前等待 {request_delay:.1f} 秒...")
+            await asyncio.sleep(request_delay)
+        
+        name = self._resolve_stock_name(context, code)
+        
+        if not self.is_available():
+            return self._unavailable_result(code, name)
+        
+        try:
+            prompt, generation_config = self._prepare_request(context, code, name, news_context)
+            _llm_usage.set(self._new_usage())
             
+            start_time = time.time()
+            response_text = await self._call_api_with_retry_async(prompt, generation_config)
+            elapsed = time.time() - start_time
+
+            if self._is_response_likely_echo(response_text):
+                logger.warning("[LLM返回] 检测到模型回显题目，重试一次...")
+                response_text = await self._call_api_with_retry_async(prompt, generation_config)
+                if self._is_response_likely_echo(response_text):
+                    raise ValueError("模型返回了题目内容而非 JSON，请稍后重试")
+
+            result = self._build_result(response_text, code, name, news_context, elapsed)
+            self._attach_usage(result, prompt, response_text)
             return result
             
         except Exception as e:
-            logger.error(f"AI 分析 {name}({code}) 失败: {e}")
-            return AnalysisResult(
-                code=code,
-                name=name,
-                sentiment_score=50,
-                trend_prediction='震荡',
-                operation_advice='持有',
-                confidence_level='低',
-                analysis_summary=f'分析过程出错: {str(e)[:100]}',
-                risk_warning='分析失败，请稍后重试或手动分析',
-                success=False,
-                error_message=str(e),
-            )
+            return self._error_result(code, name, e)
+    
+    @staticmethod
+    def _new_usage() -> Dict[str, int]:
+        return {'prompt_tokens': 0, 'completion_tokens': 0, 'calls': 0, 'cached': 0}
+    
+    def _attach_usage(self, result: AnalysisResult, prompt: str, response_text: str) -> None:
+        """
+        记录单只股票的 token 用量
+        
+        优先使用接口返回的统计；流式响应等无统计时按文本估算；缓存命中不消耗 token
+        """
+        usage = _llm_usage.get() or self._new_usage()
+        if usage['calls']:
+            result.prompt_tokens = usage['prompt_tokens']
+            result.completion_tokens = usage['completion_tokens']
+            source = "接口统计"
+        elif usage['cached']:
+            source = "缓存命中"
+        else:
+            result.prompt_tokens = estimate_tokens(self.SYSTEM_PROMPT) + estimate_tokens(prompt)
+            result.completion_tokens = estimate_tokens(response_text)
+            source = "估算"
+        logger.info(
+            f"[LLM用量] {result.name}({result.code}) 输入 {result.prompt_tokens} tokens，"
+            f"输出 {result.completion_tokens} tokens（{source}）"
+        )
+    
+    @staticmethod
+    def _resolve_stock_name(context: Dict[str, Any], code: str) -> str:
+        """优先从上下文获取股票名称（由 main.py 传入），其次实时行情，最后映射表"""
+        name = context.get('stock_name')
+        if not name or name.startswith('股票'):
+            # 备选：从 realtime 中获取
+            if 'realtime' in context and context['realtime'].get('name'):
+                name = context['realtime']['name']
+            else:
+                # 最后从映射表获取
+                name = STOCK_NAME_MAP.get(code, f'股票{code}')
+        return name
+    
+    @staticmethod
+    def _unavailable_result(code: str, name: str) -> AnalysisResult:
+        """模型不可用时的默认结果"""
+        return AnalysisResult(
+            code=code,
+            name=name,
+            sentiment_score=50,
+            trend_prediction='震荡',
+            operation_advice='持有',
+            confidence_level='低',
+            analysis_summary='AI 分析功能未启用（未配置 API Key）',
+            risk_warning='请配置 Gemini API Key 后重试',
+            success=False,
+            error_message='Gemini API Key 未配置',
+        )
+    
+    def _prepare_request(
+        self,
+        context: Dict[str, Any],
+        code: str,
+        name: str,
+        news_context: Optional[Union[str, NewsDigest]],
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        格式化提示词并生成请求配置
+        
+        Returns:
+            (prompt, generation_config)
+        """
+        # 格式化输入（包含技术面数据和新闻）
+        prompt = self._format_prompt(context, name, news_context)
+        
+        # 获取模型名称
+        model_name = getattr(self, '_current_model_name', None)
+        if not model_name:
+            model_name = getattr(self._model, '_model_name', 'unknown')
+            if hasattr(self._model, 'model_name'):
+                model_name = self._model.model_name
+        
+        logger.info(f"========== AI 分析 {name}({code}) ==========")
+        logger.info(f"[LLM配置] 模型: {model_name}")
+        logger.info(f"[LLM配置] Prompt 长度: {len(prompt)} 字符，约 {estimate_tokens(prompt)} tokens")
+        logger.info(f"[LLM配置] 是否包含新闻: {'是' if news_context else '否'}")
+        
+        # 记录完整 prompt 到日志（INFO级别记录摘要，DEBUG记录完整）
+        prompt_preview = prompt[:500] + "..." if len(prompt) > 500 else prompt
+        logger.info(f"[LLM Prompt 预览]\n{prompt_preview}")
+        logger.debug(f"=== 完整 Prompt ({len(prompt)}字符) ===\n{prompt}\n=== End Prompt ===")
+
+        # 设置生成配置（从配置文件读取温度参数）
+        config = get_config()
+        generation_config = {
+            "temperature": config.gemini_temperature,
+            "max_output_tokens": SINGLE_OUTPUT_TOKENS,
+        }
+
+        # 根据实际使用的 API 显示日志
+        api_provider = "OpenAI" if self._use_openai else "Gemini"
+        logger.info(f"[LLM调用] 开始调用 {api_provider} API...")
+        logger.info("[LLM调用] 正在生成决策仪表盘，预计需 1–2 分钟，请勿关闭...")
+        return prompt, generation_config
+    
+    def _build_result(
+        self,
+        response_text: str,
+        code: str,
+        name: str,
+        news_context: Optional[Union[str, NewsDigest]],
+        elapsed: float,
+    ) -> AnalysisResult:
+        """记录响应并解析为 AnalysisResult"""
+        api_provider = "OpenAI" if self._use_openai else "Gemini"
+        # 记录响应信息
+        logger.info(f"[LLM返回] {api_provider} API 响应成功, 耗时 {elapsed:.2f}s, 响应长度 {len(response_text)} 字符")
+        
+        # 记录响应预览（INFO级别）和完整响应（DEBUG级别）
+        response_preview = response_text[:300] + "..." if len(response_text) > 300 else response_text
+        logger.info(f"[LLM返回 预览]\n{response_preview}")
+        logger.debug(f"=== {api_provider} 完整响应 ({len(response_text)}字符) ===\n{response_text}\n=== End Response ===")
+        
+        # 解析响应
+        result = self._parse_response(response_text, code, name)
+        result.raw_response = response_text
+        result.search_performed = bool(news_context)
+        
+        logger.info(f"[LLM解析] {name}({code}) 分析完成: {result.trend_prediction}, 评分 {result.sentiment_score}")
+        return result
+    
+    @staticmethod
+    def _error_result(code: str, name: str, error: Exception) -> AnalysisResult:
+        """分析失败时的默认结果"""
+        logger.error(f"AI 分析 {name}({code}) 失败: {error}")
+        return AnalysisResult(
+            code=code,
+            name=name,
+            sentiment_score=50,
+            trend_prediction='震荡',
+            operation_advice='持有',
+            confidence_level='低',
+            analysis_summary=f'分析过程出错: {str(error)[:100]}',
+            risk_warning='分析失败，请稍后重试或手动分析',
+            success=False,
+            error_message=str(error),
+        )
     
     def _format_prompt(
         self, 
         context: Dict[str, Any], 
         name: str,
-        news_context: Optional[str] = None
+        news_context: Optional[Union[str, NewsDigest]] = None
     ) -> str:
         """
         格式化分析提示词（决策仪表盘 v2.0）
@@ -1012,7 +1676,7 @@ class GeminiAnalyzer:
         Args:
             context: 技术面数据上下文（包含增强数据）
             name: 股票名称（默认值，可能被上下文覆盖）
-            news_context: 预先搜索的新闻内容
+            news_context: 预先搜索的新闻内容（NewsDigest 或文本）
         """
         code = context.get('code', 'Unknown')
         
@@ -1123,34 +1787,10 @@ class GeminiAnalyzer:
 - 价格较昨日变化：{context.get('price_change_ratio', 'N/A')}%
 """
         
-        # 添加新闻搜索结果（重点区域）
-        prompt += """
----
-
-## 📰 舆情情报
-"""
-        if news_context:
-            # 限制舆情长度，避免 prompt 过长导致超时或模型只回显题目
-            max_news_len = 6000
-            news_for_prompt = news_context if len(news_context) <= max_news_len else news_context[:max_news_len] + "\n...(已截断)"
-            prompt += f"""
-以下是 **{stock_name}({code})** 近7日的新闻搜索结果，请重点提取：
-1. 🚨 **风险警报**：减持、处罚、利空
-2. 🎯 **利好催化**：业绩、合同、政策
-3. 📊 **业绩预期**：年报预告、业绩快报
-
-```
-{news_for_prompt}
-```
-"""
-        else:
-            prompt += """
-未搜索到该股票近期的相关新闻。请主要依据技术面数据进行分析。
-"""
-
         # 注入缺失数据警告
+        tail = ""
         if context.get('data_missing'):
-            prompt += """
+            tail += """
 ⚠️ **数据缺失警告**
 由于接口限制，当前无法获取完整的实时行情和技术指标数据。
 请 **忽略上述表格中的 N/A 数据**，重点依据 **【📰 舆情情报】** 中的新闻进行基本面和情绪面分析。
@@ -1158,7 +1798,7 @@ class GeminiAnalyzer:
 """
         
         # 明确的输出要求
-        prompt += f"""
+        tail += f"""
 ---
 
 ## ✅ 分析任务
@@ -1185,7 +1825,45 @@ class GeminiAnalyzer:
 ### ⚠️ 输出格式（必须严格遵守）
 你的回复必须且仅为一个 JSON 对象：以 `{{` 开头、以 `}}` 结尾。不要重复题目，不要输出「以下是」「请重点提取」等任何非 JSON 前缀。直接输出 JSON。"""
         
-        return prompt
+        # 添加新闻搜索结果（重点区域）
+        news_intro = f"""
+---
+
+## 📰 舆情情报
+
+以下是 **{stock_name}({code})** 近7日的新闻搜索结果，请重点提取：
+1. 🚨 **风险警报**：减持、处罚、利空
+2. 🎯 **利好催化**：业绩、合同、政策
+3. 📊 **业绩预期**：年报预告、业绩快报
+
+```
+"""
+        # 舆情去重排序；配置了 token 预算时依次压缩表格、删除低价值章节、裁剪舆情
+        digest = NewsDigest.coerce(news_context)
+        prompt, news_for_prompt, budget_report = fit_prompt(
+            prompt, digest,
+            fixed_tokens=estimate_tokens(news_intro) + estimate_tokens(tail),
+            budget=get_config().llm_prompt_token_budget,
+        )
+        if budget_report.actions or budget_report.news_duplicates:
+            logger.info(f"[Prompt预算] {stock_name}({code}) {budget_report.describe()}")
+        
+        if news_for_prompt:
+            # 限制舆情长度，避免 prompt 过长导致超时或模型只回显题目
+            max_news_len = 6000
+            if len(news_for_prompt) > max_news_len:
+                news_for_prompt = news_for_prompt[:max_news_len] + "\n...(已截断)"
+            prompt += f"{news_intro}{news_for_prompt}\n```\n"
+        else:
+            prompt += """
+---
+
+## 📰 舆情情报
+
+未搜索到该股票近期的相关新闻。请主要依据技术面数据进行分析。
+"""
+        
+        return prompt + tail
     
     def _format_volume(self, volume: Optional[float]) -> str:
         """格式化成交量显示"""
@@ -1396,33 +2074,261 @@ class GeminiAnalyzer:
         )
     
     def batch_analyze(
-        self, 
-        contexts: List[Dict[str, Any]],
-        delay_between: float = 2.0
+        self,
+        contexts: List[Union[Dict[str, Any], 'AnalysisContext']],
+        delay_between: float = 2.0,
+        news_contexts: Optional[List[Optional[Union[str, NewsDigest]]]] = None,
+        batch_size: Optional[int] = None,
     ) -> List[AnalysisResult]:
         """
         批量分析多只股票
         
-        注意：为避免 API 速率限制，每次分析之间会有延迟
+        batch_size（默认 LLM_BATCH_SIZE）> 1 时启用合并请求：每批股票的精简上下文打包为一次请求，
+        要求模型返回 JSON 数组，再逐只经 _parse_response 还原为 AnalysisResult；
+        批量响应无法解析的股票自动二分拆批重试，单只时退回 analyze()。
+        否则逐只调用 analyze()。
+        
+        注意：为避免 API 速率限制，每次请求之间会有延迟
         
         Args:
             contexts: 上下文数据列表
-            delay_between: 每次分析之间的延迟（秒）
+            delay_between: 每次请求之间的延迟（秒）
+            news_contexts: 与 contexts 一一对应的舆情内容（可选）
+            batch_size: 每次请求包含的股票数（可选）
             
         Returns:
-            AnalysisResult 列表
+            AnalysisResult 列表（与 contexts 顺序一致）
         """
+        if news_contexts is None:
+            news_contexts = [None] * len(contexts)
+        if batch_size is None:
+            batch_size = get_config().llm_batch_size
+        
         results = []
         
-        for i, context in enumerate(contexts):
-            if i > 0:
+        if batch_size <= 1 or not self.is_available():
+            for i, (context, news_context) in enumerate(zip(contexts, news_contexts)):
+                if i > 0:
+                    logger.debug(f"等待 {delay_between} 秒后继续...")
+                    time.sleep(delay_between)
+                
+                result = self.analyze(context, news_context=news_context)
+                results.append(result)
+            
+            return results
+        
+        items = []
+        for context, news_context in zip(contexts, news_contexts):
+            if hasattr(context, 'to_prompt_context'):
+                context = context.to_prompt_context()
+            code = context.get('code', 'Unknown')
+            items.append((context, code, self._resolve_stock_name(context, code), news_context))
+        
+        for start in range(0, len(items), batch_size):
+            if start > 0:
                 logger.debug(f"等待 {delay_between} 秒后继续...")
                 time.sleep(delay_between)
-            
-            result = self.analyze(context)
-            results.append(result)
+            results.extend(self._analyze_chunk(items[start:start + batch_size]))
         
         return results
+    
+    def _analyze_chunk(self, items: List[Tuple[Dict[str, Any], str, str, Optional[str]]]) -> List[AnalysisResult]:
+        """
+        合并请求分析一批股票
+        
+        响应中缺失或无法解析的股票：全部缺失时二分拆批，部分缺失时只对缺失部分再请求一次，
+        单只股票走 analyze() 原有流程
+        
+        Args:
+            items: (上下文, 股票代码, 股票名称, 舆情) 列表
+        """
+        if len(items) == 1:
+            context, _, _, news_context = items[0]
+            return [self.analyze(context, news_context=news_context)]
+        
+        codes = [code for _, code, _, _ in items]
+        parsed: Dict[str, str] = {}
+        prompt = ""
+        usage = self._new_usage()
+        _llm_usage.set(usage)
+        start_time = time.time()
+        try:
+            prompt, generation_config = self._prepare_batch_request(items)
+            response_text = self._call_api_with_retry(prompt, generation_config, json_array=True)
+            parsed = self._split_batch_response(response_text, codes)
+        except Exception as e:
+            logger.warning(f"[LLM批量] {len(items)} 只股票合并请求失败: {e}")
+        elapsed = time.time() - start_time
+        if usage['calls']:
+            logger.info(
+                f"[LLM用量] 合并请求 {len(items)} 只：输入 {usage['prompt_tokens']} tokens，"
+                f"输出 {usage['completion_tokens']} tokens"
+            )
+        
+        results: Dict[int, AnalysisResult] = {}
+        missing = []
+        for idx, (_, code, name, news_context) in enumerate(items):
+            item_text = parsed.get(code)
+            if item_text is None:
+                missing.append(idx)
+            else:
+                result = self._build_result(item_text, code, name, news_context, elapsed)
+                # 合并请求的用量按股票数均摊；无接口统计时输入均摊估算、输出按本只文本估算
+                if usage['calls']:
+                    result.prompt_tokens = usage['prompt_tokens'] // len(items)
+                    result.completion_tokens = usage['completion_tokens'] // len(items)
+                elif not usage['cached']:
+                    result.prompt_tokens = (estimate_tokens(self.SYSTEM_PROMPT) + estimate_tokens(prompt)) // len(items)
+                    result.completion_tokens = estimate_tokens(item_text)
+                results[idx] = result
+        
+        if missing:
+            if len(missing) == len(items):
+                mid = len(items) // 2
+                logger.warning(f"[LLM批量] 批量响应无法解析，拆分为 {mid} + {len(items) - mid} 只重试")
+                return self._analyze_chunk(items[:mid]) + self._analyze_chunk(items[mid:])
+            logger.warning(f"[LLM批量] 响应缺少 {[codes[i] for i in missing]}，单独重试")
+            for idx, result in zip(missing, self._analyze_chunk([items[i] for i in missing])):
+                results[idx] = result
+        
+        return [results[idx] for idx in range(len(items))]
+    
+    def _prepare_batch_request(
+        self,
+        items: List[Tuple[Dict[str, Any], str, str, Optional[str]]],
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        生成合并请求的提示词与生成配置
+        
+        Returns:
+            (prompt, generation_config)
+        """
+        config = get_config()
+        sections = [
+            self._format_batch_item(index, context, name, news_context)
+            for index, (context, _, name, news_context) in enumerate(items, 1)
+        ]
+        codes = "、".join(code for _, code, _, _ in items)
+        prompt = "# 决策仪表盘批量分析请求\n\n" + "\n".join(sections) + f"""
+---
+
+## ✅ 分析任务
+
+请分别为以上 {len(items)} 只股票（{codes}）生成【决策仪表盘】。
+
+### 重点关注（每只股票都必须明确回答）：
+1. ❓ 是否满足 MA5>MA10>MA20 多头排列？
+2. ❓ 当前乖离率是否在安全范围内（<5%）？—— 超过5%必须标注"严禁追高"
+3. ❓ 量能是否配合（缩量回调/放量突破）？
+4. ❓ 消息面有无重大利空？（减持、处罚、业绩变脸等）
+
+### ⚠️ 输出格式（必须严格遵守）
+你的回复必须且仅为一个 JSON 数组：以 `[` 开头、以 `]` 结尾，按上方顺序每只股票一个元素。
+每个元素是与单只分析格式完全相同的决策仪表盘 JSON 对象，并且必须额外包含 `"stock_code"` 字段（6 位股票代码）。
+不要重复题目，不要输出任何非 JSON 内容。"""
+        
+        generation_config = {
+            "temperature": config.gemini_temperature,
+            "max_output_tokens": min(SINGLE_OUTPUT_TOKENS * len(items), self._batch_output_cap()),
+            "response_mime_type": "application/json",
+        }
+        
+        api_provider = "OpenAI" if self._use_openai else "Gemini"
+        logger.info(f"========== AI 批量分析 {codes} ==========")
+        logger.info(f"[LLM调用] 开始调用 {api_provider} API（{len(items)} 只合并请求，Prompt 长度 {len(prompt)} 字符）...")
+        logger.debug(f"=== 完整批量 Prompt ({len(prompt)}字符) ===\n{prompt}\n=== End Prompt ===")
+        return prompt, generation_config
+    
+    def _batch_output_cap(self) -> int:
+        """合并请求的输出 token 上限：LLM_BATCH_MAX_OUTPUT_TOKENS 显式配置优先，否则取当前模型的上限"""
+        configured = get_config().llm_batch_max_output_tokens
+        if configured > 0:
+            return configured
+        return model_max_output_tokens(self._current_model_name)
+    
+    def _format_batch_item(
+        self,
+        index: int,
+        context: Dict[str, Any],
+        name: str,
+        news_context: Optional[Union[str, NewsDigest]],
+    ) -> str:
+        """单只股票的精简上下文（批量请求用，只保留判断所需的关键数值）"""
+        code = context.get('code', 'Unknown')
+        today = context.get('today', {})
+        lines = [
+            f"## [{index}] {name}({code})  分析日期 {context.get('date', '未知')}",
+            f"- 行情：收 {today.get('close', 'N/A')} 开 {today.get('open', 'N/A')} "
+            f"高 {today.get('high', 'N/A')} 低 {today.get('low', 'N/A')} 涨跌 {today.get('pct_chg', 'N/A')}% "
+            f"量 {self._format_volume(today.get('volume'))} 额 {self._format_amount(today.get('amount'))}",
+            f"- 均线：MA5 {today.get('ma5', 'N/A')} / MA10 {today.get('ma10', 'N/A')} / "
+            f"MA20 {today.get('ma20', 'N/A')}，{context.get('ma_status', '未知')}",
+        ]
+        if 'realtime' in context:
+            rt = context['realtime']
+            lines.append(
+                f"- 实时：现价 {rt.get('price', 'N/A')} 量比 {rt.get('volume_ratio', 'N/A')} "
+                f"换手 {rt.get('turnover_rate', 'N/A')}% PE {rt.get('pe_ratio', 'N/A')} PB {rt.get('pb_ratio', 'N/A')} "
+                f"流通市值 {self._format_amount(rt.get('circ_mv'))} 60日 {rt.get('change_60d', 'N/A')}%"
+            )
+        if 'chip' in context:
+            chip = context['chip']
+            lines.append(
+                f"- 筹码：获利比例 {chip.get('profit_ratio', 0):.1%} 平均成本 {chip.get('avg_cost', 'N/A')} "
+                f"90%集中度 {chip.get('concentration_90', 0):.2%} {chip.get('chip_status', '')}"
+            )
+        if 'trend_analysis' in context:
+            trend = context['trend_analysis']
+            lines.append(
+                f"- 趋势：{trend.get('trend_status', '未知')}，乖离率(MA5) {trend.get('bias_ma5', 0):+.2f}%，"
+                f"{trend.get('volume_status', '未知')}，系统信号 {trend.get('buy_signal', '未知')}，"
+                f"评分 {trend.get('signal_score', 0)}/100"
+            )
+            if trend.get('signal_reasons'):
+                lines.append(f"- 买入理由：{'；'.join(trend['signal_reasons'])}")
+            if trend.get('risk_factors'):
+                lines.append(f"- 风险因素：{'；'.join(trend['risk_factors'])}")
+        if context.get('data_missing'):
+            lines.append("- ⚠️ 行情数据缺失：技术面问题请直接说明无法判断，严禁编造数据")
+        
+        if news_context:
+            # 按优先级保留头部情报
+            news = NewsDigest.coerce(news_context).render(max_tokens=1200)
+            lines.append(f"- 舆情（近7日）：\n```\n{news}\n```")
+        else:
+            lines.append("- 舆情：无近期相关新闻，主要依据技术面分析")
+        return "\n".join(lines) + "\n"
+    
+    def _split_batch_response(self, response_text: str, codes: List[str]) -> Dict[str, str]:
+        """
+        拆分批量响应为 股票代码 → 单只 JSON 文本
+        
+        按元素中的 stock_code（或 code）匹配；元素均无代码且数量一致时按顺序匹配。
+        无法解析时返回空字典
+        """
+        cleaned_text = response_text.replace('```json', '').replace('```', '')
+        json_start = cleaned_text.find('[')
+        json_end = cleaned_text.rfind(']') + 1
+        if json_start < 0 or json_end <= json_start:
+            logger.warning("[LLM批量] 响应中没有 JSON 数组")
+            return {}
+        try:
+            items = json.loads(self._fix_json_string(cleaned_text[json_start:json_end]))
+        except json.JSONDecodeError as e:
+            logger.warning(f"[LLM批量] JSON 数组解析失败: {e}")
+            return {}
+        if not isinstance(items, list):
+            return {}
+        
+        items = [item for item in items if isinstance(item, dict)]
+        parsed: Dict[str, str] = {}
+        for item in items:
+            item_code = str(item.get('stock_code') or item.get('code') or '').strip()
+            if item_code in codes and item_code not in parsed:
+                parsed[item_code] = json.dumps(item, ensure_ascii=False)
+        if not parsed and len(items) == len(codes):
+            parsed = {code: json.dumps(item, ensure_ascii=False) for code, item in zip(codes, items)}
+        return parsed
 
 
 # 便捷函数
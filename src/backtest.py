@@ -0,0 +1,436 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+趋势信号离线回测
+===================================
+
+职责：
+1. 用已入库的日线构建指标面板，StockTrendAnalyzer.score_panel 一次算出每只股票每个交易日的评分/信号
+2. 按交易日逐日撮合（跨股票向量化）：收盘出信号，次日开盘成交
+3. 模拟 A 股交易约束：T+1、一字涨停开盘买不进、跌停开盘卖不出、停牌不可交易、100 股整数倍、佣金与印花税
+4. 输出收益率、年化收益、最大回撤、交易胜率，以及信号 N 日后的命中率
+5. 参数扫描（BIAS_THRESHOLD、均线周期）：指标按均线组合缓存，交易日对齐只做一次
+
+全程使用二维 NumPy 数组，逐日循环内不构造 DataFrame。
+"""
+
+import copy
+import logging
+import math
+from dataclasses import dataclass, field
+from itertools import product
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.indicators import IndicatorPanel, PanelIndicators, compute_indicators
+from src.stock_analyzer import BuySignal, PanelSignals, StockTrendAnalyzer
+
+logger = logging.getLogger(__name__)
+
+
+# 每年交易日数（年化用）
+TRADING_DAYS_PER_YEAR = 252
+# 20% 涨跌幅限制的板块前缀（创业板、科创板），其余按 10%
+WIDE_LIMIT_PREFIXES = ('300', '301', '688', '689')
+
+
+@dataclass
+class BacktestConfig:
+    """回测参数"""
+    initial_cash: float = 1_000_000.0
+    max_positions: int = 10               # 最大同时持仓数（等权分配）
+    max_hold_days: int = 20               # 最长持有交易日数，到期次日开盘卖出
+    lot_size: int = 100                   # 每手股数
+    commission_rate: float = 0.0003       # 佣金（双向）
+    min_commission: float = 5.0           # 最低佣金（元）
+    stamp_tax_rate: float = 0.0005        # 印花税（仅卖出）
+    entry_signals: Tuple[BuySignal, ...] = (BuySignal.STRONG_BUY, BuySignal.BUY)
+    exit_signals: Tuple[BuySignal, ...] = (BuySignal.SELL, BuySignal.STRONG_SELL)
+    forward_days: int = 5                 # 信号命中率的观察周期（交易日）
+
+
+@dataclass
+class Trade:
+    """一笔已平仓交易"""
+    code: str
+    entry_date: np.datetime64
+    exit_date: np.datetime64
+    entry_price: float
+    exit_price: float
+    shares: int
+    pnl: float                            # 扣除费用后的盈亏（元）
+    return_pct: float                     # 扣除费用后的收益率（%）
+    hold_days: int
+
+
+@dataclass
+class BacktestReport:
+    """回测结果"""
+    params: Dict[str, Any]
+    start_date: Optional[np.datetime64]
+    end_date: Optional[np.datetime64]
+    total_return: float = 0.0             # 总收益率（%）
+    annual_return: float = 0.0            # 年化收益率（%）
+    max_drawdown: float = 0.0             # 最大回撤（%）
+    trade_count: int = 0                  # 已平仓交易数
+    win_rate: float = 0.0                 # 盈利交易占比（%）
+    avg_trade_return: float = 0.0         # 平均每笔收益率（%）
+    open_positions: int = 0               # 回测结束时仍持有的股票数
+    signal_count: int = 0                 # 买入信号数
+    signal_hit_rate: float = 0.0          # 信号次日开盘买入、N 日后收盘上涨的比例（%）
+    signal_avg_return: float = 0.0        # 信号 N 日平均收益率（%）
+    blocked_buys: int = 0                 # 因涨停/停牌未成交的买单
+    blocked_sells: int = 0                # 因跌停/停牌顺延的卖单
+    equity: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    dates: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype='datetime64[D]'))
+    trades: List[Trade] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """汇总指标（不含净值序列与逐笔交易）"""
+        return {
+            'params': self.params,
+            'start_date': str(self.start_date) if self.start_date is not None else None,
+            'end_date': str(self.end_date) if self.end_date is not None else None,
+            'total_return': round(self.total_return, 2),
+            'annual_return': round(self.annual_return, 2),
+            'max_drawdown': round(self.max_drawdown, 2),
+            'trade_count': self.trade_count,
+            'win_rate': round(self.win_rate, 1),
+            'avg_trade_return': round(self.avg_trade_return, 2),
+            'open_positions': self.open_positions,
+            'signal_count': self.signal_count,
+            'signal_hit_rate': round(self.signal_hit_rate, 1),
+            'signal_avg_return': round(self.signal_avg_return, 2),
+            'blocked_buys': self.blocked_buys,
+            'blocked_sells': self.blocked_sells,
+        }
+
+    def summary(self) -> str:
+        """单行摘要（日志输出用）"""
+        return (
+            f"{self.params} 区间 {self.start_date}~{self.end_date} | "
+            f"收益 {self.total_return:.2f}% 年化 {self.annual_return:.2f}% 最大回撤 {self.max_drawdown:.2f}% | "
+            f"交易 {self.trade_count} 笔 胜率 {self.win_rate:.1f}% 平均 {self.avg_trade_return:.2f}% | "
+            f"信号 {self.signal_count} 个 {self.signal_hit_rate:.1f}% 命中"
+        )
+
+
+@dataclass
+class _MarketGrid:
+    """对齐到统一交易日历的行情（形状 (n_codes, n_days)，停牌/未上市位置为 NaN）"""
+    codes: List[str]
+    dates: np.ndarray                     # datetime64[D]，升序
+    rows: np.ndarray                      # 面板中有效 bar 的行下标
+    cols: np.ndarray                      # 面板中有效 bar 的列下标
+    grid_cols: np.ndarray                 # 有效 bar 在日历中的列下标
+    open: np.ndarray                      # 成交价（开盘价，缺失时用收盘价）
+    close: np.ndarray
+    mark: np.ndarray                      # 估值价（收盘价向前填充，停牌按最近收盘估值）
+    limit_up: np.ndarray                  # 开盘即涨停（买不进）
+    limit_down: np.ndarray                # 开盘即跌停（卖不出）
+
+    def scatter(self, values: np.ndarray, fill: Any) -> np.ndarray:
+        """把面板（按 bar 右对齐）数组映射到交易日历"""
+        out = np.full((len(self.codes), len(self.dates)), fill, dtype=values.dtype)
+        out[self.rows, self.grid_cols] = values[self.rows, self.cols]
+        return out
+
+
+def _price_limit(code: str) -> float:
+    """涨跌幅限制比例（未区分 ST 5% 与新股上市首日）"""
+    return 0.2 if code.startswith(WIDE_LIMIT_PREFIXES) else 0.1
+
+
+def _shift_right(values: np.ndarray, k: int = 1) -> np.ndarray:
+    out = np.full(values.shape, np.nan)
+    out[:, k:] = values[:, :-k]
+    return out
+
+
+def _shift_left(values: np.ndarray, k: int) -> np.ndarray:
+    out = np.full(values.shape, np.nan)
+    out[:, :-k] = values[:, k:]
+    return out
+
+
+class Backtester:
+    """
+    趋势信号回测器
+
+    使用方式：
+        panel = load_backtest_panel(codes, days=750)
+        backtester = Backtester(BacktestConfig(max_positions=5))
+        report = backtester.run(panel)
+        reports = backtester.run_grid(panel, bias_thresholds=[3, 5, 8], ma_periods=[(5, 10, 20), (10, 20, 60)])
+    """
+
+    def __init__(self, config: Optional[BacktestConfig] = None, trend_analyzer: Optional[StockTrendAnalyzer] = None):
+        self.config = config or BacktestConfig()
+        self.trend_analyzer = trend_analyzer or StockTrendAnalyzer()
+
+    # === 数据准备 ===
+
+    def align(self, panel: IndicatorPanel) -> _MarketGrid:
+        """把各股票的 bar 对齐到全部股票交易日的并集上，并预先算出涨跌停开盘标记"""
+        if panel.dates is None:
+            raise ValueError("回测需要带交易日的指标面板（日线需包含 date 列）")
+        valid = ~np.isnat(panel.dates) & ~np.isnan(panel.close)
+        rows, cols = np.nonzero(valid)
+        calendar = np.unique(panel.dates[rows, cols])
+        grid_cols = np.searchsorted(calendar, panel.dates[rows, cols])
+
+        fill_price = panel.close if panel.open is None else np.where(np.isnan(panel.open), panel.close, panel.open)
+        prev_close = _shift_right(panel.close)
+        limits = np.array([_price_limit(code) for code in panel.codes])[:, None]
+        # 涨跌停价按交易所规则四舍五入到分
+        with np.errstate(invalid='ignore'):
+            up_price = np.round(prev_close * (1 + limits), 2)
+            down_price = np.round(prev_close * (1 - limits), 2)
+            limit_up = fill_price >= up_price - 1e-6
+            limit_down = fill_price <= down_price + 1e-6
+
+        grid = _MarketGrid(
+            codes=list(panel.codes),
+            dates=calendar,
+            rows=rows,
+            cols=cols,
+            grid_cols=grid_cols,
+            open=np.zeros(0),
+            close=np.zeros(0),
+            mark=np.zeros(0),
+            limit_up=np.zeros(0),
+            limit_down=np.zeros(0),
+        )
+        grid.open = grid.scatter(fill_price, np.nan)
+        grid.close = grid.scatter(panel.close, np.nan)
+        grid.limit_up = grid.scatter(limit_up, False)
+        grid.limit_down = grid.scatter(limit_down, False)
+
+        # 收盘价向前填充（停牌期间按停牌前收盘价估值）
+        close = grid.close
+        has_bar = ~np.isnan(close)
+        last_index = np.where(has_bar, np.arange(close.shape[1]), 0)
+        np.maximum.accumulate(last_index, axis=1, out=last_index)
+        grid.mark = np.take_along_axis(close, last_index, axis=1)
+        return grid
+
+    # === 回测 ===
+
+    def run(
+        self,
+        panel: IndicatorPanel,
+        ind: Optional[PanelIndicators] = None,
+        ma_periods: Tuple[int, int, int] = (5, 10, 20),
+        trend_analyzer: Optional[StockTrendAnalyzer] = None,
+        grid: Optional[_MarketGrid] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> BacktestReport:
+        """
+        单组参数回测
+
+        Args:
+            panel: 指标面板（需包含 dates，建议包含 open）
+            ind: 已计算的指标（可选，参数扫描时复用）
+            ma_periods: 短/中/长期均线周期
+            trend_analyzer: 覆盖了规则参数的分析器（可选）
+            grid: 已对齐的行情（可选，参数扫描时复用）
+            params: 写入报告的参数描述
+
+        Returns:
+            BacktestReport
+        """
+        analyzer = trend_analyzer or self.trend_analyzer
+        grid = grid or self.align(panel)
+        params = params or {'bias_threshold': analyzer.BIAS_THRESHOLD, 'ma_periods': tuple(ma_periods)}
+        signals = analyzer.score_panel(panel, ind=ind, ma_periods=ma_periods)
+
+        report = self._simulate(grid, signals, params)
+        hits = self._signal_stats(panel, signals)
+        report.signal_count = int(hits.size)
+        if hits.size:
+            report.signal_hit_rate = float((hits > 0).mean() * 100)
+            report.signal_avg_return = float(hits.mean() * 100)
+        return report
+
+    def run_grid(
+        self,
+        panel: IndicatorPanel,
+        bias_thresholds: Iterable[float] = (StockTrendAnalyzer.BIAS_THRESHOLD,),
+        ma_periods: Iterable[Sequence[int]] = ((5, 10, 20),),
+    ) -> List[BacktestReport]:
+        """
+        参数网格扫描
+
+        同一均线组合的指标只计算一次，交易日对齐与涨跌停标记在所有组合间共享
+
+        Returns:
+            BacktestReport 列表（按总收益率降序）
+        """
+        grid = self.align(panel)
+        indicators: Dict[Tuple[int, ...], PanelIndicators] = {}
+        reports = []
+        for bias, periods in product(bias_thresholds, ma_periods):
+            periods = tuple(periods)
+            if periods not in indicators:
+                indicators[periods] = compute_indicators(panel, ma_windows=periods)
+            analyzer = copy.copy(self.trend_analyzer)
+            analyzer.BIAS_THRESHOLD = float(bias)
+            report = self.run(
+                panel,
+                ind=indicators[periods],
+                ma_periods=periods,
+                trend_analyzer=analyzer,
+                grid=grid,
+                params={'bias_threshold': float(bias), 'ma_periods': periods},
+            )
+            logger.info(f"[回测] {report.summary()}")
+            reports.append(report)
+        reports.sort(key=lambda r: r.total_return, reverse=True)
+        return reports
+
+    def _signal_stats(self, panel: IndicatorPanel, signals: PanelSignals) -> np.ndarray:
+        """买入信号的 N 日收益：次日开盘买入，第 N 个交易日收盘估值（按各股票自身 bar 计算，停牌日不计）"""
+        cfg = self.config
+        entry = signals.signal_mask(*cfg.entry_signals)
+        fill_price = panel.close if panel.open is None else np.where(np.isnan(panel.open), panel.close, panel.open)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            forward = _shift_left(panel.close, cfg.forward_days) / _shift_left(fill_price, 1) - 1
+        values = forward[entry]
+        return values[np.isfinite(values)]
+
+    def _commission(self, value: float) -> float:
+        return max(value * self.config.commission_rate, self.config.min_commission)
+
+    def _simulate(self, grid: _MarketGrid, signals: PanelSignals, params: Dict[str, Any]) -> BacktestReport:
+        """
+        逐交易日撮合（每日内跨股票向量化）
+
+        第 t 日收盘产生的买卖决定在第 t+1 日开盘执行；
+        买单当日未能成交即作废，卖单顺延到可成交为止
+        """
+        cfg = self.config
+        n_codes, n_days = grid.close.shape
+        report = BacktestReport(
+            params=params,
+            start_date=grid.dates[0] if n_days else None,
+            end_date=grid.dates[-1] if n_days else None,
+            dates=grid.dates,
+        )
+        if n_days == 0:
+            return report
+
+        score = grid.scatter(signals.score.astype(np.float64), np.nan)
+        entry_mask = grid.scatter(signals.signal_mask(*cfg.entry_signals), False)
+        exit_mask = grid.scatter(signals.signal_mask(*cfg.exit_signals), False)
+        tradable = ~np.isnan(grid.open)
+
+        cash = cfg.initial_cash
+        shares = np.zeros(n_codes, dtype=np.int64)
+        cost = np.zeros(n_codes)                  # 含买入佣金的成本
+        entry_price = np.zeros(n_codes)
+        entry_day = np.full(n_codes, -1, dtype=np.int64)
+        pending_sell = np.zeros(n_codes, dtype=bool)
+        pending_buy: List[int] = []
+        equity = np.empty(n_days)
+
+        for t in range(n_days):
+            # --- 开盘：先卖后买 ---
+            sell_now = pending_sell & tradable[:, t] & ~grid.limit_down[:, t] & (entry_day < t)
+            report.blocked_sells += int(np.count_nonzero(pending_sell & ~sell_now))
+            for i in np.flatnonzero(sell_now):
+                price = grid.open[i, t]
+                value = shares[i] * price
+                proceeds = value - self._commission(value) - value * cfg.stamp_tax_rate
+                cash += proceeds
+                pnl = proceeds - cost[i]
+                report.trades.append(Trade(
+                    code=grid.codes[i],
+                    entry_date=grid.dates[entry_day[i]],
+                    exit_date=grid.dates[t],
+                    entry_price=float(entry_price[i]),
+                    exit_price=float(price),
+                    shares=int(shares[i]),
+                    pnl=float(pnl),
+                    return_pct=float(pnl / cost[i] * 100),
+                    hold_days=int(t - entry_day[i]),
+                ))
+                shares[i] = 0
+                pending_sell[i] = False
+                entry_day[i] = -1
+
+            if pending_buy:
+                held_value = float(np.dot(shares, np.nan_to_num(grid.mark[:, t - 1])))
+                slot_value = (cash + held_value) / cfg.max_positions
+                for i in pending_buy:
+                    if np.count_nonzero(shares) >= cfg.max_positions:
+                        break
+                    if not tradable[i, t] or grid.limit_up[i, t]:
+                        report.blocked_buys += 1
+                        continue
+                    price = grid.open[i, t]
+                    budget = min(slot_value, cash)
+                    lots = math.floor(budget / (price * (1 + cfg.commission_rate)) / cfg.lot_size)
+                    if lots <= 0:
+                        continue
+                    value = lots * cfg.lot_size * price
+                    fee = self._commission(value)
+                    if value + fee > cash:
+                        lots -= 1
+                        if lots <= 0:
+                            continue
+                        value = lots * cfg.lot_size * price
+                        fee = self._commission(value)
+                    cash -= value + fee
+                    shares[i] = lots * cfg.lot_size
+                    cost[i] = value + fee
+                    entry_price[i] = price
+                    entry_day[i] = t
+                pending_buy = []
+
+            # --- 收盘：估值并生成次日订单 ---
+            held = shares > 0
+            equity[t] = cash + float(np.dot(shares, np.nan_to_num(grid.mark[:, t])))
+
+            # T+1：当日买入的持仓最早次日卖出（卖单在次日开盘执行，天然满足）
+            hold_expired = held & (t - entry_day >= cfg.max_hold_days)
+            pending_sell |= held & (exit_mask[:, t] | hold_expired)
+
+            free_slots = cfg.max_positions - int(np.count_nonzero(held & ~pending_sell))
+            if free_slots > 0:
+                candidates = np.flatnonzero(entry_mask[:, t] & ~held)
+                if candidates.size:
+                    order = np.argsort(-score[candidates, t], kind='stable')
+                    pending_buy = candidates[order[:free_slots]].tolist()
+
+        report.equity = equity
+        report.open_positions = int(np.count_nonzero(shares))
+        report.total_return = float((equity[-1] / cfg.initial_cash - 1) * 100)
+        years = n_days / TRADING_DAYS_PER_YEAR
+        if equity[-1] > 0 and years > 0:
+            report.annual_return = float(((equity[-1] / cfg.initial_cash) ** (1 / years) - 1) * 100)
+        peak = np.maximum.accumulate(equity)
+        report.max_drawdown = float(np.max(1 - equity / peak) * 100)
+        report.trade_count = len(report.trades)
+        if report.trades:
+            returns = np.array([trade.return_pct for trade in report.trades])
+            report.win_rate = float((returns > 0).mean() * 100)
+            report.avg_trade_return = float(returns.mean())
+        return report
+
+
+def load_backtest_panel(codes: List[str], days: int = 750, db=None) -> IndicatorPanel:
+    """
+    从数据库读取多只股票最近 N 个交易日的日线，构建回测面板
+
+    启用列式存储时直接由内存映射的列数组构建（DatabaseManager.get_history_panel）
+
+    Args:
+        codes: 股票代码列表
+        days: 每只股票的交易日数量
+        db: DatabaseManager（可选，默认全局实例）
+    """
+    if db is None:
+        from src.storage import get_db
+        db = get_db()
+    return db.get_history_panel(codes, days=days)
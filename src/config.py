@@ -65,11 +65,41 @@ class Config:
     openai_model: str = "gpt-4o-mini"  # OpenAI 兼容模型名称
     openai_temperature: float = 0.7  # OpenAI 温度参数（0.0-2.0，默认0.7）
 
+    # LLM 响应缓存（提示词/模型/温度完全相同时直接返回已有响应，不消耗 token）
+    llm_cache_enabled: bool = False
+    llm_cache_path: str = "./data/llm_cache.db"
+    llm_cache_ttl: int = 43200  # 有效期（秒）
+    llm_cache_max_entries: int = 2000  # 最多保留条目数，超出按最近访问时间淘汰
+
+    # LLM 合并请求：每次请求打包的股票数（1 表示逐只请求）
+    llm_batch_size: int = 1
+    llm_batch_max_output_tokens: int = 0  # 合并请求的输出 token 上限（0 表示按模型自动取值）
+
+    # LLM 流式响应：边接收边解析，回显/非 JSON 提前终止，并向 Web 任务推送部分结果
+    llm_streaming_enabled: bool = False
+
+    # 单只分析提示词的 token 预算（0 表示不限制）：超出时压缩表格、删除低价值章节、裁剪舆情
+    llm_prompt_token_budget: int = 0
+
     # === 搜索引擎配置（支持多 Key 负载均衡）===
     bocha_api_keys: List[str] = field(default_factory=list)  # Bocha API Keys
     tavily_api_keys: List[str] = field(default_factory=list)  # Tavily API Keys
     serpapi_keys: List[str] = field(default_factory=list)  # SerpAPI Keys
 
+    # 搜索结果缓存（引擎/规范化查询/时间范围相同时直接返回已有结果，不消耗搜索额度）
+    search_cache_enabled: bool = False
+    search_cache_path: str = "./data/search_cache.db"
+    search_cache_ttl: int = 1800  # 默认有效期（秒），情报维度使用各自的有效期
+    search_cache_max_entries: int = 5000  # 最多保留条目数，超出按最近访问时间淘汰
+
+    search_provider_concurrency: int = 2  # 单个搜索引擎同时进行的请求数上限（多维度情报搜索并发时共享）
+    # 单个 API Key 的令牌桶限速（所有流水线线程共享）：每分钟请求数上限与突发请求数
+    search_key_rate_per_minute: float = 30.0
+    search_key_burst: int = 5
+    # 批量情报：每 N 只股票合并为一次主题搜索，再按名称/代码分配文章；未匹配的股票仍逐只搜索
+    search_batch_enabled: bool = False
+    search_batch_group_size: int = 5
+
     # === 通知配置（可同时配置多个，全部推送）===
 
     # 企业微信 Webhook
@@ -147,6 +177,12 @@ class Config:
 
     # === 系统配置 ===
     max_workers: int = 3  # 低并发防封禁
+    # 异步流水线（asyncio，--async 或 ASYNC_PIPELINE_ENABLED=true 启用）各阶段并发上限
+    async_pipeline_enabled: bool = False
+    async_fetch_concurrency: int = 3     # 数据获取/上下文构建（同步数据源库，在有界线程池中执行）
+    async_search_concurrency: int = 8    # 同时进行情报搜索的股票数
+    async_llm_concurrency: int = 3       # 同时进行的 LLM 请求数
+    async_notify_concurrency: int = 4    # 同时进行的推送数
     debug: bool = False
     http_proxy: Optional[str] = None  # HTTP 代理 (例如: http://127.0.0.1:10809)
     https_proxy: Optional[str] = None # HTTPS 代理
@@ -172,12 +208,56 @@ class Config:
     realtime_source_priority: str = "tencent,akshare_sina,efinance,akshare_em"
     # 实时行情缓存时间（秒）
     realtime_cache_ttl: int = 600
+    # 全量行情缓存分数据源 TTL（秒），格式 "efinance:600,akshare_em:1200,akshare_etf:1200"
+    # 未列出的数据源使用各 Fetcher 的默认值
+    realtime_cache_ttls: str = ""
+    # 缓存过期后仍可返回旧数据的时长（秒），期间后台单飞刷新（stale-while-revalidate）
+    realtime_cache_stale_ttl: int = 300
     # 熔断器冷却时间（秒）
     circuit_breaker_cooldown: int = 300
 
+    # 按数据源健康记分板（近期成功率、延迟）动态调整数据源尝试顺序
+    adaptive_source_order: bool = True
+
+    # === 日线对冲请求（hedged request）===
+    # 开启后，高优先级数据源超过对冲延迟仍未返回时并行请求下一个数据源，取先返回的有效结果
+    daily_hedge_enabled: bool = False
+    # 默认对冲延迟（秒），数据源样本不足时使用
+    daily_hedge_delay: float = 3.0
+    # 自适应对冲延迟取该数据源成功耗时的分位数
+    daily_hedge_quantile: float = 0.95
+
+    # === 本地持久化缓存（跨进程共享）===
+    # 开启后实时行情快照、股票名称表、近期日线写入本地 SQLite 文件，
+    # 同一台机器上的 main.py / webui.py / 机器人进程共享一次上游拉取
+    local_cache_enabled: bool = False
+    local_cache_path: str = "./data/local_cache.db"
+    # 近期日线缓存有效期（秒）
+    local_cache_daily_ttl: int = 1800
+    # 股票名称缓存有效期（秒）
+    local_cache_names_ttl: int = 86400
+
     # Discord 机器人状态
     discord_bot_status: str = "A股智能分析 | /help"
 
+    # === 趋势分析配置 ===
+    # 趋势分析使用的历史交易日数（需覆盖 MA60 与 MACD 预热，首次同步也按此窗口拉取）
+    trend_history_days: int = 120
+    # 盘中（最新交易日日线尚未入库时）以实时报价作为当日 K 线，基于增量指标状态重新评分
+    intraday_rescore_enabled: bool = False
+
+    # === 列式历史存储（stock_daily 的 Arrow IPC 镜像，按 代码/年份 分区，依赖 pyarrow）===
+    history_store_enabled: bool = False
+    history_store_path: str = "./data/history"
+
+    # === 全市场筛选配置（--screen）===
+    # 进入 AI 分析的股票数
+    screen_top_n: int = 10
+    # 快照初筛后保留的股票数（按成交额从高到低，需同步其日线）
+    screen_prefilter_limit: int = 300
+    # 当日最低成交额（元）
+    screen_min_amount: float = 1e8
+
     # === 流控配置（防封禁关键参数）===
     # Akshare 请求间隔范围（秒）
     akshare_sleep_min: float = 2.0
@@ -414,9 +494,26 @@ class Config:
             openai_base_url=os.getenv('OPENAI_BASE_URL'),
             openai_model=os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
             openai_temperature=float(os.getenv('OPENAI_TEMPERATURE', '0.7')),
+            llm_cache_enabled=os.getenv('LLM_CACHE_ENABLED', 'false').lower() == 'true',
+            llm_cache_path=os.getenv('LLM_CACHE_PATH', './data/llm_cache.db'),
+            llm_cache_ttl=int(os.getenv('LLM_CACHE_TTL', '43200')),
+            llm_cache_max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', '2000')),
+            llm_batch_size=max(1, int(os.getenv('LLM_BATCH_SIZE', '1'))),
+            llm_batch_max_output_tokens=int(os.getenv('LLM_BATCH_MAX_OUTPUT_TOKENS', '0')),
+            llm_streaming_enabled=os.getenv('LLM_STREAMING_ENABLED', 'false').lower() == 'true',
+            llm_prompt_token_budget=int(os.getenv('LLM_PROMPT_TOKEN_BUDGET', '0')),
             bocha_api_keys=bocha_api_keys,
             tavily_api_keys=tavily_api_keys,
             serpapi_keys=serpapi_keys,
+            search_cache_enabled=os.getenv('SEARCH_CACHE_ENABLED', 'false').lower() == 'true',
+            search_cache_path=os.getenv('SEARCH_CACHE_PATH', './data/search_cache.db'),
+            search_cache_ttl=int(os.getenv('SEARCH_CACHE_TTL', '1800')),
+            search_cache_max_entries=int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', '5000')),
+            search_provider_concurrency=int(os.getenv('SEARCH_PROVIDER_CONCURRENCY', '2')),
+            search_key_rate_per_minute=float(os.getenv('SEARCH_KEY_RATE_PER_MINUTE', '30')),
+            search_key_burst=max(1, int(os.getenv('SEARCH_KEY_BURST', '5'))),
+            search_batch_enabled=os.getenv('SEARCH_BATCH_ENABLED', 'false').lower() == 'true',
+            search_batch_group_size=max(1, int(os.getenv('SEARCH_BATCH_GROUP_SIZE', '5'))),
             wechat_webhook_url=os.getenv('WECHAT_WEBHOOK_URL'),
             feishu_webhook_url=os.getenv('FEISHU_WEBHOOK_URL'),
             telegram_bot_token=os.getenv('TELEGRAM_BOT_TOKEN'),
@@ -454,6 +551,11 @@ class Config:
             log_dir=os.getenv('LOG_DIR', './logs'),
             log_level=os.getenv('LOG_LEVEL', 'INFO'),
             max_workers=int(os.getenv('MAX_WORKERS', '3')),
+            async_pipeline_enabled=os.getenv('ASYNC_PIPELINE_ENABLED', 'false').lower() == 'true',
+            async_fetch_concurrency=int(os.getenv('ASYNC_FETCH_CONCURRENCY', '3')),
+            async_search_concurrency=int(os.getenv('ASYNC_SEARCH_CONCURRENCY', '8')),
+            async_llm_concurrency=int(os.getenv('ASYNC_LLM_CONCURRENCY', '3')),
+            async_notify_concurrency=int(os.getenv('ASYNC_NOTIFY_CONCURRENCY', '4')),
             debug=os.getenv('DEBUG', 'false').lower() == 'true',
             http_proxy=os.getenv('HTTP_PROXY'),
             https_proxy=os.getenv('HTTPS_PROXY'),
@@ -518,7 +620,25 @@ class Config:
             # - tushare: Tushare Pro，需要2000积分，数据全面
             realtime_source_priority=os.getenv('REALTIME_SOURCE_PRIORITY', 'tencent,akshare_sina,efinance,akshare_em'),
             realtime_cache_ttl=int(os.getenv('REALTIME_CACHE_TTL', '600')),
+            realtime_cache_ttls=os.getenv('REALTIME_CACHE_TTLS', ''),
+            realtime_cache_stale_ttl=int(os.getenv('REALTIME_CACHE_STALE_TTL', '300')),
+            adaptive_source_order=os.getenv('ADAPTIVE_SOURCE_ORDER', 'true').lower() == 'true',
+            daily_hedge_enabled=os.getenv('DAILY_HEDGE_ENABLED', 'false').lower() == 'true',
+            daily_hedge_delay=float(os.getenv('DAILY_HEDGE_DELAY', '3.0')),
+            daily_hedge_quantile=float(os.getenv('DAILY_HEDGE_QUANTILE', '0.95')),
+            local_cache_enabled=os.getenv('LOCAL_CACHE_ENABLED', 'false').lower() == 'true',
+            local_cache_path=os.getenv('LOCAL_CACHE_PATH', './data/local_cache.db'),
+            local_cache_daily_ttl=int(os.getenv('LOCAL_CACHE_DAILY_TTL', '1800')),
+            local_cache_names_ttl=int(os.getenv('LOCAL_CACHE_NAMES_TTL', '86400')),
             circuit_breaker_cooldown=int(os.getenv('CIRCUIT_BREAKER_COOLDOWN', '300')),
+            # 趋势分析配置
+            trend_history_days=int(os.getenv('TREND_HISTORY_DAYS', '120')),
+            intraday_rescore_enabled=os.getenv('INTRADAY_RESCORE_ENABLED', 'false').lower() == 'true',
+            history_store_enabled=os.getenv('HISTORY_STORE_ENABLED', 'false').lower() == 'true',
+            history_store_path=os.getenv('HISTORY_STORE_PATH', './data/history'),
+            screen_top_n=int(os.getenv('SCREEN_TOP_N', '10')),
+            screen_prefilter_limit=int(os.getenv('SCREEN_PREFILTER_LIMIT', '300')),
+            screen_min_amount=float(os.getenv('SCREEN_MIN_AMOUNT', '1e8')),
             # 自动交易 / 国信 iQuant
             trading_enabled=os.getenv('TRADING_ENABLED', 'false').lower() == 'true',
             auto_trade_dry_run=os.getenv('AUTO_TRADE_DRY_RUN', 'true').lower() == 'true',
@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+A股自选股智能分析系统 - 异步分析流水线
+===================================
+
+职责：
+1. 以 asyncio 协程调度每只股票的 获取数据 → 情报搜索 → AI 分析 → 单股推送
+2. 每个阶段使用独立的信号量限制并发（ASYNC_*_CONCURRENCY）
+3. 超时通过 asyncio.wait_for 取消进行中的请求，而不是遗留卡住的线程
+
+与 StockAnalysisPipeline 的区别：
+- 同步流水线每只股票占用 1 个工作线程，并在情报搜索/LLM 调用处再嵌套单线程池，
+  500 只股票需要成百上千个线程，超时的线程只能被丢弃
+- 异步流水线中搜索（博查 httpx）、LLM（AsyncOpenAI / generate_content_async）、
+  自定义 Webhook 推送为原生异步请求；同步数据源库（akshare/efinance 等）与
+  仅提供同步 SDK 的搜索/推送渠道在大小固定的线程池中执行，
+  线程数上限 = 数据获取并发 + 情报搜索并发 + 推送并发，不随股票数量增长
+
+与同步流水线一致支持批量情报预取（SEARCH_BATCH_ENABLED）与合并请求（LLM_BATCH_SIZE > 1，
+批量请求在线程池中调用 batch_analyze）；流式输出（LLM_STREAMING_ENABLED）仅用于
+Web 任务的部分结果回调，异步流水线不支持，启动时记录日志并使用非流式请求
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from src.analyzer import AnalysisResult
+from src.config import Config
+from src.core.context import AnalysisContext
+from src.core.pipeline import StockAnalysisPipeline, INTEL_SEARCH_TIMEOUT
+from src.enums import ReportType
+from src.prompt_budget import NewsDigest
+from bot.models import BotMessage
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncStockAnalysisPipeline(StockAnalysisPipeline):
+    """
+    基于 asyncio 的股票分析流水线
+
+    复用 StockAnalysisPipeline 的数据获取、上下文构建、报告生成与收尾逻辑，
+    run() 签名与同步版本一致，可直接替换。
+    """
+
+    def __init__(
+        self,
+        config: Optional[Config] = None,
+        max_workers: Optional[int] = None,
+        source_message: Optional[BotMessage] = None
+    ):
+        """
+        初始化异步调度器
+
+        Args:
+            config: 配置对象（可选，默认使用全局配置）
+            max_workers: 数据获取并发数（可选，默认 ASYNC_FETCH_CONCURRENCY）
+            source_message: 触发本次分析的机器人消息（可选）
+        """
+        super().__init__(config=config, max_workers=max_workers, source_message=source_message)
+        self.fetch_concurrency = max(1, max_workers or self.config.async_fetch_concurrency)
+        self.search_concurrency = max(1, self.config.async_search_concurrency)
+        self.llm_concurrency = max(1, self.config.async_llm_concurrency)
+        self.notify_concurrency = max(1, self.config.async_notify_concurrency)
+        logger.info(
+            f"异步流水线并发上限: 数据获取={self.fetch_concurrency}, 情报搜索={self.search_concurrency}, "
+            f"LLM={self.llm_concurrency}, 推送={self.notify_concurrency}"
+        )
+        if self.config.llm_streaming_enabled:
+            logger.info("异步流水线不支持 LLM_STREAMING_ENABLED，AI 分析使用非流式请求")
+
+    def run(
+        self,
+        stock_codes: Optional[List[str]] = None,
+        dry_run: bool = False,
+        send_notification: bool = True
+    ) -> List[AnalysisResult]:
+        """运行完整的分析流程（在新的事件循环中执行 run_async）"""
+        return asyncio.run(self._run_in_own_loop(stock_codes, dry_run, send_notification))
+
+    async def _run_in_own_loop(
+        self,
+        stock_codes: Optional[List[str]],
+        dry_run: bool,
+        send_notification: bool,
+    ) -> List[AnalysisResult]:
+        """
+        为 run() 创建的事件循环安装固定大小的默认线程池
+
+        同步数据源库与 SDK 调用（asyncio.to_thread）共用该线程池，线程数不随股票数量增长；
+        事件循环结束时由 asyncio.run 关闭线程池
+        """
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(
+            max_workers=self.fetch_concurrency + self.search_concurrency + self.notify_concurrency,
+            thread_name_prefix="async_pipeline",
+        ))
+        return await self.run_async(stock_codes, dry_run, send_notification)
+
+    async def run_async(
+        self,
+        stock_codes: Optional[List[str]] = None,
+        dry_run: bool = False,
+        send_notification: bool = True
+    ) -> List[AnalysisResult]:
+        """
+        运行完整的分析流程（asyncio 版本）
+
+        Args:
+            stock_codes: 股票代码列表（可选，默认使用配置中的自选股）
+            dry_run: 是否仅获取数据不分析
+            send_notification: 是否发送推送通知
+
+        Returns:
+            分析结果列表
+        """
+        start_time = time.time()
+
+        stock_codes = self._resolve_stock_codes(stock_codes)
+        if not stock_codes:
+            return []
+
+        logger.info(f"===== 开始分析 {len(stock_codes)} 只股票（异步流水线）=====")
+        logger.info(f"股票列表: {', '.join(stock_codes)}")
+        logger.info(f"模式: {'仅获取数据' if dry_run else '完整分析'}")
+
+        self._fetch_sem = asyncio.Semaphore(self.fetch_concurrency)
+        self._search_sem = asyncio.Semaphore(self.search_concurrency)
+        self._llm_sem = asyncio.Semaphore(self.llm_concurrency)
+        self._notify_sem = asyncio.Semaphore(self.notify_concurrency)
+
+        await asyncio.to_thread(self._prefetch_realtime_quotes, stock_codes)
+        if not dry_run:
+            await asyncio.to_thread(self._prefetch_batched_intel, stock_codes)
+
+        single_stock_notify, report_type, analysis_delay = self._run_options()
+
+        # 合并请求模式：数据与情报按股票并发准备，AI 分析按批打包
+        if not dry_run and self.config.llm_batch_size > 1:
+            results = await self._run_batched_async(
+                stock_codes, single_stock_notify and send_notification, report_type
+            )
+            await asyncio.to_thread(
+                self._finish_run, stock_codes, results, start_time, dry_run, send_notification, single_stock_notify
+            )
+            return results
+
+        outcomes = await asyncio.gather(*(
+            self.process_single_stock_async(
+                code,
+                skip_analysis=dry_run,
+                single_stock_notify=single_stock_notify and send_notification,
+                report_type=report_type,
+                analysis_delay=analysis_delay,
+            )
+            for code in stock_codes
+        ))
+        results = [r for r in outcomes if r]
+
+        await asyncio.to_thread(
+            self._finish_run, stock_codes, results, start_time, dry_run, send_notification, single_stock_notify
+        )
+        return results
+
+    async def process_single_stock_async(
+        self,
+        code: str,
+        skip_analysis: bool = False,
+        single_stock_notify: bool = False,
+        report_type: ReportType = ReportType.SIMPLE,
+        analysis_delay: float = 0,
+    ) -> Optional[AnalysisResult]:
+        """
+        处理单只股票的完整流程（asyncio 版本）
+
+        各阶段分别占用对应信号量，某只股票在等待 LLM 时不占用数据获取名额
+
+        Returns:
+            AnalysisResult 或 None
+        """
+        logger.info(f"========== 开始处理 {code} ==========")
+        try:
+            # Step 1: 获取并保存数据、构建分析上下文（同步数据源库，在线程池中执行）
+            async with self._fetch_sem:
+                ctx = await asyncio.to_thread(self._prepare_stock, code, skip_analysis)
+            if skip_analysis:
+                logger.info(f"[{code}] 跳过 AI 分析（dry-run 模式）")
+                return None
+
+            # Step 2: 多维度情报搜索
+            news_context = await self._search_intel_async(ctx)
+
+            # Step 3: AI 分析
+            if not ctx.has_history:
+                logger.warning(f"[{code}] 无法获取历史行情数据，将仅基于新闻和实时行情分析")
+            result = await self._analyze_async(ctx, news_context, analysis_delay)
+            if not result:
+                return None
+            logger.info(f"[{code}] 分析完成: {result.operation_advice}, 评分 {result.sentiment_score}")
+
+            # Step 4: 单股推送（#55）
+            if single_stock_notify:
+                await self._notify_single_stock_async(result, report_type)
+
+            return result
+
+        except Exception as e:
+            # 捕获所有异常，确保单股失败不影响整体
+            logger.exception(f"[{code}] 处理过程发生未知异常: {e}")
+            return None
+
+    async def _run_batched_async(
+        self,
+        stock_codes: List[str],
+        single_stock_notify: bool,
+        report_type: ReportType,
+    ) -> List[AnalysisResult]:
+        """
+        合并请求模式（LLM_BATCH_SIZE > 1，asyncio 版本）
+
+        数据获取与情报搜索按股票并发完成后，在线程池中调用 batch_analyze 按批请求
+
+        Returns:
+            分析结果列表（按 stock_codes 顺序）
+        """
+        async def prepare(code: str) -> Optional[AnalysisContext]:
+            try:
+                async with self._fetch_sem:
+                    ctx = await asyncio.to_thread(self._prepare_stock, code, False)
+                news_contexts[code] = await self._search_intel_async(ctx)
+                if not ctx.has_history:
+                    logger.warning(f"[{code}] 无法获取历史行情数据，将仅基于新闻和实时行情分析")
+                return ctx
+            except Exception as e:
+                logger.error(f"[{code}] 分析准备失败: {e}")
+                return None
+
+        news_contexts: Dict[str, Optional[NewsDigest]] = {}
+        contexts = [ctx for ctx in await asyncio.gather(*(prepare(code) for code in stock_codes)) if ctx]
+
+        logger.info(f"[LLM批量] {len(contexts)} 只股票按每批 {self.config.llm_batch_size} 只合并请求")
+        analysis_results = await asyncio.to_thread(
+            self.analyzer.batch_analyze,
+            [self._enhance_context(ctx) for ctx in contexts],
+            delay_between=self.config.gemini_request_delay,
+            news_contexts=[news_contexts.get(ctx.code) for ctx in contexts],
+            batch_size=self.config.llm_batch_size,
+        )
+
+        results = [result for result in analysis_results if result]
+        for result in results:
+            logger.info(f"[{result.code}] 分析完成: {result.operation_advice}, 评分 {result.sentiment_score}")
+        if single_stock_notify:
+            await asyncio.gather(*(self._notify_single_stock_async(result, report_type) for result in results))
+        return results
+
+    async def _notify_single_stock_async(self, result: AnalysisResult, report_type: ReportType) -> None:
+        """单股推送（#55，asyncio 版本）"""
+        if not self.notifier.is_available():
+            return
+        code = result.code
+        async with self._notify_sem:
+            try:
+                report_content = self._build_single_stock_report(result, report_type)
+                if await self.notifier.send_async(report_content):
+                    logger.info(f"[{code}] 单股推送成功")
+                else:
+                    logger.warning(f"[{code}] 单股推送失败")
+            except Exception as e:
+                logger.error(f"[{code}] 单股推送异常: {e}")
+
+    def _prepare_stock(self, code: str, skip_analysis: bool) -> Optional[AnalysisContext]:
+        """获取并保存数据，非 dry-run 时构建分析上下文（在工作线程中执行）"""
+        with self.db.track_queries() as query_counter:
+            success, error = self.fetch_and_save_stock_data(code)
+            if not success:
+                logger.warning(f"[{code}] 数据获取失败: {error}")
+                # 即使获取失败，也尝试用已有数据分析
+            ctx = None if skip_analysis else self.build_analysis_context(code)
+        self.db_query_counts[code] = query_counter.count
+        logger.debug(f"[{code}] 数据库查询 {query_counter.count} 次")
+        return ctx
+
+    async def _search_intel_async(self, ctx: AnalysisContext) -> Optional[NewsDigest]:
+        """
+        多维度情报搜索，总超时 INTEL_SEARCH_TIMEOUT 秒，超时取消未完成的请求
+
+        批量主题搜索（SEARCH_BATCH_ENABLED）已预取的股票直接使用预取结果
+        """
+        code, stock_name = ctx.code, ctx.stock_name
+        news_context = self.prefetched_intel.get(code)
+        if news_context is not None:
+            logger.info(f"[{code}] 使用批量主题搜索预取的情报")
+            return news_context
+        if not self.search_service.is_available:
+            logger.info(f"[{code}] 搜索服务不可用，跳过情报搜索")
+            return None
+
+        async with self._search_sem:
+            logger.info(f"[{code}] 开始多维度情报搜索（超时 {INTEL_SEARCH_TIMEOUT}s）...")
+            try:
+                intel_results = await asyncio.wait_for(
+                    self.search_service.search_comprehensive_intel_async(
+                        stock_code=code,
+                        stock_name=stock_name,
+                        max_searches=3,
+                    ),
+                    timeout=INTEL_SEARCH_TIMEOUT,
+                )
+            except asyncio.TimeoutError:
+                logger.warning(f"[{code}] 情报搜索总超时({INTEL_SEARCH_TIMEOUT}s)，已取消，跳过舆情数据继续分析")
+                return None
+            except Exception as e:
+                logger.warning(f"[{code}] 情报搜索异常: {e}，跳过舆情数据，继续分析")
+                return None
+
+        if not intel_results:
+            logger.info(f"[{code}] 无舆情数据，将仅基于技术面与实时行情分析")
+            return None
+        news_context = self.search_service.build_intel_digest(intel_results, stock_name)
+        total_results = sum(len(r.results) for r in intel_results.values() if r.success)
+        logger.info(f"[{code}] 情报搜索完成: 共 {total_results} 条结果")
+        logger.debug(f"[{code}] 情报搜索结果:\n{news_context}")
+        return news_context
+
+    async def _analyze_async(
+        self,
+        ctx: AnalysisContext,
+        news_context: Optional[NewsDigest],
+        analysis_delay: float,
+    ) -> Optional[AnalysisResult]:
+        """
+        调用 AI 分析，超时取消进行中的请求
+
+        Issue #128: analysis_delay 在释放 LLM 名额前等待，用于控制请求节奏
+        """
+        code = ctx.code
+        # 略大于 analyzer 内单次请求超时
+        analyze_timeout = getattr(self.config, 'llm_request_timeout', 120) + 30
+        enhanced_context = self._enhance_context(ctx)
+
+        async with self._llm_sem:
+            logger.info(f"[{code}] 开始调用 AI 生成分析报告（超时 {analyze_timeout}s 将取消并跳过）...")
+            try:
+                return await asyncio.wait_for(
+                    self.analyzer.analyze_async(enhanced_context, news_context=news_context),
+                    timeout=analyze_timeout,
+                )
+            except asyncio.TimeoutError:
+                logger.error(f"[{code}] AI 分析超时({analyze_timeout}s)，已取消请求，本股跳过继续执行")
+                return None
+            finally:
+                if analysis_delay > 0:
+                    await asyncio.sleep(analysis_delay)
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+A股自选股智能分析系统 - 单股分析上下文
+===================================
+
+职责：
+1. 每只股票每次运行只构建一次分析上下文
+2. 汇总日线历史窗口、实时行情、筹码分布、趋势分析结果
+3. 生成 GeminiAnalyzer 所需的提示词上下文字典，避免重复查询数据库
+"""
+
+import math
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from data_provider.realtime_types import ChipDistribution
+from src.stock_analyzer import TrendAnalysisResult
+from src.storage import DatabaseManager
+
+
+def describe_volume_ratio(volume_ratio: float) -> str:
+    """
+    量比描述
+
+    量比 = 当前成交量 / 过去5日平均成交量
+    """
+    if volume_ratio < 0.5:
+        return "极度萎缩"
+    elif volume_ratio < 0.8:
+        return "明显萎缩"
+    elif volume_ratio < 1.2:
+        return "正常"
+    elif volume_ratio < 2.0:
+        return "温和放量"
+    elif volume_ratio < 3.0:
+        return "明显放量"
+    else:
+        return "巨量"
+
+
+@dataclass
+class AnalysisContext:
+    """
+    单只股票的分析上下文（每次运行构建一次）
+
+    由 StockAnalysisPipeline.analyze_stock 逐步填充，
+    _enhance_context 与 GeminiAnalyzer.analyze 直接消费，不再二次查询数据库
+    """
+    code: str
+    stock_name: str = ""
+
+    # 日线历史窗口列数组（按日期升序，来自 DatabaseManager.get_history_arrays）
+    history: Optional[Dict[str, np.ndarray]] = None
+
+    # 实时行情（UnifiedRealtimeQuote 或 None）
+    realtime_quote: Any = None
+
+    # 筹码分布
+    chip_data: Optional[ChipDistribution] = None
+
+    # 趋势分析结果
+    trend_result: Optional[TrendAnalysisResult] = None
+
+    @property
+    def has_history(self) -> bool:
+        """是否有可用的日线数据"""
+        return self.history is not None and len(self.history['date']) > 0
+
+    def recent_rows(self, n: int = 2) -> List[Dict[str, Any]]:
+        """
+        最近 N 条日线记录（按日期降序），格式与 StockDaily.to_dict() 一致
+        """
+        if not self.has_history:
+            return []
+        rows = []
+        total = len(self.history['date'])
+        for i in range(total - 1, max(total - n, 0) - 1, -1):
+            row = {'code': self.code}
+            for key, values in self.history.items():
+                value = values[i]
+                if key == 'date':
+                    value = pd.Timestamp(value).date()
+                else:
+                    value = float(value)
+                    if math.isnan(value):
+                        value = None
+                row[key] = value
+            rows.append(row)
+        return rows
+
+    def base_context(self) -> Dict[str, Any]:
+        """
+        技术面基础上下文（今日数据 + 昨日对比）
+
+        无历史数据时返回带 data_missing 标记的上下文，由提示词注入缺失数据警告
+        """
+        rows = self.recent_rows(2)
+        if not rows:
+            return {
+                'code': self.code,
+                'stock_name': self.stock_name,
+                'date': date.today().isoformat(),
+                'data_missing': True,
+                'today': {},
+                'yesterday': {},
+            }
+        return DatabaseManager.build_analysis_context(self.code, rows)
+
+    def to_prompt_context(self) -> Dict[str, Any]:
+        """
+        生成提示词上下文字典
+
+        将实时行情、筹码分布、趋势分析结果、股票名称添加到技术面基础上下文中
+        """
+        enhanced = self.base_context()
+        realtime_quote = self.realtime_quote
+
+        # 添加股票名称
+        if self.stock_name:
+            enhanced['stock_name'] = self.stock_name
+        elif realtime_quote and getattr(realtime_quote, 'name', None):
+            enhanced['stock_name'] = realtime_quote.name
+
+        # 添加实时行情（兼容不同数据源的字段差异）
+        if realtime_quote:
+            # 使用 getattr 安全获取字段，缺失字段返回 None 或默认值
+            volume_ratio = getattr(realtime_quote, 'volume_ratio', None)
+            realtime = {
+                'name': getattr(realtime_quote, 'name', ''),
+                'price': getattr(realtime_quote, 'price', None),
+                'volume_ratio': volume_ratio,
+                'volume_ratio_desc': describe_volume_ratio(volume_ratio) if volume_ratio else '无数据',
+                'turnover_rate': getattr(realtime_quote, 'turnover_rate', None),
+                'pe_ratio': getattr(realtime_quote, 'pe_ratio', None),
+                'pb_ratio': getattr(realtime_quote, 'pb_ratio', None),
+                'total_mv': getattr(realtime_quote, 'total_mv', None),
+                'circ_mv': getattr(realtime_quote, 'circ_mv', None),
+                'change_60d': getattr(realtime_quote, 'change_60d', None),
+                'source': getattr(realtime_quote, 'source', None),
+            }
+            # 移除 None 值以减少上下文大小
+            enhanced['realtime'] = {k: v for k, v in realtime.items() if v is not None}
+
+        # 添加筹码分布
+        chip_data = self.chip_data
+        if chip_data:
+            current_price = getattr(realtime_quote, 'price', 0) if realtime_quote else 0
+            enhanced['chip'] = {
+                'profit_ratio': chip_data.profit_ratio,
+                'avg_cost': chip_data.avg_cost,
+                'concentration_90': chip_data.concentration_90,
+                'concentration_70': chip_data.concentration_70,
+                'chip_status': chip_data.get_chip_status(current_price or 0),
+            }
+
+        # 添加趋势分析结果
+        trend_result = self.trend_result
+        if trend_result:
+            enhanced['trend_analysis'] = {
+                'trend_status': trend_result.trend_status.value,
+                'ma_alignment': trend_result.ma_alignment,
+                'trend_strength': trend_result.trend_strength,
+                'bias_ma5': trend_result.bias_ma5,
+                'bias_ma10': trend_result.bias_ma10,
+                'volume_status': trend_result.volume_status.value,
+                'volume_trend': trend_result.volume_trend,
+                'buy_signal': trend_result.buy_signal.value,
+                'signal_score': trend_result.signal_score,
+                'signal_reasons': trend_result.signal_reasons,
+                'risk_factors': trend_result.risk_factors,
+            }
+
+        return enhanced
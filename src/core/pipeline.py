@@ -14,23 +14,42 @@ A股自选股智能分析系统 - 核心分析流水线
 import logging
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
-from datetime import date
-from typing import List, Dict, Any, Optional, Tuple
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
 
 from src.config import get_config, Config
 from src.storage import get_db
 from data_provider import DataFetcherManager
-from data_provider.realtime_types import ChipDistribution
+from data_provider.trade_calendar import (
+    MARKET_CN,
+    expected_latest_trade_date,
+    get_market,
+    get_trade_dates,
+    is_trading_session,
+    market_close_time,
+)
 from src.analyzer import GeminiAnalyzer, AnalysisResult, STOCK_NAME_MAP
 from src.notification import NotificationService, NotificationChannel
+from src.prompt_budget import NewsDigest
 from src.search_service import SearchService
 from src.enums import ReportType
 from src.stock_analyzer import StockTrendAnalyzer, TrendAnalysisResult
+from src.core.context import AnalysisContext
+from src.screener import MarketScreener, ScreenCandidate
 from bot.models import BotMessage
 
 
 logger = logging.getLogger(__name__)
 
+# 增量同步时向前多取的自然日，保证 MA20/量比计算有足够历史
+SYNC_WARMUP_DAYS = 40
+# 收盘后超过该时长数据源仍无当日日线，视为休市日（数据源通常在收盘后数小时内更新）
+NO_BAR_CONFIRM_HOURS = 18
+# 多维度情报搜索总超时（秒），超时则跳过舆情继续分析
+INTEL_SEARCH_TIMEOUT = 45
+
 
 class StockAnalysisPipeline:
     """
@@ -58,6 +77,10 @@ class StockAnalysisPipeline:
         self.config = config or get_config()
         self.max_workers = max_workers or self.config.max_workers
         self.source_message = source_message
+        # 每只股票处理过程中的数据库查询次数（运行摘要中输出）
+        self.db_query_counts: Dict[str, int] = {}
+        # 批量情报模式（SEARCH_BATCH_ENABLED）预取的舆情：股票代码 → 情报报告
+        self.prefetched_intel: Dict[str, NewsDigest] = {}
         
         # 初始化各模块
         self.db = get_db()
@@ -72,6 +95,9 @@ class StockAnalysisPipeline:
             bocha_keys=self.config.bocha_api_keys,
             tavily_keys=self.config.tavily_api_keys,
             serpapi_keys=self.config.serpapi_keys,
+            provider_concurrency=self.config.search_provider_concurrency,
+            key_rate_per_minute=self.config.search_key_rate_per_minute,
+            key_burst=self.config.search_key_burst,
         )
         
         logger.info(f"调度器初始化完成，最大并发数: {self.max_workers}")
@@ -96,38 +122,69 @@ class StockAnalysisPipeline:
         force_refresh: bool = False
     ) -> Tuple[bool, Optional[str]]:
         """
-        获取并保存单只股票数据
+        获取并保存单只股票数据（增量同步）
         
-        断点续传逻辑：
-        1. 检查数据库是否已有今日数据
-        2. 如果有且不强制刷新，则跳过网络请求
-        3. 否则从数据源获取并保存
+        增量同步逻辑：
+        1. 读取已入库的最新交易日（水位）
+        2. 水位已覆盖最近交易日，或已确认最近交易日无数据（休市），则跳过网络请求
+        3. 否则只拉取水位之后的缺失数据（带均线预热窗口），仅写入新增交易日
+        4. 无历史数据时按初始窗口全量获取
         
         Args:
             code: 股票代码
-            force_refresh: 是否强制刷新（忽略本地缓存）
+            force_refresh: 是否强制刷新（忽略本地水位，重拉初始窗口）
             
         Returns:
             Tuple[是否成功, 错误信息]
         """
         try:
-            today = date.today()
+            latest_date = None if force_refresh else self.db.get_latest_date(code)
+            market = get_market(code)
+            expected_date = self._expected_latest_trading_day(market=market)
             
-            # 断点续传检查：如果今日数据已存在，跳过
-            if not force_refresh and self.db.has_today_data(code, today):
-                logger.info(f"[{code}] 今日数据已存在，跳过获取（断点续传）")
+            # 断点续传检查：水位已覆盖最近交易日，跳过
+            if latest_date is not None and latest_date >= expected_date:
+                logger.info(f"[{code}] 数据已是最新（{latest_date}），跳过获取（断点续传）")
                 return True, None
             
-            # 从数据源获取数据
-            logger.info(f"[{code}] 开始从数据源获取数据...")
-            df, source_name = self.fetcher_manager.get_daily_data(code, days=30)
+            # 节假日等无新数据的情况：已确认最近交易日无数据，不再重复请求
+            if latest_date is not None:
+                state = self.db.get_sync_state(code)
+                if state and state.last_synced_at and state.last_synced_at >= self._market_close_time(expected_date, market):
+                    logger.info(f"[{code}] 已确认 {expected_date} 无新数据（{state.last_synced_at:%Y-%m-%d %H:%M}），跳过获取")
+                    return True, None
+            
+            if latest_date is None:
+                # 首次同步按趋势分析窗口拉取，保证 MA60/MACD 有足够历史
+                initial_days = self.config.trend_history_days
+                logger.info(f"[{code}] 无本地数据，开始从数据源获取最近 {initial_days} 天数据...")
+                df, source_name = self.fetcher_manager.get_daily_data(code, days=initial_days)
+            else:
+                # 多取一段预热窗口，保证数据源计算的 MA20/量比与全量拉取一致
+                start_date = latest_date - timedelta(days=SYNC_WARMUP_DAYS)
+                logger.info(f"[{code}] 增量同步: 水位 {latest_date}，拉取 {start_date} 之后的数据...")
+                df, source_name = self.fetcher_manager.get_daily_data(
+                    code, start_date=start_date.strftime('%Y-%m-%d')
+                )
             
             if df is None or df.empty:
                 return False, "获取数据为空"
             
-            # 保存到数据库
-            saved_count = self.db.save_daily_data(df, code, source_name)
-            logger.info(f"[{code}] 数据保存成功（来源: {source_name}，新增 {saved_count} 条）")
+            # 只写入水位之后的新交易日
+            if latest_date is not None:
+                df = df[pd.to_datetime(df['date']).dt.date > latest_date]
+            
+            saved_count = 0
+            if not df.empty:
+                saved_count = self.db.save_daily_data(df, code, source_name)
+            new_latest = pd.to_datetime(df['date']).max().date() if not df.empty else latest_date
+            # 只有最近交易日已入库，或收盘后足够久仍无数据（休市）时才推进同步时间；
+            # 收盘后不久数据源尚未更新的情况下次运行仍会重新获取
+            synced = (new_latest is not None and new_latest >= expected_date) or (
+                datetime.now() >= self._market_close_time(expected_date, market) + timedelta(hours=NO_BAR_CONFIRM_HOURS)
+            )
+            self.db.update_sync_state(code, new_latest, source_name, synced=synced)
+            logger.info(f"[{code}] 数据同步成功（来源: {source_name}，新增 {saved_count} 条，水位 {new_latest}）")
             
             return True, None
             
@@ -136,138 +193,295 @@ class StockAnalysisPipeline:
             logger.error(f"[{code}] {error_msg}")
             return False, error_msg
     
-    def analyze_stock(self, code: str) -> Optional[AnalysisResult]:
+    def backfill_stock_data(self, code: str, days: int = 365) -> Tuple[int, Optional[str]]:
         """
-        分析单只股票（增强版：含量比、换手率、筹码分析、多维度情报）
+        回补单只股票最近 N 天内的日线缺口
         
-        流程：
-        1. 获取实时行情（量比、换手率）- 通过 DataFetcherManager 自动故障切换
-        2. 获取筹码分布 - 通过 DataFetcherManager 带熔断保护
-        3. 进行趋势分析（基于交易理念）
-        4. 多维度情报搜索（最新消息+风险排查+业绩预期）
-        5. 从数据库获取分析上下文
-        6. 调用 AI 进行综合分析
+        按交易日历（港股/美股或日历不可用时按工作日）由 DatabaseManager.find_date_gaps 找出缺口区间，
+        逐个区间从数据源拉取并补录；数据源在缺口前后有数据、唯独缺口内某些交易日没有时
+        （停牌、工作日休市），记录为已确认无数据，之后不再重复请求
         
         Args:
             code: 股票代码
+            days: 回补的自然日范围
             
         Returns:
-            AnalysisResult 或 None（如果分析失败）
+            Tuple[补录条数, 错误信息]
         """
-        try:
-            # 获取股票名称（优先从实时行情获取真实名称）
-            stock_name = STOCK_NAME_MAP.get(code, '')
-            
-            # Step 1: 获取实时行情（量比、换手率等）- 使用统一入口，自动故障切换
-            realtime_quote = None
+        market = get_market(code)
+        end_date = self._expected_latest_trading_day(market=market)
+        start_date = date.today() - timedelta(days=days)
+        trade_dates = get_trade_dates(start_date, end_date) if market == MARKET_CN else None
+        if trade_dates is None:
+            trade_dates = list(pd.bdate_range(start_date, end_date).date)
+        gaps = self.db.find_date_gaps(code, start_date, end_date, trade_dates=trade_dates)
+        if not gaps:
+            logger.info(f"[{code}] 最近 {days} 天无数据缺口")
+            return 0, None
+        
+        latest_bar = self.db.get_latest_bar(code)
+        total_saved = 0
+        errors = []
+        for gap_start, gap_end in gaps:
             try:
-                realtime_quote = self.fetcher_manager.get_realtime_quote(code)
-                if realtime_quote:
-                    # 使用实时行情返回的真实股票名称
-                    if realtime_quote.name:
-                        stock_name = realtime_quote.name
-                    # 兼容不同数据源的字段（有些数据源可能没有 volume_ratio）
-                    volume_ratio = getattr(realtime_quote, 'volume_ratio', None)
-                    turnover_rate = getattr(realtime_quote, 'turnover_rate', None)
-                    logger.info(f"[{code}] {stock_name} 实时行情: 价格={realtime_quote.price}, "
-                              f"量比={volume_ratio}, 换手率={turnover_rate}% "
-                              f"(来源: {realtime_quote.source.value if hasattr(realtime_quote, 'source') else 'unknown'})")
-                else:
-                    logger.info(f"[{code}] 实时行情获取失败或已禁用，将使用历史数据进行分析")
+                logger.info(f"[{code}] 回补缺口 {gap_start} ~ {gap_end}...")
+                df, source_name = self.fetcher_manager.get_daily_data(
+                    code,
+                    start_date=(gap_start - timedelta(days=SYNC_WARMUP_DAYS)).strftime('%Y-%m-%d'),
+                    end_date=gap_end.strftime('%Y-%m-%d'),
+                )
+                dates = pd.to_datetime(df['date']).dt.date
+                # 数据源已覆盖到的日期：其返回的最新 bar，或库中缺口之后已有的 bar
+                returned = set(dates)
+                horizon = max([*returned, latest_bar[0]] if latest_bar else returned, default=None)
+                empty = [
+                    d for d in trade_dates
+                    if gap_start <= d <= gap_end and horizon is not None and d < horizon and d not in returned
+                ]
+                if empty:
+                    self.db.mark_empty_dates(code, empty)
+                    logger.info(f"[{code}] {len(empty)} 个交易日数据源无数据（停牌/休市），之后不再回补")
+                df = df[(dates >= gap_start) & (dates <= gap_end)]
+                if df.empty:
+                    continue
+                total_saved += self.db.save_daily_data(df, code, source_name)
+                self.db.update_sync_state(code, pd.to_datetime(df['date']).max().date(), source_name, synced=False)
             except Exception as e:
-                logger.warning(f"[{code}] 获取实时行情失败: {e}")
-            
-            # 如果还是没有名称，使用代码作为名称
-            if not stock_name:
-                stock_name = f'股票{code}'
+                errors.append(f"{gap_start}~{gap_end}: {e}")
+                logger.warning(f"[{code}] 回补缺口 {gap_start} ~ {gap_end} 失败: {e}")
+        
+        logger.info(f"[{code}] 回补完成: {len(gaps)} 个缺口，补录 {total_saved} 条")
+        return total_saved, ("; ".join(errors) if errors else None)
+    
+    def backfill(self, stock_codes: Optional[List[str]] = None, days: int = 365) -> Dict[str, int]:
+        """
+        批量回补日线缺口（串行执行，避免触发数据源反爬）
+        
+        Args:
+            stock_codes: 股票代码列表（可选，默认使用配置中的自选股）
+            days: 回补的自然日范围
             
-            # Step 2: 获取筹码分布 - 使用统一入口，带熔断保护
-            chip_data = None
-            try:
-                chip_data = self.fetcher_manager.get_chip_distribution(code)
-                if chip_data:
-                    logger.info(f"[{code}] 筹码分布: 获利比例={chip_data.profit_ratio:.1%}, "
-                              f"90%集中度={chip_data.concentration_90:.2%}")
-                else:
-                    logger.debug(f"[{code}] 筹码分布获取失败或已禁用")
-            except Exception as e:
-                logger.warning(f"[{code}] 获取筹码分布失败: {e}")
+        Returns:
+            {股票代码: 补录条数}
+        """
+        if stock_codes is None:
+            self.config.refresh_stock_list()
+            stock_codes = self.config.stock_list
+        
+        logger.info(f"===== 开始回补 {len(stock_codes)} 只股票最近 {days} 天的日线缺口 =====")
+        summary = {}
+        for code in stock_codes:
+            saved, error = self.backfill_stock_data(code, days=days)
+            summary[code] = saved
+            if error:
+                logger.warning(f"[{code}] 部分缺口回补失败: {error}")
+        logger.info(f"===== 回补完成，共补录 {sum(summary.values())} 条 =====")
+        return summary
+    
+    def screen_market(self, top_n: Optional[int] = None) -> List[ScreenCandidate]:
+        """
+        全市场技术面筛选（--screen）
+        
+        流程：
+        1. 拉取全市场实时行情快照，向量化初筛（SCREEN_MIN_AMOUNT / SCREEN_PREFILTER_LIMIT）
+        2. 增量同步初筛股票的日线（已是最新的股票不发起请求）
+        3. 批量读取历史窗口，盘中（且快照为当日数据）追加快照构造的当日 K 线，批量趋势评分并排序
+        
+        Args:
+            top_n: 返回数量（默认 SCREEN_TOP_N）
             
-            # Step 3: 趋势分析（基于交易理念）
-            trend_result: Optional[TrendAnalysisResult] = None
-            try:
-                # 获取历史数据进行趋势分析
-                context = self.db.get_analysis_context(code)
-                if context and 'raw_data' in context:
-                    import pandas as pd
-                    raw_data = context['raw_data']
-                    if isinstance(raw_data, list) and len(raw_data) > 0:
-                        df = pd.DataFrame(raw_data)
-                        trend_result = self.trend_analyzer.analyze(df, code)
-                        logger.info(f"[{code}] 趋势分析: {trend_result.trend_status.value}, "
-                                  f"买入信号={trend_result.buy_signal.value}, 评分={trend_result.signal_score}")
-            except Exception as e:
-                logger.warning(f"[{code}] 趋势分析失败: {e}")
+        Returns:
+            ScreenCandidate 列表（已排序），快照获取失败返回空列表
+        """
+        if top_n is None:
+            top_n = self.config.screen_top_n
+        snapshot = self.fetcher_manager.get_market_snapshot()
+        if snapshot is None:
+            logger.error("[筛选] 无法获取全市场实时行情快照（需要 efinance 或 akshare 东财数据源）")
+            return []
+        
+        screener = MarketScreener(
+            trend_analyzer=self.trend_analyzer,
+            min_amount=self.config.screen_min_amount,
+            prefilter_limit=self.config.screen_prefilter_limit,
+        )
+        spot = screener.prefilter(snapshot)
+        if spot.empty:
+            return []
+        
+        codes = spot['code'].tolist()
+        logger.info(f"[筛选] 同步 {len(codes)} 只初筛股票的日线...")
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for code, (success, error) in zip(codes, executor.map(self.fetch_and_save_stock_data, codes)):
+                if not success:
+                    logger.warning(f"[{code}] 日线同步失败: {error}")
+        
+        history = self.db.get_history_frames(codes, days=self.config.trend_history_days)
+        now = datetime.now()
+        if self._is_trading_session(now) and datetime.fromtimestamp(snapshot.timestamp).date() == now.date():
+            history = screener.with_spot_bars(history, spot, today=now.date())
+        candidates = screener.rank(spot, history, top_n=top_n)
+        for i, c in enumerate(candidates, 1):
+            logger.info(
+                f"[筛选] #{i} {c.name}({c.code}) 现价 {c.price} 涨跌 {c.change_pct:+.2f}% | "
+                f"{c.trend.trend_status.value} 乖离 {c.trend.bias_ma5:+.2f}% "
+                f"{c.trend.volume_status.value} | 评分 {c.score}"
+            )
+        return candidates
+    
+    @staticmethod
+    def _market_close_time(day: date, market: str = MARKET_CN) -> datetime:
+        """指定交易日的收盘时间（本机时间，A股 15:00、港股/美股 16:00 交易所当地时间）"""
+        return market_close_time(day, market)
+    
+    @staticmethod
+    def _is_trading_session(now: Optional[datetime] = None, market: str = MARKET_CN) -> bool:
+        """
+        是否处于盘中（交易日开盘至收盘，午间休市沿用上午收盘快照）
+        
+        A股按交易日历判断，港股/美股按工作日；日历未覆盖的休市日由 MarketScreener.with_spot_bars
+        按快照价格是否变化兜底
+        """
+        return is_trading_session(market, now)
+    
+    @classmethod
+    def _expected_latest_trading_day(cls, now: Optional[datetime] = None, market: str = MARKET_CN) -> date:
+        """
+        数据源应已提供的最近交易日
+        
+        按交易所当地时间：收盘前取上一个交易日，收盘后取当天；A股按交易日历跳过节假日，
+        港股/美股按工作日，其节假日由同步水位的 last_synced_at 兜底，避免重复请求
+        """
+        return expected_latest_trade_date(market, now)
+    
+    def build_analysis_context(self, code: str) -> AnalysisContext:
+        """
+        构建单只股票的分析上下文（同步 I/O，异步流水线在线程中调用）
+        
+        流程：
+        1. 获取实时行情（量比、换手率）与真实股票名称
+        2. 获取筹码分布
+        3. 读取历史窗口并进行趋势分析
+        
+        各步骤失败只记录日志，不影响后续步骤
+        
+        Args:
+            code: 股票代码
             
-            # Step 4: 多维度情报搜索（最新消息+风险排查+业绩预期），带超时防止卡死
-            news_context = None
-            INTEL_SEARCH_TIMEOUT = 45  # 秒，超时则跳过舆情继续分析
-            if self.search_service.is_available:
-                logger.info(f"[{code}] 开始多维度情报搜索（超时 {INTEL_SEARCH_TIMEOUT}s）...")
+        Returns:
+            AnalysisContext
+        """
+        # 获取股票名称（优先从实时行情获取真实名称）
+        stock_name = STOCK_NAME_MAP.get(code, '')
+        # 本股本次运行唯一的分析上下文，逐步填充后交给 AI 分析
+        ctx = AnalysisContext(code=code)
 
-                def _do_intel_search():
-                    intel_results = self.search_service.search_comprehensive_intel(
-                        stock_code=code,
-                        stock_name=stock_name,
-                        max_searches=3  # 3 维即可覆盖主要舆情，减少总耗时
-                    )
-                    if not intel_results:
-                        return None, 0
-                    report = self.search_service.format_intel_report(intel_results, stock_name)
-                    total = sum(len(r.results) for r in intel_results.values() if r.success)
-                    return report, total
+        # Step 1: 获取实时行情（量比、换手率等）- 使用统一入口，自动故障切换
+        realtime_quote = None
+        try:
+            realtime_quote = self.fetcher_manager.get_realtime_quote(code)
+            if realtime_quote:
+                # 使用实时行情返回的真实股票名称
+                if realtime_quote.name:
+                    stock_name = realtime_quote.name
+                # 兼容不同数据源的字段（有些数据源可能没有 volume_ratio）
+                volume_ratio = getattr(realtime_quote, 'volume_ratio', None)
+                turnover_rate = getattr(realtime_quote, 'turnover_rate', None)
+                logger.info(f"[{code}] {stock_name} 实时行情: 价格={realtime_quote.price}, "
+                          f"量比={volume_ratio}, 换手率={turnover_rate}% "
+                          f"(来源: {realtime_quote.source.value if hasattr(realtime_quote, 'source') else 'unknown'})")
+            else:
+                logger.info(f"[{code}] 实时行情获取失败或已禁用，将使用历史数据进行分析")
+        except Exception as e:
+            logger.warning(f"[{code}] 获取实时行情失败: {e}")
 
-                try:
-                    with ThreadPoolExecutor(max_workers=1) as ex:
-                        future = ex.submit(_do_intel_search)
-                        news_context, total_results = future.result(timeout=INTEL_SEARCH_TIMEOUT)
-                    if news_context is not None:
-                        logger.info(f"[{code}] 情报搜索完成: 共 {total_results} 条结果，即将调用 AI 分析（约 1–2 分钟）")
-                        logger.debug(f"[{code}] 情报搜索结果:\n{news_context}")
-                    else:
-                        logger.info(f"[{code}] 无舆情数据，将仅基于技术面与实时行情分析")
-                except FuturesTimeoutError:
-                    logger.warning(f"[{code}] 情报搜索总超时({INTEL_SEARCH_TIMEOUT}s)，跳过舆情数据，继续分析")
-                    news_context = None
-                except Exception as e:
-                    logger.warning(f"[{code}] 情报搜索异常: {e}，跳过舆情数据，继续分析")
-                    news_context = None
+        # 如果还是没有名称，使用代码作为名称
+        if not stock_name:
+            stock_name = f'股票{code}'
+        ctx.stock_name = stock_name
+        ctx.realtime_quote = realtime_quote
+
+        # Step 2: 获取筹码分布 - 使用统一入口，带熔断保护
+        chip_data = None
+        try:
+            chip_data = self.fetcher_manager.get_chip_distribution(code)
+            if chip_data:
+                logger.info(f"[{code}] 筹码分布: 获利比例={chip_data.profit_ratio:.1%}, "
+                          f"90%集中度={chip_data.concentration_90:.2%}")
             else:
-                logger.info(f"[{code}] 搜索服务不可用，跳过情报搜索")
-            
-            # Step 5: 获取分析上下文（技术面数据）
-            context = self.db.get_analysis_context(code)
-            
-            if context is None:
-                logger.warning(f"[{code}] 无法获取历史行情数据，将仅基于新闻和实时行情分析")
-                from datetime import date
-                context = {
-                    'code': code,
-                    'stock_name': stock_name,
-                    'date': date.today().isoformat(),
-                    'data_missing': True,
-                    'today': {},
-                    'yesterday': {}
-                }
+                logger.debug(f"[{code}] 筹码分布获取失败或已禁用")
+        except Exception as e:
+            logger.warning(f"[{code}] 获取筹码分布失败: {e}")
+        ctx.chip_data = chip_data
+
+        # Step 3: 趋势分析（基于交易理念）
+        try:
+            # 一次索引范围扫描取最近 N 个交易日的列式历史窗口，后续构建上下文复用该窗口
+            ctx.history = self.db.get_history_arrays(code, days=self.config.trend_history_days)
+            if ctx.has_history:
+                ctx.trend_result = self._intraday_trend(ctx) or self.trend_analyzer.analyze_arrays(ctx.history, code)
+                logger.info(f"[{code}] 趋势分析: {ctx.trend_result.trend_status.value}, "
+                          f"买入信号={ctx.trend_result.buy_signal.value}, 评分={ctx.trend_result.signal_score}")
+            else:
+                logger.info(f"[{code}] 无历史日线数据，跳过趋势分析")
+        except Exception as e:
+            logger.warning(f"[{code}] 趋势分析失败: {e}")
+        
+        return ctx
+    
+    def _intraday_trend(self, ctx: AnalysisContext) -> Optional[TrendAnalysisResult]:
+        """
+        盘中重新评分（INTRADAY_RESCORE_ENABLED）
+        
+        最新交易日的日线尚未入库且有实时报价时，以报价作为当日 K 线，
+        基于增量指标状态 O(1) 试算；当日成交量按量比折算，避免实时行情与日线成交量单位不一致
+        
+        Returns:
+            TrendAnalysisResult，未启用或不满足条件时返回 None
+        """
+        quote = ctx.realtime_quote
+        price = getattr(quote, 'price', None) if quote else None
+        if not self.config.intraday_rescore_enabled or not price:
+            return None
+        if pd.Timestamp(ctx.history['date'][-1]).date() >= date.today():
+            return None
+        
+        state = self.db.get_indicator_state(ctx.code, days=self.config.trend_history_days)
+        if state is None:
+            return None
+        logger.info(f"[{ctx.code}] 盘中重新评分: 基于 {state.last_date} 指标状态与最新价 {price}")
+        return self.trend_analyzer.analyze_intraday(
+            state,
+            price,
+            high=getattr(quote, 'high', None),
+            volume_ratio=getattr(quote, 'volume_ratio', None),
+        )
+    
+    def analyze_stock(
+        self,
+        code: str,
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Optional[AnalysisResult]:
+        """
+        分析单只股票（增强版：含量比、换手率、筹码分析、多维度情报）
+        
+        流程：
+        1. 获取实时行情（量比、换手率）- 通过 DataFetcherManager 自动故障切换
+        2. 获取筹码分布 - 通过 DataFetcherManager 带熔断保护
+        3. 进行趋势分析（基于交易理念）
+        4. 多维度情报搜索（最新消息+风险排查+业绩预期）
+        5. 由趋势分析使用的历史窗口构建分析上下文（每股只构建一次）
+        6. 调用 AI 进行综合分析
+        
+        Args:
+            code: 股票代码
+            on_partial: 流式模式下 AI 部分结果回调（可选）
             
-            # Step 6: 增强上下文数据（添加实时行情、筹码、趋势分析结果、股票名称）
-            enhanced_context = self._enhance_context(
-                context, 
-                realtime_quote, 
-                chip_data, 
-                trend_result,
-                stock_name  # 传入股票名称
-            )
+        Returns:
+            AnalysisResult 或 None（如果分析失败）
+        """
+        try:
+            enhanced_context, news_context = self.prepare_llm_input(code)
             
             # Step 7: 调用 AI 分析（传入增强的上下文和新闻），带超时防止 LLM 无响应卡死
             config = get_config()
@@ -279,6 +493,7 @@ class StockAnalysisPipeline:
                     self.analyzer.analyze,
                     enhanced_context,
                     news_context=news_context,
+                    on_partial=on_partial,
                 )
                 result = future.result(timeout=ANALYZE_TIMEOUT)
             except FuturesTimeoutError:
@@ -294,111 +509,82 @@ class StockAnalysisPipeline:
             logger.exception(f"[{code}] 详细错误信息:")
             return None
     
-    def _enhance_context(
-        self,
-        context: Dict[str, Any],
-        realtime_quote,
-        chip_data: Optional[ChipDistribution],
-        trend_result: Optional[TrendAnalysisResult],
-        stock_name: str = ""
-    ) -> Dict[str, Any]:
+    def prepare_llm_input(self, code: str) -> Tuple[Dict[str, Any], Optional[NewsDigest]]:
+        """
+        准备 AI 分析输入（analyze_stock 的 Step 1-6，合并请求模式也复用）
+        
+        Returns:
+            (增强后的上下文, 舆情摘要)
+        """
+        # Step 1-3: 实时行情、筹码分布、趋势分析，汇总为本股唯一的分析上下文
+        ctx = self.build_analysis_context(code)
+        stock_name = ctx.stock_name
+        
+        # Step 4: 多维度情报搜索（最新消息+风险排查+业绩预期），带超时防止卡死
+        news_context = self.prefetched_intel.get(code)
+        if news_context is not None:
+            logger.info(f"[{code}] 使用批量主题搜索预取的情报")
+        elif self.search_service.is_available:
+            logger.info(f"[{code}] 开始多维度情报搜索（超时 {INTEL_SEARCH_TIMEOUT}s）...")
+
+            def _do_intel_search():
+                intel_results = self.search_service.search_comprehensive_intel(
+                    stock_code=code,
+                    stock_name=stock_name,
+                    max_searches=3  # 3 维即可覆盖主要舆情，减少总耗时
+                )
+                if not intel_results:
+                    return None, 0
+                report = self.search_service.build_intel_digest(intel_results, stock_name)
+                total = sum(len(r.results) for r in intel_results.values() if r.success)
+                return report, total
+
+            try:
+                with ThreadPoolExecutor(max_workers=1) as ex:
+                    future = ex.submit(_do_intel_search)
+                    news_context, total_results = future.result(timeout=INTEL_SEARCH_TIMEOUT)
+                if news_context is not None:
+                    logger.info(f"[{code}] 情报搜索完成: 共 {total_results} 条结果，即将调用 AI 分析（约 1–2 分钟）")
+                    logger.debug(f"[{code}] 情报搜索结果:\n{news_context}")
+                else:
+                    logger.info(f"[{code}] 无舆情数据，将仅基于技术面与实时行情分析")
+            except FuturesTimeoutError:
+                logger.warning(f"[{code}] 情报搜索总超时({INTEL_SEARCH_TIMEOUT}s)，跳过舆情数据，继续分析")
+                news_context = None
+            except Exception as e:
+                logger.warning(f"[{code}] 情报搜索异常: {e}，跳过舆情数据，继续分析")
+                news_context = None
+        else:
+            logger.info(f"[{code}] 搜索服务不可用，跳过情报搜索")
+        
+        # Step 5: 分析上下文（技术面数据）直接由历史窗口构建，不再查询数据库
+        if not ctx.has_history:
+            logger.warning(f"[{code}] 无法获取历史行情数据，将仅基于新闻和实时行情分析")
+        
+        # Step 6: 增强上下文数据（添加实时行情、筹码、趋势分析结果、股票名称）
+        return self._enhance_context(ctx), news_context
+    
+    def _enhance_context(self, ctx: AnalysisContext) -> Dict[str, Any]:
         """
         增强分析上下文
         
         将实时行情、筹码分布、趋势分析结果、股票名称添加到上下文中
         
         Args:
-            context: 原始上下文
-            realtime_quote: 实时行情数据（UnifiedRealtimeQuote 或 None）
-            chip_data: 筹码分布数据
-            trend_result: 趋势分析结果
-            stock_name: 股票名称
+            ctx: 本股的分析上下文（已包含日线窗口、实时行情、筹码、趋势结果）
             
         Returns:
             增强后的上下文
         """
-        enhanced = context.copy()
-        
-        # 添加股票名称
-        if stock_name:
-            enhanced['stock_name'] = stock_name
-        elif realtime_quote and getattr(realtime_quote, 'name', None):
-            enhanced['stock_name'] = realtime_quote.name
-        
-        # 添加实时行情（兼容不同数据源的字段差异）
-        if realtime_quote:
-            # 使用 getattr 安全获取字段，缺失字段返回 None 或默认值
-            volume_ratio = getattr(realtime_quote, 'volume_ratio', None)
-            enhanced['realtime'] = {
-                'name': getattr(realtime_quote, 'name', ''),
-                'price': getattr(realtime_quote, 'price', None),
-                'volume_ratio': volume_ratio,
-                'volume_ratio_desc': self._describe_volume_ratio(volume_ratio) if volume_ratio else '无数据',
-                'turnover_rate': getattr(realtime_quote, 'turnover_rate', None),
-                'pe_ratio': getattr(realtime_quote, 'pe_ratio', None),
-                'pb_ratio': getattr(realtime_quote, 'pb_ratio', None),
-                'total_mv': getattr(realtime_quote, 'total_mv', None),
-                'circ_mv': getattr(realtime_quote, 'circ_mv', None),
-                'change_60d': getattr(realtime_quote, 'change_60d', None),
-                'source': getattr(realtime_quote, 'source', None),
-            }
-            # 移除 None 值以减少上下文大小
-            enhanced['realtime'] = {k: v for k, v in enhanced['realtime'].items() if v is not None}
-        
-        # 添加筹码分布
-        if chip_data:
-            current_price = getattr(realtime_quote, 'price', 0) if realtime_quote else 0
-            enhanced['chip'] = {
-                'profit_ratio': chip_data.profit_ratio,
-                'avg_cost': chip_data.avg_cost,
-                'concentration_90': chip_data.concentration_90,
-                'concentration_70': chip_data.concentration_70,
-                'chip_status': chip_data.get_chip_status(current_price or 0),
-            }
-        
-        # 添加趋势分析结果
-        if trend_result:
-            enhanced['trend_analysis'] = {
-                'trend_status': trend_result.trend_status.value,
-                'ma_alignment': trend_result.ma_alignment,
-                'trend_strength': trend_result.trend_strength,
-                'bias_ma5': trend_result.bias_ma5,
-                'bias_ma10': trend_result.bias_ma10,
-                'volume_status': trend_result.volume_status.value,
-                'volume_trend': trend_result.volume_trend,
-                'buy_signal': trend_result.buy_signal.value,
-                'signal_score': trend_result.signal_score,
-                'signal_reasons': trend_result.signal_reasons,
-                'risk_factors': trend_result.risk_factors,
-            }
-        
-        return enhanced
-    
-    def _describe_volume_ratio(self, volume_ratio: float) -> str:
-        """
-        量比描述
-        
-        量比 = 当前成交量 / 过去5日平均成交量
-        """
-        if volume_ratio < 0.5:
-            return "极度萎缩"
-        elif volume_ratio < 0.8:
-            return "明显萎缩"
-        elif volume_ratio < 1.2:
-            return "正常"
-        elif volume_ratio < 2.0:
-            return "温和放量"
-        elif volume_ratio < 3.0:
-            return "明显放量"
-        else:
-            return "巨量"
+        return ctx.to_prompt_context()
     
     def process_single_stock(
         self,
         code: str,
         skip_analysis: bool = False,
         single_stock_notify: bool = False,
-        report_type: ReportType = ReportType.SIMPLE
+        report_type: ReportType = ReportType.SIMPLE,
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None
     ) -> Optional[AnalysisResult]:
         """
         处理单只股票的完整流程
@@ -416,6 +602,7 @@ class StockAnalysisPipeline:
             skip_analysis: 是否跳过 AI 分析
             single_stock_notify: 是否启用单股推送模式（每分析完一只立即推送）
             report_type: 报告类型枚举（从配置读取，Issue #119）
+            on_partial: 流式模式下 AI 部分结果回调（可选，Web 任务状态使用）
 
         Returns:
             AnalysisResult 或 None
@@ -423,20 +610,26 @@ class StockAnalysisPipeline:
         logger.info(f"========== 开始处理 {code} ==========")
         
         try:
-            # Step 1: 获取并保存数据
-            success, error = self.fetch_and_save_stock_data(code)
-            
-            if not success:
-                logger.warning(f"[{code}] 数据获取失败: {error}")
-                # 即使获取失败，也尝试用已有数据分析
+            with self.db.track_queries() as query_counter:
+                # Step 1: 获取并保存数据
+                success, error = self.fetch_and_save_stock_data(code)
+                
+                if not success:
+                    logger.warning(f"[{code}] 数据获取失败: {error}")
+                    # 即使获取失败，也尝试用已有数据分析
+                
+                # Step 2: AI 分析
+                if skip_analysis:
+                    logger.info(f"[{code}] 跳过 AI 分析（dry-run 模式）")
+                    result = None
+                else:
+                    result = self.analyze_stock(code, on_partial=on_partial)
+            self.db_query_counts[code] = query_counter.count
+            logger.debug(f"[{code}] 数据库查询 {query_counter.count} 次")
             
-            # Step 2: AI 分析
             if skip_analysis:
-                logger.info(f"[{code}] 跳过 AI 分析（dry-run 模式）")
                 return None
             
-            result = self.analyze_stock(code)
-            
             if result:
                 logger.info(
                     f"[{code}] 分析完成: {result.operation_advice}, "
@@ -444,24 +637,8 @@ class StockAnalysisPipeline:
                 )
                 
                 # 单股推送模式（#55）：每分析完一只股票立即推送
-                if single_stock_notify and self.notifier.is_available():
-                    try:
-                        # 根据报告类型选择生成方法
-                        if report_type == ReportType.FULL:
-                            # 完整报告：使用决策仪表盘格式
-                            report_content = self.notifier.generate_dashboard_report([result])
-                            logger.info(f"[{code}] 使用完整报告格式")
-                        else:
-                            # 精简报告：使用单股报告格式（默认）
-                            report_content = self.notifier.generate_single_stock_report(result)
-                            logger.info(f"[{code}] 使用精简报告格式")
-                        
-                        if self.notifier.send(report_content):
-                            logger.info(f"[{code}] 单股推送成功")
-                        else:
-                            logger.warning(f"[{code}] 单股推送失败")
-                    except Exception as e:
-                        logger.error(f"[{code}] 单股推送异常: {e}")
+                if single_stock_notify:
+                    self._notify_single_stock(result, report_type)
             
             return result
             
@@ -470,6 +647,34 @@ class StockAnalysisPipeline:
             logger.exception(f"[{code}] 处理过程发生未知异常: {e}")
             return None
     
+    def _notify_single_stock(self, result: AnalysisResult, report_type: ReportType) -> None:
+        """单股推送（#55）"""
+        if not self.notifier.is_available():
+            return
+        code = result.code
+        try:
+            report_content = self._build_single_stock_report(result, report_type)
+            if self.notifier.send(report_content):
+                logger.info(f"[{code}] 单股推送成功")
+            else:
+                logger.warning(f"[{code}] 单股推送失败")
+        except Exception as e:
+            logger.error(f"[{code}] 单股推送异常: {e}")
+    
+    def _build_single_stock_report(self, result: AnalysisResult, report_type: ReportType) -> str:
+        """
+        生成单股推送内容（#55）
+        
+        根据报告类型选择生成方法（Issue #119）
+        """
+        if report_type == ReportType.FULL:
+            # 完整报告：使用决策仪表盘格式
+            logger.info(f"[{result.code}] 使用完整报告格式")
+            return self.notifier.generate_dashboard_report([result])
+        # 精简报告：使用单股报告格式（默认）
+        logger.info(f"[{result.code}] 使用精简报告格式")
+        return self.notifier.generate_single_stock_report(result)
+    
     def run(
         self, 
         stock_codes: Optional[List[str]] = None,
@@ -495,36 +700,25 @@ class StockAnalysisPipeline:
         """
         start_time = time.time()
         
-        # 使用配置中的股票列表
-        if stock_codes is None:
-            self.config.refresh_stock_list()
-            stock_codes = self.config.stock_list
-        
+        stock_codes = self._resolve_stock_codes(stock_codes)
         if not stock_codes:
-            logger.error("未配置自选股列表，请在 .env 文件中设置 STOCK_LIST")
             return []
         
         logger.info(f"===== 开始分析 {len(stock_codes)} 只股票 =====")
         logger.info(f"股票列表: {', '.join(stock_codes)}")
         logger.info(f"并发数: {self.max_workers}, 模式: {'仅获取数据' if dry_run else '完整分析'}")
         
-        # === 批量预取实时行情（优化：避免每只股票都触发全量拉取）===
-        # 只有股票数量 >= 5 时才进行预取，少量股票直接逐个查询更高效
-        if len(stock_codes) >= 5:
-            prefetch_count = self.fetcher_manager.prefetch_realtime_quotes(stock_codes)
-            if prefetch_count > 0:
-                logger.info(f"已启用批量预取架构：一次拉取全市场数据，{len(stock_codes)} 只股票共享缓存")
+        self._prefetch_realtime_quotes(stock_codes)
+        if not dry_run:
+            self._prefetch_batched_intel(stock_codes)
         
-        # 单股推送模式（#55）：从配置读取
-        single_stock_notify = getattr(self.config, 'single_stock_notify', False)
-        # Issue #119: 从配置读取报告类型
-        report_type_str = getattr(self.config, 'report_type', 'simple').lower()
-        report_type = ReportType.FULL if report_type_str == 'full' else ReportType.SIMPLE
-        # Issue #128: 从配置读取分析间隔
-        analysis_delay = getattr(self.config, 'analysis_delay', 0)
-
-        if single_stock_notify:
-            logger.info(f"已启用单股推送模式：每分析完一只股票立即推送（报告类型: {report_type_str}）")
+        single_stock_notify, report_type, analysis_delay = self._run_options()
+        
+        # 合并请求模式：数据与情报按股票并发准备，AI 分析按批打包
+        if not dry_run and self.config.llm_batch_size > 1:
+            results = self._run_batched(stock_codes, single_stock_notify and send_notification, report_type)
+            self._finish_run(stock_codes, results, start_time, dry_run, send_notification, single_stock_notify)
+            return results
         
         results: List[AnalysisResult] = []
         
@@ -559,6 +753,149 @@ class StockAnalysisPipeline:
                 except Exception as e:
                     logger.error(f"[{code}] 任务执行失败: {e}")
         
+        self._finish_run(stock_codes, results, start_time, dry_run, send_notification, single_stock_notify)
+        return results
+    
+    def _run_batched(
+        self,
+        stock_codes: List[str],
+        single_stock_notify: bool,
+        report_type: ReportType,
+    ) -> List[AnalysisResult]:
+        """
+        合并请求模式（LLM_BATCH_SIZE > 1）
+        
+        数据获取、趋势分析、情报搜索按股票并发完成后，
+        每 LLM_BATCH_SIZE 只股票打包为一次 AI 请求（GeminiAnalyzer.batch_analyze）
+        
+        Returns:
+            分析结果列表（按 stock_codes 顺序）
+        """
+        def _prepare(code: str) -> Tuple[Dict[str, Any], Optional[NewsDigest]]:
+            with self.db.track_queries() as query_counter:
+                success, error = self.fetch_and_save_stock_data(code)
+                if not success:
+                    logger.warning(f"[{code}] 数据获取失败: {error}")
+                prepared = self.prepare_llm_input(code)
+            self.db_query_counts[code] = query_counter.count
+            return prepared
+        
+        prepared: Dict[str, Tuple[Dict[str, Any], Optional[NewsDigest]]] = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            future_to_code = {executor.submit(_prepare, code): code for code in stock_codes}
+            for future in as_completed(future_to_code):
+                code = future_to_code[future]
+                try:
+                    prepared[code] = future.result()
+                except Exception as e:
+                    logger.error(f"[{code}] 分析准备失败: {e}")
+        
+        codes = [code for code in stock_codes if code in prepared]
+        logger.info(f"[LLM批量] {len(codes)} 只股票按每批 {self.config.llm_batch_size} 只合并请求")
+        analysis_results = self.analyzer.batch_analyze(
+            [prepared[code][0] for code in codes],
+            delay_between=self.config.gemini_request_delay,
+            news_contexts=[prepared[code][1] for code in codes],
+            batch_size=self.config.llm_batch_size,
+        )
+        
+        results: List[AnalysisResult] = []
+        for result in analysis_results:
+            if not result:
+                continue
+            logger.info(f"[{result.code}] 分析完成: {result.operation_advice}, 评分 {result.sentiment_score}")
+            if single_stock_notify:
+                self._notify_single_stock(result, report_type)
+            results.append(result)
+        return results
+    
+    def _resolve_stock_codes(self, stock_codes: Optional[List[str]]) -> List[str]:
+        """未指定股票时使用配置中的自选股列表"""
+        if stock_codes is None:
+            self.config.refresh_stock_list()
+            stock_codes = self.config.stock_list
+        
+        if not stock_codes:
+            logger.error("未配置自选股列表，请在 .env 文件中设置 STOCK_LIST")
+            return []
+        return stock_codes
+    
+    def _prefetch_realtime_quotes(self, stock_codes: List[str]) -> None:
+        """
+        批量预取实时行情（优化：避免每只股票都触发全量拉取）
+        
+        只有股票数量 >= 5 时才进行预取，少量股票直接逐个查询更高效
+        """
+        if len(stock_codes) >= 5:
+            prefetch_count = self.fetcher_manager.prefetch_realtime_quotes(stock_codes)
+            if prefetch_count > 0:
+                logger.info(f"已启用批量预取架构：一次拉取全市场数据，{len(stock_codes)} 只股票共享缓存")
+    
+    def _prefetch_batched_intel(self, stock_codes: List[str]) -> None:
+        """
+        批量情报预取（SEARCH_BATCH_ENABLED）：按主题合并搜索后按名称/代码分配文章
+        
+        匹配到文章的股票在 prepare_llm_input 中直接使用；未匹配的股票仍走逐只多维度搜索
+        """
+        self.prefetched_intel = {}
+        if not self.config.search_batch_enabled or not self.search_service.is_available or len(stock_codes) < 2:
+            return
+        stocks = []
+        for code in stock_codes:
+            name = STOCK_NAME_MAP.get(code, '')
+            try:
+                quote = self.fetcher_manager.get_realtime_quote(code)
+                if quote and quote.name:
+                    name = quote.name
+            except Exception as e:
+                logger.debug(f"[{code}] 获取股票名称失败: {e}")
+            stocks.append({'code': code, 'name': name})
+        
+        try:
+            responses = self.search_service.search_watchlist_news(
+                stocks, group_size=self.config.search_batch_group_size,
+            )
+        except Exception as e:
+            logger.warning(f"批量情报搜索失败，改为逐只搜索: {e}")
+            return
+        names = {stock['code']: stock['name'] or stock['code'] for stock in stocks}
+        self.prefetched_intel = {
+            code: self.search_service.build_intel_digest({'latest_news': response}, names[code])
+            for code, response in responses.items()
+            if response.success
+        }
+    
+    def _run_options(self) -> Tuple[bool, ReportType, float]:
+        """
+        读取本次运行的推送与节奏选项
+        
+        Returns:
+            (是否单股推送, 报告类型, 分析间隔秒数)
+        """
+        # 单股推送模式（#55）：从配置读取
+        single_stock_notify = getattr(self.config, 'single_stock_notify', False)
+        # Issue #119: 从配置读取报告类型
+        report_type_str = getattr(self.config, 'report_type', 'simple').lower()
+        report_type = ReportType.FULL if report_type_str == 'full' else ReportType.SIMPLE
+        # Issue #128: 从配置读取分析间隔
+        analysis_delay = getattr(self.config, 'analysis_delay', 0)
+
+        if single_stock_notify:
+            logger.info(f"已启用单股推送模式：每分析完一只股票立即推送（报告类型: {report_type_str}）")
+        return single_stock_notify, report_type, analysis_delay
+    
+    def _finish_run(
+        self,
+        stock_codes: List[str],
+        results: List[AnalysisResult],
+        start_time: float,
+        dry_run: bool,
+        send_notification: bool,
+        single_stock_notify: bool,
+    ) -> None:
+        """
+        运行收尾：统计、汇总推送、自动交易
+        """
         # 统计
         elapsed_time = time.time() - start_time
         
@@ -573,6 +910,13 @@ class StockAnalysisPipeline:
         
         logger.info("===== 分析完成 =====")
         logger.info(f"成功: {success_count}, 失败: {fail_count}, 耗时: {elapsed_time:.2f} 秒")
+        self._log_db_query_summary(stock_codes)
+        if not dry_run:
+            for provider, stats in self.search_service.key_stats().items():
+                usage = '，'.join(
+                    f"{key} 调用 {item['usage']} 次/失败 {item['failures']} 次" for key, item in stats['keys'].items()
+                )
+                logger.info(f"[{provider}] API Key 使用情况: {usage}")
         
         # 发送通知（单股推送模式下跳过汇总推送，避免重复）
         if results and send_notification and not dry_run:
@@ -591,8 +935,15 @@ class StockAnalysisPipeline:
                 engine.run(results, source_date=date.today())
             except Exception as e:
                 logger.warning(f"交易信号生成失败（已忽略）: {e}")
-        
-        return results
+    
+    def _log_db_query_summary(self, stock_codes: List[str]) -> None:
+        """输出每只股票处理过程中的数据库查询次数"""
+        counts = {code: self.db_query_counts[code] for code in stock_codes if code in self.db_query_counts}
+        if not counts:
+            return
+        detail = ", ".join(f"{code}={count}" for code, count in counts.items())
+        avg = sum(counts.values()) / len(counts)
+        logger.info(f"数据库查询次数（每股）: {detail}（平均 {avg:.1f} 次）")
     
     def _send_notifications(self, results: List[AnalysisResult], skip_push: bool = False) -> None:
         """
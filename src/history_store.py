@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+A股自选股智能分析系统 - 列式历史行情存储
+===================================
+
+职责：
+1. 以 Arrow IPC 文件按 股票代码/年份 分区保存日线（{root}/{code}/{year}.arrow）
+2. 读取时内存映射（memory map），数值列直接作为 NumPy 数组使用，不经过 ORM 对象
+3. 作为 stock_daily 的列式镜像，由 DatabaseManager 在 HISTORY_STORE_ENABLED=true 时接管历史读取
+
+设计说明：
+- 选用未压缩的 Arrow IPC 而不是 Parquet：IPC 文件可直接 mmap 零拷贝读取，Parquet 需解码
+- 数值列写入时保留 NaN（不转为 null），单分区读取时 to_numpy() 为零拷贝视图
+- 写入先落临时文件再 os.replace 原子替换，并发读取方已映射的旧文件不受影响
+- 依赖 pyarrow（可选），未安装时 DatabaseManager 回退到仅使用数据库
+"""
+
+import logging
+import os
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+
+# 分区文件扩展名
+PARTITION_SUFFIX = '.arrow'
+
+
+class ArrowHistoryStore:
+    """
+    按 股票代码/年份 分区的列式日线存储
+
+    使用方式：
+        store = ArrowHistoryStore('./data/history', ['open', 'high', 'low', 'close', 'volume'])
+        store.write('600519', df)
+        df = store.read_window('600519', days=120)
+        arrays = store.read_arrays('600519', days=120)   # {'date': datetime64[D], 'close': float64, ...}
+    """
+
+    def __init__(self, root: str, value_columns: Sequence[str]):
+        """
+        Args:
+            root: 存储根目录
+            value_columns: 日线数值列（均按 float64 保存）
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.value_columns = list(value_columns)
+        self.schema = pa.schema(
+            [('date', pa.date32())] + [(col, pa.float64()) for col in self.value_columns]
+        )
+        # 同一进程内同一股票的写入串行化（读取无需加锁）
+        self._write_locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    # === 分区 ===
+
+    def _code_dir(self, code: str) -> Path:
+        return self.root / code
+
+    def _partition_path(self, code: str, year: int) -> Path:
+        return self._code_dir(code) / f"{year}{PARTITION_SUFFIX}"
+
+    def _write_lock(self, code: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._write_locks.setdefault(code, threading.Lock())
+
+    def has(self, code: str) -> bool:
+        """是否已有该股票的数据"""
+        return bool(self.years(code))
+
+    def years(self, code: str) -> List[int]:
+        """该股票已有的年份分区（升序）"""
+        code_dir = self._code_dir(code)
+        if not code_dir.is_dir():
+            return []
+        return sorted(
+            int(p.stem) for p in code_dir.iterdir()
+            if p.suffix == PARTITION_SUFFIX and p.stem.isdigit()
+        )
+
+    def _read_partition(self, code: str, year: int) -> pa.Table:
+        """内存映射读取单个分区（返回的 Table 直接引用映射内存）"""
+        with pa.memory_map(str(self._partition_path(code, year)), 'r') as source:
+            return pa.ipc.open_file(source).read_all()
+
+    # === 写入 ===
+
+    def _to_table(self, df: pd.DataFrame) -> pa.Table:
+        """DataFrame → Arrow Table（数值列保留 NaN，不转为 null）"""
+        arrays = [pa.array(pd.to_datetime(df['date']).dt.date.to_numpy(), type=pa.date32())]
+        for col in self.value_columns:
+            if col in df.columns:
+                values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)
+            else:
+                values = np.full(len(df), np.nan)
+            arrays.append(pa.array(values, type=pa.float64(), from_pandas=False))
+        return pa.Table.from_arrays(arrays, schema=self.schema)
+
+    def _write_partition(self, code: str, year: int, table: pa.Table) -> None:
+        path = self._partition_path(code, year)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with pa.OSFile(str(tmp_path), 'wb') as sink:
+            with pa.ipc.new_file(sink, self.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+
+    def write(self, code: str, df: pd.DataFrame) -> int:
+        """
+        写入（合并）日线数据
+
+        按年份与已有分区合并，同一交易日以新数据为准，只重写涉及的年份分区
+
+        Args:
+            code: 股票代码
+            df: 包含 date 列及数值列的 DataFrame
+
+        Returns:
+            写入的行数
+        """
+        if df is None or df.empty:
+            return 0
+        df = df.copy()
+        df['date'] = pd.to_datetime(df['date'])
+        df = df.dropna(subset=['date'])
+        with self._write_lock(code):
+            existing_years = set(self.years(code))
+            for year, group in df.groupby(df['date'].dt.year):
+                year = int(year)
+                if year in existing_years:
+                    old = self._read_partition(code, year).to_pandas()
+                    old['date'] = pd.to_datetime(old['date'])
+                    group = pd.concat([old, group[['date'] + [c for c in self.value_columns if c in group.columns]]])
+                group = group.drop_duplicates('date', keep='last').sort_values('date')
+                self._write_partition(code, year, self._to_table(group))
+        return len(df)
+
+    # === 读取 ===
+
+    def read_table(
+        self,
+        code: str,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        last_n: Optional[int] = None,
+    ) -> Optional[pa.Table]:
+        """
+        读取日线 Arrow Table（按日期升序）
+
+        Args:
+            code: 股票代码
+            start/end: 日期范围（含端点，可选）
+            last_n: 只取最近 N 个交易日（从最新年份向前读取分区，够数即停）
+
+        Returns:
+            pa.Table，无数据返回 None
+        """
+        years = self.years(code)
+        if start is not None:
+            years = [y for y in years if y >= start.year]
+        if end is not None:
+            years = [y for y in years if y <= end.year]
+        if not years:
+            return None
+
+        tables: List[pa.Table] = []
+        rows = 0
+        for year in reversed(years):
+            table = self._read_partition(code, year)
+            tables.append(table)
+            rows += table.num_rows
+            if last_n is not None and start is None and rows >= last_n:
+                break
+        table = pa.concat_tables(tables[::-1])
+
+        if start is not None or end is not None:
+            dates = table.column('date').to_numpy().astype('datetime64[D]')
+            mask = np.ones(len(dates), dtype=bool)
+            if start is not None:
+                mask &= dates >= np.datetime64(start, 'D')
+            if end is not None:
+                mask &= dates <= np.datetime64(end, 'D')
+            table = table.filter(pa.array(mask))
+        if last_n is not None and table.num_rows > last_n:
+            table = table.slice(table.num_rows - last_n)
+        return table if table.num_rows else None
+
+    @staticmethod
+    def _column_to_numpy(table: pa.Table, name: str) -> np.ndarray:
+        """单分块时零拷贝，跨分区（多分块）时合并一次"""
+        column = table.column(name)
+        if column.num_chunks == 1:
+            return column.chunk(0).to_numpy(zero_copy_only=False)
+        return column.to_numpy()
+
+    def read_arrays(self, code: str, days: int) -> Optional[Dict[str, np.ndarray]]:
+        """
+        读取最近 N 个交易日的列数组（供分析器/回测直接使用）
+
+        Returns:
+            {'date': datetime64[D] 数组, 数值列: float64 数组}，无数据返回 None
+        """
+        table = self.read_table(code, last_n=days)
+        if table is None:
+            return None
+        arrays = {name: self._column_to_numpy(table, name) for name in table.column_names}
+        arrays['date'] = arrays['date'].astype('datetime64[D]')
+        return arrays
+
+    def _to_frame(self, table: Optional[pa.Table]) -> pd.DataFrame:
+        """Arrow Table → DataFrame（date 列为 datetime64，与 get_history_window 一致）"""
+        if table is None:
+            return pd.DataFrame(columns=['date'] + self.value_columns)
+        columns = {name: self._column_to_numpy(table, name) for name in table.column_names}
+        columns['date'] = pd.to_datetime(columns['date'].astype('datetime64[D]'))
+        return pd.DataFrame(columns)
+
+    def read_window(self, code: str, days: int) -> pd.DataFrame:
+        """最近 N 个交易日的 DataFrame（按日期升序），无数据返回空 DataFrame"""
+        return self._to_frame(self.read_table(code, last_n=days))
+
+    def read_range(self, code: str, start: date, end: date) -> pd.DataFrame:
+        """指定日期范围的 DataFrame（按日期升序），无数据返回空 DataFrame"""
+        return self._to_frame(self.read_table(code, start=start, end=end))
+
+    def latest_date(self, code: str) -> Optional[date]:
+        """已存储的最新交易日"""
+        table = self.read_table(code, last_n=1)
+        if table is None:
+            return None
+        return table.column('date')[0].as_py()
+
+    def latest_bar(self, code: str) -> Optional[Tuple[date, float]]:
+        """已存储的最新一根日线 (交易日, 收盘价)"""
+        table = self.read_table(code, last_n=1)
+        if table is None:
+            return None
+        return table.column('date')[0].as_py(), table.column('close')[0].as_py()
+
+    def remove(self, code: str) -> None:
+        """删除该股票的全部分区（重建前调用）"""
+        with self._write_lock(code):
+            for year in self.years(code):
+                self._partition_path(code, year).unlink(missing_ok=True)
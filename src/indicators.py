@@ -0,0 +1,640 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+技术指标计算引擎（NumPy 面板批量计算）
+===================================
+
+职责：
+1. 将多只股票的日线整理为 股票 × 交易日 的面板（IndicatorPanel）
+2. 一次 NumPy 计算整个面板的 MA5/10/20/60、MACD（DIF/DEA/BAR）、RSI(6/12/24)
+3. 供 StockTrendAnalyzer 单股分析与全市场批量筛选共用，保证两条路径结果一致
+4. 单只股票的增量指标状态（IndicatorState）：新 K 线/盘中报价 O(1) 更新，
+   盘中重新评分无需重新加载历史
+
+面板约定：
+- 每只股票按自身交易日右对齐（最后一列为最新交易日），历史较短的股票左侧以 NaN 填充，
+  停牌日不占列，与逐只计算时 DataFrame 的行序一致
+- 均线/RSI 与 pandas rolling(window).mean() 一致（窗口内有缺失值时为 NaN）
+- EMA 与 pandas ewm(span, adjust=False).mean() 一致，从每只股票的首个有效值开始递推
+"""
+
+import copy
+import math
+from collections import deque
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Deque, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+# 均线周期
+MA_WINDOWS = (5, 10, 20, 60)
+# MACD 参数（标准12/26/9）
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+# RSI 周期
+RSI_PERIODS = (6, 12, 24)
+# 面板数值列
+PANEL_COLUMNS = ('close', 'high', 'low', 'volume', 'open')
+# 增量状态每追加多少根 K 线用精确求和重算一次滑动和，抑制浮点累计误差
+STATE_RESYNC_BARS = 250
+
+
+@dataclass
+class IndicatorPanel:
+    """
+    多只股票的日线面板（股票 × 交易日）
+
+    close/high/low/volume/open 均为 float64 二维数组，形状 (len(codes), n_dates)，
+    n_bars[i] 为第 i 只股票的有效交易日数；dates 为每个位置对应的交易日（datetime64[D]，填充位置为 NaT），
+    回测按日期对齐时使用
+    """
+    codes: List[str]
+    close: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    volume: np.ndarray
+    n_bars: np.ndarray
+    open: Optional[np.ndarray] = None
+    dates: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @classmethod
+    def from_frames(cls, frames: Mapping[str, pd.DataFrame], max_bars: Optional[int] = None) -> 'IndicatorPanel':
+        """
+        由 {code: 日线 DataFrame} 构建面板
+
+        Args:
+            frames: 每只股票的日线（需包含 date/close/high/low/volume 列）
+            max_bars: 每只股票最多保留的最近交易日数（None 表示全部）
+        """
+        codes = list(frames.keys())
+        lengths = [0 if frames[c] is None else len(frames[c]) for c in codes]
+        width = max(lengths, default=0)
+        if max_bars is not None:
+            width = min(width, max_bars)
+        arrays = {col: np.full((len(codes), width), np.nan) for col in PANEL_COLUMNS}
+        dates = np.full((len(codes), width), np.datetime64('NaT'), dtype='datetime64[D]')
+        n_bars = np.zeros(len(codes), dtype=np.int64)
+
+        for i, code in enumerate(codes):
+            df = frames[code]
+            if df is None or df.empty or width == 0:
+                continue
+            if 'date' in df.columns:
+                df = df.sort_values('date')
+            df = df.tail(width)
+            n = len(df)
+            n_bars[i] = n
+            for col, arr in arrays.items():
+                if col in df.columns:
+                    arr[i, width - n:] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)
+            if 'date' in df.columns:
+                dates[i, width - n:] = pd.to_datetime(df['date']).to_numpy().astype('datetime64[D]')
+        return cls(codes=codes, n_bars=n_bars, dates=dates, **arrays)
+
+    @classmethod
+    def from_arrays(
+        cls,
+        columns: Mapping[str, Optional[Mapping[str, np.ndarray]]],
+        max_bars: Optional[int] = None,
+    ) -> 'IndicatorPanel':
+        """
+        由 {code: 列数组} 构建面板（DatabaseManager.get_history_arrays 的返回格式）
+
+        列数组按日期升序，直接写入面板，不经过 DataFrame
+
+        Args:
+            columns: 每只股票的 {'date': datetime64[D], 'close': float64, ...}，无数据为 None
+            max_bars: 每只股票最多保留的最近交易日数（None 表示全部）
+        """
+        codes = list(columns.keys())
+        lengths = [0 if columns[c] is None else len(columns[c]['date']) for c in codes]
+        width = max(lengths, default=0)
+        if max_bars is not None:
+            width = min(width, max_bars)
+        arrays = {col: np.full((len(codes), width), np.nan) for col in PANEL_COLUMNS}
+        dates = np.full((len(codes), width), np.datetime64('NaT'), dtype='datetime64[D]')
+        n_bars = np.zeros(len(codes), dtype=np.int64)
+
+        for i, code in enumerate(codes):
+            data = columns[code]
+            n = min(lengths[i], width)
+            if n == 0:
+                continue
+            n_bars[i] = n
+            for col, arr in arrays.items():
+                if col in data:
+                    arr[i, width - n:] = data[col][-n:]
+            dates[i, width - n:] = data['date'][-n:]
+        return cls(codes=codes, n_bars=n_bars, dates=dates, **arrays)
+
+    @classmethod
+    def from_long_frame(cls, df: pd.DataFrame, max_bars: Optional[int] = None) -> 'IndicatorPanel':
+        """
+        由多股票长表（code/date/close/high/low/volume 列）构建面板
+
+        按 code、date 排序后一次性散射到面板，不逐只切片
+        """
+        if df is None or df.empty:
+            empty = np.empty((0, 0))
+            return cls(codes=[], close=empty, high=empty, low=empty, volume=empty, open=empty,
+                       n_bars=np.zeros(0, dtype=np.int64), dates=np.empty((0, 0), dtype='datetime64[D]'))
+
+        df = df.sort_values(['code', 'date'])
+        codes_col = df['code'].astype(str).to_numpy()
+        codes, row_idx, counts = np.unique(codes_col, return_inverse=True, return_counts=True)
+        # 从最新交易日往前数的序号：0 为最新
+        pos_from_end = df.groupby('code', sort=False).cumcount(ascending=False).to_numpy()
+
+        width = int(counts.max())
+        if max_bars is not None:
+            width = min(width, max_bars)
+        keep = pos_from_end < width
+        rows = row_idx[keep]
+        cols = width - 1 - pos_from_end[keep]
+
+        arrays = {}
+        for col in PANEL_COLUMNS:
+            arr = np.full((len(codes), width), np.nan)
+            if col in df.columns:
+                values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)
+                arr[rows, cols] = values[keep]
+            arrays[col] = arr
+        dates = np.full((len(codes), width), np.datetime64('NaT'), dtype='datetime64[D]')
+        dates[rows, cols] = pd.to_datetime(df['date']).to_numpy().astype('datetime64[D]')[keep]
+        return cls(codes=[str(c) for c in codes], n_bars=np.minimum(counts, width).astype(np.int64),
+                   dates=dates, **arrays)
+
+
+@dataclass
+class PanelIndicators:
+    """面板指标计算结果，每个字段形状与面板一致"""
+    ma: Dict[int, np.ndarray]
+    dif: np.ndarray
+    dea: np.ndarray
+    bar: np.ndarray
+    rsi: Dict[int, np.ndarray]
+
+
+@dataclass
+class IndicatorSnapshot:
+    """单只股票评分所需的最新指标数值（由指标面板或增量状态取出）"""
+    n_bars: int                 # 有效交易日数
+    close: float                # 最新收盘价
+    prev_close: float           # 前一交易日收盘价
+    ma5: float
+    ma10: float
+    ma20: float
+    ma60: float
+    prev5_ma5: float            # 5 个交易日前（含当日倒数第 5 根）的 MA5
+    prev5_ma20: float
+    volume: float               # 最新成交量
+    vol_5d_avg: float           # 前 5 个交易日平均成交量（不含当日）
+    recent_high: float          # 近 20 个交易日最高价
+    dif: float
+    dea: float
+    bar: float
+    prev_dif: float
+    prev_dea: float
+    rsi_6: float
+    rsi_12: float
+    rsi_24: float
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    沿最后一维的滑动平均（窗口内任一值缺失则为 NaN，同 pandas rolling(window).mean()）
+
+    使用前缀和实现，O(n) 且不依赖窗口大小
+    """
+    values = np.atleast_2d(values)
+    out = np.full(values.shape, np.nan)
+    if values.shape[1] < window:
+        return out
+    valid = ~np.isnan(values)
+    zeros = np.zeros((values.shape[0], 1))
+    csum = np.concatenate([zeros, np.cumsum(np.where(valid, values, 0.0), axis=1)], axis=1)
+    ccount = np.concatenate([zeros, np.cumsum(valid, axis=1)], axis=1)
+    window_sum = csum[:, window:] - csum[:, :-window]
+    window_count = ccount[:, window:] - ccount[:, :-window]
+    means = np.where(window_count == window, window_sum / window, np.nan)
+
+    # 窗口内价格完全相同时（停牌、一字板）直接取该值，避免前缀和的舍入误差
+    # 让"现价 == 均线"变成略低于均线（pandas rolling 同样做了该处理）
+    changed = np.ones(values.shape, dtype=np.int64)
+    changed[:, 1:] = values[:, 1:] != values[:, :-1]
+    cchanged = np.concatenate([np.zeros((values.shape[0], 1), dtype=np.int64), np.cumsum(changed, axis=1)], axis=1)
+    constant = (cchanged[:, window:] - cchanged[:, 1:values.shape[1] - window + 2]) == 0
+    out[:, window - 1:] = np.where(constant, values[:, window - 1:], means)
+    return out
+
+
+def ema(values: np.ndarray, span: int) -> np.ndarray:
+    """
+    沿最后一维的指数移动平均（同 pandas ewm(span=span, adjust=False).mean()）
+
+    按交易日递推、按股票向量化：每一步是一次跨全部股票的数组运算。
+    缺失值处沿用上一有效 EMA。
+    """
+    values = np.atleast_2d(values)
+    alpha = 2.0 / (span + 1.0)
+    out = np.full(values.shape, np.nan)
+    prev = np.full(values.shape[0], np.nan)
+    for t in range(values.shape[1]):
+        x = values[:, t]
+        prev = np.where(np.isnan(prev), x, np.where(np.isnan(x), prev, alpha * x + (1.0 - alpha) * prev))
+        out[:, t] = prev
+    return out
+
+
+def rsi(close: np.ndarray, periods=RSI_PERIODS) -> Dict[int, np.ndarray]:
+    """
+    RSI（简单移动平均版，与原 StockTrendAnalyzer 口径一致）
+
+    价格变化只计算一次，各周期共用；RS 无定义（无涨无跌）时取中性值 50
+    """
+    close = np.atleast_2d(close)
+    delta = np.full(close.shape, np.nan)
+    delta[:, 1:] = np.diff(close, axis=1)
+    valid = ~np.isnan(close)
+    # 每只股票第一根 K 线的变化视为 0（同 pandas diff + where 的结果）
+    gain = np.where(valid, np.where(delta > 0, delta, 0.0), np.nan)
+    loss = np.where(valid, np.where(delta < 0, -delta, 0.0), np.nan)
+
+    result = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for period in periods:
+            avg_gain = rolling_mean(gain, period)
+            avg_loss = rolling_mean(loss, period)
+            values = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+            result[period] = np.where(np.isnan(values), 50.0, values)
+    return result
+
+
+def compute_indicators(panel: IndicatorPanel, ma_windows: Iterable[int] = MA_WINDOWS) -> PanelIndicators:
+    """
+    计算整个面板的均线、MACD、RSI
+
+    Args:
+        panel: 指标面板
+        ma_windows: 均线周期（回测参数扫描时可传入其他周期）
+
+    Returns:
+        PanelIndicators
+    """
+    close = panel.close
+    ma = {window: rolling_mean(close, window) for window in ma_windows}
+    dif = ema(close, MACD_FAST) - ema(close, MACD_SLOW)
+    dea = ema(dif, MACD_SIGNAL)
+    bar = (dif - dea) * 2
+    return PanelIndicators(ma=ma, dif=dif, dea=dea, bar=bar, rsi=rsi(close))
+
+
+def _is_number(value: Any) -> bool:
+    """是否为有效数值（非 None、非 NaN）"""
+    try:
+        return value is not None and not math.isnan(float(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def _nanmean(values: Iterable[float]) -> float:
+    valid = [v for v in values if not math.isnan(v)]
+    return sum(valid) / len(valid) if valid else math.nan
+
+
+def _nanmax(values: Iterable[float]) -> float:
+    valid = [v for v in values if not math.isnan(v)]
+    return max(valid) if valid else math.nan
+
+
+def _ema_step(prev: float, value: float, span: int) -> float:
+    """EMA 递推一步（口径同 ema()：首个有效值为种子，缺失值沿用上一 EMA）"""
+    if math.isnan(prev):
+        return value
+    if math.isnan(value):
+        return prev
+    alpha = 2.0 / (span + 1.0)
+    return alpha * value + (1.0 - alpha) * prev
+
+
+def _rsi_value(avg_gain: float, avg_loss: float) -> float:
+    """由平均涨幅/跌幅计算 RSI（口径同 rsi()：无定义时取 50）"""
+    if math.isnan(avg_gain) or math.isnan(avg_loss):
+        return 50.0
+    if avg_loss == 0:
+        return 50.0 if avg_gain == 0 else 100.0
+    return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+
+def _encode_floats(values: Iterable[float]) -> List[Optional[float]]:
+    """序列化为标准 JSON：NaN 写为 null"""
+    return [None if math.isnan(v) else v for v in values]
+
+
+def _decode_floats(values: Iterable[Optional[float]]) -> List[float]:
+    return [math.nan if v is None else float(v) for v in values]
+
+
+class _RollingSums:
+    """
+    单条序列的多窗口滑动和（环形缓冲区，追加一个值 O(1)）
+
+    - 缓冲区只保留最长窗口的值，每个窗口维护一个累加和
+    - 记录末尾连续相同值的个数：窗口内值完全相同时直接返回该值，与 rolling_mean 一致
+    """
+
+    def __init__(self, windows: Sequence[int]):
+        self.windows = tuple(windows)
+        self.values: Deque[float] = deque(maxlen=max(self.windows))
+        self.sums: Dict[int, float] = {w: 0.0 for w in self.windows}
+        self.run = 0
+        self._pushes_since_resync = 0
+
+    @property
+    def last(self) -> float:
+        return self.values[-1] if self.values else math.nan
+
+    def _next_sums(self, value: float) -> Dict[int, float]:
+        n = len(self.values)
+        return {w: total + value - (self.values[-w] if n >= w else 0.0) for w, total in self.sums.items()}
+
+    def _next_run(self, value: float) -> int:
+        return self.run + 1 if self.values and self.values[-1] == value else 1
+
+    def push(self, value: float) -> None:
+        """追加一个值"""
+        self.sums = self._next_sums(value)
+        self.run = self._next_run(value)
+        self.values.append(value)
+        self._pushes_since_resync += 1
+        if self._pushes_since_resync >= STATE_RESYNC_BARS:
+            self.resync()
+
+    def resync(self) -> None:
+        """用缓冲区内的值精确重算各窗口累加和"""
+        values = list(self.values)
+        self.sums = {w: math.fsum(values[-w:]) for w in self.windows}
+        self._pushes_since_resync = 0
+
+    def means(self) -> Dict[int, float]:
+        """各窗口当前均值（数据不足为 NaN）"""
+        count = len(self.values)
+        return {w: self._mean(w, self.sums[w], count, self.run, self.last) for w in self.windows}
+
+    @staticmethod
+    def _mean(window: int, total: float, count: int, run: int, last: float) -> float:
+        if count < window:
+            return math.nan
+        if run >= window:
+            return last
+        return total / window
+
+    def copy(self) -> '_RollingSums':
+        clone = copy.copy(self)
+        clone.values = self.values.copy()
+        clone.sums = dict(self.sums)
+        return clone
+
+    def to_dict(self) -> Dict[str, Any]:
+        # 累加和与重算进度一并保存，恢复后继续追加的结果与原状态逐位相同
+        return {
+            'values': _encode_floats(self.values),
+            'run': self.run,
+            'sums': {str(w): total for w, total in self.sums.items()},
+            'pushes_since_resync': self._pushes_since_resync,
+        }
+
+    @classmethod
+    def from_dict(cls, windows: Sequence[int], data: Mapping[str, Any]) -> '_RollingSums':
+        rolling = cls(windows)
+        rolling.values.extend(_decode_floats(data.get('values', [])))
+        rolling.run = int(data.get('run', 0))
+        sums = data.get('sums') or {}
+        if all(str(w) in sums for w in rolling.windows):
+            rolling.sums = {w: float(sums[str(w)]) for w in rolling.windows}
+            rolling._pushes_since_resync = int(data.get('pushes_since_resync', 0))
+        else:
+            # 旧格式未保存累加和：按缓冲区精确重算
+            rolling.resync()
+        return rolling
+
+
+class IndicatorState:
+    """
+    单只股票的增量指标状态
+
+    保存 EMA12/EMA26/DEA 的当前值、均线与 RSI 涨跌幅的滑动和环形缓冲区、
+    近 5 日 MA5/MA20、近 6 日成交量、近 20 日最高价，以及前一交易日的 DIF/DEA。
+
+    - update(): 追加一根已收盘的日线，O(1)
+    - snapshot(): 最新交易日的指标快照
+    - preview(): 以盘中报价作为"当日 K 线"试算指标快照，不修改状态
+    - to_dict()/from_dict(): JSON 序列化，由 DatabaseManager 持久化到 stock_indicator_state 表
+
+    指标口径与 compute_indicators 一致（均线/RSI 的滑动和存在 1e-12 量级的浮点差异）；
+    EMA 从状态建立时的首根 K 线开始递推，与同一历史窗口上的批量计算结果相同。
+    """
+
+    def __init__(self, code: str):
+        self.code = code
+        self.last_date: Optional[date] = None
+        self.n_bars = 0
+        self.closes = _RollingSums(MA_WINDOWS)
+        self.gains = _RollingSums(RSI_PERIODS)
+        self.losses = _RollingSums(RSI_PERIODS)
+        self.ema_fast = math.nan
+        self.ema_slow = math.nan
+        self.dea = math.nan
+        self.prev_dif = math.nan
+        self.prev_dea = math.nan
+        # 含最新交易日的最近 5 个 MA5/MA20（取 5 日前的值判断均线拐头）
+        self.ma5_history: Deque[float] = deque(maxlen=5)
+        self.ma20_history: Deque[float] = deque(maxlen=5)
+        # 含最新交易日的最近 6 日成交量（前 5 日均量不含当日）
+        self.volumes: Deque[float] = deque(maxlen=6)
+        self.highs: Deque[float] = deque(maxlen=20)
+
+    def __repr__(self):
+        return f"<IndicatorState(code={self.code}, last_date={self.last_date}, n_bars={self.n_bars})>"
+
+    @property
+    def dif(self) -> float:
+        return self.ema_fast - self.ema_slow
+
+    @property
+    def last_close(self) -> float:
+        return self.closes.last
+
+    @classmethod
+    def from_history(cls, code: str, df: pd.DataFrame) -> 'IndicatorState':
+        """
+        由日线历史建立状态（按日期升序逐根追加，仅在首次建立或历史被修正时调用）
+
+        Args:
+            code: 股票代码
+            df: 日线 DataFrame（需包含 date/close 列，high/volume 可选）
+        """
+        state = cls(code)
+        if df is None or df.empty:
+            return state
+        df = df.sort_values('date')
+        dates = pd.to_datetime(df['date']).dt.date.tolist()
+        closes = df['close'].tolist()
+        highs = df['high'].tolist() if 'high' in df.columns else [None] * len(df)
+        volumes = df['volume'].tolist() if 'volume' in df.columns else [None] * len(df)
+        for bar_date, close, high, volume in zip(dates, closes, highs, volumes):
+            state.update(bar_date, close, high, volume)
+        return state
+
+    def update(
+        self,
+        bar_date: date,
+        close: float,
+        high: Optional[float] = None,
+        volume: Optional[float] = None,
+    ) -> bool:
+        """
+        追加一根已收盘的日线
+
+        Args:
+            bar_date: 交易日
+            close: 收盘价
+            high: 最高价（缺失时不计入近 20 日最高价）
+            volume: 成交量
+
+        Returns:
+            是否已追加（交易日不晚于 last_date 或收盘价缺失时忽略）
+        """
+        if self.last_date is not None and bar_date <= self.last_date:
+            return False
+        if not _is_number(close):
+            return False
+        self._apply(float(close), high, volume)
+        self.last_date = bar_date
+        return True
+
+    def _apply(self, close: float, high: Optional[float], volume: Optional[float]) -> None:
+        prev_close = self.closes.last
+        delta = 0.0 if math.isnan(prev_close) else close - prev_close
+        self.gains.push(delta if delta > 0 else 0.0)
+        self.losses.push(-delta if delta < 0 else 0.0)
+        self.closes.push(close)
+
+        self.prev_dif, self.prev_dea = self.dif, self.dea
+        self.ema_fast = _ema_step(self.ema_fast, close, MACD_FAST)
+        self.ema_slow = _ema_step(self.ema_slow, close, MACD_SLOW)
+        self.dea = _ema_step(self.dea, self.dif, MACD_SIGNAL)
+
+        means = self.closes.means()
+        self.ma5_history.append(means[5])
+        self.ma20_history.append(means[20])
+        self.volumes.append(float(volume) if _is_number(volume) else math.nan)
+        # 最高价缺失时不参与近 20 日最高价，与面板 np.nanmax 一致
+        self.highs.append(float(high) if _is_number(high) else math.nan)
+        self.n_bars += 1
+
+    def snapshot(self) -> IndicatorSnapshot:
+        """最新交易日的指标快照（字段口径同 StockTrendAnalyzer._latest_snapshots）"""
+        ma = self.closes.means()
+        closes = self.closes.values
+        volumes = list(self.volumes)
+        gain_means, loss_means = self.gains.means(), self.losses.means()
+        dif = self.dif
+        return IndicatorSnapshot(
+            n_bars=self.n_bars,
+            close=self.last_close,
+            prev_close=closes[-2] if len(closes) >= 2 else math.nan,
+            ma5=ma[5],
+            ma10=ma[10],
+            ma20=ma[20],
+            ma60=ma[60] if self.n_bars >= 60 else ma[20],  # 数据不足时使用 MA20 替代
+            prev5_ma5=self.ma5_history[0] if len(self.ma5_history) == 5 else math.nan,
+            prev5_ma20=self.ma20_history[0] if len(self.ma20_history) == 5 else math.nan,
+            volume=volumes[-1] if volumes else math.nan,
+            vol_5d_avg=_nanmean(volumes[:-1][-5:]),
+            recent_high=_nanmax(self.highs),
+            dif=dif,
+            dea=self.dea,
+            bar=(dif - self.dea) * 2,
+            prev_dif=self.prev_dif,
+            prev_dea=self.prev_dea,
+            rsi_6=_rsi_value(gain_means[RSI_PERIODS[0]], loss_means[RSI_PERIODS[0]]),
+            rsi_12=_rsi_value(gain_means[RSI_PERIODS[1]], loss_means[RSI_PERIODS[1]]),
+            rsi_24=_rsi_value(gain_means[RSI_PERIODS[2]], loss_means[RSI_PERIODS[2]]),
+        )
+
+    def preview(
+        self,
+        price: float,
+        high: Optional[float] = None,
+        volume: Optional[float] = None,
+        volume_ratio: Optional[float] = None,
+    ) -> IndicatorSnapshot:
+        """
+        以盘中报价作为当日 K 线试算指标快照（不修改状态）
+
+        Args:
+            price: 最新价
+            high: 当日最高价（缺失时按最新价）
+            volume: 当日累计成交量（需与日线成交量同一单位）
+            volume_ratio: 量比；未提供 volume 时按 量比 × 前 5 日均量 折算全天成交量，
+                避免实时行情与日线成交量单位（手/股）不一致
+
+        Returns:
+            IndicatorSnapshot
+        """
+        if not _is_number(volume) and _is_number(volume_ratio):
+            volume = float(volume_ratio) * _nanmean(list(self.volumes)[-5:])
+        if not _is_number(high):
+            high = price
+        state = self.copy()
+        state._apply(float(price), high, volume)
+        return state.snapshot()
+
+    def copy(self) -> 'IndicatorState':
+        """复制状态（缓冲区长度固定，复制开销与历史长度无关）"""
+        clone = copy.copy(self)
+        for name in ('closes', 'gains', 'losses', 'ma5_history', 'ma20_history', 'volumes', 'highs'):
+            setattr(clone, name, getattr(self, name).copy())
+        return clone
+
+    def to_dict(self) -> Dict[str, Any]:
+        """序列化为可 JSON 编码的字典"""
+        return {
+            'code': self.code,
+            'last_date': self.last_date.isoformat() if self.last_date else None,
+            'n_bars': self.n_bars,
+            'closes': self.closes.to_dict(),
+            'gains': self.gains.to_dict(),
+            'losses': self.losses.to_dict(),
+            'ema': _encode_floats([self.ema_fast, self.ema_slow, self.dea, self.prev_dif, self.prev_dea]),
+            'ma5_history': _encode_floats(self.ma5_history),
+            'ma20_history': _encode_floats(self.ma20_history),
+            'volumes': _encode_floats(self.volumes),
+            'highs': _encode_floats(self.highs),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> 'IndicatorState':
+        """由 to_dict() 的结果恢复状态"""
+        state = cls(data['code'])
+        if data.get('last_date'):
+            state.last_date = date.fromisoformat(data['last_date'])
+        state.n_bars = int(data.get('n_bars', 0))
+        state.closes = _RollingSums.from_dict(MA_WINDOWS, data.get('closes', {}))
+        state.gains = _RollingSums.from_dict(RSI_PERIODS, data.get('gains', {}))
+        state.losses = _RollingSums.from_dict(RSI_PERIODS, data.get('losses', {}))
+        (state.ema_fast, state.ema_slow, state.dea,
+         state.prev_dif, state.prev_dea) = _decode_floats(data.get('ema', [None] * 5))
+        state.ma5_history.extend(_decode_floats(data.get('ma5_history', [])))
+        state.ma20_history.extend(_decode_floats(data.get('ma20_history', [])))
+        state.volumes.extend(_decode_floats(data.get('volumes', [])))
+        state.highs.extend(_decode_floats(data.get('highs', [])))
+        return state
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+搜索引擎 API Key 调度池
+===================================
+
+替代原先的「轮询 + 错误计数」：多个流水线线程同时搜索时，
+每个 Key 的调用频率、剩余额度与限流状态都需要在线程间共享并加锁维护。
+
+KeyPool（每个搜索引擎一个）：
+1. 令牌桶：每个 Key 按 rate_per_minute 补充令牌，突发不超过 burst，避免打满触发封禁
+2. 限流窗口：响应头 X-RateLimit-Remaining 为当前短周期窗口的剩余次数，
+   归零时冷却到 X-RateLimit-Reset / Retry-After（缺失时按短窗口冷却）
+3. 额度跟踪：只有明确的额度响应头（X-Quota-Remaining）或额度耗尽错误才冷却到次日
+4. 限流冷却：429 按 Retry-After 或指数退避冷却；连续错误达到阈值短暂冷却；Key 无效长时间停用
+5. 加权选择：在可用 Key 中按 剩余令牌 × 健康度 × 剩余额度 加权随机选择
+
+acquire() 不阻塞，返回 (key, 需要等待的秒数)，同步/异步调用方各自等待
+"""
+
+import logging
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# 失败类型
+FAILURE_RATE_LIMIT = 'rate_limit'
+FAILURE_QUOTA = 'quota'
+FAILURE_AUTH = 'auth'
+FAILURE_ERROR = 'error'
+
+# 连续普通错误达到该次数后冷却
+ERROR_COOLDOWN_THRESHOLD = 3
+ERROR_COOLDOWN = 60.0
+# 429 未给出 Retry-After 时的基础冷却时间与上限（指数退避）
+RATE_LIMIT_COOLDOWN = 30.0
+MAX_RATE_LIMIT_COOLDOWN = 600.0
+# Key 无效（401）时停用时长
+AUTH_COOLDOWN = 6 * 3600.0
+# 限流窗口剩余次数归零且未给出重置时间时的冷却时间
+RATE_WINDOW_COOLDOWN = 60.0
+# X-RateLimit-Reset 大于该值视为 Unix 时间戳，否则为剩余秒数
+_EPOCH_THRESHOLD = 1e9
+
+# 没有状态码时（SDK 异常）按错误信息判断；避免裸子串匹配误判普通错误
+_RATE_LIMIT_PATTERN = re.compile(
+    r'rate[ _-]?limit|too many requests|(?:http|status|code|error)\W{0,3}429\b|请求频率|频率限制'
+)
+_AUTH_PATTERN = re.compile(r'unauthorized|invalid api[ _-]?key|api[ _-]?key\s*无效|(?:http|status|code|error)\W{0,3}401\b')
+_QUOTA_PATTERN = re.compile(
+    r'quota|run out of searches|(?:insufficient|exhausted|out of) credits?|credits? (?:exhausted|used up)|余额不足|配额'
+)
+
+
+def classify_failure(status_code: Optional[int], message: Optional[str]) -> str:
+    """
+    判断失败类型：有 HTTP 状态码时以状态码为准，SDK 异常没有状态码时按错误信息判断
+    """
+    if status_code is not None:
+        if status_code == 429:
+            return FAILURE_RATE_LIMIT
+        if status_code == 401:
+            return FAILURE_AUTH
+        if status_code in (402, 403):
+            return FAILURE_QUOTA
+        return FAILURE_ERROR
+    text = (message or '').lower()
+    if _RATE_LIMIT_PATTERN.search(text):
+        return FAILURE_RATE_LIMIT
+    if _AUTH_PATTERN.search(text):
+        return FAILURE_AUTH
+    if _QUOTA_PATTERN.search(text):
+        return FAILURE_QUOTA
+    return FAILURE_ERROR
+
+
+@dataclass
+class RateLimitInfo:
+    """响应头中的限流/额度信息"""
+    window_remaining: Optional[int] = None  # 当前限流窗口剩余次数（X-RateLimit-Remaining）
+    reset_after: Optional[float] = None  # 限流窗口重置的剩余秒数（X-RateLimit-Reset）
+    retry_after: Optional[float] = None  # Retry-After（秒）
+    quota_remaining: Optional[int] = None  # 剩余额度（X-Quota-Remaining 等明确的额度头）
+
+
+def _header_number(headers: Dict[str, str], names: Tuple[str, ...]) -> Optional[float]:
+    for name in names:
+        if name in headers:
+            try:
+                return float(headers[name])
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+def parse_rate_headers(headers: Optional[Mapping[str, str]]) -> Optional[RateLimitInfo]:
+    """从响应头解析限流窗口与额度信息，没有相关响应头时返回 None"""
+    if not headers:
+        return None
+    lowered = {str(k).lower(): v for k, v in headers.items()}
+    window_remaining = _header_number(lowered, ('x-ratelimit-remaining', 'ratelimit-remaining'))
+    reset = _header_number(lowered, ('x-ratelimit-reset', 'ratelimit-reset'))
+    if reset is not None and reset > _EPOCH_THRESHOLD:
+        reset = reset - time.time()
+    retry_after = _header_number(lowered, ('retry-after',))
+    quota_remaining = _header_number(lowered, ('x-quota-remaining', 'x-ratelimit-remaining-day'))
+    info = RateLimitInfo(
+        window_remaining=int(window_remaining) if window_remaining is not None else None,
+        reset_after=max(reset, 0.0) if reset is not None else None,
+        retry_after=max(retry_after, 0.0) if retry_after is not None else None,
+        quota_remaining=int(quota_remaining) if quota_remaining is not None else None,
+    )
+    if info == RateLimitInfo():
+        return None
+    return info
+
+
+@dataclass
+class KeyState:
+    """单个 Key 的调度状态"""
+    key: str
+    index: int  # 配置顺序（从 1 开始），区分前缀相同的 Key（如 tvly-dev-...）
+    tokens: float
+    updated_at: float
+    cooldown_until: float = 0.0
+    consecutive_errors: int = 0
+    rate_limit_hits: int = 0
+    remaining_quota: Optional[int] = None
+    usage: int = 0
+    failures: int = 0
+
+    @property
+    def masked(self) -> str:
+        """脱敏标识：序号 + Key 末 4 位"""
+        return f"#{self.index} ...{self.key[-4:]}"
+
+
+class KeyPool:
+    """
+    单个搜索引擎的 Key 调度池（线程安全）
+    """
+
+    def __init__(self, name: str, api_keys: List[str], rate_per_minute: float = 30.0, burst: int = 5):
+        """
+        Args:
+            name: 搜索引擎名称（日志用）
+            api_keys: API Key 列表
+            rate_per_minute: 每个 Key 每分钟的请求数上限
+            burst: 令牌桶容量（允许的突发请求数）
+        """
+        self.name = name
+        self.rate = max(rate_per_minute, 0.1) / 60.0
+        self.burst = max(1, burst)
+        self._lock = threading.Lock()
+        now = time.monotonic()
+        # 同一个 Key 重复配置时只保留一份
+        self._states: Dict[str, KeyState] = {
+            key: KeyState(key=key, index=index, tokens=float(self.burst), updated_at=now)
+            for index, key in enumerate(dict.fromkeys(api_keys), 1)
+        }
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def _refill(self, state: KeyState, now: float) -> None:
+        state.tokens = min(float(self.burst), state.tokens + (now - state.updated_at) * self.rate)
+        state.updated_at = now
+
+    @staticmethod
+    def _weight(state: KeyState) -> float:
+        weight = state.tokens / (1 + state.consecutive_errors)
+        if state.remaining_quota is not None:
+            weight *= min(state.remaining_quota, 100) / 100
+        return weight
+
+    def acquire(self) -> Tuple[Optional[str], float]:
+        """
+        取一个可用 Key（不阻塞）
+
+        Returns:
+            (key, 0) 取到 Key；(None, 秒数) 暂无可用 Key，建议等待的时间；
+            (None, inf) 没有 Key 或全部停用
+        """
+        with self._lock:
+            now = time.monotonic()
+            ready = []
+            wait = float('inf')
+            for state in self._states.values():
+                self._refill(state, now)
+                if state.remaining_quota == 0 and state.cooldown_until <= now:
+                    # 额度信息过期（已过冷却期）后重新尝试
+                    state.remaining_quota = None
+                if state.cooldown_until > now:
+                    wait = min(wait, state.cooldown_until - now)
+                elif state.tokens < 1:
+                    wait = min(wait, (1 - state.tokens) / self.rate)
+                else:
+                    ready.append(state)
+            if not ready:
+                return None, wait
+            weights = [self._weight(state) for state in ready]
+            if sum(weights) > 0:
+                state = random.choices(ready, weights=weights)[0]
+            else:
+                state = max(ready, key=lambda s: s.tokens)
+            state.tokens -= 1
+            state.usage += 1
+            return state.key, 0.0
+
+    def _apply_rate_info(self, state: KeyState, info: Optional[RateLimitInfo], now: float) -> float:
+        """
+        按响应头更新状态，返回需要的冷却秒数
+
+        - 限流窗口剩余次数归零：冷却到窗口重置（Reset / Retry-After，缺失时 RATE_WINDOW_COOLDOWN）
+        - 明确的额度头归零：冷却到次日
+        """
+        if info is None:
+            return 0.0
+        cooldown = 0.0
+        if info.quota_remaining is not None:
+            state.remaining_quota = info.quota_remaining
+            if info.quota_remaining <= 0:
+                cooldown = self._seconds_until_tomorrow()
+        if info.window_remaining is not None and info.window_remaining <= 0:
+            window = info.reset_after if info.reset_after is not None else info.retry_after
+            cooldown = max(cooldown, window if window is not None else RATE_WINDOW_COOLDOWN)
+        return cooldown
+
+    def report_success(self, key: str, rate_info: Optional[RateLimitInfo] = None) -> None:
+        """记录成功（可附带响应头中的限流/额度信息）"""
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return
+            state.consecutive_errors = 0
+            state.rate_limit_hits = 0
+            now = time.monotonic()
+            cooldown = self._apply_rate_info(state, rate_info, now)
+            if cooldown > 0:
+                state.cooldown_until = max(state.cooldown_until, now + cooldown)
+                logger.info(f"[{self.name}] API Key {state.masked} 限流窗口/额度已用完，冷却 {cooldown:.0f}s")
+
+    def report_failure(
+        self,
+        key: str,
+        kind: str = FAILURE_ERROR,
+        rate_info: Optional[RateLimitInfo] = None,
+    ) -> None:
+        """
+        记录失败并按类型冷却
+
+        Args:
+            key: API Key
+            kind: 失败类型（classify_failure）
+            rate_info: 响应头中的限流/额度信息
+        """
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return
+            now = time.monotonic()
+            state.failures += 1
+            cooldown = self._apply_rate_info(state, rate_info, now)
+            if kind == FAILURE_RATE_LIMIT:
+                state.rate_limit_hits += 1
+                retry_after = None
+                if rate_info is not None:
+                    retry_after = rate_info.retry_after if rate_info.retry_after is not None else rate_info.reset_after
+                cooldown = max(cooldown, retry_after if retry_after is not None else min(
+                    RATE_LIMIT_COOLDOWN * (2 ** (state.rate_limit_hits - 1)), MAX_RATE_LIMIT_COOLDOWN
+                ))
+                state.tokens = 0.0
+            elif kind == FAILURE_QUOTA:
+                state.remaining_quota = 0
+                cooldown = self._seconds_until_tomorrow()
+            elif kind == FAILURE_AUTH:
+                cooldown = AUTH_COOLDOWN
+            else:
+                state.consecutive_errors += 1
+                if state.consecutive_errors >= ERROR_COOLDOWN_THRESHOLD:
+                    cooldown = max(cooldown, ERROR_COOLDOWN)
+            if cooldown > 0:
+                state.cooldown_until = max(state.cooldown_until, now + cooldown)
+                logger.warning(f"[{self.name}] API Key {state.masked} {kind}，冷却 {cooldown:.0f}s")
+            else:
+                logger.warning(f"[{self.name}] API Key {state.masked} 错误计数: {state.consecutive_errors}")
+
+    @staticmethod
+    def _seconds_until_tomorrow() -> float:
+        now = datetime.now()
+        tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return max((tomorrow - now).total_seconds(), 60.0)
+
+    def stats(self) -> Dict[str, Any]:
+        """各 Key 的调度状态（Key 已脱敏）"""
+        with self._lock:
+            now = time.monotonic()
+            keys = {}
+            for state in self._states.values():
+                self._refill(state, now)
+                keys[state.masked] = {
+                    'usage': state.usage,
+                    'failures': state.failures,
+                    'tokens': round(state.tokens, 2),
+                    'cooldown': round(max(0.0, state.cooldown_until - now), 1),
+                    'remaining_quota': state.remaining_quota,
+                }
+        return {
+            'rate_per_minute': round(self.rate * 60, 2),
+            'burst': self.burst,
+            'keys': keys,
+        }
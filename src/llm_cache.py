@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+LLM 响应缓存（按提示词指纹寻址）
+===================================
+
+设计目标：
+同一只股票当天被重复请求（WebUI /analysis、机器人 analyze 命令、
+/api/trading/signals?stocks=... 重跑流水线）时，格式化后的提示词完全相同，
+无需再次调用大模型。
+
+LLMResponseCache 以 sha256(提供方 + 模型 + 温度 + 输出上限 + 系统提示词 + 用户提示词) 为键，
+把响应文本保存在本地 SQLite 文件中（存储、TTL 与淘汰见 src/ttl_store.TTLStore）。
+
+使用方式：
+- 配置 LLM_CACHE_ENABLED=true 开启（默认关闭）
+- get_llm_cache() 未开启时返回 None，调用方直接请求大模型
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from src.ttl_store import LazyStore, TTLStore
+
+
+class LLMResponseCache:
+    """
+    大模型响应缓存：值为响应文本，元数据记录模型（存储委托给 TTLStore）
+    """
+
+    def __init__(self, path: str, ttl: float = 43200, max_entries: int = 2000):
+        """
+        Args:
+            path: SQLite 文件路径
+            ttl: 有效期（秒）
+            max_entries: 最多保留的条目数
+        """
+        self._store = TTLStore(path, ttl, max_entries)
+        self.path = self._store.path
+
+    @staticmethod
+    def make_key(
+        prompt: str,
+        model: str,
+        temperature: Optional[float],
+        system_prompt: str = "",
+        max_tokens: Optional[int] = None,
+    ) -> str:
+        """
+        计算提示词指纹
+
+        Args:
+            prompt: 用户提示词
+            model: 模型标识（含提供方，如 gemini:gemini-2.5-flash）
+            temperature: 温度
+            system_prompt: 系统提示词（变更后旧缓存自动失效）
+            max_tokens: 输出上限
+        """
+        payload = json.dumps(
+            [model, temperature, max_tokens, system_prompt, prompt],
+            ensure_ascii=False, separators=(',', ':'),
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """读取未过期的响应"""
+        return self._store.get(key)
+
+    def set(self, key: str, model: str, response: str) -> None:
+        """写入响应"""
+        self._store.set(key, response, meta={'model': model})
+
+    def clear(self) -> int:
+        """清空缓存，返回删除数量"""
+        return self._store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计（本进程）与当前条目数（全部进程共享）"""
+        return self._store.stats()
+
+
+_llm_cache: LazyStore[LLMResponseCache] = LazyStore(
+    "LLM缓存",
+    enabled=lambda config: config.llm_cache_enabled,
+    factory=lambda config: LLMResponseCache(
+        config.llm_cache_path,
+        ttl=config.llm_cache_ttl,
+        max_entries=config.llm_cache_max_entries,
+    ),
+)
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """
+    获取 LLM 响应缓存（LLM_CACHE_ENABLED=false 或初始化失败时返回 None）
+    """
+    return _llm_cache.get()
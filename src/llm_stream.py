@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+LLM 流式响应增量解析
+===================================
+
+职责：
+1. 逐块接收模型输出，边接收边检查：
+   - 开头若干字符内没有出现 JSON（{ 或 [）→ 判定为无效响应，提前终止
+   - 命中回显题目特征 → 提前终止，不再为无效生成消耗 token
+2. 在 JSON 生成过程中提取已完整输出的关键字段（评分、操作建议、一句话结论等），
+   通过回调推送给调用方（如 Web 任务状态），无需等待完整响应
+"""
+
+import json
+import logging
+import re
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# 增量推送的字段：字段名 → 输出键
+PARTIAL_FIELDS = {
+    'stock_name': 'stock_name',
+    'sentiment_score': 'sentiment_score',
+    'trend_prediction': 'trend_prediction',
+    'operation_advice': 'operation_advice',
+    'one_sentence': 'core_conclusion',
+    'signal_type': 'signal_type',
+}
+# 已完整输出的 字符串/数值 字段值（数值需后跟分隔符才视为完整）
+_FIELD_PATTERNS = {
+    field: re.compile(
+        r'"' + field + r'"\s*:\s*(?:"((?:[^"\\]|\\.)*)"|(-?\d+(?:\.\d+)?)\s*[,}\n])'
+    )
+    for field in PARTIAL_FIELDS
+}
+
+
+class StreamAbort(Exception):
+    """流式响应被提前终止（回显题目或非 JSON 内容）"""
+
+
+class DashboardStreamParser:
+    """
+    决策仪表盘 JSON 流式解析器
+
+    使用方式：
+        parser = DashboardStreamParser(analyzer._is_response_likely_echo, on_partial=callback)
+        for chunk in stream:
+            parser.feed(chunk)          # 判定无效时抛出 StreamAbort
+        text = parser.text
+    """
+
+    def __init__(
+        self,
+        echo_check: Optional[Callable[[str], bool]] = None,
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None,
+        probe_chars: int = 300,
+    ):
+        """
+        Args:
+            echo_check: 回显判断函数（传入已接收文本）
+            on_partial: 提取到新字段时的回调（参数为目前已提取的全部字段）
+            probe_chars: 在前多少个非空白字符内必须出现 JSON 起始符
+        """
+        self.echo_check = echo_check
+        self.on_partial = on_partial
+        self.probe_chars = probe_chars
+        self.partial: Dict[str, Any] = {}
+        self._text = ''
+        self._scanned = 0
+        # 尚未提取的字段 → 其 "字段名" 首次出现的位置（值可能在之后任意多块才输出完整）
+        self._key_positions: Dict[str, int] = {}
+        self._json_started = False
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def feed(self, chunk: str) -> None:
+        """接收一块输出"""
+        if not chunk:
+            return
+        self._text += chunk
+        text = self._text
+        if not self._json_started:
+            self._probe(text)
+        if self._json_started:
+            self._extract(text)
+
+    def _probe(self, text: str) -> None:
+        """JSON 开始前检查回显/无效输出"""
+        stripped = text.lstrip()
+        if stripped.startswith('```'):
+            stripped = stripped.split('\n', 1)[1].lstrip() if '\n' in stripped else ''
+        if stripped[:1] in ('{', '['):
+            self._json_started = True
+            return
+        if self.echo_check is not None and self.echo_check(stripped):
+            raise StreamAbort(f"检测到模型回显题目（已接收 {len(self._text)} 字符）")
+        head = stripped[:self.probe_chars]
+        if '{' in head or '[' in head:
+            self._json_started = True
+        elif len(stripped) >= self.probe_chars:
+            raise StreamAbort(f"前 {self.probe_chars} 字符内没有 JSON 内容")
+
+    def _extract(self, text: str) -> None:
+        """
+        提取已完整输出的关键字段
+
+        每个字段记录其 "字段名" 首次出现的位置，之后从该位置匹配值，
+        字段名与值之间隔多少块都能找到；字段名本身只需回退其长度即可覆盖跨块的情况
+        """
+        scanned = self._scanned
+        self._scanned = len(text)
+        found = False
+        for field, pattern in _FIELD_PATTERNS.items():
+            key = PARTIAL_FIELDS[field]
+            if key in self.partial:
+                continue
+            start = self._key_positions.get(field)
+            if start is None:
+                token = f'"{field}"'
+                start = text.find(token, max(0, scanned - len(token) + 1))
+                if start < 0:
+                    continue
+                self._key_positions[field] = start
+            match = pattern.search(text, start)
+            if match is None:
+                continue
+            if match.group(1) is not None:
+                try:
+                    value: Any = json.loads(f'"{match.group(1)}"')
+                except json.JSONDecodeError:
+                    value = match.group(1)
+            else:
+                number = float(match.group(2))
+                value = int(number) if number.is_integer() else number
+            self.partial[key] = value
+            found = True
+        if found and self.on_partial is not None:
+            try:
+                self.on_partial(dict(self.partial))
+            except Exception as e:
+                logger.debug(f"[LLM流式] 部分结果回调失败: {e}")
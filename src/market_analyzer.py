@@ -218,7 +218,7 @@ class MarketAnalyzer:
 
     def search_market_news(self) -> List[Dict]:
         """
-        搜索市场新闻
+        搜索市场新闻（SearchService.search_market_news，与批量情报在 MARKET_NEWS_TTL 内共用一次搜索）
         
         Returns:
             新闻列表
@@ -227,36 +227,13 @@ class MarketAnalyzer:
             logger.warning("[大盘] 搜索服务未配置，跳过新闻搜索")
             return []
         
-        all_news = []
-        today = datetime.now()
-        date_str = today.strftime('%Y年%m月%d日')
-
-        # 多维度搜索
-        search_queries = [
-            "A股 大盘 复盘",
-            "股市 行情 分析",
-            "A股 市场 热点 板块",
-        ]
-        
         try:
             logger.info("[大盘] 开始搜索市场新闻...")
-            
-            for query in search_queries:
-                # 使用 search_stock_news 方法，传入"大盘"作为股票名
-                response = self.search_service.search_stock_news(
-                    stock_code="market",
-                    stock_name="大盘",
-                    max_results=3,
-                    focus_keywords=query.split()
-                )
-                if response and response.results:
-                    all_news.extend(response.results)
-                    logger.info(f"[大盘] 搜索 '{query}' 获取 {len(response.results)} 条结果")
-            
+            all_news = self.search_service.search_market_news(max_results=3)
             logger.info(f"[大盘] 共获取 {len(all_news)} 条市场新闻")
-            
         except Exception as e:
             logger.error(f"[大盘] 搜索市场新闻失败: {e}")
+            all_news = []
         
         return all_news
     
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+新闻近似去重（MinHash + LSH）
+===================================
+
+财经新闻被大量转载：同一篇稿件换个链接、改几个字就会在各维度的搜索结果里反复出现，
+只按 URL 去重无法识别，导致每个 LLM 提示词里堆满重复内容。
+
+NearDuplicateIndex：
+1. 标题 + 摘要规范化后切成字符 3-gram（中文按字切分效果好于分词）
+2. 每条文本计算 64 维 MinHash 签名（numpy 向量化的乘移位哈希），分成 16 个 band 建立内存 LSH 索引，
+   只与同 band 命中的候选比较，避免两两比较
+3. 估算 Jaccard 相似度 >= 阈值视为同一簇；每簇保留发布时间最新的一条
+
+使用方式：
+    clusters = cluster_results(results)        # [(代表结果, 簇大小)]
+    unique = dedupe_results(results)           # 只保留各簇代表
+"""
+
+import re
+import unicodedata
+import zlib
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from src.search_service import SearchResult
+
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+DEFAULT_THRESHOLD = 0.6
+
+# 乘移位哈希 h(s) = ((a * s + b) mod 2^64) >> 32（a 为奇数），uint64 溢出即取模，可整体向量化
+# 固定种子，保证同一文本在不同进程中的签名一致
+_rng = np.random.default_rng(20240601)
+_PERM_A = (_rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)
+_PERM_B = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64) << np.uint64(1)
+_SHIFT = np.uint64(32)
+
+
+def _normalize(text: str) -> str:
+    """全角转半角、小写，去掉空白与标点"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return re.sub(r'[\W_]+', '', text)
+
+
+def _shingles(text: str) -> Set[int]:
+    normalized = _normalize(text)
+    if len(normalized) <= SHINGLE_SIZE:
+        return {zlib.crc32(normalized.encode('utf-8'))} if normalized else set()
+    return {
+        zlib.crc32(normalized[i:i + SHINGLE_SIZE].encode('utf-8'))
+        for i in range(len(normalized) - SHINGLE_SIZE + 1)
+    }
+
+
+def minhash(text: str) -> Tuple[int, ...]:
+    """计算文本的 MinHash 签名（空文本返回空元组）"""
+    shingles = _shingles(text)
+    if not shingles:
+        return ()
+    values = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+    # (NUM_PERM, 1) × (1, 词项数) 一次算出全部排列下的哈希，逐行取最小值
+    with np.errstate(over='ignore'):
+        hashes = (_PERM_A[:, None] * values[None, :] + _PERM_B[:, None]) >> _SHIFT
+    return tuple(hashes.min(axis=1).tolist())
+
+
+def similarity(sig_a: Sequence[int], sig_b: Sequence[int]) -> float:
+    """由签名估算 Jaccard 相似度"""
+    if not sig_a or not sig_b:
+        return 0.0
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+_DATE_PATTERN = re.compile(r'(\d{4})[-/年.](\d{1,2})[-/月.](\d{1,2})')
+_RELATIVE_PATTERN = re.compile(r'(\d+)\s*(分钟|小时|天|minute|hour|day)s?\s*(前|ago)', re.IGNORECASE)
+
+
+def parse_published(value: Optional[str], now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    解析各引擎的发布时间（ISO 8601 / RFC 2822 / 2025年10月10日 / 3 天前 / 3 days ago），无法解析返回 None
+
+    返回不带时区的本地时间，仅用于比较新旧
+    """
+    if not value:
+        return None
+    text = value.strip()
+    try:
+        parsed = datetime.fromisoformat(text.replace('Z', '+00:00'))
+        return parsed.replace(tzinfo=None)
+    except ValueError:
+        pass
+    try:
+        return parsedate_to_datetime(text).replace(tzinfo=None)
+    except (TypeError, ValueError, IndexError):
+        pass
+    match = _DATE_PATTERN.search(text)
+    if match:
+        try:
+            return datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        except ValueError:
+            return None
+    match = _RELATIVE_PATTERN.search(text)
+    if match:
+        amount = int(match.group(1))
+        unit = match.group(2).lower()
+        if unit in ('分钟', 'minute'):
+            delta = timedelta(minutes=amount)
+        elif unit in ('小时', 'hour'):
+            delta = timedelta(hours=amount)
+        else:
+            delta = timedelta(days=amount)
+        return (now or datetime.now()) - delta
+    return None
+
+
+class NearDuplicateIndex:
+    """
+    近似重复检测的内存索引
+
+    add() 返回文本所属簇的编号（新簇为新编号），同一簇的文本互为近似重复
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self._signatures: List[Tuple[int, ...]] = []
+        self._clusters: List[int] = []
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+        self._cluster_count = 0
+
+    def add(self, text: str) -> int:
+        """加入一条文本，返回其簇编号"""
+        signature = minhash(text)
+        doc_id = len(self._signatures)
+        cluster = None
+        if signature:
+            keys = [
+                (band, signature[band * ROWS:(band + 1) * ROWS])
+                for band in range(BANDS)
+            ]
+            candidates = {other for key in keys for other in self._buckets.get(key, ())}
+            best = 0.0
+            for other in sorted(candidates):
+                score = similarity(signature, self._signatures[other])
+                if score >= self.threshold and score > best:
+                    best = score
+                    cluster = self._clusters[other]
+            for key in keys:
+                self._buckets.setdefault(key, []).append(doc_id)
+        if cluster is None:
+            cluster = self._cluster_count
+            self._cluster_count += 1
+        self._signatures.append(signature)
+        self._clusters.append(cluster)
+        return cluster
+
+
+def result_text(result: 'SearchResult') -> str:
+    """参与相似度计算的文本（标题 + 摘要）"""
+    return f"{result.title} {result.snippet}"
+
+
+def freshest(group: Sequence['SearchResult'], now: Optional[datetime] = None) -> 'SearchResult':
+    """簇内发布时间最新的一条（时间无法解析时保留最先出现的一条）"""
+    now = now or datetime.now()
+    representative = group[0]
+    latest = parse_published(representative.published_date, now)
+    for candidate in group[1:]:
+        published = parse_published(candidate.published_date, now)
+        if published is not None and (latest is None or published > latest):
+            representative, latest = candidate, published
+    return representative
+
+
+def cluster_results(
+    results: Sequence['SearchResult'],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> List[Tuple['SearchResult', int]]:
+    """
+    近似重复聚类
+
+    Returns:
+        [(代表结果, 簇大小)]，按各簇首次出现的顺序排列；
+        代表为簇内发布时间最新的一条（时间无法解析时保留最先出现的一条）
+    """
+    index = NearDuplicateIndex(threshold)
+    members: Dict[int, List['SearchResult']] = {}
+    order: List[int] = []
+    for result in results:
+        cluster = index.add(result_text(result))
+        if cluster not in members:
+            members[cluster] = []
+            order.append(cluster)
+        members[cluster].append(result)
+
+    now = datetime.now()
+    return [(freshest(members[cluster], now), len(members[cluster])) for cluster in order]
+
+
+def dedupe_results(
+    results: Sequence['SearchResult'],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> List['SearchResult']:
+    """近似去重，只保留每簇的代表结果"""
+    return [representative for representative, _ in cluster_results(results, threshold)]
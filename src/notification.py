@@ -14,6 +14,7 @@ A股自选股智能分析系统 - 通知层
    - 邮件 SMTP
    - Pushover（手机/桌面推送）
 """
+import asyncio
 import hashlib
 import hmac
 import logging
@@ -22,7 +23,7 @@ import smtplib
 import re
 import markdown2
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.header import Header
@@ -2307,12 +2308,45 @@ class NotificationService:
         logger.info(f"自定义 Webhook 推送完成：成功 {success_count}/{len(self._custom_webhook_urls)}")
         return success_count > 0
 
-    @staticmethod
-    def _is_dingtalk_webhook(url: str) -> bool:
-        url_lower = (url or "").lower()
-        return 'dingtalk' in url_lower or 'oapi.dingtalk.com' in url_lower
+    async def send_to_custom_async(self, content: str) -> bool:
+        """
+        推送消息到自定义 Webhook（asyncio 版本）
+        
+        多个 Webhook 并发请求；钉钉需分批发送，仍在线程中执行
+        """
+        if not self._custom_webhook_urls:
+            logger.warning("未配置自定义 Webhook，跳过推送")
+            return False
+        try:
+            import httpx
+        except ImportError:
+            return await asyncio.to_thread(self.send_to_custom, content)
+        
+        async def _send_one(client, i: int, url: str) -> bool:
+            try:
+                if self._is_dingtalk_webhook(url):
+                    ok = await asyncio.to_thread(self._send_dingtalk_chunked, url, content, 20000)
+                else:
+                    payload = self._build_custom_webhook_payload(url, content)
+                    ok = await self._post_custom_webhook_async(client, url, payload)
+            except Exception as e:
+                logger.error(f"自定义 Webhook {i+1} 推送异常: {e}")
+                return False
+            if ok:
+                logger.info(f"自定义 Webhook {i+1} 推送成功")
+            else:
+                logger.error(f"自定义 Webhook {i+1} 推送失败")
+            return ok
+        
+        async with httpx.AsyncClient(timeout=30) as client:
+            outcomes = await asyncio.gather(*(
+                _send_one(client, i, url) for i, url in enumerate(self._custom_webhook_urls)
+            ))
+        success_count = sum(1 for ok in outcomes if ok)
+        logger.info(f"自定义 Webhook 推送完成：成功 {success_count}/{len(self._custom_webhook_urls)}")
+        return success_count > 0
 
-    def _post_custom_webhook(self, url: str, payload: dict, timeout: int = 30) -> bool:
+    def _custom_webhook_headers(self) -> Dict[str, str]:
         headers = {
             'Content-Type': 'application/json; charset=utf-8',
             'User-Agent': 'StockAnalysis/1.0',
@@ -2320,8 +2354,25 @@ class NotificationService:
         # 支持 Bearer Token 认证（#51）
         if self._custom_webhook_bearer_token:
             headers['Authorization'] = f'Bearer {self._custom_webhook_bearer_token}'
+        return headers
+
+    async def _post_custom_webhook_async(self, client, url: str, payload: dict) -> bool:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        response = await client.post(url, content=body, headers=self._custom_webhook_headers())
+        if response.status_code == 200:
+            return True
+        logger.error(f"自定义 Webhook 推送失败: HTTP {response.status_code}")
+        logger.debug(f"响应内容: {response.text[:200]}")
+        return False
+
+    @staticmethod
+    def _is_dingtalk_webhook(url: str) -> bool:
+        url_lower = (url or "").lower()
+        return 'dingtalk' in url_lower or 'oapi.dingtalk.com' in url_lower
+
+    def _post_custom_webhook(self, url: str, payload: dict, timeout: int = 30) -> bool:
         body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
-        response = requests.post(url, data=body, headers=headers, timeout=timeout)
+        response = requests.post(url, data=body, headers=self._custom_webhook_headers(), timeout=timeout)
         if response.status_code == 200:
             return True
         logger.error(f"自定义 Webhook 推送失败: HTTP {response.status_code}")
@@ -2876,27 +2927,12 @@ class NotificationService:
         for channel in self._available_channels:
             channel_name = ChannelDetector.get_channel_name(channel)
             try:
-                if channel == NotificationChannel.WECHAT:
-                    result = self.send_to_wechat(content)
-                elif channel == NotificationChannel.FEISHU:
-                    result = self.send_to_feishu(content)
-                elif channel == NotificationChannel.TELEGRAM:
-                    result = self.send_to_telegram(content)
-                elif channel == NotificationChannel.EMAIL:
-                    result = self.send_to_email(content)
-                elif channel == NotificationChannel.PUSHOVER:
-                    result = self.send_to_pushover(content)
-                elif channel == NotificationChannel.PUSHPLUS:
-                    result = self.send_to_pushplus(content)
-                elif channel == NotificationChannel.CUSTOM:
-                    result = self.send_to_custom(content)
-                elif channel == NotificationChannel.DISCORD:
-                    result = self.send_to_discord(content)
-                elif channel == NotificationChannel.ASTRBOT:
-                    result = self.send_to_astrbot(content)
-                else:
+                sender = self._channel_sender(channel)
+                if sender is None:
                     logger.warning(f"不支持的通知渠道: {channel}")
                     result = False
+                else:
+                    result = sender(content)
                 
                 if result:
                     success_count += 1
@@ -2910,6 +2946,61 @@ class NotificationService:
         logger.info(f"通知发送完成：成功 {success_count} 个，失败 {fail_count} 个")
         return success_count > 0 or context_success
     
+    def _channel_sender(self, channel: NotificationChannel) -> Optional[Callable[[str], bool]]:
+        """渠道对应的发送方法，不支持的渠道返回 None"""
+        return {
+            NotificationChannel.WECHAT: self.send_to_wechat,
+            NotificationChannel.FEISHU: self.send_to_feishu,
+            NotificationChannel.TELEGRAM: self.send_to_telegram,
+            NotificationChannel.EMAIL: self.send_to_email,
+            NotificationChannel.PUSHOVER: self.send_to_pushover,
+            NotificationChannel.PUSHPLUS: self.send_to_pushplus,
+            NotificationChannel.CUSTOM: self.send_to_custom,
+            NotificationChannel.DISCORD: self.send_to_discord,
+            NotificationChannel.ASTRBOT: self.send_to_astrbot,
+        }.get(channel)
+    
+    async def send_async(self, content: str) -> bool:
+        """
+        统一发送接口（asyncio 版本，供异步流水线使用）
+        
+        各渠道并发发送：自定义 Webhook 使用 httpx 异步请求，
+        其余渠道（SDK/SMTP/分段发送）在线程中执行
+        
+        Returns:
+            是否至少有一个渠道发送成功
+        """
+        context_success = await asyncio.to_thread(self.send_to_context, content)
+
+        if not self._available_channels:
+            if context_success:
+                logger.info("已通过消息上下文渠道完成推送（无其他通知渠道）")
+                return True
+            logger.warning("通知服务不可用，跳过推送")
+            return False
+        
+        logger.info(f"正在向 {len(self._available_channels)} 个渠道并发发送通知：{self.get_channel_names()}")
+        
+        async def _send_one(channel: NotificationChannel) -> bool:
+            channel_name = ChannelDetector.get_channel_name(channel)
+            try:
+                if channel == NotificationChannel.CUSTOM:
+                    return await self.send_to_custom_async(content)
+                sender = self._channel_sender(channel)
+                if sender is None:
+                    logger.warning(f"不支持的通知渠道: {channel}")
+                    return False
+                return await asyncio.to_thread(sender, content)
+            except Exception as e:
+                logger.error(f"{channel_name} 发送失败: {e}")
+                return False
+        
+        outcomes = await asyncio.gather(*(_send_one(channel) for channel in self._available_channels))
+        success_count = sum(1 for ok in outcomes if ok)
+        
+        logger.info(f"通知发送完成：成功 {success_count} 个，失败 {len(outcomes) - success_count} 个")
+        return success_count > 0 or context_success
+    
     def _send_chunked_messages(self, content: str, max_length: int) -> bool:
         """
         分段发送长消息
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+提示词 token 预算
+===================================
+
+职责：
+1. 估算文本 token 数（中文按 1 字 1 token，其余按 4 字符 1 token 粗略估算）
+2. 舆情情报排序：SearchService.build_intel_digest 直接传入搜索结果与近似去重簇
+   （src/news_dedup），这里按「维度优先级 + 维度内排名」排序，
+   预算不足时优先保留风险排查与最新消息的头部条目
+3. 超出预算时逐级压缩：
+   - Markdown 表格压缩为「指标: 数值（说明）」列表，去掉 N/A 行
+   - 按价值从低到高删除章节（量价变化 → 系统分析理由 → 筹码分布）
+   - 最后按排序裁剪舆情条目
+
+使用方式：
+- 配置 LLM_PROMPT_TOKEN_BUDGET（默认 0 表示不限制）
+"""
+
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple, Union
+
+
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]')
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """粗略估算 token 数（不依赖具体模型的分词器）"""
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+# ========== 舆情情报 ==========
+
+# 维度优先级（越靠前越重要），对应 SearchService 的情报维度名
+NEWS_DIMENSION_PRIORITY = ['risk_check', 'latest_news', 'earnings', 'market_analysis', 'industry']
+
+
+@dataclass
+class NewsItem:
+    """单条情报（近似去重后的簇代表）"""
+    dimension: int  # 所属维度在摘要中的序号
+    position: int  # 维度内排名（0 起）
+    title: str
+    snippet: str = ""
+    published_date: Optional[str] = None
+    similar: int = 0  # 被合并的相似报道数
+
+    def render(self, index: int) -> str:
+        similar_str = f"（另有 {self.similar} 条相似报道）" if self.similar else ""
+        date_str = f" [{self.published_date}]" if self.published_date else ""
+        lines = [f"  {index}. {self.title}{similar_str}{date_str}"]
+        if self.snippet:
+            lines.append(f"     {self.snippet}...")
+        return "\n".join(lines)
+
+
+@dataclass
+class NewsDimension:
+    """情报维度：name 为维度名（如 risk_check），title 为报告中的维度标题行"""
+    name: str
+    title: str
+    note: str = ""  # 没有条目时展示的说明（未找到相关信息 / 与上文报道重复）
+
+
+class NewsDigest:
+    """
+    结构化情报摘要：由 SearchService.build_intel_digest 根据搜索结果与去重簇直接构建，
+    按「维度优先级 + 维度内排名」排序并按预算渲染
+
+    其他来源的舆情文本用 from_text 包装，按原文处理，超出预算时按字符截断
+    """
+
+    def __init__(
+        self,
+        header: str = "",
+        dimensions: Optional[List[NewsDimension]] = None,
+        items: Optional[List[NewsItem]] = None,
+        duplicates: int = 0,
+        text: Optional[str] = None,
+    ):
+        self.header = header
+        self.dimensions: List[NewsDimension] = dimensions or []
+        self.items: List[NewsItem] = items or []
+        self.duplicates = duplicates
+        self.text = text
+
+    @classmethod
+    def from_text(cls, text: str) -> 'NewsDigest':
+        """包装无结构的舆情文本"""
+        return cls(text=text)
+
+    @classmethod
+    def coerce(cls, news: Union[str, 'NewsDigest', None]) -> Optional['NewsDigest']:
+        """调用方传入的舆情（结构化摘要或原始文本）统一为 NewsDigest"""
+        if not news:
+            return None
+        return news if isinstance(news, cls) else cls.from_text(news)
+
+    def __str__(self) -> str:
+        return self.render()
+
+    def _dimension_rank(self, dimension: int) -> int:
+        name = self.dimensions[dimension].name
+        if name in NEWS_DIMENSION_PRIORITY:
+            return NEWS_DIMENSION_PRIORITY.index(name)
+        return len(NEWS_DIMENSION_PRIORITY)
+
+    def ranked(self, items: List[NewsItem]) -> List[NewsItem]:
+        """先保证每个维度的头部条目，再按维度优先级轮流补充"""
+        return sorted(items, key=lambda item: (item.position, self._dimension_rank(item.dimension)))
+
+    def render(self, max_tokens: Optional[int] = None) -> str:
+        """
+        渲染为提示词文本
+
+        Args:
+            max_tokens: token 上限（None 表示不限制）
+        """
+        if self.text is not None:
+            if max_tokens is None or estimate_tokens(self.text) <= max_tokens:
+                return self.text
+            # 中文为主，按 1 字 1 token 截断
+            return self.text[:max(max_tokens, 0)] + "\n...(已截断)"
+
+        selected = self.items
+        if max_tokens is not None:
+            budget = max_tokens - estimate_tokens(self.header)
+            chosen = []
+            for item in self.ranked(self.items):
+                cost = estimate_tokens(item.render(0)) + 1
+                if cost > budget and chosen:
+                    break
+                chosen.append(item)
+                budget -= cost
+            selected = chosen
+
+        lines = [self.header] if self.header else []
+        for dim, dimension in enumerate(self.dimensions):
+            items = sorted((item for item in selected if item.dimension == dim), key=lambda item: item.position)
+            if items:
+                lines.append(f"\n{dimension.title}")
+                lines.extend(item.render(i) for i, item in enumerate(items, 1))
+            elif dimension.note and max_tokens is None:
+                lines.append(f"\n{dimension.title}")
+                lines.append(f"  {dimension.note}")
+        omitted = len(self.items) - len(selected)
+        if omitted:
+            lines.append(f"（另有 {omitted} 条较低优先级情报已省略）")
+        return "\n".join(lines)
+
+
+# ========== 技术面章节 ==========
+
+# 超出预算时依次删除的章节（标题关键字，价值从低到高）
+LOW_VALUE_SECTIONS = ['量价变化', '系统分析理由', '筹码分布数据']
+
+_TABLE_SEPARATOR = re.compile(r'^\|[\s\-:|]+\|$')
+
+
+def _table_cells(line: str) -> List[str]:
+    return [cell.strip().replace('**', '') for cell in line.strip().strip('|').split('|')]
+
+
+def compact_tables(text: str) -> str:
+    """
+    Markdown 表格压缩为列表：「- 指标: 数值（说明）」
+
+    表头与分隔行删除，数值为 N/A 的行删除
+    """
+    lines = text.split('\n')
+    output: List[str] = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        is_table = (
+            line.startswith('|')
+            and i + 1 < len(lines)
+            and _TABLE_SEPARATOR.match(lines[i + 1].strip())
+        )
+        if not is_table:
+            output.append(line)
+            i += 1
+            continue
+        i += 2  # 跳过表头与分隔行
+        while i < len(lines) and lines[i].startswith('|'):
+            cells = _table_cells(lines[i])
+            i += 1
+            if len(cells) < 2 or not cells[1] or cells[1].startswith('N/A'):
+                continue
+            note = '，'.join(cell for cell in cells[2:] if cell)
+            output.append(f"- {cells[0]}: {cells[1]}" + (f"（{note}）" if note else ""))
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(output))
+
+
+def drop_section(text: str, keyword: str) -> str:
+    """删除标题包含 keyword 的章节（到下一个同级或更高级标题/分隔线为止）"""
+    lines = text.split('\n')
+    output: List[str] = []
+    dropping_level = 0
+    for line in lines:
+        heading = re.match(r'^(#+) ', line)
+        if dropping_level:
+            if (heading and len(heading.group(1)) <= dropping_level) or line.strip() == '---':
+                dropping_level = 0
+            else:
+                continue
+        if heading and keyword in line:
+            dropping_level = len(heading.group(1))
+            continue
+        output.append(line)
+    return '\n'.join(output)
+
+
+@dataclass
+class BudgetReport:
+    """一次预算裁剪的统计"""
+    tokens_before: int
+    tokens_after: int
+    news_duplicates: int = 0
+    actions: Tuple[str, ...] = ()
+
+    def describe(self) -> str:
+        actions = '、'.join(self.actions) if self.actions else '无'
+        return (
+            f"{self.tokens_before} → {self.tokens_after} tokens"
+            f"（舆情去重 {self.news_duplicates} 条，压缩操作: {actions}）"
+        )
+
+
+def fit_prompt(
+    context_text: str,
+    digest: Optional[NewsDigest],
+    fixed_tokens: int,
+    budget: int,
+    min_news_share: float = 0.4,
+) -> Tuple[str, str, BudgetReport]:
+    """
+    在预算内组合 技术面章节 + 舆情
+
+    顺序：表格压缩 → 删除低价值章节（舆情至少保留 min_news_share 的可用预算）→ 裁剪舆情
+
+    Args:
+        context_text: 技术面部分（Markdown）
+        digest: 舆情摘要（可为 None）
+        fixed_tokens: 其余固定部分（舆情说明、分析任务）的 token 数
+        budget: 总 token 预算（<=0 不限制）
+
+    Returns:
+        (技术面文本, 舆情文本, 统计)
+    """
+    news_text = digest.render() if digest else ""
+    duplicates = digest.duplicates if digest else 0
+    tokens_before = estimate_tokens(context_text) + estimate_tokens(news_text) + fixed_tokens
+    if budget <= 0 or tokens_before <= budget:
+        return context_text, news_text, BudgetReport(tokens_before, tokens_before, duplicates)
+
+    actions: List[str] = []
+    available = budget - fixed_tokens
+    news_tokens = estimate_tokens(news_text)
+    news_floor = min(news_tokens, int(available * min_news_share))
+
+    context_text = compact_tables(context_text)
+    actions.append('表格压缩')
+    for keyword in LOW_VALUE_SECTIONS:
+        if estimate_tokens(context_text) + news_floor <= available:
+            break
+        shorter = drop_section(context_text, keyword)
+        if shorter != context_text:
+            context_text = shorter
+            actions.append(f'删除「{keyword}」')
+
+    news_budget = available - estimate_tokens(context_text)
+    if digest and news_tokens > news_budget:
+        news_text = digest.render(max_tokens=max(news_budget, 0))
+        actions.append('裁剪舆情')
+
+    tokens_after = estimate_tokens(context_text) + estimate_tokens(news_text) + fixed_tokens
+    return context_text, news_text, BudgetReport(tokens_before, tokens_after, duplicates, tuple(actions))
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+全市场技术面筛选
+===================================
+
+职责：
+1. 基于全市场实时行情快照（RealtimeSnapshot）向量化初筛：
+   剔除非 A 股/ST/停牌/成交清淡/当日涨幅过大的股票，按成交额保留前 N 只
+2. 对初筛结果构建指标面板，批量套用 StockTrendAnalyzer 规则
+   （多头排列、乖离率 < 5%、缩量回调）
+3. 按信号评分排序，只把排名靠前的股票交给 AI 分析，降低 LLM 调用量
+
+盘中运行时，最新交易日的日线尚未入库，以快照价格作为当日 K 线参与计算，
+当日成交量按 量比 × 前 5 日均量 折算（实时行情与日线的成交量单位不一定一致）。
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.indicators import IndicatorPanel
+from src.stock_analyzer import StockTrendAnalyzer, TrendAnalysisResult, TrendStatus, VolumeStatus
+
+logger = logging.getLogger(__name__)
+
+
+# 沪深主板/创业板/科创板代码前缀（排除 ETF、B 股、北交所）
+A_SHARE_PREFIXES = ('600', '601', '603', '605', '688', '000', '001', '002', '003', '300', '301')
+# 入选的趋势状态（MA5 > MA10 > MA20）
+SCREEN_TREND_STATUSES = (TrendStatus.STRONG_BULL, TrendStatus.BULL)
+# 快照价格与最新收盘价一致的股票占比达到该比例时，视为快照停留在上一交易日（样本过少时不判断）
+STALE_SNAPSHOT_RATIO = 0.9
+STALE_SNAPSHOT_MIN_CODES = 20
+
+
+@dataclass
+class ScreenCandidate:
+    """筛选入选股票"""
+    code: str
+    name: str
+    price: float
+    change_pct: float
+    amount: float
+    trend: TrendAnalysisResult
+
+    @property
+    def score(self) -> int:
+        return self.trend.signal_score
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'code': self.code,
+            'name': self.name,
+            'price': self.price,
+            'change_pct': self.change_pct,
+            'amount': self.amount,
+            'trend_status': self.trend.trend_status.value,
+            'bias_ma5': self.trend.bias_ma5,
+            'volume_status': self.trend.volume_status.value,
+            'buy_signal': self.trend.buy_signal.value,
+            'signal_score': self.trend.signal_score,
+        }
+
+
+class MarketScreener:
+    """
+    全市场技术面筛选器
+
+    使用方式：
+        screener = MarketScreener(min_amount=1e8, prefilter_limit=300)
+        spot = screener.prefilter(snapshot)
+        history = db.get_history_frames(spot['code'].tolist(), days=120)
+        candidates = screener.rank(spot, history, top_n=10)
+    """
+
+    def __init__(
+        self,
+        trend_analyzer: Optional[StockTrendAnalyzer] = None,
+        min_amount: float = 1e8,
+        prefilter_limit: int = 300,
+    ):
+        """
+        Args:
+            trend_analyzer: 趋势分析器（可选，默认新建）
+            min_amount: 当日最低成交额（元）
+            prefilter_limit: 初筛后保留的股票数（按成交额从高到低）
+        """
+        self.trend_analyzer = trend_analyzer or StockTrendAnalyzer()
+        self.min_amount = min_amount
+        self.prefilter_limit = prefilter_limit
+
+    def prefilter(self, snapshot) -> pd.DataFrame:
+        """
+        基于全市场快照的向量化初筛
+
+        Args:
+            snapshot: RealtimeSnapshot
+
+        Returns:
+            DataFrame（code/name/price/change_pct/amount/high/volume_ratio/change_60d），按成交额降序
+        """
+        n = len(snapshot)
+
+        def column(name: str) -> np.ndarray:
+            return snapshot.columns.get(name, np.full(n, np.nan))
+
+        spot = pd.DataFrame({
+            'code': snapshot.codes,
+            'name': snapshot.names,
+            'price': column('price'),
+            'change_pct': column('change_pct'),
+            'amount': column('amount'),
+            'high': column('high'),
+            'volume_ratio': column('volume_ratio'),
+            'change_60d': column('change_60d'),
+        })
+        spot = spot.drop_duplicates('code')
+
+        mask = (
+            spot['code'].str.fullmatch(r'\d{6}')
+            & spot['code'].str.startswith(A_SHARE_PREFIXES)
+            & ~spot['name'].str.contains('ST|退', regex=True)
+            & (spot['price'] > 0)                       # 停牌无最新价
+            & (spot['amount'] >= self.min_amount)
+            # 当日涨幅已超过乖离率阈值的不追高
+            & (spot['change_pct'] < self.trend_analyzer.BIAS_THRESHOLD)
+            # 60 日跌幅为负的中期趋势向下，难以形成多头排列（数据源无该字段时不剔除）
+            & ~(spot['change_60d'] <= 0)
+        )
+
+        result = spot[mask].sort_values('amount', ascending=False).head(self.prefilter_limit)
+        logger.info(f"[筛选] 全市场 {n} 只，初筛保留 {len(result)} 只")
+        return result.reset_index(drop=True)
+
+    @staticmethod
+    def with_spot_bars(history: pd.DataFrame, spot: pd.DataFrame, today: Optional[date] = None) -> pd.DataFrame:
+        """
+        盘中为最新交易日日线尚未入库的股票追加一根以快照价格构造的当日 K 线
+
+        调用方负责确认当前处于交易时段且快照为当日数据（见 StockAnalysisPipeline.screen_market）；
+        快照价格与已入库的最新收盘价几乎全部一致时，视为快照仍停留在上一交易日
+        （工作日休市或数据源未刷新），不追加
+
+        Args:
+            history: 多股票日线长表（DatabaseManager.get_history_frames）
+            spot: 初筛结果
+            today: 当前日期（默认今天；周末不追加）
+        """
+        today = today or date.today()
+        if history.empty or today.weekday() >= 5:
+            return history
+
+        grouped = history.groupby('code')
+        last_dates = grouped['date'].max().dt.date
+        last_close = history.sort_values('date').groupby('code')['close'].last()
+        avg_volume_5d = grouped.tail(5).groupby('code')['volume'].mean()
+
+        spot = spot.set_index('code')
+        codes = last_dates.index[last_dates < today].intersection(spot.index)
+        if codes.empty:
+            return history
+
+        spot = spot.loc[codes]
+        price = spot['price']
+        unchanged = np.isclose(price.to_numpy(), last_close.reindex(codes).to_numpy(), rtol=0, atol=1e-6)
+        if len(codes) >= STALE_SNAPSHOT_MIN_CODES and unchanged.mean() >= STALE_SNAPSHOT_RATIO:
+            logger.info(f"[筛选] 快照价格与最新收盘价一致（{unchanged.mean():.0%}），判定为非交易日快照，不追加当日 K 线")
+            return history
+
+        bars = pd.DataFrame({
+            'code': codes,
+            'date': pd.Timestamp(today),
+            'close': price.to_numpy(),
+            'high': spot['high'].fillna(price).to_numpy(),
+            'volume': (spot['volume_ratio'] * avg_volume_5d.reindex(codes)).to_numpy(),
+        })
+        return pd.concat([history, bars], ignore_index=True)
+
+    def rank(self, spot: pd.DataFrame, history: pd.DataFrame, top_n: int = 10) -> List[ScreenCandidate]:
+        """
+        批量套用趋势规则并排序
+
+        入选条件：多头排列（MA5 > MA10 > MA20）且 MA5 乖离率 < BIAS_THRESHOLD；
+        按信号评分降序，同分时缩量回调优先，再按成交额
+
+        Args:
+            spot: 初筛结果
+            history: 多股票日线长表（可含 with_spot_bars 追加的当日 K 线）
+            top_n: 返回数量
+
+        Returns:
+            ScreenCandidate 列表（已排序）
+        """
+        if spot.empty or history.empty:
+            return []
+
+        panel = IndicatorPanel.from_long_frame(history)
+        results = self.trend_analyzer.analyze_batch(panel)
+
+        table = pd.DataFrame({
+            'code': panel.codes,
+            'aligned': [r.trend_status in SCREEN_TREND_STATUSES for r in results],
+            'bias_ma5': [r.bias_ma5 for r in results],
+            'signal_score': [r.signal_score for r in results],
+            'shrink_pullback': [r.volume_status == VolumeStatus.SHRINK_VOLUME_DOWN for r in results],
+            'result_index': np.arange(len(results)),
+        })
+        table = table[table['aligned'] & (table['bias_ma5'] < self.trend_analyzer.BIAS_THRESHOLD)]
+        table = table.merge(spot, on='code')
+        table = table.sort_values(
+            ['signal_score', 'shrink_pullback', 'amount'], ascending=False
+        ).head(top_n)
+        logger.info(f"[筛选] {len(panel)} 只股票完成趋势评分，{len(table)} 只入选")
+
+        return [
+            ScreenCandidate(
+                code=row.code,
+                name=row.name,
+                price=float(row.price),
+                change_pct=float(row.change_pct),
+                amount=float(row.amount),
+                trend=results[row.result_index],
+            )
+            for row in table.itertuples(index=False)
+        ]
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+新闻搜索结果缓存（按规范化查询寻址）
+===================================
+
+设计目标：
+同一交易日内每次运行都会对每只股票重复发出相同的 Bocha/Tavily/SerpAPI 查询
+（如 "{name} 业绩预告 财报 营收..."），而新闻在一天内变化很慢，
+重复请求既消耗付费额度，又让每只股票多等几秒。
+
+SearchResultCache 以 sha256(引擎 + 时间范围 + 规范化查询) 为键，
+把成功的搜索结果保存在本地 SQLite 文件（存储、TTL 与淘汰见 src/ttl_store.TTLStore）：
+1. 查询规范化：全角转半角、小写、合并空白、词项去重排序，词序不同的相同查询命中同一条
+2. TTL 由调用方按维度指定（风险排查/业绩预期可保留数小时，最新消息较短）
+3. 缓存条数 >= 请求条数时才算命中
+
+使用方式：
+- 配置 SEARCH_CACHE_ENABLED=true 开启（默认关闭）
+- get_search_cache() 未开启时返回 None，调用方直接请求搜索引擎
+"""
+
+import hashlib
+import json
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+from src.ttl_store import LazyStore, TTLStore
+
+
+def normalize_query(query: str) -> str:
+    """规范化查询：NFKC（全角转半角）、小写、词项去重并排序"""
+    text = unicodedata.normalize('NFKC', query).lower()
+    return ' '.join(sorted(set(text.split())))
+
+
+class SearchResultCache:
+    """
+    搜索结果缓存：值为结果列表（JSON），元数据记录引擎、查询与请求条数（存储委托给 TTLStore）
+    """
+
+    def __init__(self, path: str, ttl: float = 1800, max_entries: int = 5000):
+        """
+        Args:
+            path: SQLite 文件路径
+            ttl: 默认有效期（秒），调用方可按查询覆盖
+            max_entries: 最多保留的条目数
+        """
+        self._store = TTLStore(path, ttl, max_entries)
+        self.path = self._store.path
+
+    @staticmethod
+    def make_key(provider: str, query: str, days: int) -> str:
+        """计算缓存键（引擎 + 时间范围 + 规范化查询）"""
+        payload = json.dumps([provider, days, normalize_query(query)], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str, max_results: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        读取未过期的结果列表
+
+        缓存时请求的条数少于 max_results 且结果数也不足时视为未命中
+        """
+        parsed: Dict[str, List[Dict[str, Any]]] = {}
+
+        def enough(value: str, meta: Dict[str, Any]) -> bool:
+            parsed['items'] = json.loads(value)
+            return meta.get('max_results', 0) >= max_results or len(parsed['items']) >= max_results
+
+        if self._store.get(key, accept=enough) is None:
+            return None
+        return parsed['items'][:max_results]
+
+    def set(
+        self,
+        key: str,
+        provider: str,
+        query: str,
+        max_results: int,
+        items: List[Dict[str, Any]],
+        ttl: Optional[float] = None,
+    ) -> None:
+        """写入结果"""
+        self._store.set(
+            key,
+            json.dumps(items, ensure_ascii=False),
+            meta={'provider': provider, 'query': query, 'max_results': max_results},
+            ttl=ttl,
+        )
+
+    def clear(self) -> int:
+        """清空缓存，返回删除数量"""
+        return self._store.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计（本进程）与当前条目数（全部进程共享）"""
+        return self._store.stats()
+
+
+_search_cache: LazyStore[SearchResultCache] = LazyStore(
+    "搜索缓存",
+    enabled=lambda config: config.search_cache_enabled,
+    factory=lambda config: SearchResultCache(
+        config.search_cache_path,
+        ttl=config.search_cache_ttl,
+        max_entries=config.search_cache_max_entries,
+    ),
+)
+
+
+def get_search_cache() -> Optional[SearchResultCache]:
+    """
+    获取搜索结果缓存（SEARCH_CACHE_ENABLED=false 或初始化失败时返回 None）
+    """
+    return _search_cache.get()
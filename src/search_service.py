@@ -11,20 +11,42 @@ A股自选股智能分析系统 - 搜索服务模块
 4. 搜索结果缓存和格式化
 """
 
+import asyncio
+import json
 import logging
+import math
 import random
+import threading
 import time
 from abc import ABC, abstractmethod
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
-from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
+from dataclasses import asdict, dataclass, field
 from datetime import datetime
-from typing import List, Dict, Any, Optional
-from itertools import cycle
+from typing import List, Dict, Any, Mapping, Optional, Tuple
 import requests
 from newspaper import Article, Config
 
+from src.key_pool import KeyPool, RateLimitInfo, classify_failure, parse_rate_headers
+from src.news_dedup import NearDuplicateIndex, dedupe_results, freshest, result_text
+from src.prompt_budget import NewsDigest, NewsDimension, NewsItem
+from src.search_cache import SearchResultCache, get_search_cache
+
 logger = logging.getLogger(__name__)
 
+# 多维度情报搜索的共享截止时间（秒）：各维度并发执行，到点仍未返回的维度记为超时
+INTEL_SEARCH_DEADLINE = 15
+# 情报维度的搜索缓存有效期（秒，SEARCH_CACHE_ENABLED=true 时生效）：风险与业绩类消息变化慢，可保留更久
+INTEL_CACHE_TTL = {
+    'latest_news': 1800,
+    'market_analysis': 4 * 3600,
+    'risk_check': 4 * 3600,
+    'earnings': 6 * 3600,
+    'industry': 12 * 3600,
+}
+# 市场新闻（search_market_news）在进程内复用的时长（秒）：批量情报与紧随其后的大盘复盘共用一次搜索，
+# 长期运行的 WebUI/机器人进程中盘后复盘仍会重新搜索
+MARKET_NEWS_TTL = INTEL_CACHE_TTL['latest_news']
+
 
 def fetch_url_content(url: str, timeout: int = 3) -> str:
     """
@@ -81,6 +103,8 @@ class SearchResponse:
     success: bool = True
     error_message: Optional[str] = None
     search_time: float = 0.0  # 搜索耗时（秒）
+    status_code: Optional[int] = None  # HTTP 状态码（失败时用于判断限流/额度）
+    rate_limit: Optional[RateLimitInfo] = None  # 响应头中的限流窗口/额度信息
     
     def to_context(self, max_results: int = 5) -> str:
         """将搜索结果转换为可用于 AI 分析的上下文"""
@@ -97,19 +121,29 @@ class SearchResponse:
 class BaseSearchProvider(ABC):
     """搜索引擎基类"""
     
-    def __init__(self, api_keys: List[str], name: str):
+    # 所有 Key 限流/冷却时，最多等待的秒数（超过则直接失败，交给下一个搜索引擎）
+    KEY_WAIT_LIMIT = 5.0
+    
+    def __init__(
+        self,
+        api_keys: List[str],
+        name: str,
+        rate_per_minute: float = 30.0,
+        burst: int = 5,
+    ):
         """
         初始化搜索引擎
         
         Args:
             api_keys: API Key 列表（支持多个 key 负载均衡）
             name: 搜索引擎名称
+            rate_per_minute: 每个 Key 每分钟的请求数上限
+            burst: 每个 Key 允许的突发请求数
         """
         self._api_keys = api_keys
         self._name = name
-        self._key_cycle = cycle(api_keys) if api_keys else None
-        self._key_usage: Dict[str, int] = {key: 0 for key in api_keys}
-        self._key_errors: Dict[str, int] = {key: 0 for key in api_keys}
+        # Key 调度池（令牌桶限速、限流冷却、额度跟踪），多个流水线线程共享
+        self._key_pool = KeyPool(name, api_keys, rate_per_minute=rate_per_minute, burst=burst)
     
     @property
     def name(self) -> str:
@@ -120,91 +154,253 @@ class BaseSearchProvider(ABC):
         """检查是否有可用的 API Key"""
         return bool(self._api_keys)
     
-    def _get_next_key(self) -> Optional[str]:
+    @property
+    def key_stats(self) -> Dict[str, Any]:
+        """各 Key 的调度状态（Key 已脱敏）"""
+        return self._key_pool.stats()
+    
+    def _get_next_key(self) -> Tuple[Optional[str], Optional[str]]:
         """
         获取下一个可用的 API Key（负载均衡）
         
-        策略：轮询 + 跳过错误过多的 key
+        策略：按剩余令牌、健康度与剩余额度加权选择；
+        所有 Key 暂时不可用时最多等待 KEY_WAIT_LIMIT 秒
+        
+        Returns:
+            (key, 错误信息)
         """
-        if not self._key_cycle:
-            return None
-        
-        # 最多尝试所有 key
-        for _ in range(len(self._api_keys)):
-            key = next(self._key_cycle)
-            # 跳过错误次数过多的 key（超过 3 次）
-            if self._key_errors.get(key, 0) < 3:
-                return key
-        
-        # 所有 key 都有问题，重置错误计数并返回第一个
-        logger.warning(f"[{self._name}] 所有 API Key 都有错误记录，重置错误计数")
-        self._key_errors = {key: 0 for key in self._api_keys}
-        return self._api_keys[0] if self._api_keys else None
+        if not self._api_keys:
+            return None, f"{self._name} 未配置 API Key"
+        deadline = time.monotonic() + self.KEY_WAIT_LIMIT
+        while True:
+            key, wait = self._key_pool.acquire()
+            if key is not None:
+                return key, None
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                return None, self._keys_unavailable(wait)
+            time.sleep(wait)
+    
+    async def _get_next_key_async(self) -> Tuple[Optional[str], Optional[str]]:
+        """获取下一个可用的 API Key（asyncio 版本，等待时不阻塞事件循环）"""
+        if not self._api_keys:
+            return None, f"{self._name} 未配置 API Key"
+        deadline = time.monotonic() + self.KEY_WAIT_LIMIT
+        while True:
+            key, wait = self._key_pool.acquire()
+            if key is not None:
+                return key, None
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                return None, self._keys_unavailable(wait)
+            await asyncio.sleep(wait)
     
-    def _record_success(self, key: str) -> None:
-        """记录成功使用"""
-        self._key_usage[key] = self._key_usage.get(key, 0) + 1
-        # 成功后减少错误计数
-        if key in self._key_errors and self._key_errors[key] > 0:
-            self._key_errors[key] -= 1
+    def _keys_unavailable(self, wait: float) -> str:
+        logger.warning(f"[{self._name}] 所有 API Key 限流或冷却中")
+        if math.isinf(wait):
+            return f"{self._name} 所有 API Key 均不可用（额度耗尽或 Key 无效）"
+        return f"{self._name} 所有 API Key 限流或冷却中，约 {wait:.0f}s 后恢复"
     
-    def _record_error(self, key: str) -> None:
-        """记录错误"""
-        self._key_errors[key] = self._key_errors.get(key, 0) + 1
-        logger.warning(f"[{self._name}] API Key {key[:8]}... 错误计数: {self._key_errors[key]}")
+    def _record_success(self, key: str, response: Optional[SearchResponse] = None) -> None:
+        """记录成功使用（附带响应头中的限流窗口/额度信息）"""
+        self._key_pool.report_success(key, response.rate_limit if response else None)
+    
+    def _record_error(
+        self,
+        key: str,
+        response: Optional[SearchResponse] = None,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        """记录错误（按状态码/错误信息区分限流、额度耗尽、Key 无效与普通错误）"""
+        if response is not None:
+            kind = classify_failure(response.status_code, response.error_message)
+            self._key_pool.report_failure(key, kind, rate_info=response.rate_limit)
+        else:
+            self._key_pool.report_failure(key, classify_failure(None, str(error) if error else None))
     
     @abstractmethod
     def _do_search(self, query: str, api_key: str, max_results: int, days: int = 7) -> SearchResponse:
         """执行搜索（子类实现）"""
         pass
     
-    def search(self, query: str, max_results: int = 5, days: int = 7) -> SearchResponse:
+    def _get_cached(self, query: str, max_results: int, days: int) -> Tuple[Optional[SearchResponse], Optional[str]]:
         """
-        执行搜索
+        查询搜索结果缓存（SEARCH_CACHE_ENABLED=false 或缓存异常时视为未命中）
         
-        Args:
-            query: 搜索关键词
-            max_results: 最大返回结果数
-            days: 搜索最近几天的时间范围（默认7天）
-            
         Returns:
-            SearchResponse 对象
+            (缓存的响应, key)
+        """
+        cache = get_search_cache()
+        if cache is None:
+            return None, None
+        key = SearchResultCache.make_key(self._name, query, days)
+        try:
+            items = cache.get(key, max_results)
+        except Exception as e:
+            logger.warning(f"[搜索缓存] 读取失败，直接请求: {e}")
+            return None, key
+        if items is None:
+            return None, key
+        logger.info(f"[{self._name}] 搜索 '{query}' 命中缓存，{len(items)} 条结果")
+        return SearchResponse(
+            query=query,
+            results=[SearchResult(**item) for item in items],
+            provider=self._name,
+            success=True,
+        ), key
+    
+    def _store_cached(
+        self,
+        key: Optional[str],
+        query: str,
+        max_results: int,
+        response: SearchResponse,
+        cache_ttl: Optional[float],
+    ) -> None:
+        """写入搜索结果缓存（失败或无结果的响应不写入）"""
+        cache = get_search_cache()
+        if cache is None or key is None or not response.success or not response.results:
+            return
+        try:
+            cache.set(
+                key, self._name, query, max_results,
+                [asdict(r) for r in response.results], ttl=cache_ttl,
+            )
+        except Exception as e:
+            logger.warning(f"[搜索缓存] 写入失败: {e}")
+    
+    def _begin_search(
+        self,
+        query: str,
+        max_results: int,
+        days: int,
+        cache_ttl: Optional[float],
+    ) -> Tuple[Optional[SearchResponse], Dict[str, Any]]:
+        """
+        search / search_async 的前置步骤：查询搜索结果缓存
+
+        Returns:
+            (命中缓存的响应或 None, 传给 _finish_search 的请求信息；调用方取到 Key 后写入 start_time)
         """
-        api_key = self._get_next_key()
+        cached, cache_key = self._get_cached(query, max_results, days)
+        request = {
+            'query': query,
+            'max_results': max_results,
+            'cache_key': cache_key,
+            'cache_ttl': cache_ttl,
+        }
+        return cached, request
+
+    def _finish_search(
+        self,
+        request: Dict[str, Any],
+        api_key: Optional[str],
+        key_error: Optional[str] = None,
+        response: Optional[SearchResponse] = None,
+        error: Optional[BaseException] = None,
+    ) -> SearchResponse:
+        """
+        search / search_async 的收尾步骤：记录 Key 结果、写入缓存、输出日志
+
+        Args:
+            request: _begin_search 返回的请求信息
+            api_key: 本次使用的 Key（未取到 Key 时为 None）
+            key_error: 未取到 Key 的原因
+            response: 搜索响应
+            error: 搜索抛出的异常
+        """
+        query = request['query']
         if not api_key:
             return SearchResponse(
                 query=query,
                 results=[],
                 provider=self._name,
                 success=False,
-                error_message=f"{self._name} 未配置 API Key"
+                error_message=key_error
             )
-        
-        start_time = time.time()
-        try:
-            response = self._do_search(query, api_key, max_results, days=days)
-            response.search_time = time.time() - start_time
-            
-            if response.success:
-                self._record_success(api_key)
-                logger.info(f"[{self._name}] 搜索 '{query}' 成功，返回 {len(response.results)} 条结果，耗时 {response.search_time:.2f}s")
-            else:
-                self._record_error(api_key)
-            
-            return response
-            
-        except Exception as e:
-            self._record_error(api_key)
-            elapsed = time.time() - start_time
-            logger.error(f"[{self._name}] 搜索 '{query}' 失败: {e}")
+        elapsed = time.time() - request['start_time']
+        if error is not None or response is None:
+            self._record_error(api_key, error=error)
+            logger.error(f"[{self._name}] 搜索 '{query}' 失败: {error}")
             return SearchResponse(
                 query=query,
                 results=[],
                 provider=self._name,
                 success=False,
-                error_message=str(e),
+                error_message=str(error),
                 search_time=elapsed
             )
+        response.search_time = elapsed
+        if response.success:
+            self._record_success(api_key, response)
+            self._store_cached(request['cache_key'], query, request['max_results'], response, request['cache_ttl'])
+            logger.info(f"[{self._name}] 搜索 '{query}' 成功，返回 {len(response.results)} 条结果，耗时 {response.search_time:.2f}s")
+        else:
+            self._record_error(api_key, response)
+        return response
+
+    def search(
+        self,
+        query: str,
+        max_results: int = 5,
+        days: int = 7,
+        cache_ttl: Optional[float] = None,
+    ) -> SearchResponse:
+        """
+        执行搜索（先查搜索结果缓存，未命中时请求并写入）
+        
+        Args:
+            query: 搜索关键词
+            max_results: 最大返回结果数
+            days: 搜索最近几天的时间范围（默认7天）
+            cache_ttl: 本次结果的缓存有效期（秒，None 使用 SEARCH_CACHE_TTL）
+            
+        Returns:
+            SearchResponse 对象
+        """
+        cached, request = self._begin_search(query, max_results, days, cache_ttl)
+        if cached is not None:
+            return cached
+        api_key, key_error = self._get_next_key()
+        if not api_key:
+            return self._finish_search(request, None, key_error=key_error)
+        request['start_time'] = time.time()
+        try:
+            response = self._do_search(query, api_key, max_results, days=days)
+        except Exception as e:
+            return self._finish_search(request, api_key, error=e)
+        return self._finish_search(request, api_key, response=response)
+    
+    async def _do_search_async(self, query: str, api_key: str, max_results: int, days: int = 7) -> SearchResponse:
+        """
+        执行搜索（asyncio 版本）
+        
+        默认在线程中调用同步 SDK；基于 HTTP 的引擎可覆盖为原生异步请求
+        """
+        return await asyncio.to_thread(self._do_search, query, api_key, max_results, days)
+    
+    async def search_async(
+        self,
+        query: str,
+        max_results: int = 5,
+        days: int = 7,
+        cache_ttl: Optional[float] = None,
+    ) -> SearchResponse:
+        """
+        执行搜索（asyncio 版本，前置/收尾步骤与 search 共用）
+        """
+        cached, request = self._begin_search(query, max_results, days, cache_ttl)
+        if cached is not None:
+            return cached
+        api_key, key_error = await self._get_next_key_async()
+        if not api_key:
+            return self._finish_search(request, None, key_error=key_error)
+        request['start_time'] = time.time()
+        try:
+            response = await self._do_search_async(query, api_key, max_results, days=days)
+        except Exception as e:
+            return self._finish_search(request, api_key, error=e)
+        return self._finish_search(request, api_key, response=response)
 
 
 class TavilySearchProvider(BaseSearchProvider):
@@ -219,8 +415,8 @@ class TavilySearchProvider(BaseSearchProvider):
     文档：https://docs.tavily.com/
     """
     
-    def __init__(self, api_keys: List[str]):
-        super().__init__(api_keys, "Tavily")
+    def __init__(self, api_keys: List[str], rate_per_minute: float = 30.0, burst: int = 5):
+        super().__init__(api_keys, "Tavily", rate_per_minute=rate_per_minute, burst=burst)
     
     def _do_search(self, query: str, api_key: str, max_results: int, days: int = 7) -> SearchResponse:
         """执行 Tavily 搜索"""
@@ -308,8 +504,8 @@ class SerpAPISearchProvider(BaseSearchProvider):
     文档：https://serpapi.com/baidu-search-api?utm_source=github_daily_stock_analysis
     """
     
-    def __init__(self, api_keys: List[str]):
-        super().__init__(api_keys, "SerpAPI")
+    def __init__(self, api_keys: List[str], rate_per_minute: float = 30.0, burst: int = 5):
+        super().__init__(api_keys, "SerpAPI", rate_per_minute=rate_per_minute, burst=burst)
     
     def _do_search(self, query: str, api_key: str, max_results: int, days: int = 7) -> SearchResponse:
         """执行 SerpAPI 搜索"""
@@ -498,8 +694,8 @@ class BochaSearchProvider(BaseSearchProvider):
     文档：https://bocha-ai.feishu.cn/wiki/RXEOw02rFiwzGSkd9mUcqoeAnNK
     """
     
-    def __init__(self, api_keys: List[str]):
-        super().__init__(api_keys, "Bocha")
+    def __init__(self, api_keys: List[str], rate_per_minute: float = 30.0, burst: int = 5):
+        super().__init__(api_keys, "Bocha", rate_per_minute=rate_per_minute, burst=burst)
     
     def _do_search(self, query: str, api_key: str, max_results: int, days: int = 7) -> SearchResponse:
         """执行博查搜索"""
@@ -515,128 +711,16 @@ class BochaSearchProvider(BaseSearchProvider):
             )
         
         try:
-            # API 端点
-            url = "https://api.bocha.cn/v1/web-search"
-            
-            # 请求头
-            headers = {
-                'Authorization': f'Bearer {api_key}',
-                'Content-Type': 'application/json'
-            }
-            
-            # 确定时间范围
-            freshness = "oneWeek"
-            if days <= 1:
-                freshness = "oneDay"
-            elif days <= 7:
-                freshness = "oneWeek"
-            elif days <= 30:
-                freshness = "oneMonth"
-            else:
-                freshness = "oneYear"
-
-            # 请求参数（严格按照API文档）
-            payload = {
-                "query": query,
-                "freshness": freshness,  # 动态时间范围
-                "summary": True,  # 启用AI摘要
-                "count": min(max_results, 50)  # 最大50条
-            }
+            url, headers, payload = self._build_request(query, api_key, max_results, days)
             
             # 执行搜索
             response = requests.post(url, headers=headers, json=payload, timeout=10)
-            
-            # 检查HTTP状态码
-            if response.status_code != 200:
-                # 尝试解析错误信息
-                try:
-                    if response.headers.get('content-type', '').startswith('application/json'):
-                        error_data = response.json()
-                        error_message = error_data.get('message', response.text)
-                    else:
-                        error_message = response.text
-                except:
-                    error_message = response.text
-                
-                # 根据错误码处理
-                if response.status_code == 403:
-                    error_msg = f"余额不足: {error_message}"
-                elif response.status_code == 401:
-                    error_msg = f"API KEY无效: {error_message}"
-                elif response.status_code == 400:
-                    error_msg = f"请求参数错误: {error_message}"
-                elif response.status_code == 429:
-                    error_msg = f"请求频率达到限制: {error_message}"
-                else:
-                    error_msg = f"HTTP {response.status_code}: {error_message}"
-                
-                logger.warning(f"[Bocha] 搜索失败: {error_msg}")
-                
-                return SearchResponse(
-                    query=query,
-                    results=[],
-                    provider=self.name,
-                    success=False,
-                    error_message=error_msg
-                )
-            
-            # 解析响应
-            try:
-                data = response.json()
-            except ValueError as e:
-                error_msg = f"响应JSON解析失败: {str(e)}"
-                logger.error(f"[Bocha] {error_msg}")
-                return SearchResponse(
-                    query=query,
-                    results=[],
-                    provider=self.name,
-                    success=False,
-                    error_message=error_msg
-                )
-            
-            # 检查响应code
-            if data.get('code') != 200:
-                error_msg = data.get('msg') or f"API返回错误码: {data.get('code')}"
-                return SearchResponse(
-                    query=query,
-                    results=[],
-                    provider=self.name,
-                    success=False,
-                    error_message=error_msg
-                )
-            
-            # 记录原始响应到日志
-            logger.info(f"[Bocha] 搜索完成，query='{query}'")
-            logger.debug(f"[Bocha] 原始响应: {data}")
-            
-            # 解析搜索结果
-            results = []
-            web_pages = data.get('data', {}).get('webPages', {})
-            value_list = web_pages.get('value', [])
-            
-            for item in value_list[:max_results]:
-                # 优先使用summary（AI摘要），fallback到snippet
-                snippet = item.get('summary') or item.get('snippet', '')
-                
-                # 截取摘要长度
-                if snippet:
-                    snippet = snippet[:500]
-                
-                results.append(SearchResult(
-                    title=item.get('name', ''),
-                    snippet=snippet,
-                    url=item.get('url', ''),
-                    source=item.get('siteName') or self._extract_domain(item.get('url', '')),
-                    published_date=item.get('datePublished'),  # UTC+8格式，无需转换
-                ))
-            
-            logger.info(f"[Bocha] 成功解析 {len(results)} 条结果")
-            
-            return SearchResponse(
-                query=query,
-                results=results,
-                provider=self.name,
-                success=True,
+            return self._parse_http_response(
+                query,
+                response.status_code,
+                response.headers,
+                response.text,
+                max_results,
             )
             
         except requests.exceptions.Timeout:
@@ -670,6 +754,178 @@ class BochaSearchProvider(BaseSearchProvider):
                 error_message=error_msg
             )
     
+    async def _do_search_async(self, query: str, api_key: str, max_results: int, days: int = 7) -> SearchResponse:
+        """执行博查搜索（httpx 异步请求，超时取消时连接随之关闭）"""
+        try:
+            import httpx
+        except ImportError:
+            return await super()._do_search_async(query, api_key, max_results, days=days)
+        
+        try:
+            url, headers, payload = self._build_request(query, api_key, max_results, days)
+            async with httpx.AsyncClient(timeout=10) as client:
+                response = await client.post(url, headers=headers, json=payload)
+            return self._parse_http_response(
+                query,
+                response.status_code,
+                response.headers,
+                response.text,
+                max_results,
+            )
+        except httpx.TimeoutException:
+            error_msg = "请求超时"
+        except httpx.HTTPError as e:
+            error_msg = f"网络请求失败: {str(e)}"
+        except Exception as e:
+            error_msg = f"未知错误: {str(e)}"
+        logger.error(f"[Bocha] {error_msg}")
+        return SearchResponse(
+            query=query,
+            results=[],
+            provider=self.name,
+            success=False,
+            error_message=error_msg
+        )
+    
+    @staticmethod
+    def _build_request(query: str, api_key: str, max_results: int, days: int) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+        """构建请求（URL、请求头、请求体）"""
+        # API 端点
+        url = "https://api.bocha.cn/v1/web-search"
+        
+        # 请求头
+        headers = {
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json'
+        }
+        
+        # 确定时间范围
+        freshness = "oneWeek"
+        if days <= 1:
+            freshness = "oneDay"
+        elif days <= 7:
+            freshness = "oneWeek"
+        elif days <= 30:
+            freshness = "oneMonth"
+        else:
+            freshness = "oneYear"
+
+        # 请求参数（严格按照API文档）
+        payload = {
+            "query": query,
+            "freshness": freshness,  # 动态时间范围
+            "summary": True,  # 启用AI摘要
+            "count": min(max_results, 50)  # 最大50条
+        }
+        return url, headers, payload
+    
+    def _parse_http_response(
+        self,
+        query: str,
+        status_code: int,
+        headers: Mapping[str, str],
+        text: str,
+        max_results: int,
+    ) -> SearchResponse:
+        """解析 HTTP 响应（同步/异步请求共用，响应头中的限流窗口/额度信息交给 Key 调度池）"""
+        content_type = headers.get('content-type', '')
+        rate_limit = parse_rate_headers(headers)
+        # 检查HTTP状态码
+        if status_code != 200:
+            # 尝试解析错误信息
+            try:
+                if content_type.startswith('application/json'):
+                    error_data = json.loads(text)
+                    error_message = error_data.get('message', text)
+                else:
+                    error_message = text
+            except:
+                error_message = text
+            
+            # 根据错误码处理
+            if status_code == 403:
+                error_msg = f"余额不足: {error_message}"
+            elif status_code == 401:
+                error_msg = f"API KEY无效: {error_message}"
+            elif status_code == 400:
+                error_msg = f"请求参数错误: {error_message}"
+            elif status_code == 429:
+                error_msg = f"请求频率达到限制: {error_message}"
+            else:
+                error_msg = f"HTTP {status_code}: {error_message}"
+            
+            logger.warning(f"[Bocha] 搜索失败: {error_msg}")
+            
+            return SearchResponse(
+                query=query,
+                results=[],
+                provider=self.name,
+                success=False,
+                error_message=error_msg,
+                status_code=status_code,
+                rate_limit=rate_limit,
+            )
+        
+        # 解析响应
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            error_msg = f"响应JSON解析失败: {str(e)}"
+            logger.error(f"[Bocha] {error_msg}")
+            return SearchResponse(
+                query=query,
+                results=[],
+                provider=self.name,
+                success=False,
+                error_message=error_msg
+            )
+        
+        # 检查响应code
+        if data.get('code') != 200:
+            error_msg = data.get('msg') or f"API返回错误码: {data.get('code')}"
+            return SearchResponse(
+                query=query,
+                results=[],
+                provider=self.name,
+                success=False,
+                error_message=error_msg
+            )
+        
+        # 记录原始响应到日志
+        logger.info(f"[Bocha] 搜索完成，query='{query}'")
+        logger.debug(f"[Bocha] 原始响应: {data}")
+        
+        # 解析搜索结果
+        results = []
+        web_pages = data.get('data', {}).get('webPages', {})
+        value_list = web_pages.get('value', [])
+        
+        for item in value_list[:max_results]:
+            # 优先使用summary（AI摘要），fallback到snippet
+            snippet = item.get('summary') or item.get('snippet', '')
+            
+            # 截取摘要长度
+            if snippet:
+                snippet = snippet[:500]
+            
+            results.append(SearchResult(
+                title=item.get('name', ''),
+                snippet=snippet,
+                url=item.get('url', ''),
+                source=item.get('siteName') or self._extract_domain(item.get('url', '')),
+                published_date=item.get('datePublished'),  # UTC+8格式，无需转换
+            ))
+        
+        logger.info(f"[Bocha] 成功解析 {len(results)} 条结果")
+        
+        return SearchResponse(
+            query=query,
+            results=results,
+            provider=self.name,
+            success=True,
+            rate_limit=rate_limit,
+        )
+    
     @staticmethod
     def _extract_domain(url: str) -> str:
         """从 URL 提取域名作为来源"""
@@ -702,11 +958,21 @@ class SearchService:
         "{name} {code} 涨跌 成交量",
     ]
     
+    # 大盘/市场主题查询（大盘复盘与批量情报共用）
+    MARKET_NEWS_QUERIES = [
+        "A股 大盘 复盘",
+        "股市 行情 分析",
+        "A股 市场 热点 板块",
+    ]
+    
     def __init__(
         self,
         bocha_keys: Optional[List[str]] = None,
         tavily_keys: Optional[List[str]] = None,
         serpapi_keys: Optional[List[str]] = None,
+        provider_concurrency: int = 2,
+        key_rate_per_minute: float = 30.0,
+        key_burst: int = 5,
     ):
         """
         初始化搜索服务
@@ -715,33 +981,52 @@ class SearchService:
             bocha_keys: 博查搜索 API Key 列表
             tavily_keys: Tavily API Key 列表
             serpapi_keys: SerpAPI Key 列表
+            provider_concurrency: 单个搜索引擎同时进行的请求数上限（所有股票共享）
+            key_rate_per_minute: 单个 API Key 每分钟的请求数上限
+            key_burst: 单个 API Key 允许的突发请求数
         """
         self._providers: List[BaseSearchProvider] = []
         
         # 初始化搜索引擎（按优先级排序）
         # 1. Bocha 优先（中文搜索优化，AI摘要）
         if bocha_keys:
-            self._providers.append(BochaSearchProvider(bocha_keys))
+            self._providers.append(BochaSearchProvider(bocha_keys, key_rate_per_minute, key_burst))
             logger.info(f"已配置 Bocha 搜索，共 {len(bocha_keys)} 个 API Key")
         
         # 2. Tavily（免费额度更多，每月 1000 次）
         if tavily_keys:
-            self._providers.append(TavilySearchProvider(tavily_keys))
+            self._providers.append(TavilySearchProvider(tavily_keys, key_rate_per_minute, key_burst))
             logger.info(f"已配置 Tavily 搜索，共 {len(tavily_keys)} 个 API Key")
         
         # 3. SerpAPI 作为备选（每月 100 次）
         if serpapi_keys:
-            self._providers.append(SerpAPISearchProvider(serpapi_keys))
+            self._providers.append(SerpAPISearchProvider(serpapi_keys, key_rate_per_minute, key_burst))
             logger.info(f"已配置 SerpAPI 搜索，共 {len(serpapi_keys)} 个 API Key")
         
         if not self._providers:
             logger.warning("未配置任何搜索引擎 API Key，新闻搜索功能将不可用")
+        
+        # 各引擎的并发名额（多只股票并发分析时共用，避免同一引擎被打满触发限流）
+        self._provider_concurrency = max(1, provider_concurrency)
+        self._provider_slots: Dict[str, threading.BoundedSemaphore] = {
+            p.name: threading.BoundedSemaphore(self._provider_concurrency) for p in self._providers
+        }
+        # 异步流水线使用的同等名额（按事件循环创建，见 _async_slots）
+        self._async_provider_slots: Dict[str, asyncio.Semaphore] = {}
+        self._async_slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        # 最近一次市场新闻（搜索时间 monotonic, 每条查询结果数, 结果列表），MARKET_NEWS_TTL 内大盘复盘与批量情报共用
+        self._market_news: Optional[Tuple[float, int, List[SearchResult]]] = None
+        self._market_news_lock = threading.Lock()
     
     @property
     def is_available(self) -> bool:
         """检查是否有可用的搜索引擎"""
         return any(p.is_available for p in self._providers)
     
+    def key_stats(self) -> Dict[str, Any]:
+        """各搜索引擎的 API Key 调度状态（Key 已脱敏）"""
+        return {p.name: p.key_stats for p in self._providers}
+    
     def search_stock_news(
         self,
         stock_code: str,
@@ -852,33 +1137,10 @@ class SearchService:
             error_message="事件搜索失败"
         )
     
-    def search_comprehensive_intel(
-        self,
-        stock_code: str,
-        stock_name: str,
-        max_searches: int = 3
-    ) -> Dict[str, SearchResponse]:
-        """
-        多维度情报搜索（同时使用多个引擎、多个维度）
-        
-        搜索维度：
-        1. 最新消息 - 近期新闻动态
-        2. 风险排查 - 减持、处罚、利空
-        3. 业绩预期 - 年报预告、业绩快报
-        
-        Args:
-            stock_code: 股票代码
-            stock_name: 股票名称
-            max_searches: 最大搜索次数
-            
-        Returns:
-            {维度名称: SearchResponse} 字典
-        """
-        results = {}
-        search_count = 0
-        
-        # 定义搜索维度
-        search_dimensions = [
+    @staticmethod
+    def _intel_dimensions(stock_code: str, stock_name: str) -> List[Dict[str, str]]:
+        """多维度情报搜索的维度定义（按优先级排序）"""
+        return [
             {
                 'name': 'latest_news',
                 'query': f"{stock_name} {stock_code} 最新 新闻 重大 事件",
@@ -905,83 +1167,320 @@ class SearchService:
                 'desc': '行业分析'
             },
         ]
+    
+    def search_comprehensive_intel(
+        self,
+        stock_code: str,
+        stock_name: str,
+        max_searches: int = 3
+    ) -> Dict[str, SearchResponse]:
+        """
+        多维度情报搜索（同时使用多个引擎、多个维度）
         
-        # 单维度搜索超时（秒），避免某一次 API 无响应导致整体卡死
-        PER_DIMENSION_TIMEOUT = 10
-        total_dims = min(len(search_dimensions), max_searches)
-        logger.info(f"开始多维度情报搜索: {stock_name}({stock_code})，共 {total_dims} 维，单维超时 {PER_DIMENSION_TIMEOUT}s")
+        搜索维度：
+        1. 最新消息 - 近期新闻动态
+        2. 风险排查 - 减持、处罚、利空
+        3. 业绩预期 - 年报预告、业绩快报
         
-        provider_index = 0
+        各维度轮流分配到可用引擎并发执行，受引擎并发上限约束；
+        所有维度共享 INTEL_SEARCH_DEADLINE 截止时间，结果按返回顺序收集，
+        到点仍未返回的维度记为超时（不等待其线程结束）。
         
-        for idx, dim in enumerate(search_dimensions):
-            if search_count >= max_searches:
-                break
+        Args:
+            stock_code: 股票代码
+            stock_name: 股票名称
+            max_searches: 最大搜索次数
             
-            available_providers = [p for p in self._providers if p.is_available]
-            if not available_providers:
+        Returns:
+            {维度名称: SearchResponse} 字典（按维度优先级排序）
+        """
+        available_providers = [p for p in self._providers if p.is_available]
+        if not available_providers:
+            return {}
+        
+        dims = self._intel_dimensions(stock_code, stock_name)[:max_searches]
+        total_dims = len(dims)
+        logger.info(
+            f"开始多维度情报搜索: {stock_name}({stock_code})，共 {total_dims} 维并发，"
+            f"共享截止 {INTEL_SEARCH_DEADLINE}s"
+        )
+        
+        deadline = time.monotonic() + INTEL_SEARCH_DEADLINE
+        results = self._run_dimensions(dims, available_providers, deadline, max_results=3)
+        
+        succeeded = sum(1 for r in results.values() if r.success)
+        logger.info(f"[情报搜索] 全部完成: {stock_name}({stock_code})，{succeeded}/{total_dims} 个维度获取成功")
+        return results
+    
+    def _run_dimensions(
+        self,
+        dims: List[Dict[str, str]],
+        providers: List[BaseSearchProvider],
+        deadline: float,
+        max_results: int,
+    ) -> Dict[str, SearchResponse]:
+        """
+        并发执行多个查询（维度轮流分配到各引擎），在截止时间前按返回顺序收集结果
+        
+        到点仍未返回的查询记为超时，不等待其线程结束
+        
+        Returns:
+            {查询名称: SearchResponse}（按 dims 顺序）
+        """
+        workers = min(len(dims), len(providers) * self._provider_concurrency)
+        executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        futures = {
+            executor.submit(
+                self._search_dimension, dim,
+                providers[i % len(providers)], providers, deadline, max_results,
+            ): dim
+            for i, dim in enumerate(dims)
+        }
+        arrived: Dict[str, SearchResponse] = {}
+        try:
+            for future in as_completed(futures, timeout=max(0.0, deadline - time.monotonic())):
+                dim = futures[future]
+                try:
+                    response = future.result()
+                except Exception as e:
+                    logger.warning(f"[情报搜索] {dim['desc']}: 异常 - {e}")
+                    response = SearchResponse(
+                        query=dim['query'],
+                        results=[],
+                        provider="None",
+                        success=False,
+                        error_message=str(e),
+                    )
+                arrived[dim['name']] = response
+                if response.success:
+                    logger.info(
+                        f"[情报搜索] ({len(arrived)}/{len(dims)}) {dim['desc']}: "
+                        f"{response.provider} 获取 {len(response.results)} 条结果"
+                    )
+                else:
+                    logger.debug(f"[情报搜索] {dim['desc']}: 无结果或失败 - {response.error_message}")
+        except FuturesTimeoutError:
+            pending = [dim['desc'] for dim in dims if dim['name'] not in arrived]
+            logger.warning(f"[情报搜索] 超过共享截止时间，跳过: {', '.join(pending)}")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        return {
+            dim['name']: arrived.get(dim['name']) or SearchResponse(
+                query=dim['query'],
+                results=[],
+                provider=providers[i % len(providers)].name,
+                success=False,
+                error_message="超过共享截止时间，未返回",
+            )
+            for i, dim in enumerate(dims)
+        }
+    
+    def _search_dimension(
+        self,
+        dim: Dict[str, str],
+        preferred: BaseSearchProvider,
+        providers: List[BaseSearchProvider],
+        deadline: float,
+        max_results: int = 3,
+    ) -> SearchResponse:
+        """
+        在引擎并发上限内执行单维度搜索
+        
+        优先使用分配的引擎；其名额已满时改用其他有空位的引擎，都满则等待分配的引擎直到截止时间
+        """
+        provider = None
+        for candidate in [preferred] + [p for p in providers if p is not preferred]:
+            if self._provider_slots[candidate.name].acquire(blocking=False):
+                provider = candidate
                 break
-            
-            provider = available_providers[provider_index % len(available_providers)]
-            provider_index += 1
-            
-            current_step = idx + 1
-            logger.info(f"[情报搜索] ({current_step}/{total_dims}) {dim['desc']}，使用 {provider.name}...")
-            
-            def _one_search():
-                return provider.search(dim['query'], max_results=3)
-            
-            try:
-                with ThreadPoolExecutor(max_workers=1) as ex:
-                    future = ex.submit(_one_search)
-                    response = future.result(timeout=PER_DIMENSION_TIMEOUT)
-            except FuturesTimeoutError:
-                logger.warning(f"[情报搜索] ({current_step}/{total_dims}) {dim['desc']}: 超时({PER_DIMENSION_TIMEOUT}s)，跳过")
-                response = SearchResponse(
+        if provider is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._provider_slots[preferred.name].acquire(timeout=remaining):
+                return SearchResponse(
                     query=dim['query'],
                     results=[],
-                    provider=provider.name,
+                    provider=preferred.name,
                     success=False,
-                    error_message=f"单次搜索超时({PER_DIMENSION_TIMEOUT}s)",
+                    error_message="等待搜索引擎空闲名额超时",
                 )
+            provider = preferred
+        
+        try:
+            logger.info(f"[情报搜索] {dim['desc']}，使用 {provider.name}...")
+            return provider.search(dim['query'], max_results=max_results, cache_ttl=INTEL_CACHE_TTL.get(dim['name']))
+        finally:
+            self._provider_slots[provider.name].release()
+    
+    async def search_comprehensive_intel_async(
+        self,
+        stock_code: str,
+        stock_name: str,
+        max_searches: int = 3
+    ) -> Dict[str, SearchResponse]:
+        """
+        多维度情报搜索（asyncio 版本，供异步流水线使用）
+        
+        维度与引擎分配、引擎并发上限、共享截止时间均同 search_comprehensive_intel；
+        到点仍未返回的维度由 asyncio 取消，不遗留阻塞线程。
+        
+        Returns:
+            {维度名称: SearchResponse} 字典（按维度优先级排序）
+        """
+        available_providers = [p for p in self._providers if p.is_available]
+        if not available_providers:
+            return {}
+        
+        dims = self._intel_dimensions(stock_code, stock_name)[:max_searches]
+        total_dims = len(dims)
+        logger.info(
+            f"开始多维度情报搜索(async): {stock_name}({stock_code})，共 {total_dims} 维并发，"
+            f"共享截止 {INTEL_SEARCH_DEADLINE}s"
+        )
+        
+        deadline = time.monotonic() + INTEL_SEARCH_DEADLINE
+        arrived: Dict[str, SearchResponse] = {}
+        
+        async def _one_search(dim: Dict[str, str], preferred: BaseSearchProvider) -> None:
+            try:
+                response = await self._search_dimension_async(dim, preferred, available_providers, deadline)
             except Exception as e:
-                logger.warning(f"[情报搜索] ({current_step}/{total_dims}) {dim['desc']}: 异常 - {e}")
+                logger.warning(f"[情报搜索] {dim['desc']}: 异常 - {e}")
                 response = SearchResponse(
                     query=dim['query'],
                     results=[],
-                    provider=provider.name,
+                    provider="None",
                     success=False,
                     error_message=str(e),
                 )
-            
-            results[dim['name']] = response
-            search_count += 1
-            
+            arrived[dim['name']] = response
             if response.success:
-                logger.info(f"[情报搜索] ({current_step}/{total_dims}) {dim['desc']}: 获取 {len(response.results)} 条结果")
+                logger.info(
+                    f"[情报搜索] ({len(arrived)}/{total_dims}) {dim['desc']}: "
+                    f"{response.provider} 获取 {len(response.results)} 条结果"
+                )
             else:
                 logger.debug(f"[情报搜索] {dim['desc']}: 无结果或失败 - {response.error_message}")
-            
-            time.sleep(0.3)
         
-        logger.info(f"[情报搜索] 全部完成: {stock_name}({stock_code})，共 {len(results)} 个维度")
+        tasks = [
+            asyncio.create_task(_one_search(dim, available_providers[i % len(available_providers)]))
+            for i, dim in enumerate(dims)
+        ]
+        _, pending = await asyncio.wait(tasks, timeout=max(0.0, deadline - time.monotonic()))
+        if pending:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            skipped = [dim['desc'] for dim in dims if dim['name'] not in arrived]
+            logger.warning(f"[情报搜索] 超过共享截止时间，跳过: {', '.join(skipped)}")
+        
+        results = {
+            dim['name']: arrived.get(dim['name']) or SearchResponse(
+                query=dim['query'],
+                results=[],
+                provider=available_providers[i % len(available_providers)].name,
+                success=False,
+                error_message="超过共享截止时间，未返回",
+            )
+            for i, dim in enumerate(dims)
+        }
+        succeeded = sum(1 for r in results.values() if r.success)
+        logger.info(f"[情报搜索] 全部完成: {stock_name}({stock_code})，{succeeded}/{total_dims} 个维度获取成功")
         return results
     
-    def format_intel_report(self, intel_results: Dict[str, SearchResponse], stock_name: str) -> str:
+    def _async_slots(self) -> Dict[str, asyncio.Semaphore]:
+        """
+        当前事件循环的引擎并发名额（与 _provider_slots 同样大小）
+        
+        asyncio.Semaphore 绑定事件循环，每次 asyncio.run 创建新循环时随之重建
         """
-        格式化情报搜索结果为报告
+        loop = asyncio.get_running_loop()
+        if self._async_slots_loop is not loop:
+            self._async_slots_loop = loop
+            self._async_provider_slots = {
+                p.name: asyncio.Semaphore(self._provider_concurrency) for p in self._providers
+            }
+        return self._async_provider_slots
+    
+    async def _search_dimension_async(
+        self,
+        dim: Dict[str, str],
+        preferred: BaseSearchProvider,
+        providers: List[BaseSearchProvider],
+        deadline: float,
+        max_results: int = 3,
+    ) -> SearchResponse:
+        """
+        在引擎并发上限内执行单维度搜索（asyncio 版本，选择引擎的规则同 _search_dimension）
+        """
+        slots = self._async_slots()
+        provider = None
+        for candidate in [preferred] + [p for p in providers if p is not preferred]:
+            if not slots[candidate.name].locked():
+                await slots[candidate.name].acquire()
+                provider = candidate
+                break
+        if provider is None:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                await asyncio.wait_for(slots[preferred.name].acquire(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return SearchResponse(
+                    query=dim['query'],
+                    results=[],
+                    provider=preferred.name,
+                    success=False,
+                    error_message="等待搜索引擎空闲名额超时",
+                )
+            provider = preferred
+        
+        try:
+            logger.info(f"[情报搜索] {dim['desc']}，使用 {provider.name}...")
+            return await provider.search_async(
+                dim['query'], max_results=max_results, cache_ttl=INTEL_CACHE_TTL.get(dim['name'])
+            )
+        finally:
+            slots[provider.name].release()
+    
+    def build_intel_digest(self, intel_results: Dict[str, SearchResponse], stock_name: str) -> NewsDigest:
+        """
+        情报搜索结果整理为结构化摘要（供 prompt 预算排序、裁剪）
+        
+        各维度的结果先做跨维度近似去重：转载稿只在首次出现的维度展示一次，
+        保留发布时间最新的来源，并标注相似报道数量
         
         Args:
             intel_results: 多维度搜索结果
             stock_name: 股票名称
             
         Returns:
-            格式化的情报报告文本
+            NewsDigest（str() 即情报报告文本）
         """
-        lines = [f"【{stock_name} 情报搜索结果】"]
-        
         # 维度展示顺序
         display_order = ['latest_news', 'market_analysis', 'risk_check', 'earnings', 'industry']
         
+        # 跨维度近似去重：簇代表挂在簇首次出现的维度下
+        ordered = [
+            (dim_name, r)
+            for dim_name in display_order
+            if dim_name in intel_results and intel_results[dim_name].success
+            for r in intel_results[dim_name].results
+        ]
+        index = NearDuplicateIndex()
+        cluster_ids = [index.add(result_text(r)) for _, r in ordered]
+        clusters: Dict[int, List[SearchResult]] = {}
+        cluster_dims: Dict[int, str] = {}
+        for (dim_name, r), cluster in zip(ordered, cluster_ids):
+            clusters.setdefault(cluster, []).append(r)
+            cluster_dims.setdefault(cluster, dim_name)
+        unique_results: Dict[str, List[Tuple[SearchResult, int]]] = {}
+        for cluster, members in clusters.items():
+            unique_results.setdefault(cluster_dims[cluster], []).append((freshest(members), len(members)))
+        
+        dimensions: List[NewsDimension] = []
+        items: List[NewsItem] = []
         for dim_name in display_order:
             if dim_name not in intel_results:
                 continue
@@ -996,19 +1495,29 @@ class SearchService:
             elif dim_name == 'earnings': dim_desc = '📊 业绩预期'
             elif dim_name == 'industry': dim_desc = '🏭 行业分析'
             
-            lines.append(f"\n{dim_desc} (来源: {resp.provider}):")
-            if resp.success and resp.results:
-                # 增加显示条数
-                for i, r in enumerate(resp.results[:4], 1):
-                    date_str = f" [{r.published_date}]" if r.published_date else ""
-                    lines.append(f"  {i}. {r.title}{date_str}")
-                    # 如果摘要太短，可能信息量不足
-                    snippet = r.snippet[:150] if len(r.snippet) > 20 else r.snippet
-                    lines.append(f"     {snippet}...")
-            else:
-                lines.append("  未找到相关信息")
+            dimension = NewsDimension(name=dim_name, title=f"{dim_desc} (来源: {resp.provider}):")
+            # 增加显示条数
+            for position, (r, size) in enumerate(unique_results.get(dim_name, [])[:4]):
+                # 如果摘要太短，可能信息量不足
+                snippet = r.snippet[:150] if len(r.snippet) > 20 else r.snippet
+                items.append(NewsItem(
+                    dimension=len(dimensions),
+                    position=position,
+                    title=r.title,
+                    snippet=snippet,
+                    published_date=r.published_date,
+                    similar=size - 1,
+                ))
+            if dim_name not in unique_results:
+                dimension.note = "与上文报道重复" if resp.success and resp.results else "未找到相关信息"
+            dimensions.append(dimension)
         
-        return "\n".join(lines)
+        return NewsDigest(
+            header=f"【{stock_name} 情报搜索结果】",
+            dimensions=dimensions,
+            items=items,
+            duplicates=len(ordered) - len(clusters),
+        )
     
     def batch_search(
         self,
@@ -1040,6 +1549,131 @@ class SearchService:
             results[code] = response
         
         return results
+    
+    def search_market_news(self, max_results: int = 3) -> List[SearchResult]:
+        """
+        搜索市场新闻（MARKET_NEWS_QUERIES），MARKET_NEWS_TTL 内只搜索一次
+        
+        大盘复盘（MarketAnalyzer）与批量情报（search_watchlist_news）共用结果
+        
+        Args:
+            max_results: 每条查询的最大结果数
+        """
+        with self._market_news_lock:
+            if self._market_news is not None:
+                searched_at, cached_max, cached_news = self._market_news
+                if time.monotonic() - searched_at < MARKET_NEWS_TTL and cached_max >= max_results:
+                    return list(cached_news)
+            
+            news: List[SearchResult] = []
+            for query in self.MARKET_NEWS_QUERIES:
+                response = self.search_stock_news(
+                    stock_code="market",
+                    stock_name="大盘",
+                    max_results=max_results,
+                    focus_keywords=query.split(),
+                )
+                if response.success and response.results:
+                    news.extend(response.results)
+                    logger.info(f"[大盘] 搜索 '{query}' 获取 {len(response.results)} 条结果")
+            if news:
+                self._market_news = (time.monotonic(), max_results, news)
+        return list(news)
+    
+    def search_watchlist_news(
+        self,
+        stocks: List[Dict[str, str]],
+        group_size: int = 5,
+        max_results_per_query: int = 10,
+        max_results_per_stock: int = 5,
+        include_market: bool = True,
+    ) -> Dict[str, SearchResponse]:
+        """
+        批量情报：按主题合并查询，再按股票名称/代码把文章分配给各股票
+        
+        主题：同一板块（stocks 中提供 sector 时）的股票每 group_size 只合并为一次查询，
+        未提供板块的按列表顺序分组；另加当日大盘主题查询（search_market_news）。
+        200 只自选股约 40 次搜索即可覆盖，逐只搜索则需要数百次。
+        主题查询并发执行，受引擎并发上限约束。
+        
+        Args:
+            stocks: [{'code': 股票代码, 'name': 股票名称, 'sector': 所属板块（可选）}]
+            group_size: 每次查询合并的股票数
+            max_results_per_query: 每次主题查询的最大结果数
+            max_results_per_stock: 每只股票最多分配的文章数
+            include_market: 是否同时匹配大盘主题新闻
+            
+        Returns:
+            {股票代码: SearchResponse}（未匹配到文章的股票 success=False）
+        """
+        stocks = [stock for stock in stocks if stock.get('code')]
+        available_providers = [p for p in self._providers if p.is_available]
+        if not stocks or not available_providers:
+            return {}
+        
+        by_sector: Dict[str, List[Dict[str, str]]] = {}
+        for stock in stocks:
+            by_sector.setdefault(stock.get('sector') or '', []).append(stock)
+        themes = []
+        for sector, members in by_sector.items():
+            for start in range(0, len(members), max(1, group_size)):
+                group = members[start:start + max(1, group_size)]
+                names = " ".join(stock.get('name') or stock['code'] for stock in group)
+                themes.append({
+                    'name': f"theme_{len(themes) + 1}",
+                    'query': f"{sector} {names} 最新消息".strip(),
+                    'desc': f"主题{len(themes) + 1}（{sector or '自选股'} {len(group)} 只）",
+                })
+        
+        logger.info(f"[批量情报] {len(stocks)} 只股票合并为 {len(themes)} 次主题搜索")
+        rounds = math.ceil(len(themes) / (len(available_providers) * self._provider_concurrency))
+        deadline = time.monotonic() + INTEL_SEARCH_DEADLINE * rounds
+        responses = self._run_dimensions(themes, available_providers, deadline, max_results=max_results_per_query)
+        
+        articles: List[SearchResult] = []
+        for response in responses.values():
+            if response.success:
+                articles.extend(response.results)
+        if include_market:
+            articles.extend(self.search_market_news())
+        
+        assigned = self._assign_articles(stocks, articles)
+        providers = "/".join(sorted({r.provider for r in responses.values() if r.success})) or "None"
+        query = f"批量情报（{len(themes)} 次主题搜索）"
+        results: Dict[str, SearchResponse] = {}
+        for stock in stocks:
+            matched = dedupe_results(assigned[stock['code']])[:max_results_per_stock]
+            results[stock['code']] = SearchResponse(
+                query=query,
+                results=matched,
+                provider=providers,
+                success=bool(matched),
+                error_message=None if matched else "主题搜索未匹配到相关文章",
+            )
+        matched_count = sum(1 for r in results.values() if r.success)
+        logger.info(f"[批量情报] 共 {len(articles)} 篇文章，{matched_count}/{len(stocks)} 只股票匹配到相关文章")
+        return results
+    
+    @staticmethod
+    def _assign_articles(
+        stocks: List[Dict[str, str]],
+        articles: List[SearchResult],
+    ) -> Dict[str, List[SearchResult]]:
+        """按标题/摘要中出现的股票名称或代码分配文章（同一篇文章可分配给多只股票，按链接去重）"""
+        assigned: Dict[str, List[SearchResult]] = {stock['code']: [] for stock in stocks}
+        seen: Dict[str, set] = {stock['code']: set() for stock in stocks}
+        for article in articles:
+            text = f"{article.title} {article.snippet}"
+            for stock in stocks:
+                code = stock['code']
+                name = stock.get('name') or ''
+                if not ((len(name) >= 2 and name in text) or code in text):
+                    continue
+                key = article.url or article.title
+                if key not in seen[code]:
+                    seen[code].add(key)
+                    assigned[code].append(article)
+        return assigned
 
     def search_stock_price_fallback(
         self,
@@ -1121,7 +1755,8 @@ class SearchService:
             if i < max_attempts - 1:
                 time.sleep(0.5)
         
-        # 汇总结果
+        # 汇总结果（转载稿近似去重，保留最新来源）
+        all_results = dedupe_results(all_results)
         if all_results:
             # 截取前 max_results 条
             final_results = all_results[:max_results]
@@ -1232,6 +1867,9 @@ def get_search_service() -> SearchService:
             bocha_keys=config.bocha_api_keys,
             tavily_keys=config.tavily_api_keys,
             serpapi_keys=config.serpapi_keys,
+            provider_concurrency=config.search_provider_concurrency,
+            key_rate_per_minute=config.search_key_rate_per_minute,
+            key_burst=config.search_key_burst,
         )
     
     return _search_service
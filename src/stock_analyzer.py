@@ -17,6 +17,7 @@
 """
 
 import logging
+import warnings
 from dataclasses import dataclass, field
 from typing import Optional, Dict, Any, List, Tuple
 from enum import Enum
@@ -24,6 +25,18 @@ from enum import Enum
 import pandas as pd
 import numpy as np
 
+from src.indicators import (
+    MACD_FAST,
+    MACD_SIGNAL,
+    MACD_SLOW,
+    RSI_PERIODS,
+    IndicatorPanel,
+    IndicatorSnapshot,
+    IndicatorState,
+    PanelIndicators,
+    compute_indicators,
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -166,6 +179,32 @@ class TrendAnalysisResult:
         }
 
 
+# 面板评分中枚举的整数编码（列表下标）
+TREND_STATUS_ORDER = list(TrendStatus)
+BUY_SIGNAL_ORDER = list(BuySignal)
+
+
+@dataclass
+class PanelSignals:
+    """
+    面板逐日评分结果（StockTrendAnalyzer.score_panel）
+
+    各字段形状与指标面板一致，第 t 列为只使用截至第 t 个交易日数据的评分；
+    trend_status / buy_signal 为 TREND_STATUS_ORDER / BUY_SIGNAL_ORDER 中的下标，
+    有效交易日不足 20 的位置 valid 为 False
+    """
+    score: np.ndarray
+    trend_status: np.ndarray
+    buy_signal: np.ndarray
+    bias_ma5: np.ndarray
+    valid: np.ndarray
+
+    def signal_mask(self, *signals: BuySignal) -> np.ndarray:
+        """指定买入信号的布尔掩码（仅 valid 位置）"""
+        codes = [BUY_SIGNAL_ORDER.index(s) for s in signals]
+        return self.valid & np.isin(self.buy_signal, codes)
+
+
 class StockTrendAnalyzer:
     """
     股票趋势分析器
@@ -185,15 +224,13 @@ class StockTrendAnalyzer:
     VOLUME_HEAVY_RATIO = 1.5    # 放量判断阈值
     MA_SUPPORT_TOLERANCE = 0.02  # MA 支撑判断容忍度（2%）
 
-    # MACD 参数（标准12/26/9）
-    MACD_FAST = 12              # 快线周期
-    MACD_SLOW = 26             # 慢线周期
-    MACD_SIGNAL = 9             # 信号线周期
+    # MACD 参数（标准12/26/9，计算见 src.indicators）
+    MACD_FAST = MACD_FAST       # 快线周期
+    MACD_SLOW = MACD_SLOW       # 慢线周期
+    MACD_SIGNAL = MACD_SIGNAL   # 信号线周期
 
     # RSI 参数
-    RSI_SHORT = 6               # 短期RSI周期
-    RSI_MID = 12               # 中期RSI周期
-    RSI_LONG = 24              # 长期RSI周期
+    RSI_SHORT, RSI_MID, RSI_LONG = RSI_PERIODS  # 短期/中期/长期RSI周期
     RSI_OVERBOUGHT = 70        # 超买阈值
     RSI_OVERSOLD = 30          # 超卖阈值
     
@@ -212,142 +249,329 @@ class StockTrendAnalyzer:
         Returns:
             TrendAnalysisResult 分析结果
         """
-        result = TrendAnalysisResult(code=code)
-        
         if df is None or df.empty or len(df) < 20:
             logger.warning(f"{code} 数据不足，无法进行趋势分析")
-            result.risk_factors.append("数据不足，无法完成分析")
-            return result
+            return self._insufficient_result(code)
         
-        # 确保数据按日期排序
-        df = df.sort_values('date').reset_index(drop=True)
-        
-        # 计算均线
-        df = self._calculate_mas(df)
-
-        # 计算 MACD 和 RSI
-        df = self._calculate_macd(df)
-        df = self._calculate_rsi(df)
+        # 单股分析即单行面板，与批量筛选共用同一套指标计算
+        return self.analyze_batch(IndicatorPanel.from_frames({code: df}))[0]
 
-        # 获取最新数据
-        latest = df.iloc[-1]
-        result.current_price = float(latest['close'])
-        result.ma5 = float(latest['MA5'])
-        result.ma10 = float(latest['MA10'])
-        result.ma20 = float(latest['MA20'])
-        result.ma60 = float(latest.get('MA60', 0))
+    def analyze_arrays(self, arrays: Optional[Dict[str, np.ndarray]], code: str) -> TrendAnalysisResult:
+        """
+        分析股票趋势（列数组输入，来自 DatabaseManager.get_history_arrays）
 
-        # 1. 趋势判断
-        self._analyze_trend(df, result)
+        启用列式存储时数组为内存映射数据的视图，直接写入面板，不构造 DataFrame
 
-        # 2. 乖离率计算
-        self._calculate_bias(result)
+        Args:
+            arrays: {'date': datetime64[D], 'close': float64, ...}，按日期升序
+            code: 股票代码
 
-        # 3. 量能分析
-        self._analyze_volume(df, result)
+        Returns:
+            TrendAnalysisResult 分析结果
+        """
+        if arrays is None or len(arrays['date']) < 20:
+            logger.warning(f"{code} 数据不足，无法进行趋势分析")
+            return self._insufficient_result(code)
 
-        # 4. 支撑压力分析
-        self._analyze_support_resistance(df, result)
+        return self.analyze_batch(IndicatorPanel.from_arrays({code: arrays}))[0]
 
-        # 5. MACD 分析
-        self._analyze_macd(df, result)
+    def analyze_batch(self, panel: IndicatorPanel) -> List[TrendAnalysisResult]:
+        """
+        批量分析多只股票趋势（全市场筛选）
+        
+        一次 NumPy 计算整个面板的均线/MACD/RSI/乖离率/量比，
+        再逐只套用评分规则
+        
+        Args:
+            panel: 股票 × 交易日面板（IndicatorPanel.from_frames / from_long_frame）
+            
+        Returns:
+            与 panel.codes 顺序一致的 TrendAnalysisResult 列表
+        """
+        if len(panel) == 0:
+            return []
+        if panel.close.shape[1] < 20:
+            return [self._insufficient_result(code) for code in panel.codes]
+        
+        snapshots = self._latest_snapshots(panel, compute_indicators(panel))
+        results = []
+        for i, code in enumerate(panel.codes):
+            snap = snapshots[i]
+            if snap.n_bars < 20:
+                results.append(self._insufficient_result(code))
+            else:
+                results.append(self._evaluate(code, snap))
+        return results
+    
+    def analyze_intraday(
+        self,
+        state: IndicatorState,
+        price: float,
+        high: Optional[float] = None,
+        volume: Optional[float] = None,
+        volume_ratio: Optional[float] = None,
+    ) -> TrendAnalysisResult:
+        """
+        盘中重新评分：以最新报价作为当日 K 线，基于增量指标状态试算
 
-        # 6. RSI 分析
-        self._analyze_rsi(df, result)
+        每次报价刷新 O(1)，不重新加载历史；状态本身不被修改
 
-        # 7. 生成买入信号
-        self._generate_signal(result)
+        Args:
+            state: 截至上一交易日的增量指标状态（DatabaseManager.get_indicator_state）
+            price: 最新价
+            high: 当日最高价
+            volume: 当日累计成交量（与日线同一单位）
+            volume_ratio: 量比（未提供 volume 时用于折算当日成交量）
 
+        Returns:
+            TrendAnalysisResult 分析结果
+        """
+        if state.n_bars + 1 < 20:
+            logger.warning(f"{state.code} 数据不足，无法进行盘中趋势分析")
+            return self._insufficient_result(state.code)
+        return self._evaluate(state.code, state.preview(price, high, volume, volume_ratio))
+
+    def score_panel(
+        self,
+        panel: IndicatorPanel,
+        ind: Optional[PanelIndicators] = None,
+        ma_periods: Tuple[int, int, int] = (5, 10, 20),
+    ) -> PanelSignals:
+        """
+        面板逐日评分（回测用）：对每只股票的每个交易日套用与 _evaluate 相同的规则
+        
+        全部为整块数组运算，不逐日构造 TrendAnalysisResult；
+        规则参数读取实例属性（BIAS_THRESHOLD、VOLUME_*_RATIO、MA_SUPPORT_TOLERANCE），
+        便于参数扫描时覆盖
+        
+        Args:
+            panel: 指标面板
+            ind: 已计算的指标（可选，需包含 ma_periods 中的均线）
+            ma_periods: 短/中/长期均线周期（默认 MA5/MA10/MA20）
+            
+        Returns:
+            PanelSignals
+        """
+        if ind is None:
+            ind = compute_indicators(panel, ma_windows=ma_periods)
+        short, mid, long_ = ma_periods
+        ma5, ma10, ma20 = ind.ma[short], ind.ma[mid], ind.ma[long_]
+        close = panel.close
+        bars = np.cumsum(~np.isnan(close), axis=1)
+        
+        def shift(values: np.ndarray, k: int) -> np.ndarray:
+            out = np.full(values.shape, np.nan)
+            out[:, k:] = values[:, :-k]
+            return out
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # === 趋势（与 5 个交易日前的均线间距比较）===
+            prev5_ma5, prev5_ma20 = shift(ma5, 4), shift(ma20, 4)
+            bull = (ma5 > ma10) & (ma10 > ma20)
+            bull_prev = np.where(prev5_ma20 > 0, (prev5_ma5 - prev5_ma20) / prev5_ma20 * 100, 0.0)
+            bull_curr = np.where(ma20 > 0, (ma5 - ma20) / ma20 * 100, 0.0)
+            weak_bull = (ma5 > ma10) & (ma10 <= ma20)
+            bear = (ma5 < ma10) & (ma10 < ma20)
+            bear_prev = np.where(prev5_ma5 > 0, (prev5_ma20 - prev5_ma5) / prev5_ma5 * 100, 0.0)
+            bear_curr = np.where(ma5 > 0, (ma20 - ma5) / ma5 * 100, 0.0)
+            weak_bear = (ma5 < ma10) & (ma10 >= ma20)
+            status_index = TREND_STATUS_ORDER.index
+            trend = np.select(
+                [
+                    bull & (bull_curr > bull_prev) & (bull_curr > 5),
+                    bull,
+                    weak_bull,
+                    bear & (bear_curr > bear_prev) & (bear_curr > 5),
+                    bear,
+                    weak_bear,
+                ],
+                [
+                    status_index(TrendStatus.STRONG_BULL),
+                    status_index(TrendStatus.BULL),
+                    status_index(TrendStatus.WEAK_BULL),
+                    status_index(TrendStatus.STRONG_BEAR),
+                    status_index(TrendStatus.BEAR),
+                    status_index(TrendStatus.WEAK_BEAR),
+                ],
+                default=status_index(TrendStatus.CONSOLIDATION),
+            )
+            trend_points = np.array([30, 26, 18, 12, 8, 4, 0])  # 按 TrendStatus 定义顺序
+            score = trend_points[trend]
+            
+            # === 乖离率 ===
+            bias = np.where(ma5 > 0, (close - ma5) / ma5 * 100, 0.0)
+            score += np.select(
+                [(bias < 0) & (bias > -3), (bias < 0) & (bias > -5), bias < 0, bias < 2, bias < self.BIAS_THRESHOLD],
+                [20, 16, 8, 18, 14],
+                default=4,
+            )
+            
+            # === 量能（当日量 / 前 5 日均量，不含当日）===
+            volume = panel.volume
+            valid_volume = ~np.isnan(volume)
+            pad = np.zeros((volume.shape[0], 6))
+            vol_sum = np.concatenate([pad, np.cumsum(np.where(valid_volume, volume, 0.0), axis=1)], axis=1)
+            vol_cnt = np.concatenate([pad, np.cumsum(valid_volume, axis=1)], axis=1)
+            # 第 t 列：volume[t-5 .. t-1] 的有效值均值
+            vol_5d_avg = (vol_sum[:, 5:-1] - vol_sum[:, :-6]) / (vol_cnt[:, 5:-1] - vol_cnt[:, :-6])
+            ratio = np.where(vol_5d_avg > 0, volume / vol_5d_avg, 0.0)
+            up = (close - shift(close, 1)) / shift(close, 1) * 100 > 0
+            heavy = ratio >= self.VOLUME_HEAVY_RATIO
+            shrink = ratio <= self.VOLUME_SHRINK_RATIO
+            score += np.select([heavy & up, heavy, shrink & up, shrink], [12, 0, 6, 15], default=10)
+            
+            # === 均线支撑 ===
+            for ma in (ma5, ma10):
+                support = (ma > 0) & (np.abs(close - ma) / ma <= self.MA_SUPPORT_TOLERANCE) & (close >= ma)
+                score += np.where(support, 5, 0)
+            
+            # === MACD ===
+            dif, dea = ind.dif, ind.dea
+            prev_dif, prev_dea = shift(dif, 1), shift(dea, 1)
+            prev_diff, curr_diff = prev_dif - prev_dea, dif - dea
+            golden = (prev_diff <= 0) & (curr_diff > 0)
+            death = (prev_diff >= 0) & (curr_diff < 0)
+            macd_points = np.select(
+                [
+                    golden & (dif > 0),                   # 零轴上金叉
+                    (prev_dif <= 0) & (dif > 0),          # 上穿零轴
+                    golden,
+                    death,
+                    (prev_dif >= 0) & (dif < 0),          # 下穿零轴
+                    (dif > 0) & (dea > 0),                # 多头
+                    (dif < 0) & (dea < 0),                # 空头
+                ],
+                [15, 10, 12, 0, 0, 8, 2],
+                default=8,
+            )
+            score += np.where(bars >= self.MACD_SLOW, macd_points, 8)
+            
+            # === RSI（以 RSI12 为主）===
+            rsi_mid = ind.rsi[self.RSI_MID]
+            rsi_points = np.select(
+                [rsi_mid > self.RSI_OVERBOUGHT, rsi_mid > 60, rsi_mid >= 40, rsi_mid >= self.RSI_OVERSOLD],
+                [0, 8, 5, 3],
+                default=10,
+            )
+            score += np.where(bars >= self.RSI_LONG, rsi_points, 5)
+        
+        # === 买入信号 ===
+        in_trend = np.isin(trend, [status_index(TrendStatus.STRONG_BULL), status_index(TrendStatus.BULL)])
+        bullish = in_trend | (trend == status_index(TrendStatus.WEAK_BULL))
+        bearish = np.isin(trend, [status_index(TrendStatus.BEAR), status_index(TrendStatus.STRONG_BEAR)])
+        signal_index = BUY_SIGNAL_ORDER.index
+        buy_signal = np.select(
+            [(score >= 75) & in_trend, (score >= 60) & bullish, score >= 45, score >= 30, bearish],
+            [
+                signal_index(BuySignal.STRONG_BUY),
+                signal_index(BuySignal.BUY),
+                signal_index(BuySignal.HOLD),
+                signal_index(BuySignal.WAIT),
+                signal_index(BuySignal.STRONG_SELL),
+            ],
+            default=signal_index(BuySignal.SELL),
+        )
+        
+        return PanelSignals(
+            score=score,
+            trend_status=trend.astype(np.int8),
+            buy_signal=buy_signal.astype(np.int8),
+            bias_ma5=bias,
+            valid=bars >= 20,
+        )
+    
+    @staticmethod
+    def _insufficient_result(code: str) -> TrendAnalysisResult:
+        result = TrendAnalysisResult(code=code)
+        result.risk_factors.append("数据不足，无法完成分析")
         return result
     
-    def _calculate_mas(self, df: pd.DataFrame) -> pd.DataFrame:
-        """计算均线"""
-        df = df.copy()
-        df['MA5'] = df['close'].rolling(window=5).mean()
-        df['MA10'] = df['close'].rolling(window=10).mean()
-        df['MA20'] = df['close'].rolling(window=20).mean()
-        if len(df) >= 60:
-            df['MA60'] = df['close'].rolling(window=60).mean()
-        else:
-            df['MA60'] = df['MA20']  # 数据不足时使用 MA20 替代
-        return df
-
-    def _calculate_macd(self, df: pd.DataFrame) -> pd.DataFrame:
+    @staticmethod
+    def _latest_snapshots(panel: IndicatorPanel, ind: PanelIndicators) -> List[IndicatorSnapshot]:
         """
-        计算 MACD 指标
-
-        公式：
-        - EMA(12)：12日指数移动平均
-        - EMA(26)：26日指数移动平均
-        - DIF = EMA(12) - EMA(26)
-        - DEA = EMA(DIF, 9)
-        - MACD = (DIF - DEA) * 2
-        """
-        df = df.copy()
-
-        # 计算快慢线 EMA
-        ema_fast = df['close'].ewm(span=self.MACD_FAST, adjust=False).mean()
-        ema_slow = df['close'].ewm(span=self.MACD_SLOW, adjust=False).mean()
-
-        # 计算快线 DIF
-        df['MACD_DIF'] = ema_fast - ema_slow
-
-        # 计算信号线 DEA
-        df['MACD_DEA'] = df['MACD_DIF'].ewm(span=self.MACD_SIGNAL, adjust=False).mean()
-
-        # 计算柱状图
-        df['MACD_BAR'] = (df['MACD_DIF'] - df['MACD_DEA']) * 2
-
-        return df
-
-    def _calculate_rsi(self, df: pd.DataFrame) -> pd.DataFrame:
+        从指标面板中一次取出每只股票最新/前一日/5日前的数值
+        
+        面板按交易日右对齐，最后一列即每只股票的最新交易日
         """
-        计算 RSI 指标
+        n_bars = panel.n_bars
+        ma20 = ind.ma[20][:, -1]
+        with warnings.catch_warnings():
+            # 全为 NaN 的行（历史不足）返回 NaN，不需要告警
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            vol_5d_avg = np.nanmean(panel.volume[:, -6:-1], axis=1)
+            recent_high = np.nanmax(panel.high[:, -20:], axis=1)
+        columns = {
+            'n_bars': n_bars,
+            'close': panel.close[:, -1],
+            'prev_close': panel.close[:, -2],
+            'ma5': ind.ma[5][:, -1],
+            'ma10': ind.ma[10][:, -1],
+            'ma20': ma20,
+            'ma60': np.where(n_bars >= 60, ind.ma[60][:, -1], ma20),  # 数据不足时使用 MA20 替代
+            'prev5_ma5': ind.ma[5][:, -5],
+            'prev5_ma20': ind.ma[20][:, -5],
+            'volume': panel.volume[:, -1],
+            'vol_5d_avg': vol_5d_avg,
+            'recent_high': recent_high,
+            'dif': ind.dif[:, -1],
+            'dea': ind.dea[:, -1],
+            'bar': ind.bar[:, -1],
+            'prev_dif': ind.dif[:, -2],
+            'prev_dea': ind.dea[:, -2],
+            'rsi_6': ind.rsi[RSI_PERIODS[0]][:, -1],
+            'rsi_12': ind.rsi[RSI_PERIODS[1]][:, -1],
+            'rsi_24': ind.rsi[RSI_PERIODS[2]][:, -1],
+        }
+        lists = {name: values.tolist() for name, values in columns.items()}
+        return [
+            IndicatorSnapshot(**{name: values[i] for name, values in lists.items()})
+            for i in range(len(panel))
+        ]
+    
+    def _evaluate(self, code: str, snap: IndicatorSnapshot) -> TrendAnalysisResult:
+        """按交易理念对单只股票的最新指标评分"""
+        result = TrendAnalysisResult(code=code)
+        result.current_price = snap.close
+        result.ma5 = snap.ma5
+        result.ma10 = snap.ma10
+        result.ma20 = snap.ma20
+        result.ma60 = snap.ma60
 
-        公式：
-        - RS = 平均上涨幅度 / 平均下跌幅度
-        - RSI = 100 - (100 / (1 + RS))
-        """
-        df = df.copy()
+        # 1. 趋势判断
+        self._analyze_trend(snap, result)
 
-        for period in [self.RSI_SHORT, self.RSI_MID, self.RSI_LONG]:
-            # 计算价格变化
-            delta = df['close'].diff()
+        # 2. 乖离率计算
+        self._calculate_bias(result)
 
-            # 分离上涨和下跌
-            gain = delta.where(delta > 0, 0)
-            loss = -delta.where(delta < 0, 0)
+        # 3. 量能分析
+        self._analyze_volume(snap, result)
 
-            # 计算平均涨跌幅
-            avg_gain = gain.rolling(window=period).mean()
-            avg_loss = loss.rolling(window=period).mean()
+        # 4. 支撑压力分析
+        self._analyze_support_resistance(snap, result)
 
-            # 计算 RS 和 RSI
-            rs = avg_gain / avg_loss
-            rsi = 100 - (100 / (1 + rs))
+        # 5. MACD 分析
+        self._analyze_macd(snap, result)
 
-            # 填充 NaN 值
-            rsi = rsi.fillna(50)  # 默认中性值
+        # 6. RSI 分析
+        self._analyze_rsi(snap, result)
 
-            # 添加到 DataFrame
-            col_name = f'RSI_{period}'
-            df[col_name] = rsi
+        # 7. 生成买入信号
+        self._generate_signal(result)
 
-        return df
+        return result
     
-    def _analyze_trend(self, df: pd.DataFrame, result: TrendAnalysisResult) -> None:
+    def _analyze_trend(self, snap: IndicatorSnapshot, result: TrendAnalysisResult) -> None:
         """
         分析趋势状态
         
-        核心逻辑：判断均线排列和趋势强度
+        核心逻辑：判断均线排列和趋势强度（与 5 个交易日前的均线间距比较）
         """
         ma5, ma10, ma20 = result.ma5, result.ma10, result.ma20
         
         # 判断均线排列
         if ma5 > ma10 > ma20:
             # 检查间距是否在扩大（强势）
-            prev = df.iloc[-5] if len(df) >= 5 else df.iloc[-1]
-            prev_spread = (prev['MA5'] - prev['MA20']) / prev['MA20'] * 100 if prev['MA20'] > 0 else 0
+            prev_spread = (snap.prev5_ma5 - snap.prev5_ma20) / snap.prev5_ma20 * 100 if snap.prev5_ma20 > 0 else 0
             curr_spread = (ma5 - ma20) / ma20 * 100 if ma20 > 0 else 0
             
             if curr_spread > prev_spread and curr_spread > 5:
@@ -365,8 +589,7 @@ class StockTrendAnalyzer:
             result.trend_strength = 55
             
         elif ma5 < ma10 < ma20:
-            prev = df.iloc[-5] if len(df) >= 5 else df.iloc[-1]
-            prev_spread = (prev['MA20'] - prev['MA5']) / prev['MA5'] * 100 if prev['MA5'] > 0 else 0
+            prev_spread = (snap.prev5_ma20 - snap.prev5_ma5) / snap.prev5_ma5 * 100 if snap.prev5_ma5 > 0 else 0
             curr_spread = (ma20 - ma5) / ma5 * 100 if ma5 > 0 else 0
             
             if curr_spread > prev_spread and curr_spread > 5:
@@ -405,24 +628,17 @@ class StockTrendAnalyzer:
         if result.ma20 > 0:
             result.bias_ma20 = (price - result.ma20) / result.ma20 * 100
     
-    def _analyze_volume(self, df: pd.DataFrame, result: TrendAnalysisResult) -> None:
+    def _analyze_volume(self, snap: IndicatorSnapshot, result: TrendAnalysisResult) -> None:
         """
         分析量能
         
         偏好：缩量回调 > 放量上涨 > 缩量上涨 > 放量下跌
         """
-        if len(df) < 5:
-            return
-        
-        latest = df.iloc[-1]
-        vol_5d_avg = df['volume'].iloc[-6:-1].mean()
-        
-        if vol_5d_avg > 0:
-            result.volume_ratio_5d = float(latest['volume']) / vol_5d_avg
+        if snap.vol_5d_avg > 0:
+            result.volume_ratio_5d = snap.volume / snap.vol_5d_avg
         
         # 判断价格变化
-        prev_close = df.iloc[-2]['close']
-        price_change = (latest['close'] - prev_close) / prev_close * 100
+        price_change = (snap.close - snap.prev_close) / snap.prev_close * 100
         
         # 量能状态判断
         if result.volume_ratio_5d >= self.VOLUME_HEAVY_RATIO:
@@ -443,7 +659,7 @@ class StockTrendAnalyzer:
             result.volume_status = VolumeStatus.NORMAL
             result.volume_trend = "量能正常"
     
-    def _analyze_support_resistance(self, df: pd.DataFrame, result: TrendAnalysisResult) -> None:
+    def _analyze_support_resistance(self, snap: IndicatorSnapshot, result: TrendAnalysisResult) -> None:
         """
         分析支撑压力位
         
@@ -470,13 +686,11 @@ class StockTrendAnalyzer:
         if result.ma20 > 0 and price >= result.ma20:
             result.support_levels.append(result.ma20)
         
-        # 近期高点作为压力
-        if len(df) >= 20:
-            recent_high = df['high'].iloc[-20:].max()
-            if recent_high > price:
-                result.resistance_levels.append(recent_high)
+        # 近 20 个交易日高点作为压力
+        if snap.recent_high > price:
+            result.resistance_levels.append(snap.recent_high)
 
-    def _analyze_macd(self, df: pd.DataFrame, result: TrendAnalysisResult) -> None:
+    def _analyze_macd(self, snap: IndicatorSnapshot, result: TrendAnalysisResult) -> None:
         """
         分析 MACD 指标
 
@@ -485,20 +699,17 @@ class StockTrendAnalyzer:
         - 金叉：DIF 上穿 DEA
         - 死叉：DIF 下穿 DEA
         """
-        if len(df) < self.MACD_SLOW:
+        if snap.n_bars < self.MACD_SLOW:
             result.macd_signal = "数据不足"
             return
 
-        latest = df.iloc[-1]
-        prev = df.iloc[-2]
-
         # 获取 MACD 数据
-        result.macd_dif = float(latest['MACD_DIF'])
-        result.macd_dea = float(latest['MACD_DEA'])
-        result.macd_bar = float(latest['MACD_BAR'])
+        result.macd_dif = snap.dif
+        result.macd_dea = snap.dea
+        result.macd_bar = snap.bar
 
         # 判断金叉死叉
-        prev_dif_dea = prev['MACD_DIF'] - prev['MACD_DEA']
+        prev_dif_dea = snap.prev_dif - snap.prev_dea
         curr_dif_dea = result.macd_dif - result.macd_dea
 
         # 金叉：DIF 上穿 DEA
@@ -508,7 +719,7 @@ class StockTrendAnalyzer:
         is_death_cross = prev_dif_dea >= 0 and curr_dif_dea < 0
 
         # 零轴穿越
-        prev_zero = prev['MACD_DIF']
+        prev_zero = snap.prev_dif
         curr_zero = result.macd_dif
         is_crossing_up = prev_zero <= 0 and curr_zero > 0
         is_crossing_down = prev_zero >= 0 and curr_zero < 0
@@ -539,7 +750,7 @@ class StockTrendAnalyzer:
             result.macd_status = MACDStatus.BULLISH
             result.macd_signal = " MACD 中性区域"
 
-    def _analyze_rsi(self, df: pd.DataFrame, result: TrendAnalysisResult) -> None:
+    def _analyze_rsi(self, snap: IndicatorSnapshot, result: TrendAnalysisResult) -> None:
         """
         分析 RSI 指标
 
@@ -548,16 +759,14 @@ class StockTrendAnalyzer:
         - RSI < 30：超卖，关注反弹
         - 40-60：中性区域
         """
-        if len(df) < self.RSI_LONG:
+        if snap.n_bars < self.RSI_LONG:
             result.rsi_signal = "数据不足"
             return
 
-        latest = df.iloc[-1]
-
         # 获取 RSI 数据
-        result.rsi_6 = float(latest[f'RSI_{self.RSI_SHORT}'])
-        result.rsi_12 = float(latest[f'RSI_{self.RSI_MID}'])
-        result.rsi_24 = float(latest[f'RSI_{self.RSI_LONG}'])
+        result.rsi_6 = snap.rsi_6
+        result.rsi_12 = snap.rsi_12
+        result.rsi_24 = snap.rsi_24
 
         # 以中期 RSI(12) 为主进行判断
         rsi_mid = result.rsi_12
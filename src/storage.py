@@ -12,25 +12,33 @@ A股自选股智能分析系统 - 存储层
 """
 
 import atexit
+import json
 import logging
+import math
+import threading
+from collections import OrderedDict
 from datetime import datetime, date, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable, Sequence, Tuple
 from pathlib import Path
+from contextlib import contextmanager
 
 import pandas as pd
 from sqlalchemy import (
     create_engine,
+    event,
     Column,
     String,
     Float,
     Date,
     DateTime,
     Integer,
+    Text,
     Index,
     UniqueConstraint,
     select,
     and_,
     desc,
+    func,
 )
 from sqlalchemy.orm import (
     declarative_base,
@@ -38,14 +46,27 @@ from sqlalchemy.orm import (
     Session,
 )
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 
 from src.config import get_config
+from src.indicators import IndicatorPanel, IndicatorState
 
 logger = logging.getLogger(__name__)
 
 # SQLAlchemy ORM 基类
 Base = declarative_base()
 
+# 日线数值列（批量 UPSERT 时按列构造参数）
+DAILY_VALUE_COLUMNS = [
+    'open', 'high', 'low', 'close', 'volume', 'amount', 'pct_chg',
+    'ma5', 'ma10', 'ma20', 'volume_ratio',
+]
+# 冲突时需要更新的列
+DAILY_UPSERT_COLUMNS = DAILY_VALUE_COLUMNS + ['data_source']
+# 历史窗口 LRU 缓存容量（条目数）
+HISTORY_CACHE_SIZE = 256
+
 
 # === 数据模型定义 ===
 
@@ -120,6 +141,102 @@ class StockDaily(Base):
         }
 
 
+class StockSyncState(Base):
+    """
+    日线同步水位模型
+
+    每只股票一条记录，记录已入库的最新交易日及最近一次同步时间，
+    用于增量同步：只拉取水位之后缺失的日线，避免每次重拉固定窗口
+    """
+    __tablename__ = 'stock_sync_state'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    # 股票代码
+    code = Column(String(10), nullable=False, unique=True, index=True)
+
+    # 已入库的最新交易日（水位）
+    last_date = Column(Date)
+
+    # 最近一次同步到最近交易日（含确认该日无数据）的时间
+    last_synced_at = Column(DateTime)
+
+    # 最近一次同步使用的数据源
+    data_source = Column(String(50))
+
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return f"<StockSyncState(code={self.code}, last_date={self.last_date})>"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            'code': self.code,
+            'last_date': self.last_date,
+            'last_synced_at': self.last_synced_at,
+            'data_source': self.data_source,
+        }
+
+
+class StockDailyEmpty(Base):
+    """
+    已确认无日线的交易日（停牌、交易日历不可用时的工作日休市）
+
+    回补时数据源在这些日期前后都有数据、唯独这些日期没有，
+    记录后 find_date_gaps 不再把它们当作缺口反复请求
+    """
+    __tablename__ = 'stock_daily_empty'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    code = Column(String(10), nullable=False, index=True)
+    date = Column(Date, nullable=False)
+    confirmed_at = Column(DateTime, default=datetime.now)
+
+    __table_args__ = (
+        UniqueConstraint('code', 'date', name='uix_empty_code_date'),
+    )
+
+    def __repr__(self):
+        return f"<StockDailyEmpty(code={self.code}, date={self.date})>"
+
+
+class StockIndicatorState(Base):
+    """
+    增量指标状态模型
+
+    每只股票一条记录，保存截至 last_date 的 IndicatorState（JSON），
+    与 stock_daily 配套：读取时用 last_date 之后入库的日线追平，盘中评分无需重新加载历史
+    """
+    __tablename__ = 'stock_indicator_state'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    # 股票代码
+    code = Column(String(10), nullable=False, unique=True, index=True)
+
+    # 状态对应的最新交易日
+    last_date = Column(Date)
+
+    # 状态对应交易日的收盘价（用于发现历史日线被修正）
+    last_close = Column(Float)
+
+    # IndicatorState.to_dict() 的 JSON
+    state = Column(Text, nullable=False)
+
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def __repr__(self):
+        return f"<StockIndicatorState(code={self.code}, last_date={self.last_date})>"
+
+
+class QueryCounter:
+    """当前线程内执行的 SQL 语句计数（配合 DatabaseManager.track_queries 使用）"""
+
+    def __init__(self):
+        self.count = 0
+
+
 class DatabaseManager:
     """
     数据库管理器 - 单例模式
@@ -186,6 +303,24 @@ class DatabaseManager:
             Base.metadata.create_all(self._engine)
             self._migrate_analysis_history_source_columns()
 
+        # 历史窗口 LRU 缓存：(code, 库内最新交易日, 当日收盘价, days) -> DataFrame
+        self._history_cache: 'OrderedDict[Tuple[str, date, float, int], pd.DataFrame]' = OrderedDict()
+        self._history_lock = threading.Lock()
+
+        # 列式历史行情存储（HISTORY_STORE_ENABLED，依赖 pyarrow）
+        self._history_store = None
+        if config.history_store_enabled:
+            try:
+                from src.history_store import ArrowHistoryStore
+                self._history_store = ArrowHistoryStore(config.history_store_path, DAILY_VALUE_COLUMNS)
+                logger.info(f"列式历史存储已启用: {config.history_store_path}")
+            except ImportError:
+                logger.warning("HISTORY_STORE_ENABLED=true 但未安装 pyarrow，历史行情仅从数据库读取")
+
+        # 按线程统计 SQL 语句数（用于流水线报告每只股票的数据库查询次数）
+        self._query_tracking = threading.local()
+        event.listen(self._engine, 'before_cursor_execute', self._on_before_cursor_execute)
+
         self._initialized = True
         logger.info(f"数据库初始化完成")
 
@@ -243,6 +378,32 @@ class DatabaseManager:
         except Exception as e:
             logger.warning(f"清理数据库引擎时出错: {e}")
     
+    def _on_before_cursor_execute(self, *args, **kwargs) -> None:
+        """SQLAlchemy 事件钩子：累加当前线程的查询计数"""
+        counter = getattr(self._query_tracking, 'counter', None)
+        if counter is not None:
+            counter.count += 1
+
+    @contextmanager
+    def track_queries(self):
+        """
+        统计代码块内当前线程执行的 SQL 语句数
+        
+        使用示例:
+            with db.track_queries() as counter:
+                db.get_history_window('600519')
+            print(counter.count)
+        """
+        previous = getattr(self._query_tracking, 'counter', None)
+        counter = QueryCounter()
+        self._query_tracking.counter = counter
+        try:
+            yield counter
+        finally:
+            self._query_tracking.counter = previous
+            if previous is not None:
+                previous.count += counter.count
+
     def get_session(self) -> Session:
         """
         获取数据库 Session
@@ -287,6 +448,263 @@ class DatabaseManager:
             
             return result is not None
     
+    def get_latest_date(self, code: str) -> Optional[date]:
+        """
+        获取已入库的最新交易日
+
+        Args:
+            code: 股票代码
+
+        Returns:
+            最新交易日，无数据时返回 None
+        """
+        with self.get_session() as session:
+            return session.execute(
+                select(func.max(StockDaily.date)).where(StockDaily.code == code)
+            ).scalar()
+
+    def get_latest_bar(self, code: str) -> Optional[Tuple[date, float]]:
+        """
+        获取已入库的最新一根日线的 (交易日, 收盘价)
+
+        一次索引查找，用于判断进程内缓存/列式存储是否落后于数据库
+        （其他进程写入新 K 线或修正最新收盘价时均会变化）
+
+        Returns:
+            (交易日, 收盘价)，无数据时返回 None
+        """
+        with self.get_session() as session:
+            row = session.execute(
+                select(StockDaily.date, StockDaily.close)
+                .where(StockDaily.code == code)
+                .order_by(desc(StockDaily.date))
+                .limit(1)
+            ).first()
+        if row is None:
+            return None
+        return row.date, row.close
+
+    def get_sync_state(self, code: str) -> Optional[StockSyncState]:
+        """
+        获取股票的同步水位
+
+        Args:
+            code: 股票代码
+
+        Returns:
+            StockSyncState 对象，未同步过则返回 None
+        """
+        with self.get_session() as session:
+            return session.execute(
+                select(StockSyncState).where(StockSyncState.code == code)
+            ).scalar_one_or_none()
+
+    def update_sync_state(
+        self,
+        code: str,
+        last_date: Optional[date],
+        data_source: Optional[str] = None,
+        synced: bool = True,
+    ) -> None:
+        """
+        更新股票的同步水位
+
+        水位只前进不后退：回补历史缺口时传入较早的日期不会覆盖已有水位
+
+        Args:
+            code: 股票代码
+            last_date: 本次同步后已入库的最新交易日
+            data_source: 数据来源名称
+            synced: 是否已同步到最近交易日（含确认无新数据），为 False 时不更新 last_synced_at
+        """
+        with self.get_session() as session:
+            try:
+                state = session.execute(
+                    select(StockSyncState).where(StockSyncState.code == code)
+                ).scalar_one_or_none()
+                if state is None:
+                    state = StockSyncState(code=code)
+                    session.add(state)
+                if last_date is not None and (state.last_date is None or last_date > state.last_date):
+                    state.last_date = last_date
+                if synced:
+                    state.last_synced_at = datetime.now()
+                if data_source:
+                    state.data_source = data_source
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.error(f"更新 {code} 同步水位失败: {e}")
+                raise
+
+    def get_indicator_state(self, code: str, days: int = 120) -> Optional[IndicatorState]:
+        """
+        获取股票的增量指标状态，并追平到已入库的最新交易日
+
+        - 已有状态：只读取 last_date 之后入库的日线逐根追加（O(新增 K 线数)）
+        - 无状态，或 last_date 当日收盘价与库内不一致（历史被修正）：由最近 days 个交易日重建
+        - 状态有变化时写回 stock_indicator_state
+
+        Args:
+            code: 股票代码
+            days: 重建状态时使用的交易日数量（与趋势分析的历史窗口一致）
+
+        Returns:
+            IndicatorState，无日线数据时返回 None
+        """
+        with self.get_session() as session:
+            row = session.execute(
+                select(StockIndicatorState).where(StockIndicatorState.code == code)
+            ).scalar_one_or_none()
+            stored = (row.last_date, row.last_close, row.state) if row is not None else None
+
+        state = None
+        if stored is not None:
+            last_date, last_close, payload = stored
+            try:
+                state = IndicatorState.from_dict(json.loads(payload))
+            except (ValueError, KeyError, TypeError) as e:
+                logger.warning(f"[{code}] 指标状态解析失败，将重建: {e}")
+
+        if state is not None and state.last_date is not None:
+            with self.get_session() as session:
+                bars = session.execute(
+                    select(StockDaily.date, StockDaily.close, StockDaily.high, StockDaily.volume)
+                    .where(and_(StockDaily.code == code, StockDaily.date >= state.last_date))
+                    .order_by(StockDaily.date)
+                ).all()
+            if bars and bars[0].date == state.last_date and bars[0].close == last_close:
+                new_bars = bars[1:]
+                for bar in new_bars:
+                    state.update(bar.date, bar.close, bar.high, bar.volume)
+                if new_bars:
+                    self.save_indicator_state(state)
+                return state
+            logger.info(f"[{code}] {state.last_date} 日线与指标状态不一致，重建指标状态")
+
+        history = self.get_history_window(code, days=days)
+        if history.empty:
+            return None
+        state = IndicatorState.from_history(code, history)
+        self.save_indicator_state(state)
+        return state
+
+    def save_indicator_state(self, state: IndicatorState) -> None:
+        """
+        保存增量指标状态（UPSERT）
+
+        Args:
+            state: IndicatorState
+        """
+        payload = json.dumps(state.to_dict(), ensure_ascii=False)
+        with self.get_session() as session:
+            try:
+                row = session.execute(
+                    select(StockIndicatorState).where(StockIndicatorState.code == state.code)
+                ).scalar_one_or_none()
+                if row is None:
+                    row = StockIndicatorState(code=state.code)
+                    session.add(row)
+                row.last_date = state.last_date
+                row.last_close = state.last_close
+                row.state = payload
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.error(f"保存 {state.code} 指标状态失败: {e}")
+                raise
+
+    def find_date_gaps(
+        self,
+        code: str,
+        start_date: date,
+        end_date: date,
+        trade_dates: Optional[Sequence[date]] = None,
+    ) -> List[Tuple[date, date]]:
+        """
+        查找指定区间内的日线缺口
+
+        区间内（含头部与尾部）应有数据但未入库、也未确认无数据（StockDailyEmpty）的交易日视为缺失，
+        相邻的缺失交易日合并为一个缺口区间
+
+        Args:
+            code: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期（通常为最近一个应有数据的交易日）
+            trade_dates: 区间内的交易日（交易日历）；为 None 时按工作日判断
+
+        Returns:
+            缺口列表 [(缺口开始日期, 缺口结束日期), ...]，按日期升序
+        """
+        if start_date > end_date:
+            return []
+        with self.get_session() as session:
+            stored = set(session.execute(
+                select(StockDaily.date)
+                .where(
+                    and_(
+                        StockDaily.code == code,
+                        StockDaily.date >= start_date,
+                        StockDaily.date <= end_date
+                    )
+                )
+            ).scalars().all())
+            stored.update(session.execute(
+                select(StockDailyEmpty.date)
+                .where(
+                    and_(
+                        StockDailyEmpty.code == code,
+                        StockDailyEmpty.date >= start_date,
+                        StockDailyEmpty.date <= end_date
+                    )
+                )
+            ).scalars().all())
+
+        if trade_dates is None:
+            trade_dates = pd.bdate_range(start_date, end_date).date
+        gaps: List[Tuple[date, date]] = []
+        gap_start = gap_end = None
+        for day in trade_dates:
+            if not start_date <= day <= end_date:
+                continue
+            if day in stored:
+                if gap_start is not None:
+                    gaps.append((gap_start, gap_end))
+                    gap_start = None
+                continue
+            if gap_start is None:
+                gap_start = day
+            gap_end = day
+        if gap_start is not None:
+            gaps.append((gap_start, gap_end))
+        return gaps
+
+    def mark_empty_dates(self, code: str, dates: Iterable[date]) -> int:
+        """
+        记录已确认无日线的交易日（停牌、休市），之后 find_date_gaps 跳过这些日期
+
+        Returns:
+            新记录的天数
+        """
+        dates = sorted(set(dates))
+        if not dates:
+            return 0
+        with self.get_session() as session:
+            try:
+                existing = set(session.execute(
+                    select(StockDailyEmpty.date).where(
+                        and_(StockDailyEmpty.code == code, StockDailyEmpty.date.in_(dates))
+                    )
+                ).scalars().all())
+                new_dates = [d for d in dates if d not in existing]
+                session.add_all(StockDailyEmpty(code=code, date=d) for d in new_dates)
+                session.commit()
+                return len(new_dates)
+            except Exception as e:
+                session.rollback()
+                logger.error(f"记录 {code} 无数据交易日失败: {e}")
+                raise
+
     def get_latest_data(
         self, 
         code: str, 
@@ -314,6 +732,242 @@ class DatabaseManager:
             
             return list(results)
     
+    def get_history_window(
+        self,
+        code: str,
+        days: int = 120
+    ) -> pd.DataFrame:
+        """
+        获取最近 N 个交易日的列式历史窗口（供趋势分析器使用）
+        
+        一次索引范围扫描直接取列，不构造 ORM 对象；结果按 (code, 库内最新交易日, 当日收盘价, days)
+        缓存在进程内 LRU 中。每次读取先查询库内最新一根日线（一次索引查找），
+        其他进程（如定时任务/命令行）写入新数据或修正收盘价后缓存键随之变化
+        
+        Args:
+            code: 股票代码
+            days: 交易日数量
+            
+        Returns:
+            按日期升序的 DataFrame（date 列为 datetime64），无数据时返回空 DataFrame
+        """
+        latest_bar = self.get_latest_bar(code)
+        if latest_bar is None:
+            return pd.DataFrame(columns=['date'] + DAILY_VALUE_COLUMNS)
+        key = (code, latest_bar[0], latest_bar[1], days)
+        with self._history_lock:
+            if key in self._history_cache:
+                self._history_cache.move_to_end(key)
+                return self._history_cache[key].copy()
+        
+        df = self._read_history_store(code, days, latest_bar)
+        if df is None:
+            columns = ['date'] + DAILY_VALUE_COLUMNS
+            with self.get_session() as session:
+                rows = session.execute(
+                    select(*[getattr(StockDaily, col) for col in columns])
+                    .where(StockDaily.code == code)
+                    .order_by(desc(StockDaily.date))
+                    .limit(days)
+                ).all()
+            
+            df = pd.DataFrame.from_records(rows[::-1], columns=columns)
+            if df.empty:
+                return df
+            df['date'] = pd.to_datetime(df['date'])
+            df[DAILY_VALUE_COLUMNS] = df[DAILY_VALUE_COLUMNS].astype(float)
+        elif df.empty:
+            return df
+        
+        with self._history_lock:
+            self._history_cache[key] = df
+            while len(self._history_cache) > HISTORY_CACHE_SIZE:
+                self._history_cache.popitem(last=False)
+        return df.copy()
+    
+    def get_history_frames(
+        self,
+        codes: List[str],
+        days: int = 120
+    ) -> pd.DataFrame:
+        """
+        批量获取多只股票最近 N 个交易日的日线（长表，供 IndicatorPanel.from_long_frame 使用）
+
+        按代码分批做一次范围扫描，不逐只查询；日历范围取 days 的两倍，
+        再按股票截取最近 days 个交易日
+
+        Args:
+            codes: 股票代码列表
+            days: 每只股票的交易日数量
+
+        Returns:
+            含 code/date 及日线数值列的 DataFrame（按 code、date 升序），无数据时返回空 DataFrame
+        """
+        columns = ['code', 'date'] + DAILY_VALUE_COLUMNS
+        if not codes:
+            return pd.DataFrame(columns=columns)
+
+        if self._history_store is not None:
+            frames = []
+            for code in codes:
+                df = self.get_history_window(code, days=days)
+                if not df.empty:
+                    frames.append(df.assign(code=code)[columns])
+            return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+        start_date = date.today() - timedelta(days=days * 2)
+        rows = []
+        with self.get_session() as session:
+            # SQLite 默认变量上限 999，分批查询
+            for i in range(0, len(codes), 500):
+                chunk = codes[i:i + 500]
+                rows.extend(session.execute(
+                    select(*[getattr(StockDaily, col) for col in columns])
+                    .where(and_(StockDaily.code.in_(chunk), StockDaily.date >= start_date))
+                ).all())
+
+        df = pd.DataFrame.from_records(rows, columns=columns)
+        if df.empty:
+            return df
+        df['date'] = pd.to_datetime(df['date'])
+        df[DAILY_VALUE_COLUMNS] = df[DAILY_VALUE_COLUMNS].astype(float)
+        df = df.sort_values(['code', 'date'])
+        return df.groupby('code', sort=False).tail(days).reset_index(drop=True)
+
+    def get_history_arrays(self, code: str, days: int = 120) -> Optional[Dict[str, Any]]:
+        """
+        获取最近 N 个交易日的列数组（供分析器/回测直接使用）
+        
+        启用列式存储时直接返回内存映射数据的 NumPy 视图（单分区零拷贝），否则由数据库窗口转换
+        
+        Returns:
+            {'date': datetime64[D] 数组, 数值列: float64 数组}，无数据返回 None
+        """
+        if self._history_store is not None and self._ensure_history_store(code):
+            try:
+                return self._history_store.read_arrays(code, days)
+            except Exception as e:
+                logger.warning(f"[列式存储] {code} 读取失败，改为从数据库读取: {e}")
+        df = self.get_history_window(code, days=days)
+        if df.empty:
+            return None
+        arrays = {'date': df['date'].to_numpy().astype('datetime64[D]')}
+        arrays.update({col: df[col].to_numpy(dtype=float) for col in DAILY_VALUE_COLUMNS})
+        return arrays
+
+    def get_history_panel(self, codes: List[str], days: int = 120) -> IndicatorPanel:
+        """
+        批量获取多只股票最近 N 个交易日的指标面板（供回测使用）
+
+        启用列式存储时逐只读取列数组直接写入面板（不经过 DataFrame），
+        否则由 get_history_frames 的批量范围扫描构建
+
+        Args:
+            codes: 股票代码列表
+            days: 每只股票的交易日数量
+        """
+        if self._history_store is None:
+            return IndicatorPanel.from_long_frame(self.get_history_frames(codes, days=days))
+        columns = {}
+        for code in codes:
+            arrays = self.get_history_arrays(code, days=days)
+            if arrays is not None:
+                columns[code] = arrays
+        return IndicatorPanel.from_arrays(columns)
+    
+    def _ensure_history_store(self, code: str, db_latest: Optional[Tuple[date, float]] = None) -> bool:
+        """
+        确保列式存储与数据库中该股票的日线一致
+        
+        以库内最新一根日线 (交易日, 收盘价) 为准（其他进程写入或修正数据后均会变化）：
+        - 与存储的最新一根一致：直接使用
+        - 存储落后且其最新一根的收盘价与库内同日一致：只追加之后的日线
+        - 否则（首次导入、历史被修正、库内数据被删除）：由 stock_daily 整体重建
+        
+        Args:
+            code: 股票代码
+            db_latest: 调用方已查询的库内最新一根日线（省去一次重复查询）
+        
+        Returns:
+            列式存储中是否有该股票的数据
+        """
+        store = self._history_store
+        try:
+            if db_latest is None:
+                db_latest = self.get_latest_bar(code)
+            if db_latest is None:
+                return False
+            stored = store.latest_bar(code)
+            if stored is not None and self._same_bar(stored, db_latest):
+                return True
+            
+            columns = ['date'] + DAILY_VALUE_COLUMNS
+            query = select(*[getattr(StockDaily, col) for col in columns]).where(StockDaily.code == code)
+            rebuild = True
+            if stored is not None and stored[0] < db_latest[0]:
+                with self.get_session() as session:
+                    db_close = session.execute(
+                        select(StockDaily.close).where(and_(StockDaily.code == code, StockDaily.date == stored[0]))
+                    ).first()
+                if db_close is not None and self._same_bar(stored, (stored[0], db_close.close)):
+                    query = query.where(StockDaily.date > stored[0])
+                    rebuild = False
+            with self.get_session() as session:
+                rows = session.execute(query.order_by(StockDaily.date)).all()
+            if rebuild:
+                store.remove(code)
+            store.write(code, pd.DataFrame.from_records(rows, columns=columns))
+            logger.debug(f"[列式存储] {code} {'重建' if rebuild else '追加'} {len(rows)} 条日线")
+            return True
+        except Exception as e:
+            logger.warning(f"[列式存储] {code} 同步失败，改为从数据库读取: {e}")
+            return False
+    
+    @staticmethod
+    def _same_bar(a: Tuple[date, Optional[float]], b: Tuple[date, Optional[float]]) -> bool:
+        """两根日线的 (交易日, 收盘价) 是否一致（收盘价缺失视为相同）"""
+        if a[0] != b[0]:
+            return False
+        close_a, close_b = a[1], b[1]
+        if close_a is None or close_b is None or math.isnan(close_a) or math.isnan(close_b):
+            return (close_a is None or math.isnan(close_a)) == (close_b is None or math.isnan(close_b))
+        return abs(close_a - close_b) < 1e-9
+    
+    def _read_history_store(
+        self, code: str, days: int, db_latest: Optional[Tuple[date, float]] = None
+    ) -> Optional[pd.DataFrame]:
+        """从列式存储读取历史窗口；未启用或失败时返回 None（由调用方回退到数据库）"""
+        if self._history_store is None or not self._ensure_history_store(code, db_latest):
+            return None
+        try:
+            return self._history_store.read_window(code, days)
+        except Exception as e:
+            logger.warning(f"[列式存储] {code} 读取失败，改为从数据库读取: {e}")
+            return None
+    
+    def _mirror_to_history_store(self, df: pd.DataFrame) -> None:
+        """
+        将写入数据库的日线同步写入列式存储
+        
+        只写入已导入过的股票；未导入的股票在首次读取时整体导入，避免存储中只有部分历史
+        """
+        store = self._history_store
+        if store is None or df.empty:
+            return
+        for code, group in df.groupby('code'):
+            try:
+                if store.has(code):
+                    store.write(code, group)
+            except Exception as e:
+                logger.warning(f"[列式存储] {code} 写入失败: {e}")
+    
+    def _invalidate_history_cache(self, codes) -> None:
+        """写入日线后丢弃这些股票的历史窗口缓存"""
+        codes = set(codes)
+        with self._history_lock:
+            for key in [k for k in self._history_cache if k[0] in codes]:
+                del self._history_cache[key]
+    
     def get_data_range(
         self, 
         code: str, 
@@ -329,8 +983,20 @@ class DatabaseManager:
             end_date: 结束日期
             
         Returns:
-            StockDaily 对象列表
+            StockDaily 对象列表（启用列式存储时为未绑定会话的只读对象）
         """
+        if self._history_store is not None and self._ensure_history_store(code):
+            try:
+                df = self._history_store.read_range(code, start_date, end_date)
+                return [
+                    StockDaily(code=code, date=record.pop('date').date(), **{
+                        k: (None if pd.isna(v) else v) for k, v in record.items()
+                    })
+                    for record in df.to_dict('records')
+                ]
+            except Exception as e:
+                logger.warning(f"[列式存储] {code} 读取失败，改为从数据库读取: {e}")
+        
         with self.get_session() as session:
             results = session.execute(
                 select(StockDaily)
@@ -349,15 +1015,139 @@ class DatabaseManager:
     def save_daily_data(
         self, 
         df: pd.DataFrame, 
-        code: str,
+        code: Optional[str] = None,
         data_source: str = "Unknown"
     ) -> int:
         """
-        保存日线数据到数据库
+        保存日线数据到数据库（批量 UPSERT）
         
         策略：
-        - 使用 UPSERT 逻辑（存在则更新，不存在则插入）
-        - 跳过已存在的数据，避免重复
+        - SQLite 使用 INSERT ... ON CONFLICT DO UPDATE，MySQL 使用 ON DUPLICATE KEY UPDATE
+        - 按列数组构造参数，单条语句 executemany，整个 DataFrame 在一个事务内提交
+        - 支持多股票 DataFrame（含 code 列），可一次保存整个自选股列表
+        - 其他数据库回退到逐行 ORM 路径
+        
+        Args:
+            df: 包含日线数据的 DataFrame
+            code: 股票代码（df 含 code 列时可省略）
+            data_source: 数据来源名称
+            
+        Returns:
+            新增的记录数（已存在的记录会被更新，不计入）
+        """
+        label = code or 'batch'
+        if df is None or df.empty:
+            logger.warning(f"保存数据为空，跳过 {label}")
+            return 0
+        
+        if code is None and 'code' not in df.columns:
+            raise ValueError("save_daily_data: 未指定 code 且 DataFrame 不含 code 列")
+        
+        dialect = self._engine.dialect.name
+        if dialect not in ('sqlite', 'mysql'):
+            if code is None:
+                return sum(
+                    self._save_daily_data_rowwise(group, group_code, data_source)
+                    for group_code, group in df.groupby('code')
+                )
+            return self._save_daily_data_rowwise(df, code, data_source)
+        
+        records = self._build_daily_records(df, code, data_source)
+        if not records:
+            logger.warning(f"保存数据无有效日期，跳过 {label}")
+            return 0
+        
+        if dialect == 'sqlite':
+            stmt = sqlite_insert(StockDaily)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['code', 'date'],
+                set_={**{col: stmt.excluded[col] for col in DAILY_UPSERT_COLUMNS}, 'updated_at': datetime.now()},
+            )
+        else:
+            stmt = mysql_insert(StockDaily)
+            stmt = stmt.on_duplicate_key_update(
+                {**{col: stmt.inserted[col] for col in DAILY_UPSERT_COLUMNS}, 'updated_at': datetime.now()}
+            )
+        
+        with self.get_session() as session:
+            try:
+                existing_count = self._count_existing_daily(session, records)
+                session.execute(stmt, records)
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                logger.error(f"保存 {label} 数据失败: {e}")
+                raise
+        
+        self._invalidate_history_cache(record['code'] for record in records)
+        self._mirror_to_history_store(pd.DataFrame.from_records(records))
+        
+        saved_count = len(records) - existing_count
+        logger.info(f"保存 {label} 数据成功，共 {len(records)} 条，新增 {saved_count} 条")
+        return saved_count
+    
+    @staticmethod
+    def _build_daily_records(
+        df: pd.DataFrame,
+        code: Optional[str],
+        data_source: str
+    ) -> List[Dict[str, Any]]:
+        """
+        按列数组构造批量写入参数
+        
+        日期列统一转换为 date，NaN 转换为 None；缺失的列写入 None
+        """
+        dates = pd.to_datetime(df['date'], errors='coerce')
+        valid = dates.notna().to_numpy()
+        n = int(valid.sum())
+        
+        columns = {
+            'code': (df['code'].astype(str).to_numpy()[valid] if code is None else [code] * n),
+            'date': dates.dt.date.to_numpy()[valid],
+        }
+        for col in DAILY_VALUE_COLUMNS:
+            if col in df.columns:
+                values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float)[valid]
+                columns[col] = [None if v != v else float(v) for v in values]
+            else:
+                columns[col] = [None] * n
+        columns['data_source'] = [data_source] * n
+        
+        keys = list(columns)
+        return [dict(zip(keys, values)) for values in zip(*columns.values())]
+    
+    @staticmethod
+    def _count_existing_daily(session: Session, records: List[Dict[str, Any]]) -> int:
+        """统计批量写入前已存在的 (code, date) 数量（按股票分组，每只股票一次区间查询）"""
+        dates_by_code: Dict[str, set] = {}
+        for record in records:
+            dates_by_code.setdefault(record['code'], set()).add(record['date'])
+        
+        existing = 0
+        for code, dates in dates_by_code.items():
+            stored = session.execute(
+                select(StockDaily.date).where(
+                    and_(
+                        StockDaily.code == code,
+                        StockDaily.date >= min(dates),
+                        StockDaily.date <= max(dates)
+                    )
+                )
+            ).scalars().all()
+            existing += len(dates.intersection(stored))
+        return existing
+    
+    def _save_daily_data_rowwise(
+        self, 
+        df: pd.DataFrame, 
+        code: str,
+        data_source: str = "Unknown"
+    ) -> int:
+        """
+        逐行保存日线数据（ORM 路径）
+        
+        每行先 SELECT 再更新/插入，用于不支持原生 UPSERT 的数据库，
+        也作为批量 UPSERT 的性能对比基线
         
         Args:
             df: 包含日线数据的 DataFrame
@@ -372,6 +1162,7 @@ class DatabaseManager:
             return 0
         
         saved_count = 0
+        latest_date = None
         
         with self.get_session() as session:
             try:
@@ -384,6 +1175,8 @@ class DatabaseManager:
                         row_date = row_date.date()
                     elif isinstance(row_date, pd.Timestamp):
                         row_date = row_date.date()
+                    if latest_date is None or row_date > latest_date:
+                        latest_date = row_date
                     
                     # 检查是否已存在
                     existing = session.execute(
@@ -439,6 +1232,9 @@ class DatabaseManager:
                 logger.error(f"保存 {code} 数据失败: {e}")
                 raise
         
+        if latest_date is not None:
+            self._invalidate_history_cache([code])
+            self._mirror_to_history_store(df.assign(code=code))
         return saved_count
     
     def get_analysis_context(
@@ -468,35 +1264,52 @@ class DatabaseManager:
             logger.warning(f"未找到 {code} 的数据")
             return None
         
-        today_data = recent_data[0]
-        yesterday_data = recent_data[1] if len(recent_data) > 1 else None
+        return self.build_analysis_context(code, [r.to_dict() for r in recent_data])
+    
+    @classmethod
+    def build_analysis_context(cls, code: str, recent_rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        由最近的日线记录构造分析上下文（今日数据 + 昨日对比）
+        
+        与 get_analysis_context 共用，调用方已持有日线数据时无需再次查询数据库
+        
+        Args:
+            code: 股票代码
+            recent_rows: 日线字典列表（按日期降序，至少 1 条）
+            
+        Returns:
+            包含今日数据、昨日对比等信息的字典
+        """
+        today_data = recent_rows[0]
+        yesterday_data = recent_rows[1] if len(recent_rows) > 1 else None
         
         context = {
             'code': code,
-            'date': today_data.date.isoformat(),
-            'today': today_data.to_dict(),
+            'date': today_data['date'].isoformat(),
+            'today': today_data,
         }
         
         if yesterday_data:
-            context['yesterday'] = yesterday_data.to_dict()
+            context['yesterday'] = yesterday_data
             
             # 计算相比昨日的变化
-            if yesterday_data.volume and yesterday_data.volume > 0:
+            if yesterday_data.get('volume') and today_data.get('volume') is not None:
                 context['volume_change_ratio'] = round(
-                    today_data.volume / yesterday_data.volume, 2
+                    today_data['volume'] / yesterday_data['volume'], 2
                 )
             
-            if yesterday_data.close and yesterday_data.close > 0:
+            if yesterday_data.get('close') and today_data.get('close') is not None:
                 context['price_change_ratio'] = round(
-                    (today_data.close - yesterday_data.close) / yesterday_data.close * 100, 2
+                    (today_data['close'] - yesterday_data['close']) / yesterday_data['close'] * 100, 2
                 )
             
             # 均线形态判断
-            context['ma_status'] = self._analyze_ma_status(today_data)
+            context['ma_status'] = cls._analyze_ma_status(today_data)
         
         return context
     
-    def _analyze_ma_status(self, data: StockDaily) -> str:
+    @staticmethod
+    def _analyze_ma_status(data: Dict[str, Any]) -> str:
         """
         分析均线形态
         
@@ -505,10 +1318,10 @@ class DatabaseManager:
         - 空头排列：close < ma5 < ma10 < ma20
         - 震荡整理：其他情况
         """
-        close = data.close or 0
-        ma5 = data.ma5 or 0
-        ma10 = data.ma10 or 0
-        ma20 = data.ma20 or 0
+        close = data.get('close') or 0
+        ma5 = data.get('ma5') or 0
+        ma10 = data.get('ma10') or 0
+        ma20 = data.get('ma20') or 0
         
         if close > ma5 > ma10 > ma20 > 0:
             return "多头排列 📈"
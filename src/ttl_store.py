@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+===================================
+SQLite TTL/LRU 键值存储（LLM 响应缓存与搜索结果缓存共用）
+===================================
+
+TTLStore 把文本值保存在本地 SQLite 文件（WAL 模式，跨进程共享）中：
+1. TTL：超过有效期的条目视为未命中，并在写入时顺带清理
+2. 容量上限：条目数超过 max_entries 时按最近访问时间淘汰
+3. 命中/未命中/写入/淘汰计数（本进程），供 /api/health 展示
+
+LazyStore 负责按配置开关懒加载单例；初始化失败只告警一次，之后直接返回 None。
+
+使用方式：
+    store = TTLStore(path, ttl=1800, max_entries=5000)
+    store.set(key, value, meta={'provider': 'Bocha'})
+    value = store.get(key)
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Generic, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class TTLStore:
+    """
+    基于 SQLite 的 TTL/LRU 键值存储
+
+    - entries: key → 文本值与元数据（JSON），带过期时间、最近访问时间与命中次数
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float,
+        max_entries: int,
+    ):
+        """
+        Args:
+            path: SQLite 文件路径
+            ttl: 默认有效期（秒），写入时可按条目覆盖
+            max_entries: 最多保留的条目数
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                meta TEXT NOT NULL DEFAULT '{}',
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS ix_entries_accessed_at ON entries (accessed_at);
+        """)
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    def get(
+        self,
+        key: str,
+        accept: Optional[Callable[[str, Dict[str, Any]], bool]] = None,
+    ) -> Optional[str]:
+        """
+        读取未过期的值
+
+        Args:
+            key: 键
+            accept: 额外的命中条件（参数为 值, 元数据），返回 False 时按未命中处理
+
+        Returns:
+            值，不存在、已过期或不满足 accept 时返回 None
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, meta FROM entries WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None or (accept is not None and not accept(row[0], json.loads(row[1]))):
+                self._stats['misses'] += 1
+                return None
+            self._conn.execute(
+                "UPDATE entries SET accessed_at = ?, hit_count = hit_count + 1 WHERE key = ?",
+                (now, key),
+            )
+            self._stats['hits'] += 1
+        return row[0]
+
+    def set(
+        self,
+        key: str,
+        value: str,
+        meta: Optional[Dict[str, Any]] = None,
+        ttl: Optional[float] = None,
+    ) -> None:
+        """写入值，并清理过期条目、按最近访问时间淘汰超出容量的条目"""
+        now = time.time()
+        expires_at = now + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(key, value, meta, created_at, expires_at, accessed_at, hit_count) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (key, value, json.dumps(meta or {}, ensure_ascii=False), now, expires_at, now),
+            )
+            self._stats['stores'] += 1
+            evicted = self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,)).rowcount
+            count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            if count > self.max_entries:
+                evicted += self._conn.execute(
+                    "DELETE FROM entries WHERE key IN "
+                    "(SELECT key FROM entries ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_entries,),
+                ).rowcount
+            self._stats['evictions'] += evicted
+
+    def clear(self) -> int:
+        """清空，返回删除数量"""
+        with self._lock:
+            return self._conn.execute("DELETE FROM entries").rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计（本进程）与当前条目数（全部进程共享）"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['entries'] = entries
+        stats['max_entries'] = self.max_entries
+        stats['ttl'] = self.ttl
+        return stats
+
+
+class LazyStore(Generic[T]):
+    """
+    按配置开关懒加载的缓存单例
+
+    - enabled(config) 为 False 时返回 None
+    - 首次使用时调用 factory(config) 创建；失败时记录一次告警，之后不再重试
+    """
+
+    def __init__(
+        self,
+        label: str,
+        enabled: Callable[[Any], bool],
+        factory: Callable[[Any], T],
+    ):
+        """
+        Args:
+            label: 日志前缀（如 "LLM缓存"）
+            enabled: 由配置判断是否启用
+            factory: 由配置创建缓存实例
+        """
+        self.label = label
+        self._enabled = enabled
+        self._factory = factory
+        self._instance: Optional[T] = None
+        self._failed = False
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[T]:
+        """获取单例（未启用或初始化失败时返回 None）"""
+        from src.config import get_config
+
+        config = get_config()
+        if not self._enabled(config) or self._failed:
+            return None
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None and not self._failed:
+                    try:
+                        self._instance = self._factory(config)
+                        logger.info(f"[{self.label}] 已启用: {getattr(self._instance, 'path', '')}")
+                    except Exception as e:
+                        self._failed = True
+                        logger.warning(f"[{self.label}] 初始化失败，本进程不再使用缓存: {e}")
+        return self._instance
+
+    def reset(self) -> None:
+        """丢弃单例与失败状态（配置变更或测试时使用）"""
+        with self._lock:
+            self._instance = None
+            self._failed = False
@@ -251,6 +251,47 @@ class ApiHandler:
         }
         return JsonResponse(data)
     
+    def handle_api_health(self) -> Response:
+        """
+        数据源健康记分板 GET /api/health
+        
+        返回:
+            {
+                "status": "ok",
+                "timestamp": "2026-01-19T10:30:00",
+                "data_sources": {
+                    "daily": {"EfinanceFetcher": {"healthy": true, "success_rate": 0.95, "p50": 1.0, ...}},
+                    "realtime": {...}, "chip": {...}, "indices": {...}
+                },
+                "circuit_breakers": {"realtime": {"efinance": "closed"}, "chip": {...}},
+                "llm_cache": {"hits": 3, "misses": 10, "hit_rate": 0.2308, "entries": 42, ...},  // 未启用时为 null
+                "search_cache": {"hits": 12, "misses": 5, "hit_rate": 0.7059, "entries": 80, ...}  // 未启用时为 null
+            }
+        """
+        from data_provider.source_stats import get_health_report
+        from src.llm_cache import get_llm_cache
+        from src.search_cache import get_search_cache
+        
+        report = get_health_report()
+        unhealthy = [
+            f"{operation}:{source}"
+            for operation, sources in report['sources'].items()
+            for source, stats in sources.items()
+            if not stats['healthy']
+        ]
+        data = {
+            "status": "degraded" if unhealthy else "ok",
+            "timestamp": datetime.now().isoformat(),
+            "unhealthy": unhealthy,
+            "data_sources": report['sources'],
+            "circuit_breakers": report['circuit_breakers'],
+        }
+        llm_cache = get_llm_cache()
+        data["llm_cache"] = llm_cache.stats() if llm_cache is not None else None
+        search_cache = get_search_cache()
+        data["search_cache"] = search_cache.stats() if search_cache is not None else None
+        return JsonResponse(data)
+    
     def handle_analysis(self, query: Dict[str, list], headers: Dict[str, str] = None) -> Response:
         """
         触发股票分析 GET /analysis?code=xxx
@@ -464,6 +464,12 @@ def create_default_router() -> Router:
         "健康检查"
     )
     
+    router.register(
+        "/api/health", "GET",
+        lambda q: api_handler.handle_api_health(),
+        "数据源健康记分板"
+    )
+    
     router.register(
         "/analysis", "GET",
         lambda q, headers=None: api_handler.handle_analysis(q, headers or {}),
@@ -16,8 +16,8 @@ import re
 import logging
 import threading
 from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime
-from typing import Optional, Dict, Any, List, Union
+from datetime import date, datetime
+from typing import Optional, Dict, Any, List, Tuple, Union
 
 from src.enums import ReportType
 from bot.models import BotMessage
@@ -140,6 +140,8 @@ class AnalysisService:
     2. 执行股票分析
     3. 触发通知推送
     4. 任务持久化（支持 MySQL / 内存存储）
+    5. 同一股票并发请求合并：(股票代码, 报告类型, 交易日) 相同的请求只运行一次流水线，
+       后提交者挂到进行中的任务上，完成后各自获得同一份结果
     """
     
     _instance: Optional['AnalysisService'] = None
@@ -158,6 +160,9 @@ class AnalysisService:
         self._tasks: Dict[str, Dict[str, Any]] = {}  # 内存缓存
         self._tasks_lock = threading.Lock()
         self._persist_to_db = persist_to_db
+        # 进行中的分析：(code, report_type, 交易日) → 订阅者列表（首个为实际执行者）
+        self._inflight: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = {}
+        self._inflight_lock = threading.Lock()
         
         # 延迟初始化数据库相关组件
         self._db_initialized = False
@@ -248,16 +253,39 @@ class AnalysisService:
         if self._persist_to_db:
             self._persist_task_create(task_id, code, user_id, report_type)
         
-        # 立即增加用户分析次数（在任务提交时，而不是完成后）
+        # 立即增加用户分析次数（在任务提交时，而不是完成后；合并到进行中任务的请求同样计数）
         if user_id:
             self._increment_user_analysis_count(user_id)
         
-        # 提交到线程池
-        self.executor.submit(
-            self._run_analysis, code, task_id, report_type, source_message, user_id, source_type, source_ref
-        )
+        # 同一股票/报告类型/交易日已有进行中的分析：挂到该任务上，不再重复运行流水线
+        inflight_key = (code, report_type.value, date.today().isoformat())
+        subscriber = {
+            "task_id": task_id,
+            "user_id": user_id,
+            "source_message": source_message,
+            "source_type": source_type,
+            "source_ref": source_ref,
+        }
+        with self._inflight_lock:
+            subscribers = self._inflight.get(inflight_key)
+            if subscribers is None:
+                self._inflight[inflight_key] = [subscriber]
+            else:
+                subscribers.append(subscriber)
+                leader_task_id = subscribers[0]["task_id"]
         
-        logger.info(f"[AnalysisService] 已提交股票 {code} 的分析任务, task_id={task_id}, report_type={report_type.value}, user_id={user_id}")
+        if subscribers is not None:
+            leader_status = (self.get_task_status(leader_task_id) or {}).get("status")
+            if leader_status == "running":
+                self._update_task_status(task_id, "running")
+            logger.info(f"[AnalysisService] 股票 {code} 已有进行中的分析 {leader_task_id}，合并请求 task_id={task_id}, user_id={user_id}")
+        else:
+            # 提交到线程池
+            self.executor.submit(
+                self._run_analysis, code, task_id, report_type, source_message, user_id, source_type, source_ref,
+                inflight_key
+            )
+            logger.info(f"[AnalysisService] 已提交股票 {code} 的分析任务, task_id={task_id}, report_type={report_type.value}, user_id={user_id}")
         
         return {
             "success": True,
@@ -313,12 +341,13 @@ class AnalysisService:
         source_message: Optional[BotMessage] = None,
         user_id: Optional[int] = None,
         source_type: str = 'direct',
-        source_ref: Optional[str] = None
+        source_ref: Optional[str] = None,
+        inflight_key: Optional[Tuple[str, str, str]] = None
     ) -> Dict[str, Any]:
         """
         执行单只股票分析
 
-        内部方法，在线程池中运行
+        内部方法，在线程池中运行；完成后把同一结果分发给合并到本任务的其他请求
 
         Args:
             code: 股票代码
@@ -328,10 +357,15 @@ class AnalysisService:
             user_id: 用户 ID
             source_type: 分析来源 direct/url_crawl/prompt_crawl
             source_ref: 来源引用
+            inflight_key: 进行中分析的合并键（submit_analysis 传入）
         """
-        # 更新任务状态为运行中
-        self._update_task_status(task_id, "running")
+        # 更新任务状态为运行中（包括已合并进来的请求）
+        for subscriber in self._inflight_subscribers(inflight_key, task_id):
+            self._update_task_status(subscriber["task_id"], "running")
         
+        result = None
+        error_msg = None
+        pipeline = None
         try:
             # 延迟导入避免循环依赖
             from src.config import get_config
@@ -347,56 +381,132 @@ class AnalysisService:
                 source_message=source_message
             )
             
-            # 执行单只股票分析（启用单股推送）
+            # 执行单只股票分析（启用单股推送；流式模式下部分结果实时写入任务状态）
             result = pipeline.process_single_stock(
                 code=code,
                 skip_analysis=False,
                 single_stock_notify=True,
-                report_type=report_type
+                report_type=report_type,
+                on_partial=lambda partial: self._update_task_partial(inflight_key, task_id, partial)
             )
-            
-            if result:
-                result_data = {
-                    "code": result.code,
-                    "name": result.name,
-                    "sentiment_score": result.sentiment_score,
-                    "operation_advice": result.operation_advice,
-                    "trend_prediction": result.trend_prediction,
-                    "analysis_summary": result.analysis_summary,
-                }
-                
-                # 更新任务状态
-                self._update_task_status(task_id, "completed", result_data=result_data)
-                
-                # 注意：用户分析次数已在 submit_analysis 中递增，这里不再重复
-                
-                # 保存分析历史
-                if user_id and self._persist_to_db:
-                    self._save_analysis_history(
-                        user_id, task_id, code, result.name, result_data,
-                        source_type=source_type or 'direct',
-                        source_ref=source_ref
-                    )
-                
-                # 发送分析报告到用户邮箱
-                if user_id:
-                    self._send_report_to_user_email(user_id, result, report_type, pipeline)
-                
-                logger.info(f"[AnalysisService] 股票 {code} 分析完成: {result.operation_advice}")
-                return {"success": True, "task_id": task_id, "result": result_data}
-            else:
-                self._update_task_status(task_id, "failed", error="分析返回空结果")
-                
+            if not result:
+                error_msg = "分析返回空结果"
                 logger.warning(f"[AnalysisService] 股票 {code} 分析失败: 返回空结果")
-                return {"success": False, "task_id": task_id, "error": "分析返回空结果"}
                 
         except Exception as e:
             error_msg = str(e)
             logger.error(f"[AnalysisService] 股票 {code} 分析异常: {error_msg}")
-            
+        
+        # 结束合并窗口：此后的同股票请求会重新运行流水线
+        subscribers = self._release_inflight(inflight_key, task_id)
+        if len(subscribers) > 1:
+            logger.info(f"[AnalysisService] 股票 {code} 分析结果分发给 {len(subscribers) - 1} 个合并请求")
+        
+        result_data = None
+        if result:
+            result_data = {
+                "code": result.code,
+                "name": result.name,
+                "sentiment_score": result.sentiment_score,
+                "operation_advice": result.operation_advice,
+                "trend_prediction": result.trend_prediction,
+                "analysis_summary": result.analysis_summary,
+            }
+            logger.info(f"[AnalysisService] 股票 {code} 分析完成: {result.operation_advice}")
+        
+        for subscriber in subscribers:
+            is_leader = subscriber["task_id"] == task_id
+            try:
+                self._finish_subscriber(subscriber, code, report_type, result, result_data, error_msg, pipeline, is_leader)
+            except Exception as e:
+                logger.error(f"[AnalysisService] 任务 {subscriber['task_id']} 结果分发失败: {e}")
+        
+        if result_data:
+            return {"success": True, "task_id": task_id, "result": result_data}
+        return {"success": False, "task_id": task_id, "error": error_msg}
+    
+    def _update_task_partial(
+        self,
+        inflight_key: Optional[Tuple[str, str, str]],
+        task_id: str,
+        partial: Dict[str, Any]
+    ):
+        """写入流式解析出的部分结果（仅内存，包括合并进来的请求）"""
+        subscribers = self._inflight_subscribers(inflight_key, task_id)
+        with self._tasks_lock:
+            for subscriber in subscribers:
+                task = self._tasks.get(subscriber["task_id"])
+                if task is not None:
+                    task["partial_result"] = partial
+    
+    def _inflight_subscribers(
+        self,
+        inflight_key: Optional[Tuple[str, str, str]],
+        task_id: str
+    ) -> List[Dict[str, Any]]:
+        """当前挂在进行中分析上的订阅者（未经 submit_analysis 合并时只有任务本身）"""
+        with self._inflight_lock:
+            subscribers = self._inflight.get(inflight_key) if inflight_key else None
+            if subscribers and subscribers[0]["task_id"] == task_id:
+                return list(subscribers)
+        return [{"task_id": task_id}]
+    
+    def _release_inflight(
+        self,
+        inflight_key: Optional[Tuple[str, str, str]],
+        task_id: str
+    ) -> List[Dict[str, Any]]:
+        """移除进行中分析记录，返回全部订阅者（首个为执行者本身）"""
+        with self._inflight_lock:
+            subscribers = self._inflight.get(inflight_key) if inflight_key else None
+            if subscribers and subscribers[0]["task_id"] == task_id:
+                del self._inflight[inflight_key]
+                return subscribers
+        return [{"task_id": task_id}]
+    
+    def _finish_subscriber(
+        self,
+        subscriber: Dict[str, Any],
+        code: str,
+        report_type: ReportType,
+        result,
+        result_data: Optional[Dict[str, Any]],
+        error_msg: Optional[str],
+        pipeline,
+        is_leader: bool
+    ):
+        """
+        把分析结果写回单个请求：任务状态、分析历史、用户邮箱，
+        合并请求来自其他机器人会话时另行回复到该会话（执行者的会话已由流水线单股推送）
+        """
+        task_id = subscriber["task_id"]
+        if not result_data:
             self._update_task_status(task_id, "failed", error=error_msg)
-            
-            return {"success": False, "task_id": task_id, "error": error_msg}
+            return
+        
+        self._update_task_status(task_id, "completed", result_data=result_data)
+        
+        # 注意：用户分析次数已在 submit_analysis 中递增，这里不再重复
+        
+        user_id = subscriber.get("user_id")
+        # 保存分析历史
+        if user_id and self._persist_to_db:
+            self._save_analysis_history(
+                user_id, task_id, code, result.name, result_data,
+                source_type=subscriber.get("source_type") or 'direct',
+                source_ref=subscriber.get("source_ref")
+            )
+        
+        # 发送分析报告到用户邮箱
+        if user_id:
+            self._send_report_to_user_email(user_id, result, report_type, pipeline)
+        
+        source_message = subscriber.get("source_message")
+        if not is_leader and source_message is not None:
+            from src.notification import NotificationService
+            notifier = NotificationService(source_message=source_message)
+            if notifier.send_to_context(pipeline._build_single_stock_report(result, report_type)):
+                logger.info(f"[AnalysisService] 合并请求 {task_id} 已回复到来源会话")
     
     def _update_task_status(
         self,